@@ -45,6 +45,39 @@ module.exports = {
       },
       watch: false,
       ignore_watch: ["public/data/**", "public/dist/**", "node_modules/**"]
+    },
+    {
+      name: 'read-service',
+      script: './venv/Scripts/python.exe',
+      args: '-m server.apis.ana.services.read_service --porta 5001',
+      cwd: './',
+      env: {
+        NODE_ENV: 'development'
+      },
+      watch: false,
+      ignore_watch: ["public/data/**", "public/dist/**", "node_modules/**"]
+    },
+    {
+      name: 'inventory-refresher',
+      script: './venv/Scripts/python.exe',
+      args: '-m server.apis.ana.services.inventory_refresher',
+      cwd: './',
+      env: {
+        NODE_ENV: 'development'
+      },
+      watch: false,
+      ignore_watch: ["public/data/**", "public/dist/**", "node_modules/**"]
+    },
+    {
+      name: 'realearth-prefetcher',
+      script: './venv/Scripts/python.exe',
+      args: '-m server.apis.hydro_estimator_rainfall.services.tile_prefetcher',
+      cwd: './',
+      env: {
+        NODE_ENV: 'development'
+      },
+      watch: false,
+      ignore_watch: ["public/data/**", "public/dist/**", "node_modules/**", "cache/**"]
     }
   ]
 };
@@ -16,10 +16,11 @@ Objetivos Específicos:
 # Importação de módulos necessários
 import os                         # Para interação com o sistema operacional e acesso a variáveis de ambiente.
 import requests                   # Biblioteca para realizar requisições HTTP.
+from requests.adapters import HTTPAdapter  # Pool de conexões da sessão (consultas em paralelo).
 from dotenv import load_dotenv    # Para carregar variáveis de ambiente de um arquivo .env.
 import logging                    # Para registro de mensagens de log (INFO, WARNING, ERROR, etc.).
 # from apis.ana.hidrowebAuth import HidroWebAPI  # Importa a classe para autenticação na API HidroWeb.
-from apis.ana.services.hidrowebAuth import HidroWebAPI
+from server.apis.ana.services.hidrowebAuth import HidroWebAPI
 import time                       # Para manipulação de tempo, utilizado para medir o tempo de execução e delays.
 
 # Carrega as variáveis de ambiente do arquivo .env.
@@ -42,19 +43,31 @@ class HidroWebInventory:
     """
     BASE_URL = "https://www.ana.gov.br/hidrowebservice"
 
-    def __init__(self, token=None):
+    def __init__(self, token=None, base_url=None, max_connections=10):
         """
         Inicializa a classe com o token de autenticação.
         
         Args:
             token (str, optional): Token de autenticação JWT.
                 Se o token não for fornecido, ele será obtido automaticamente utilizando a classe HidroWebAPI.
+            base_url (str, optional): URL base da API. Se não for fornecida, será lida da variável de ambiente
+                "HIDROWEB_BASE_URL" ou, na ausência desta, será usada a URL oficial (BASE_URL).
+            max_connections (int, optional): Tamanho do pool de conexões da sessão HTTP, que é compartilhada
+                pelas consultas feitas em paralelo (ver fetch_inventory).
         
         Raises:
             ValueError: Se o token não puder ser obtido após as tentativas de autenticação.
         """
+        self.base_url = base_url or os.getenv("HIDROWEB_BASE_URL") or self.BASE_URL
+
+        # Sessão reaproveitada entre as consultas (evita um handshake TLS por estação)
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("https://", adaptador)
+        self.session.mount("http://", adaptador)
+
         # Obtém o token utilizando a classe HidroWebAPI se não for fornecido
-        self.token = token or self.HidroWebAPI().authenticate()
+        self.token = token or HidroWebAPI(base_url=self.base_url).authenticate()
         
         if not self.token:
             raise ValueError("Token de autenticação não fornecido. Autentique primeiro.")
@@ -74,7 +87,7 @@ class HidroWebInventory:
             Exception: Em caso de erro na consulta, como problemas de rede, autenticação ou parâmetros inválidos.
         """
         # Constrói a URL completa para a requisição à API HidroWeb para consultar o inventário
-        url = f"{self.BASE_URL}/EstacoesTelemetricas/HidroInventarioEstacoes/v1"
+        url = f"{self.base_url}/EstacoesTelemetricas/HidroInventarioEstacoes/v1"
         
         # Define os cabeçalhos da requisição, incluindo o token de autenticação no formato Bearer
         headers = {
@@ -109,6 +122,50 @@ class HidroWebInventory:
             logger.error(f"Erro desconhecido ao buscar inventário: {e}")
             raise Exception(f"Erro desconhecido ao buscar inventário: {e}")
 
+    def fetch_inventory(self, station_code=None, uf=None, basin_code=None, timeout=30):
+        """
+        Consulta o inventário filtrando por estação, unidade federativa e/ou bacia.
+
+        Diferente de fetch_station_inventory, uma única chamada pode retornar centenas de estações
+        (ex.: todas as estações de uma UF), por isso o timeout padrão é maior.
+
+        Args:
+            station_code (str, optional): Código da estação.
+            uf (str, optional): Sigla da unidade federativa (ex.: "MT").
+            basin_code (str | int, optional): Código da bacia (campo "codigobacia" do inventário).
+            timeout (int, optional): Tempo máximo da requisição, em segundos.
+
+        Returns:
+            list: Estações encontradas (lista vazia se não houver nenhuma).
+
+        Raises:
+            ValueError: Se nenhum filtro for informado.
+            Exception: Em caso de erro na consulta, como problemas de rede, autenticação ou parâmetros inválidos.
+        """
+        params = {}
+        if station_code:
+            params["Código da Estação"] = station_code
+        if uf:
+            params["Unidade Federativa"] = uf
+        if basin_code not in (None, ""):
+            params["Código da Bacia"] = basin_code
+        if not params:
+            raise ValueError("Informe ao menos um filtro (estação, UF ou bacia) para consultar o inventário.")
+
+        url = f"{self.base_url}/EstacoesTelemetricas/HidroInventarioEstacoes/v1"
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "accept": "*/*"
+        }
+
+        try:
+            response = self.session.get(url, headers=headers, params=params, timeout=timeout)
+            self._handle_response(response)
+            return response.json().get("items") or []
+        except requests.RequestException as e:
+            logger.error(f"Erro ao buscar inventário ({params}): {e}")
+            raise Exception(f"Erro ao buscar inventário ({params}): {e}")
+
     def _handle_response(self, response):
         """
         Verifica a resposta da API e levanta exceções em caso de erro.
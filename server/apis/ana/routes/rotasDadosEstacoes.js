@@ -11,6 +11,37 @@ import express from 'express'; // Framework Express para criação do roteador
 import { mergeStationData } from '#apis/ana/services/node/mesclarDadosEstacoes.js';
 import { categorizeStations, categorizeStation } from '#utils/ana/classification/categorizacaoEstacoes.js'; // Funções para categorizar as estações
 import { getHistoricalStationData } from '#apis/ana/services/node/historicalStationData.js';
+import fetch from 'node-fetch'; // Encaminhamento das consultas ao serviço de leitura em Python
+import { pipeline } from 'stream'; // Encaminhamento do fluxo SSE do feed de alterações
+import fs from 'fs/promises';
+import path from 'path';
+
+// URL do serviço de leitura em Python (server/apis/ana/services/read_service.py)
+const READ_SERVICE_URL = process.env.READ_SERVICE_URL || 'http://127.0.0.1:5001';
+
+// Estatísticas de chuva pré-calculadas a cada ciclo (server/apis/ana/services/rainfall_stats.py)
+const ESTATISTICAS_CHUVA_PATH = path.join('public', 'data', 'estatisticas_chuva.json');
+let estatisticasChuvaCache = { mtimeMs: null, dados: null };
+
+/**
+ * Lê o arquivo de estatísticas de chuva, relendo-o somente quando ele for regravado.
+ * @returns {Promise<Object|null>} Conteúdo do arquivo ou null se ainda não existir.
+ */
+async function lerEstatisticasChuva() {
+  try {
+    const { mtimeMs } = await fs.stat(ESTATISTICAS_CHUVA_PATH);
+    if (estatisticasChuvaCache.mtimeMs !== mtimeMs) {
+      const dados = JSON.parse(await fs.readFile(ESTATISTICAS_CHUVA_PATH, 'utf-8'));
+      estatisticasChuvaCache = { mtimeMs, dados };
+    }
+    return estatisticasChuvaCache.dados;
+  } catch (error) {
+    if (error.code !== 'ENOENT') {
+      console.error('Erro ao ler as estatísticas de chuva:', error);
+    }
+    return null;
+  }
+}
 
 const router = express.Router();
 
@@ -151,84 +182,198 @@ router.get('/estacoes/historico/:dateStr/:intervaloh/:stationCode?', async (req,
 });
 
 /**
- * GET /estacoes/chuvaPorCidade
- * Retorna os dados de chuva acumulada agrupados por cidade (usando Municipio_Nome),
- * calculando a média e a mediana dos valores de "chuvaAcumulada" de cada estação por cidade.
+ * GET /estacoes/serie/:stationCode?inicio=YYYY-MM-DD&fim=YYYY-MM-DD&variaveis=cota,vazao,chuva&pontos=500&metodo=lttb
+ * Retorna a série da estação em um intervalo arbitrário, já reduzida no servidor para no máximo "pontos"
+ * pontos por variável ("metodo": "lttb" ou "minmax"). A consulta é encaminhada ao serviço de leitura em Python;
+ * os cabeçalhos ETag/If-None-Match são repassados, de modo que intervalos sem alteração retornam 304.
  */
-router.get('/estacoes/chuvaPorCidade', async (req, res) => {
+router.get('/estacoes/serie/:stationCode', async (req, res) => {
   try {
-    const mergedStations = await mergeStationData();
+    const query = new URLSearchParams(req.query).toString();
+    const url = `${READ_SERVICE_URL}/series/${encodeURIComponent(req.params.stationCode)}?${query}`;
+    const headers = req.get('If-None-Match') ? { 'If-None-Match': req.get('If-None-Match') } : {};
+    const response = await fetch(url, { headers });
 
-    // Atualiza o campo chuvaAcumulada conforme a categorização
-    const categorizedStations = mergedStations.map(station => {
-      const cat = categorizeStation(station);
-      const chuvaValue = Number(cat.chuvaAcumulada);
-      return {
-        ...station,
-        chuvaAcumulada: !isNaN(chuvaValue) && chuvaValue !== null && chuvaValue !== 'N/A'
-          ? chuvaValue
-          : null
-      };
-    });
+    const etag = response.headers.get('etag');
+    if (etag) {
+      res.set('ETag', etag);
+      res.set('Cache-Control', 'no-cache');
+    }
+    if (response.status === 304) {
+      return res.status(304).end();
+    }
+    res.status(response.status).json(await response.json());
+  } catch (error) {
+    console.error("Erro ao consultar a série da estação:", error);
+    res.status(502).json({ error: "Serviço de leitura indisponível." });
+  }
+});
 
-    // Função auxiliar para calcular a mediana de um array de números
-    function calcularMediana(numeros) {
-      if (!numeros.length) return 0;
-      const ordenados = numeros.slice().sort((a, b) => a - b);
-      const meio = Math.floor(ordenados.length / 2);
-      if (ordenados.length % 2 === 0) {
-        return (ordenados[meio - 1] + ordenados[meio]) / 2;
-      } else {
-        return ordenados[meio];
+/**
+ * GET /estacoes/alteracoes?desde=N&timeout=25
+ * Long-poll do feed de alterações: retorna apenas as estações cuja última leitura ou classificação mudou
+ * após a versão N (ou o estado completo, se N for 0/antigo). Sem alterações, responde com a lista vazia
+ * ao fim do timeout. GET /estacoes/alteracoes/versao retorna apenas a versão atual.
+ */
+router.get(['/estacoes/alteracoes', '/estacoes/alteracoes/versao'], async (req, res) => {
+  try {
+    const query = new URLSearchParams(req.query).toString();
+    const caminho = req.path.endsWith('/versao') ? '/alteracoes/versao' : '/alteracoes';
+    const response = await fetch(`${READ_SERVICE_URL}${caminho}?${query}`);
+    res.set('Cache-Control', 'no-store');
+    res.status(response.status).json(await response.json());
+  } catch (error) {
+    console.error("Erro ao consultar o feed de alterações:", error);
+    res.status(502).json({ error: "Serviço de leitura indisponível." });
+  }
+});
+
+/**
+ * GET /estacoes/alteracoes/stream?desde=N
+ * Mesmo feed de alterações como Server-Sent Events (text/event-stream).
+ */
+router.get('/estacoes/alteracoes/stream', async (req, res) => {
+  try {
+    const query = new URLSearchParams(req.query).toString();
+    const headers = req.get('Last-Event-ID') ? { 'Last-Event-ID': req.get('Last-Event-ID') } : {};
+    const response = await fetch(`${READ_SERVICE_URL}/alteracoes/stream?${query}`, { headers });
+    res.status(response.status);
+    res.set({ 'Content-Type': 'text/event-stream; charset=utf-8', 'Cache-Control': 'no-store' });
+    res.flushHeaders();
+    req.on('close', () => response.body.destroy());
+    pipeline(response.body, res, (err) => {
+      if (err && err.code !== 'ERR_STREAM_PREMATURE_CLOSE') {
+        console.error('Erro no fluxo de alterações:', err.message);
       }
+    });
+  } catch (error) {
+    console.error("Erro ao abrir o fluxo de alterações:", error);
+    res.status(502).json({ error: "Serviço de leitura indisponível." });
+  }
+});
+
+/**
+ * GET /estacoes/estatisticasChuva
+ * Retorna as estatísticas de chuva acumulada (quantidade de estações, média, mediana, desvio padrão,
+ * máximo e lista de estações) por município, bacia, sub-bacia e UF, além do resumo geral.
+ * O arquivo é gerado uma vez por ciclo de ingestão; a ETag é a versão do arquivo.
+ */
+router.get('/estacoes/estatisticasChuva', async (req, res) => {
+  const estatisticas = await lerEstatisticasChuva();
+  if (!estatisticas) {
+    return res.status(503).json({ error: "Estatísticas de chuva ainda não geradas." });
+  }
+  const etag = `"estatisticas-chuva-${estatisticas.versao}"`;
+  res.set({ ETag: etag, 'Cache-Control': 'no-cache' });
+  if (req.get('If-None-Match') === etag) {
+    return res.status(304).end();
+  }
+  res.json(estatisticas);
+});
+
+/**
+ * Calcula a chuva por cidade a partir dos dados mesclados (usado enquanto o arquivo de
+ * estatísticas pré-calculadas não existir).
+ * @returns {Promise<Object[]>}
+ */
+async function calcularChuvaPorCidade() {
+  const mergedStations = await mergeStationData();
+
+  // Atualiza o campo chuvaAcumulada conforme a categorização
+  const categorizedStations = mergedStations.map(station => {
+    const cat = categorizeStation(station);
+    const chuvaValue = Number(cat.chuvaAcumulada);
+    return {
+      ...station,
+      chuvaAcumulada: !isNaN(chuvaValue) && chuvaValue !== null && chuvaValue !== 'N/A'
+        ? chuvaValue
+        : null
+    };
+  });
+
+  // Função auxiliar para calcular a mediana de um array de números
+  function calcularMediana(numeros) {
+    if (!numeros.length) return 0;
+    const ordenados = numeros.slice().sort((a, b) => a - b);
+    const meio = Math.floor(ordenados.length / 2);
+    if (ordenados.length % 2 === 0) {
+      return (ordenados[meio - 1] + ordenados[meio]) / 2;
+    } else {
+      return ordenados[meio];
     }
+  }
 
-    // Agrupa os dados por cidade, armazenando também os valores individuais de chuva
-    const chuvaPorCidade = {};
-
-    categorizedStations.forEach(station => {
-      const cidade = station.Municipio_Nome
-        ? station.Municipio_Nome.trim().toUpperCase()
-        : 'DESCONHECIDO';
-      const chuva = station.chuvaAcumulada;
-
-      if (chuva !== null) { // Ignora valores inválidos
-        if (!chuvaPorCidade[cidade]) {
-          chuvaPorCidade[cidade] = {
-            cidade,
-            chuvaTotal: 0,
-            numEstacoes: 0,
-            valoresChuva: [],
-            estacoes: []
-          };
-        }
-
-        chuvaPorCidade[cidade].chuvaTotal += chuva;
-        chuvaPorCidade[cidade].numEstacoes += 1;
-        chuvaPorCidade[cidade].valoresChuva.push(chuva);
-        chuvaPorCidade[cidade].estacoes.push({
-          codigoestacao: station.codigoestacao,
-          Estacao_Nome: station.Estacao_Nome,
-          chuvaAcumulada: chuva
-        });
+  // Agrupa os dados por cidade, armazenando também os valores individuais de chuva
+  const chuvaPorCidade = {};
+
+  categorizedStations.forEach(station => {
+    const cidade = station.Municipio_Nome
+      ? station.Municipio_Nome.trim().toUpperCase()
+      : 'DESCONHECIDO';
+    const chuva = station.chuvaAcumulada;
+
+    if (chuva !== null) { // Ignora valores inválidos
+      if (!chuvaPorCidade[cidade]) {
+        chuvaPorCidade[cidade] = {
+          cidade,
+          chuvaTotal: 0,
+          numEstacoes: 0,
+          valoresChuva: [],
+          estacoes: []
+        };
       }
-    });
 
-    // Calcula a média e a mediana para cada cidade
-    Object.values(chuvaPorCidade).forEach(cidadeData => {
-      const media = cidadeData.numEstacoes > 0
-        ? cidadeData.chuvaTotal / cidadeData.numEstacoes
-        : 0;
-      const mediana = calcularMediana(cidadeData.valoresChuva);
-      cidadeData.chuvaMedia = media;
-      cidadeData.chuvaMediana = mediana;
-      // Remove os campos intermediários, se desejar
-      delete cidadeData.chuvaTotal;
-      delete cidadeData.numEstacoes;
-      delete cidadeData.valoresChuva;
-    });
+      chuvaPorCidade[cidade].chuvaTotal += chuva;
+      chuvaPorCidade[cidade].numEstacoes += 1;
+      chuvaPorCidade[cidade].valoresChuva.push(chuva);
+      chuvaPorCidade[cidade].estacoes.push({
+        codigoestacao: station.codigoestacao,
+        Estacao_Nome: station.Estacao_Nome,
+        chuvaAcumulada: chuva
+      });
+    }
+  });
+
+  // Calcula a média e a mediana para cada cidade
+  Object.values(chuvaPorCidade).forEach(cidadeData => {
+    const media = cidadeData.numEstacoes > 0
+      ? cidadeData.chuvaTotal / cidadeData.numEstacoes
+      : 0;
+    const mediana = calcularMediana(cidadeData.valoresChuva);
+    cidadeData.chuvaMedia = media;
+    cidadeData.chuvaMediana = mediana;
+    // Remove os campos intermediários, se desejar
+    delete cidadeData.chuvaTotal;
+    delete cidadeData.numEstacoes;
+    delete cidadeData.valoresChuva;
+  });
 
-    res.json(Object.values(chuvaPorCidade));
+  return Object.values(chuvaPorCidade);
+}
+
+/**
+ * GET /estacoes/chuvaPorCidade
+ * Retorna os dados de chuva acumulada agrupados por cidade (usando Municipio_Nome), com a média
+ * e a mediana dos valores de "chuvaAcumulada" de cada estação por cidade. Os valores vêm do arquivo
+ * de estatísticas pré-calculadas; se ele ainda não existir, são calculados a partir dos dados mesclados.
+ */
+router.get('/estacoes/chuvaPorCidade', async (req, res) => {
+  try {
+    const estatisticas = await lerEstatisticasChuva();
+    if (!estatisticas) {
+      return res.json(await calcularChuvaPorCidade());
+    }
+    const resultado = estatisticas.grupos.Municipio_Nome.map(grupo => ({
+      cidade: grupo.nome,
+      estacoes: grupo.estacoes.map(codigo => ({
+        codigoestacao: codigo,
+        Estacao_Nome: estatisticas.estacoes[codigo].Estacao_Nome,
+        chuvaAcumulada: estatisticas.estacoes[codigo].chuvaAcumulada
+      })),
+      chuvaMedia: grupo.media,
+      chuvaMediana: grupo.mediana
+    }));
+    res.json(resultado);
   } catch (error) {
     console.error("Erro ao calcular a média e a mediana de chuva por cidade:", error);
     res.status(500).json({ error: "Falha ao calcular a média e a mediana de chuva por cidade." });
@@ -0,0 +1,393 @@
+"""
+@file server/apis/ana/services/alert_engine.py
+@description Motor de alertas por limiar avaliado na ingestão, apenas sobre as leituras que acabaram de chegar.
+
+O motor é um observador do pipeline de ingestão (PipelineIngestao): a cada lote gravado ele recebe,
+para cada estação, as leituras inéditas ("novos", ver DataStorage.preparar_arquivos) e as avalia contra
+as regras, usando um estado pequeno por estação e regra (alerta ativo, início da subida, janela de chuva
+da última hora...). Nenhum arquivo diário é relido, portanto o custo é proporcional às leituras novas,
+não ao histórico. Leituras mais antigas que a última já avaliada para a estação são ignoradas.
+
+Tipos de regra (REGRAS_ALERTA):
+  - limiar: valor (cota ou vazão) acima de "acima"; o alerta só é encerrado quando o valor volta para
+    abaixo de "acima - histerese", evitando alertas intermitentes em torno do limiar;
+  - subida: valor subindo continuamente há pelo menos "horas" (leituras iguais não interrompem a subida);
+  - taxa_chuva: chuva somada na janela de "horas" acima de "mm_h" por hora (encerra abaixo de mm_h - histerese);
+  - silencio: estação sem leituras há mais de "horas"; avaliada ao final do ciclo (verificar_silencio)
+    sobre o estado das estações, e encerrada pela próxima leitura.
+
+Cada transição gera um evento ("disparo" ou "normalizacao") no log de eventos, uma tabela SQLite que só
+recebe inserções. O id do evento é derivado de (estação, regra, tipo, medição), de modo que reprocessar as
+mesmas leituras (ex.: após uma falha no meio do ciclo) não duplica eventos.
+
+Uso nos schedulers:
+    motor = MotorAlertas(fonte="hidroweb")
+    pipeline = PipelineIngestao(..., observadores=[motor])
+    pipeline.executar(itens)
+    motor.verificar_silencio()
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from server.apis.ana.utils.classificacao import CONFIG_CLASSIFICACAO
+from server.apis.ana.utils.leituras import texto_para_segundos, segundos_para_texto
+from server.apis.ana.services.change_feed import codigo_do_arquivo
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+CAMINHO_ALERTAS = os.path.join(DATA_ROOT, "alertas.sqlite3")
+
+# Limiares de nível e vazão alinhados às classes "Alto" e "Alta" de CONFIG_CLASSIFICACAO
+REGRAS_ALERTA = [
+    {"nome": "nivel_alto", "tipo": "limiar", "variavel": "cota",
+     "acima": CONFIG_CLASSIFICACAO["nivel"]["normal"][1], "histerese": 10},
+    {"nome": "vazao_alta", "tipo": "limiar", "variavel": "vazao",
+     "acima": CONFIG_CLASSIFICACAO["vazao"]["normal"][1], "histerese": 2},
+    {"nome": "nivel_subindo", "tipo": "subida", "variavel": "cota", "horas": 3},
+    {"nome": "chuva_intensa", "tipo": "taxa_chuva", "mm_h": 10, "horas": 1, "histerese": 2},
+    {"nome": "estacao_silenciosa", "tipo": "silencio", "horas": CONFIG_CLASSIFICACAO["limiar_atualizacao_h"]},
+]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS estado_alertas (
+    codigoestacao TEXT NOT NULL,
+    regra TEXT NOT NULL,
+    fonte TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    PRIMARY KEY (codigoestacao, regra)
+);
+CREATE TABLE IF NOT EXISTS eventos (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    codigoestacao TEXT NOT NULL,
+    regra TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    medicao TEXT NOT NULL,
+    valor REAL,
+    limiar REAL,
+    fonte TEXT NOT NULL,
+    registrado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_eventos_estacao ON eventos (codigoestacao, seq);
+"""
+
+
+def _evento(codigo, regra, tipo, medicao, valor=None, limiar=None):
+    return {"codigoestacao": codigo, "regra": regra["nome"], "tipo": tipo, "medicao": medicao,
+            "valor": None if valor is None else round(float(valor), 2), "limiar": limiar}
+
+
+class RegraLimiar:
+    """Valor acima do limiar, com histerese para o encerramento."""
+
+    def __init__(self, config):
+        self.config = config
+        self.variavel = config["variavel"]
+        self.acima = float(config["acima"])
+        self.abaixo = self.acima - float(config.get("histerese", 0))
+
+    def avaliar(self, codigo, estado, leitura):
+        valor = getattr(leitura, self.variavel)
+        if valor is None:
+            return None
+        ativo = estado.get("ativo", False)
+        if not ativo and valor > self.acima:
+            estado["ativo"] = True
+            return _evento(codigo, self.config, "disparo", leitura.medicao, valor, self.acima)
+        if ativo and valor < self.abaixo:
+            estado["ativo"] = False
+            return _evento(codigo, self.config, "normalizacao", leitura.medicao, valor, self.abaixo)
+        return None
+
+
+class RegraSubida:
+    """Valor subindo continuamente há pelo menos N horas."""
+
+    def __init__(self, config):
+        self.config = config
+        self.variavel = config["variavel"]
+        self.duracao_s = float(config["horas"]) * 3600
+
+    def avaliar(self, codigo, estado, leitura):
+        valor = getattr(leitura, self.variavel)
+        if valor is None:
+            return None
+        anterior, medicao_anterior = estado.get("valor"), estado.get("medicao")
+        estado["valor"], estado["medicao"] = valor, leitura.medicao
+        if anterior is None:
+            return None
+        if valor > anterior and estado.get("inicio") is None:
+            # A subida começa na leitura anterior (o último ponto baixo)
+            estado["inicio"] = medicao_anterior
+        elif valor < anterior:
+            estado["inicio"] = None
+            if estado.get("ativo"):
+                estado["ativo"] = False
+                return _evento(codigo, self.config, "normalizacao", leitura.medicao, valor)
+        if not estado.get("ativo") and estado.get("inicio") is not None \
+                and leitura.medicao - estado["inicio"] >= self.duracao_s:
+            estado["ativo"] = True
+            return _evento(codigo, self.config, "disparo", leitura.medicao, valor, self.config["horas"])
+        return None
+
+
+class RegraTaxaChuva:
+    """Chuva acumulada na janela de N horas acima de mm_h por hora."""
+
+    def __init__(self, config):
+        self.config = config
+        self.janela_s = float(config.get("horas", 1)) * 3600
+        self.limiar = float(config["mm_h"]) * float(config.get("horas", 1))
+        self.abaixo = self.limiar - float(config.get("histerese", 0)) * float(config.get("horas", 1))
+
+    def avaliar(self, codigo, estado, leitura):
+        if leitura.chuva is None:
+            return None
+        # Só as leituras dentro da janela ficam no estado
+        janela = [(medicao, chuva) for medicao, chuva in estado.get("janela", [])
+                  if medicao > leitura.medicao - self.janela_s]
+        janela.append((leitura.medicao, leitura.chuva))
+        estado["janela"] = janela
+        total = sum(chuva for _, chuva in janela)
+        ativo = estado.get("ativo", False)
+        if not ativo and total > self.limiar:
+            estado["ativo"] = True
+            return _evento(codigo, self.config, "disparo", leitura.medicao, total, self.limiar)
+        if ativo and total < self.abaixo:
+            estado["ativo"] = False
+            return _evento(codigo, self.config, "normalizacao", leitura.medicao, total, self.abaixo)
+        return None
+
+
+class RegraSilencio:
+    """Estação sem leituras há mais de N horas (verificada no fim do ciclo, encerrada pela próxima leitura)."""
+
+    def __init__(self, config):
+        self.config = config
+        self.limite_s = float(config["horas"]) * 3600
+
+    def avaliar(self, codigo, estado, leitura):
+        if estado.get("ativo"):
+            estado["ativo"] = False
+            return _evento(codigo, self.config, "normalizacao", leitura.medicao)
+        return None
+
+    def verificar(self, codigo, estado, agora_s):
+        if estado.get("ativo") or estado.get("ultima") is None:
+            return None
+        if agora_s - estado["ultima"] > self.limite_s:
+            estado["ativo"] = True
+            # A medição do evento é o instante em que a estação ficou silenciosa (não o da verificação),
+            # para que verificações concorrentes (workers em modo shard) gerem o mesmo id
+            return _evento(codigo, self.config, "disparo", estado["ultima"] + self.limite_s, None,
+                           self.config["horas"])
+        return None
+
+
+def _textos_estado(estados):
+    """Estado serializado de cada (estação, regra), usado para gravar só as linhas alteradas."""
+    return {(codigo, regra): json.dumps(estado, separators=(",", ":"))
+            for codigo, estados_estacao in estados.items() for regra, estado in estados_estacao.items()}
+
+
+TIPOS_REGRA = {"limiar": RegraLimiar, "subida": RegraSubida, "taxa_chuva": RegraTaxaChuva, "silencio": RegraSilencio}
+
+
+class MotorAlertas:
+    """Avalia as regras sobre as leituras novas de cada lote e registra os eventos de alerta."""
+
+    def __init__(self, caminho=CAMINHO_ALERTAS, fonte="ingestao", regras=None):
+        """
+        @param caminho: Arquivo SQLite com o estado das regras e o log de eventos.
+        @param fonte: Fonte das leituras ("hidroweb", "cemaden"); a verificação de silêncio é feita por fonte.
+        @param regras: Lista de regras no formato de REGRAS_ALERTA (padrão: REGRAS_ALERTA).
+        """
+        self.caminho = caminho
+        self.fonte = fonte
+        self.regras = [TIPOS_REGRA[regra["tipo"]](regra) for regra in (regras or REGRAS_ALERTA)]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao().executescript(_ESQUEMA)
+
+    def _conexao(self):
+        """Uma conexão por thread (o pipeline chama os observadores na thread de gravação)."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def __call__(self, lote):
+        """Observador do pipeline: reúne as leituras novas de cada estação do lote e as avalia."""
+        novas = {}
+        for resultado in lote:
+            for arquivo in resultado.get("arquivos", []):
+                if arquivo.get("novos"):
+                    novas.setdefault(codigo_do_arquivo(arquivo["caminho"]), []).extend(arquivo["novos"])
+        if novas:
+            self.avaliar(novas)
+
+    def avaliar(self, leituras_por_estacao):
+        """
+        Avalia as regras sobre as leituras recebidas.
+
+        @param leituras_por_estacao: Dicionário {codigoestacao: [Leitura]} com as leituras novas.
+        @return: Lista dos eventos registrados (já sem os duplicados).
+        """
+        def calcular(estados):
+            eventos = []
+            for codigo, leituras in leituras_por_estacao.items():
+                estados_estacao = estados.setdefault(codigo, {})
+                ultima = estados_estacao.get("__ultima__", {}).get("ultima")
+                for leitura in sorted(leituras, key=lambda l: l.medicao):
+                    if ultima is not None and leitura.medicao <= ultima:
+                        continue
+                    ultima = leitura.medicao
+                    for regra in self.regras:
+                        evento = regra.avaliar(codigo, estados_estacao.setdefault(regra.config["nome"], {}), leitura)
+                        if evento:
+                            eventos.append(evento)
+                for regra in self.regras:
+                    if isinstance(regra, RegraSilencio):
+                        estados_estacao.setdefault(regra.config["nome"], {})["ultima"] = ultima
+                estados_estacao["__ultima__"] = {"ultima": ultima}
+            return eventos
+
+        codigos = list(leituras_por_estacao)
+        return self._gravar(lambda conexao: self._carregar_estados(conexao, codigos), calcular)
+
+    def verificar_silencio(self, agora_utc=None):
+        """
+        Dispara os alertas de silêncio das estações desta fonte sem leituras recentes. Percorre apenas o
+        estado das estações (uma linha por estação), não os arquivos. Em modo shard deve rodar num único
+        worker por ciclo (ObservadoresCiclo.concluir).
+
+        @param agora_utc: Instante de referência (padrão: agora); as medições estão no horário de Brasília.
+        @return: Lista dos eventos registrados.
+        """
+        agora_local = (agora_utc or datetime.utcnow()) - timedelta(hours=3)
+        agora_s = texto_para_segundos(agora_local.strftime("%Y-%m-%d %H:%M:%S"))
+        regras = [regra for regra in self.regras if isinstance(regra, RegraSilencio)]
+        if not regras:
+            return []
+        nomes = [regra.config["nome"] for regra in regras]
+
+        def carregar(conexao):
+            estados = {}
+            for codigo, nome, estado in conexao.execute(
+                    f"SELECT codigoestacao, regra, estado FROM estado_alertas WHERE fonte = ? "
+                    f"AND regra IN ({','.join('?' * len(nomes))})", [self.fonte, *nomes]):
+                estados.setdefault(codigo, {})[nome] = json.loads(estado)
+            return estados
+
+        def calcular(estados):
+            eventos = []
+            for codigo, estados_estacao in estados.items():
+                for regra in regras:
+                    estado = estados_estacao.get(regra.config["nome"])
+                    evento = regra.verificar(codigo, estado, agora_s) if estado is not None else None
+                    if evento:
+                        eventos.append(evento)
+            return eventos
+
+        return self._gravar(carregar, calcular)
+
+    def _carregar_estados(self, conexao, codigos):
+        estados = {}
+        for inicio in range(0, len(codigos), 500):
+            parte = codigos[inicio:inicio + 500]
+            for codigo, regra, estado in conexao.execute(
+                    f"SELECT codigoestacao, regra, estado FROM estado_alertas "
+                    f"WHERE codigoestacao IN ({','.join('?' * len(parte))})", parte):
+                estados.setdefault(codigo, {})[regra] = json.loads(estado)
+        return estados
+
+    def _gravar(self, carregar, calcular):
+        """
+        Lê o estado, avalia e grava o estado e os eventos numa única transação, para que um worker (modo
+        shard) não sobrescreva o estado gravado por outro entre a leitura e a gravação. Só as linhas de
+        estado que mudaram são regravadas.
+
+        @param carregar: Função (conexao) -> {codigoestacao: {regra: estado}}.
+        @param calcular: Função (estados) -> lista de eventos; altera os estados recebidos.
+        @return: Os eventos efetivamente inseridos.
+        """
+        registrado_em = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        inseridos = []
+        with self._lock:
+            conexao = self._conexao()
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                estados = carregar(conexao)
+                lidos = _textos_estado(estados)
+                eventos = calcular(estados)
+                conexao.executemany(
+                    "INSERT OR REPLACE INTO estado_alertas (codigoestacao, regra, fonte, estado) VALUES (?, ?, ?, ?)",
+                    [(codigo, regra, self.fonte, texto) for (codigo, regra), texto in _textos_estado(estados).items()
+                     if lidos.get((codigo, regra)) != texto])
+                for evento in eventos:
+                    evento["medicao"] = segundos_para_texto(int(evento["medicao"]))
+                    evento["id"] = hashlib.sha1("|".join(
+                        (evento["codigoestacao"], evento["regra"], evento["tipo"], evento["medicao"])
+                    ).encode("utf-8")).hexdigest()[:20]
+                    cursor = conexao.execute(
+                        "INSERT OR IGNORE INTO eventos (id, codigoestacao, regra, tipo, medicao, valor, limiar, fonte, "
+                        "registrado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (evento["id"], evento["codigoestacao"], evento["regra"], evento["tipo"], evento["medicao"],
+                         evento["valor"], evento["limiar"], self.fonte, registrado_em))
+                    if cursor.rowcount:
+                        inseridos.append(dict(evento, seq=cursor.lastrowid, fonte=self.fonte))
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+        for evento in inseridos:
+            logger.info(f"[alertas] {evento['tipo']} {evento['regra']} em {evento['codigoestacao']} "
+                        f"({evento['medicao']}, valor {evento['valor']})")
+        return inseridos
+
+    def eventos_desde(self, seq=0, limite=1000):
+        """Eventos do log posteriores ao número de sequência informado (em ordem de registro)."""
+        colunas = ("seq", "id", "codigoestacao", "regra", "tipo", "medicao", "valor", "limiar", "fonte",
+                   "registrado_em")
+        linhas = self._conexao().execute(
+            f"SELECT {', '.join(colunas)} FROM eventos WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limite))
+        return [dict(zip(colunas, linha)) for linha in linhas]
+
+    def alertas_ativos(self):
+        """Alertas atualmente ativos: lista de {"codigoestacao", "regra"}."""
+        ativos = []
+        for codigo, regra, estado in self._conexao().execute(
+                "SELECT codigoestacao, regra, estado FROM estado_alertas ORDER BY codigoestacao, regra"):
+            if json.loads(estado).get("ativo"):
+                ativos.append({"codigoestacao": codigo, "regra": regra})
+        return ativos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o log de eventos de alerta.")
+    parser.add_argument("--caminho", default=CAMINHO_ALERTAS)
+    parser.add_argument("--desde", type=int, default=0, help="Número de sequência a partir do qual listar.")
+    parser.add_argument("--ativos", action="store_true", help="Lista os alertas ativos em vez dos eventos.")
+    args = parser.parse_args()
+    motor = MotorAlertas(args.caminho)
+    itens = motor.alertas_ativos() if args.ativos else motor.eventos_desde(args.desde)
+    for item in itens:
+        print(json.dumps(item, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.alert_engine --ativos
@@ -0,0 +1,403 @@
+"""
+@file server/apis/ana/services/analytics_query.py
+@description Biblioteca de consultas analíticas: séries de várias estações em DataFrames tipados e
+exportação em fluxo para CSV/Parquet.
+
+Em vez de scripts que percorrem public/data e carregam tudo em memória, a consulta é descrita por
+(estações, início, fim, variáveis):
+
+  consulta = ConsultaAnalitica()
+  df = consulta.dataframe(["15043000", "66260001"], "2024-01-01", "2024-12-31", variaveis=("cota", "vazao"))
+
+Cada partição é um dia de uma estação (arquivo solto ou membro do arquivo mensal, ver utils/arquivo_mensal.py).
+As partições do intervalo são planejadas pelos manifestos mensais (utils/manifesto_mensal.py), sem listar
+diretórios, e lidas em paralelo (threads, ou processos com usar_processos=True para usar todos os núcleos
+na decodificação do JSON). As partições já decodificadas ficam num cache LRU limitado pelo número de
+linhas e revalidado pela assinatura da partição, como em series_query.py.
+
+Para intervalos grandes, iterar() devolve um DataFrame por estação e mês, com no máximo algumas
+partições em andamento, e exportar() grava esses blocos em sequência (CSV, CSV.gz ou Parquet), com uso
+de memória constante independentemente do tamanho do intervalo. O Parquet depende do pacote opcional
+pyarrow.
+
+Tipos das colunas: codigoestacao (category), medicao (datetime64, horário de Brasília, sem fuso),
+chuva/cota/vazao (float64, NaN quando ausente), <variavel>_status (Int16 com valores ausentes) e
+atualizacao (datetime64, NaT quando ausente).
+"""
+
+import os
+import json
+import gzip
+import functools
+import logging
+import argparse
+import threading
+import concurrent.futures
+from collections import OrderedDict, deque
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from server.apis.ana.utils.leituras import SerieLeituras, segundos_para_texto
+from server.apis.ana.utils.arquivo_mensal import listar_dias_mes, localizar_dia, ler_localizado
+from server.apis.ana.utils.manifesto_mensal import ler_manifesto
+from server.apis.ana.services.series_query import VARIAVEIS, interpretar_instante
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+MAX_LINHAS_EM_CACHE = 2_000_000
+# Partições lidas à frente do consumidor em iterar(), por worker
+PARTICOES_POR_WORKER = 4
+
+
+def decodificar_particao(caminho, membro=None):
+    """
+    Lê e decodifica uma partição (dia de uma estação) em colunas NumPy.
+    Função de módulo para poder ser executada no pool de processos.
+
+    @return: Dicionário {"medicao", "chuva", "cota", "vazao", "<variavel>_status", "atualizacao"};
+             status ausente = -1 e atualização ausente = -1.
+    """
+    try:
+        serie = SerieLeituras.de_json(json.loads(ler_localizado(caminho, membro)).get("dados", []))
+    except (OSError, KeyError, ValueError, AttributeError) as e:
+        print(f"Erro ao ler {membro or caminho}: {e}")
+        serie = SerieLeituras()
+    leituras = serie.ordenadas()
+    n = len(leituras)
+    colunas = {"medicao": np.fromiter((leitura.medicao for leitura in leituras), dtype=np.int64, count=n)}
+    for variavel, atributo in VARIAVEIS.items():
+        colunas[variavel] = np.fromiter(
+            (np.nan if getattr(leitura, atributo) is None else getattr(leitura, atributo) for leitura in leituras),
+            dtype=np.float64, count=n)
+        colunas[f"{variavel}_status"] = np.fromiter(
+            (-1 if getattr(leitura, f"{atributo}_status") is None else getattr(leitura, f"{atributo}_status")
+             for leitura in leituras), dtype=np.int16, count=n)
+    colunas["atualizacao"] = np.fromiter(
+        (-1 if leitura.atualizacao_ms is None else leitura.atualizacao_ms for leitura in leituras),
+        dtype=np.int64, count=n)
+    return colunas
+
+
+def _meses_do_intervalo(inicio_s, fim_s):
+    """Meses ("YYYY", "MM") cobertos pelo intervalo, em ordem."""
+    dia = date.fromisoformat(segundos_para_texto(inicio_s)[:10]).replace(day=1)
+    ultimo = date.fromisoformat(segundos_para_texto(fim_s)[:10])
+    meses = []
+    while dia <= ultimo:
+        meses.append((f"{dia.year:04d}", f"{dia.month:02d}"))
+        dia = (dia + timedelta(days=32)).replace(day=1)
+    return meses
+
+
+class ConsultaAnalitica:
+    """Consultas de séries de várias estações sobre os arquivos diários (ambas as camadas)."""
+
+    def __init__(self, root_dir=DATA_ROOT, max_workers=None, usar_processos=False,
+                 max_linhas_em_cache=MAX_LINHAS_EM_CACHE):
+        """
+        @param root_dir: Diretório raiz dos arquivos diários.
+        @param max_workers: Número de threads/processos de leitura (padrão: 2x o número de CPUs, até 16).
+        @param usar_processos: Decodifica as partições num pool de processos (fora do GIL).
+        @param max_linhas_em_cache: Número máximo de leituras mantidas no cache de partições.
+        """
+        self.root_dir = root_dir
+        self.max_workers = max_workers or min(16, 2 * (os.cpu_count() or 1))
+        self.usar_processos = usar_processos
+        self.max_linhas_em_cache = max_linhas_em_cache
+        self._cache = OrderedDict()  # {(caminho, membro): (assinatura, colunas)}
+        self._linhas_em_cache = 0
+        self._lock = threading.Lock()
+        self.estatisticas = {"particoes_lidas": 0, "acertos_cache": 0}
+
+    # ----------------------------------------------------------------------------------------------
+    # Planejamento e leitura das partições
+    # ----------------------------------------------------------------------------------------------
+
+    def planejar(self, estacoes, inicio_s, fim_s):
+        """
+        Partições do intervalo, agrupadas em blocos por estação e mês.
+
+        @return: Lista de (codigo, "YYYY-MM", [(caminho, membro, assinatura), ...]).
+        """
+        data_inicio = segundos_para_texto(inicio_s)[:10]
+        data_fim = segundos_para_texto(fim_s)[:10]
+        dias_por_mes = {}
+        for ano, mes in _meses_do_intervalo(inicio_s, fim_s):
+            manifesto = ler_manifesto(self.root_dir, ano, mes)
+            dias_por_mes[(ano, mes)] = (manifesto["estacoes"] if manifesto is not None
+                                        else listar_dias_mes(self.root_dir, ano, mes))
+        blocos = []
+        for codigo in estacoes:
+            codigo = str(codigo)
+            for (ano, mes), dias_do_mes in dias_por_mes.items():
+                particoes = []
+                for data_str in sorted(dias_do_mes.get(codigo, ())):
+                    if data_inicio <= data_str <= data_fim:
+                        local = localizar_dia(self.root_dir, codigo, data_str)
+                        if local is not None:
+                            particoes.append(local)
+                if particoes:
+                    blocos.append((codigo, f"{ano}-{mes}", particoes))
+        return blocos
+
+    def _do_cache(self, caminho, membro, assinatura):
+        with self._lock:
+            em_cache = self._cache.get((caminho, membro))
+            if em_cache is not None and em_cache[0] == assinatura:
+                self._cache.move_to_end((caminho, membro))
+                self.estatisticas["acertos_cache"] += 1
+                return em_cache[1]
+        return None
+
+    def _guardar(self, caminho, membro, assinatura, colunas):
+        with self._lock:
+            self.estatisticas["particoes_lidas"] += 1
+            anterior = self._cache.pop((caminho, membro), None)
+            if anterior is not None:
+                self._linhas_em_cache -= len(anterior[1]["medicao"])
+            self._cache[(caminho, membro)] = (assinatura, colunas)
+            self._linhas_em_cache += len(colunas["medicao"])
+            while self._linhas_em_cache > self.max_linhas_em_cache and len(self._cache) > 1:
+                _, (_, removidas) = self._cache.popitem(last=False)
+                self._linhas_em_cache -= len(removidas["medicao"])
+
+    def _criar_pool(self):
+        if self.usar_processos:
+            return concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _blocos_lidos(self, blocos, usar_cache=True):
+        """
+        Gera (codigo, [colunas das partições]) para cada bloco, lendo as partições em paralelo com um
+        número limitado de partições em andamento (a memória não cresce com o tamanho do intervalo).
+        """
+        limite = self.max_workers * PARTICOES_POR_WORKER
+        with self._criar_pool() as pool:
+            pendentes = deque()  # (indice_bloco, posicao, futuro | colunas)
+            tarefas = ((i, j, particao) for i, (_, _, particoes) in enumerate(blocos)
+                       for j, particao in enumerate(particoes))
+            resultados = {}
+
+            def enviar():
+                for i, j, (caminho, membro, assinatura) in tarefas:
+                    colunas = self._do_cache(caminho, membro, assinatura) if usar_cache else None
+                    if colunas is None:
+                        colunas = pool.submit(decodificar_particao, caminho, membro)
+                    pendentes.append((i, j, (caminho, membro, assinatura), colunas))
+                    if len(pendentes) >= limite:
+                        return
+
+            enviar()
+            for i, (codigo, _, particoes) in enumerate(blocos):
+                while len(resultados) < len(particoes):
+                    _, j, (caminho, membro, assinatura), colunas = pendentes.popleft()
+                    if isinstance(colunas, concurrent.futures.Future):
+                        colunas = colunas.result()
+                        if usar_cache:
+                            self._guardar(caminho, membro, assinatura, colunas)
+                        else:
+                            with self._lock:
+                                self.estatisticas["particoes_lidas"] += 1
+                    resultados[j] = colunas
+                    enviar()
+                yield codigo, [resultados[j] for j in range(len(particoes))]
+                resultados = {}
+
+    # ----------------------------------------------------------------------------------------------
+    # DataFrames
+    # ----------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def _montar(partes, inicio_s, fim_s, variaveis, incluir_status, incluir_atualizacao, categorias):
+        """DataFrame tipado a partir de [(codigo, [colunas])], filtrado ao intervalo."""
+        codigos, colunas = [], []
+        for codigo, particoes in partes:
+            for particao in particoes:
+                codigos.append(codigo)
+                colunas.append(particao)
+        if colunas:
+            medicao = np.concatenate([c["medicao"] for c in colunas])
+            repeticoes = np.repeat(np.arange(len(codigos)), [len(c["medicao"]) for c in colunas])
+        else:
+            medicao = np.empty(0, dtype=np.int64)
+            repeticoes = np.empty(0, dtype=np.int64)
+        selecao = (medicao >= inicio_s) & (medicao <= fim_s)
+
+        def coluna(nome):
+            return np.concatenate([c[nome] for c in colunas])[selecao] if colunas else np.empty(0)
+
+        posicoes = {codigo: i for i, codigo in enumerate(categorias)}
+        indices = np.array([posicoes[codigo] for codigo in codigos], dtype=np.int32)
+        dados = {
+            "codigoestacao": pd.Categorical.from_codes(indices[repeticoes[selecao]], categories=categorias),
+            "medicao": pd.to_datetime(medicao[selecao], unit="s"),
+        }
+        for variavel in variaveis:
+            dados[variavel] = coluna(variavel).astype(np.float64)
+        if incluir_status:
+            for variavel in variaveis:
+                status = coluna(f"{variavel}_status").astype(np.int16)
+                dados[f"{variavel}_status"] = pd.arrays.IntegerArray(np.maximum(status, 0), status < 0)
+        if incluir_atualizacao:
+            atualizacao = coluna("atualizacao").astype(np.int64)
+            instantes = atualizacao.astype("datetime64[ms]")
+            instantes[atualizacao < 0] = np.datetime64("NaT")
+            dados["atualizacao"] = instantes.astype("datetime64[ns]")
+        return pd.DataFrame(dados)
+
+    def _validar(self, estacoes, inicio, fim, variaveis):
+        if isinstance(estacoes, (str, int)):
+            estacoes = [estacoes]
+        estacoes = list(dict.fromkeys(str(codigo) for codigo in estacoes))
+        if not estacoes:
+            raise ValueError("Informe ao menos uma estação.")
+        inicio_s = interpretar_instante(inicio)
+        fim_s = interpretar_instante(fim, fim=True)
+        if fim_s < inicio_s:
+            raise ValueError("O fim do intervalo deve ser posterior ao início.")
+        variaveis = tuple(dict.fromkeys(variaveis))
+        invalidas = [v for v in variaveis if v not in VARIAVEIS]
+        if not variaveis or invalidas:
+            raise ValueError(f"Variáveis inválidas: {', '.join(invalidas) or '(nenhuma)'}. "
+                             f"Use {', '.join(VARIAVEIS)}.")
+        return estacoes, inicio_s, fim_s, variaveis
+
+    def dataframe(self, estacoes, inicio, fim, variaveis=("chuva", "cota", "vazao"), incluir_status=False,
+                  incluir_atualizacao=False):
+        """
+        Leituras das estações no intervalo [inicio, fim] em um único DataFrame (ordenado por estação e medição).
+
+        @param estacoes: Código ou lista de códigos de estação.
+        @param inicio: Início do intervalo ("YYYY-MM-DD" ou "YYYY-MM-DD HH:MM:SS").
+        @param fim: Fim do intervalo (inclusive).
+        @param variaveis: Variáveis desejadas ("chuva", "cota", "vazao").
+        @param incluir_status: Inclui as colunas <variavel>_status.
+        @param incluir_atualizacao: Inclui a coluna atualizacao (Data_Atualizacao).
+        @raise ValueError: Para parâmetros inválidos.
+        """
+        estacoes, inicio_s, fim_s, variaveis = self._validar(estacoes, inicio, fim, variaveis)
+        partes = list(self._blocos_lidos(self.planejar(estacoes, inicio_s, fim_s)))
+        return self._montar(partes, inicio_s, fim_s, variaveis, incluir_status, incluir_atualizacao, estacoes)
+
+    def iterar(self, estacoes, inicio, fim, variaveis=("chuva", "cota", "vazao"), incluir_status=False,
+               incluir_atualizacao=False, usar_cache=False):
+        """
+        Gera um DataFrame por estação e mês (mesmas colunas e tipos de dataframe()), lendo as partições
+        à frente em paralelo. Por padrão não usa o cache de partições, para que exportações longas não
+        desloquem as partições das consultas interativas.
+
+        Os parâmetros são validados na chamada (não só ao consumir o primeiro bloco).
+        """
+        estacoes, inicio_s, fim_s, variaveis = self._validar(estacoes, inicio, fim, variaveis)
+        return self._gerar_blocos(estacoes, inicio_s, fim_s, variaveis, incluir_status, incluir_atualizacao,
+                                  usar_cache)
+
+    def _gerar_blocos(self, estacoes, inicio_s, fim_s, variaveis, incluir_status, incluir_atualizacao, usar_cache):
+        for codigo, particoes in self._blocos_lidos(self.planejar(estacoes, inicio_s, fim_s), usar_cache):
+            df = self._montar([(codigo, particoes)], inicio_s, fim_s, variaveis, incluir_status,
+                              incluir_atualizacao, estacoes)
+            if len(df):
+                yield df
+
+    # ----------------------------------------------------------------------------------------------
+    # Exportação
+    # ----------------------------------------------------------------------------------------------
+
+    def exportar(self, caminho, estacoes, inicio, fim, variaveis=("chuva", "cota", "vazao"), incluir_status=False,
+                 incluir_atualizacao=False):
+        """
+        Exporta as leituras para CSV (.csv ou .csv.gz) ou Parquet (.parquet), bloco a bloco.
+        O arquivo é gravado num temporário e movido para o destino ao final; se a exportação falhar,
+        o temporário é removido.
+
+        @return: Número de linhas exportadas.
+        @raise ValueError: Para extensões não suportadas ou parâmetros inválidos (antes de criar qualquer arquivo).
+        @raise ImportError: Para Parquet sem o pacote pyarrow.
+        """
+        if caminho.endswith(".parquet"):
+            exportar = _exportar_parquet
+        elif caminho.endswith(".csv") or caminho.endswith(".csv.gz"):
+            exportar = functools.partial(_exportar_csv, comprimir=caminho.endswith(".gz"))
+        else:
+            raise ValueError("Formato de exportação não suportado. Use .csv, .csv.gz ou .parquet.")
+        blocos = self.iterar(estacoes, inicio, fim, variaveis, incluir_status, incluir_atualizacao)
+        temporario = f"{caminho}.tmp"
+        try:
+            linhas = exportar(temporario, blocos)
+            os.replace(temporario, caminho)
+        except BaseException:
+            try:
+                os.remove(temporario)
+            except FileNotFoundError:
+                pass
+            raise
+        logger.info(f"[analitica] {linhas} linhas exportadas para {caminho}.")
+        return linhas
+
+
+def _exportar_csv(caminho, blocos, comprimir=False):
+    linhas = 0
+    abrir = gzip.open if comprimir else open
+    with abrir(caminho, "wt", encoding="utf-8", newline="") as f:
+        for df in blocos:
+            df.to_csv(f, index=False, header=linhas == 0, date_format="%Y-%m-%d %H:%M:%S")
+            linhas += len(df)
+    return linhas
+
+
+def _exportar_parquet(caminho, blocos):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("A exportação para Parquet requer o pacote pyarrow (pip install pyarrow).")
+    linhas = 0
+    escritor = None
+    try:
+        for df in blocos:
+            # O código da estação vai como texto: as categorias de cada bloco não precisam coincidir
+            tabela = pa.Table.from_pandas(df.astype({"codigoestacao": str}), preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema, compression="zstd")
+            escritor.write_table(tabela)
+            linhas += len(df)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    if escritor is None:
+        # Nenhuma linha: grava um arquivo vazio com o esquema mínimo
+        pq.write_table(pa.table({"codigoestacao": pa.array([], pa.string()),
+                                 "medicao": pa.array([], pa.timestamp("ns"))}), caminho)
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta e exporta as séries de várias estações.")
+    parser.add_argument("estacoes", nargs="+", help="Códigos das estações.")
+    parser.add_argument("--inicio", required=True)
+    parser.add_argument("--fim", required=True)
+    parser.add_argument("--variaveis", default="chuva,cota,vazao")
+    parser.add_argument("--status", action="store_true", help="Inclui as colunas de status.")
+    parser.add_argument("--saida", help="Arquivo .csv, .csv.gz ou .parquet (sem ele, exibe um resumo).")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--processos", action="store_true", help="Decodifica as partições em processos.")
+    args = parser.parse_args()
+
+    consulta = ConsultaAnalitica(args.root_dir, usar_processos=args.processos)
+    variaveis = tuple(args.variaveis.split(","))
+    if args.saida:
+        linhas = consulta.exportar(args.saida, args.estacoes, args.inicio, args.fim, variaveis, args.status)
+        print(f"{linhas} linhas exportadas para {args.saida}.")
+        return
+    df = consulta.dataframe(args.estacoes, args.inicio, args.fim, variaveis, args.status)
+    print(df.groupby("codigoestacao", observed=True).describe().T.to_string())
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.analytics_query 15043000 --inicio 2025-01-01 --fim 2025-03-31 --saida cota.csv.gz
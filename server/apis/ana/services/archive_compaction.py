@@ -0,0 +1,233 @@
+"""
+@file server/apis/ana/services/archive_compaction.py
+@description Compactação dos dias fechados em arquivos mensais comprimidos por grupo de estações.
+
+Cada dia fechado deixa em public/data/YYYY/MM/YYYY-MM-DD/ um arquivo JSON formatado por estação, que
+ficaria lá para sempre: milhares de inodes por mês, listagens de diretório lentas e backups lentos.
+Esta tarefa junta os dias com mais de 'dias_minimos' dias (no horário de Brasília) em um ZIP por mês
+e grupo de estações (utils/arquivo_mensal.py), comprimindo (deflate) o conteúdo original de cada dia, e
+remove os arquivos soltos. Como o conteúdo é o mesmo, tamanho e checksum do manifesto do mês
+(utils/manifesto_mensal.py) continuam valendo.
+
+Segurança da troca:
+  - o ZIP novo (membros antigos + dias novos) é gravado num temporário e substituído com os.replace,
+    de modo que leitores sempre veem o ZIP anterior ou o novo, completo;
+  - só depois da troca os arquivos soltos são removidos, e apenas os que não mudaram desde a leitura
+    (mtime e tamanho): uma gravação tardia durante a compactação continua viva e prevalece na leitura;
+  - arquivos com JSON inválido não são arquivados e continuam soltos.
+Se o processo for interrompido entre a troca e a remoção, os arquivos soltos continuam válidos (a camada
+viva prevalece) e são arquivados de novo na próxima execução.
+"""
+
+import os
+import json
+import shutil
+import logging
+import zipfile
+import argparse
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from server.apis.ana.utils.arquivo_mensal import (
+    DIRETORIO_ARQUIVO, caminho_arquivo_mensal, grupo_da_estacao, membro_dia
+)
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+# Dias mais recentes que isso continuam soltos (podem receber correções da origem)
+DIAS_MINIMOS = 30
+NIVEL_COMPRESSAO = 9
+
+
+def dias_fechados(root_dir, dias_minimos=DIAS_MINIMOS, agora_utc=None):
+    """
+    Diretórios de dias que já podem ser arquivados, agrupados por mês.
+
+    @return: Dicionário {("YYYY", "MM"): ["YYYY-MM-DD", ...]}.
+    """
+    limite = ((agora_utc or datetime.utcnow()) - timedelta(hours=3, days=dias_minimos)).strftime("%Y-%m-%d")
+    por_mes = {}
+    if not os.path.isdir(root_dir):
+        return por_mes
+    for ano in sorted(os.listdir(root_dir)):
+        dir_ano = os.path.join(root_dir, ano)
+        if not ano.isdigit() or not os.path.isdir(dir_ano):
+            continue
+        for mes in sorted(os.listdir(dir_ano)):
+            dir_mes = os.path.join(dir_ano, mes)
+            if not os.path.isdir(dir_mes):
+                continue
+            for dia in sorted(os.listdir(dir_mes)):
+                if dia.startswith(f"{ano}-{mes}-") and dia < limite and os.path.isdir(os.path.join(dir_mes, dia)):
+                    por_mes.setdefault((ano, mes), []).append(dia)
+    return por_mes
+
+
+def _reescrever_arquivo(caminho, novos):
+    """
+    Grava o ZIP do grupo com os membros existentes mais os novos (os novos substituem os existentes).
+
+    @param novos: Dicionário {membro: conteúdo (bytes)}.
+    @return: Tamanho do ZIP resultante, em bytes.
+    """
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with zipfile.ZipFile(temporario, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=NIVEL_COMPRESSAO) as destino:
+        if os.path.exists(caminho):
+            with zipfile.ZipFile(caminho, "r") as origem:
+                for info in origem.infolist():
+                    if info.filename not in novos:
+                        destino.writestr(info, origem.read(info))
+        for membro in sorted(novos):
+            destino.writestr(membro, novos[membro])
+    os.replace(temporario, caminho)
+    return os.path.getsize(caminho)
+
+
+def compactar_mes(root_dir, ano, mes, dias):
+    """
+    Arquiva os dias informados de um mês e remove os arquivos soltos que foram arquivados.
+
+    @return: Estatísticas {"arquivos", "bytes_soltos", "ignorados", "grupos"}.
+    """
+    # Lê os arquivos soltos dos dias, agrupados pelo grupo da estação
+    por_grupo = {}
+    lidos = {}  # {caminho: (mtime_ns, tamanho)}
+    ignorados = 0
+    bytes_soltos = 0
+    for dia in dias:
+        dir_dia = os.path.join(root_dir, ano, mes, dia)
+        for nome in sorted(os.listdir(dir_dia)):
+            if not (nome.startswith("codigoestacao_") and nome.endswith(".json")):
+                continue
+            caminho = os.path.join(dir_dia, nome)
+            codigo = nome[len("codigoestacao_"):-len(".json")]
+            try:
+                info = os.stat(caminho)
+                with open(caminho, "rb") as f:
+                    conteudo = f.read()
+                json.loads(conteudo)
+            except (OSError, ValueError) as e:
+                logger.warning(f"[compactacao] {caminho} não foi arquivado: {e}")
+                ignorados += 1
+                continue
+            por_grupo.setdefault(grupo_da_estacao(codigo), {})[membro_dia(codigo, dia)] = conteudo
+            lidos[caminho] = (info.st_mtime_ns, info.st_size)
+            bytes_soltos += info.st_size
+
+    arquivados = set()
+    for grupo, novos in sorted(por_grupo.items()):
+        caminho_zip = caminho_arquivo_mensal(root_dir, ano, mes, grupo)
+        try:
+            _reescrever_arquivo(caminho_zip, novos)
+        except (OSError, zipfile.BadZipFile) as e:
+            logger.error(f"[compactacao] Falha ao gravar {caminho_zip}: {e}")
+            continue
+        arquivados.update(os.path.join(root_dir, ano, mes, *membro.split("/")) for membro in novos)
+
+    # Remove os arquivos soltos já arquivados que não mudaram desde a leitura
+    removidos = 0
+    for caminho in arquivados:
+        try:
+            info = os.stat(caminho)
+            if (info.st_mtime_ns, info.st_size) == lidos[caminho]:
+                os.remove(caminho)
+                removidos += 1
+        except OSError:
+            continue
+    for dia in dias:
+        dir_dia = os.path.join(root_dir, ano, mes, dia)
+        try:
+            os.rmdir(dir_dia)
+        except OSError:
+            pass  # Ainda há arquivos (gravações tardias ou ignorados)
+    return {"arquivos": removidos, "bytes_soltos": bytes_soltos, "ignorados": ignorados, "grupos": len(por_grupo)}
+
+
+def compactar(root_dir=DATA_ROOT, dias_minimos=DIAS_MINIMOS, agora_utc=None):
+    """
+    Arquiva todos os dias fechados.
+
+    @return: Estatísticas da execução.
+    @raise ValueError: Se dias_minimos for menor que 2 (hoje e ontem são lidos como arquivos soltos
+                       pelo servidor Node, ver mesclarDadosEstacoes.js).
+    """
+    if dias_minimos < 2:
+        raise ValueError("Os dias de hoje e de ontem não podem ser arquivados (dias_minimos >= 2).")
+    resumo = {"meses": 0, "dias": 0, "arquivos": 0, "bytes_soltos": 0, "bytes_arquivo": 0, "ignorados": 0}
+    for (ano, mes), dias in sorted(dias_fechados(root_dir, dias_minimos, agora_utc).items()):
+        estatisticas = compactar_mes(root_dir, ano, mes, dias)
+        resumo["meses"] += 1
+        resumo["dias"] += len(dias)
+        for chave in ("arquivos", "bytes_soltos", "ignorados"):
+            resumo[chave] += estatisticas[chave]
+        dir_arquivo = os.path.join(root_dir, ano, mes, DIRETORIO_ARQUIVO)
+        if os.path.isdir(dir_arquivo):
+            resumo["bytes_arquivo"] += sum(entrada.stat().st_size for entrada in os.scandir(dir_arquivo))
+        print(f"Mês {ano}-{mes}: {estatisticas['arquivos']} arquivos de {len(dias)} dias "
+              f"arquivados em {estatisticas['grupos']} grupos.")
+    logger.info(f"[compactacao] Concluída: {resumo}")
+    return resumo
+
+
+def desarquivar_mes(root_dir, ano, mes):
+    """
+    Operação inversa (ex.: antes de uma migração): regrava os dias arquivados do mês como arquivos soltos
+    e remove os ZIPs. Dias que já existem soltos não são sobrescritos.
+
+    @return: Número de arquivos restaurados.
+    """
+    dir_arquivo = os.path.join(root_dir, ano, mes, DIRETORIO_ARQUIVO)
+    if not os.path.isdir(dir_arquivo):
+        return 0
+    restaurados = 0
+    for nome in sorted(os.listdir(dir_arquivo)):
+        if not nome.endswith(".zip"):
+            continue
+        with zipfile.ZipFile(os.path.join(dir_arquivo, nome), "r") as arquivo:
+            for membro in arquivo.namelist():
+                caminho = os.path.join(root_dir, ano, mes, *membro.split("/"))
+                if os.path.exists(caminho):
+                    continue
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                with open(caminho, "wb") as f:
+                    f.write(arquivo.read(membro))
+                restaurados += 1
+    shutil.rmtree(dir_arquivo)
+    return restaurados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta os dias fechados em arquivos mensais comprimidos.")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--dias", type=int, default=DIAS_MINIMOS, help="Idade mínima (em dias) para arquivar.")
+    parser.add_argument("--intervalo-h", type=int, default=24)
+    parser.add_argument("--uma-vez", action="store_true", help="Executa uma única compactação e encerra.")
+    parser.add_argument("--desarquivar", metavar="YYYY-MM", help="Restaura os dias arquivados de um mês.")
+    args = parser.parse_args()
+
+    if args.desarquivar:
+        ano, mes = args.desarquivar.split("-")
+        print(f"{desarquivar_mes(args.root_dir, ano, mes)} arquivos restaurados.")
+        return
+    if args.uma_vez:
+        print(json.dumps(compactar(args.root_dir, args.dias)))
+        return
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(compactar, 'interval', hours=args.intervalo_h, args=[args.root_dir, args.dias],
+                      next_run_time=datetime.now(), max_instances=1, coalesce=True)
+    logger.info(f"Compactação dos dias fechados iniciada (a cada {args.intervalo_h} horas)...")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Compactação dos dias fechados interrompida.")
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.archive_compaction --uma-vez --dias 30
@@ -0,0 +1,451 @@
+"""
+@file server/apis/ana/services/archive_scrubber.py
+@description Verificação de integridade dos arquivos diários (varredura) com correção opcional.
+
+Os gravadores só percebem um arquivo diário ilegível quando o dia volta a ser gravado (e então o regravam
+a partir das leituras novas, guardando o original em <arquivo>.corrompido), e nada verificava os milhares
+de arquivos existentes. A varredura percorre as duas camadas (arquivos soltos e membros dos arquivos
+mensais, ver utils/arquivo_mensal.py) num pool de processos e confere cada documento:
+
+  truncado / json_invalido   conteúdo que não é JSON (truncado: não termina em "}")
+  documento_invalido         JSON sem a estrutura {"codigoestacao", "data", "dados": [...]}
+  cabecalho                  codigoestacao ou data diferentes do caminho do arquivo          (corrigível)
+  registro_sem_medicao       registros sem Data_Hora_Medicao válida                           (corrigível)
+  duplicados                 Data_Hora_Medicao repetida                                       (corrigível)
+  fora_de_ordem              registros fora da ordem cronológica                              (corrigível)
+  fora_do_dia                leituras de outro dia (Cemaden: fora da janela de um dia a mais ou a menos)
+  campos_ausentes            campos do esquema da origem ausentes (HidroWeb: os 8 campos; Cemaden: chuva)
+  campos_desconhecidos       campos fora do esquema conhecido (utils/leituras.py)
+  valores_invalidos          valores numéricos ou de status que não são números
+  chuva_acumulada            chuvaAcumulada dos dias do Cemaden diferente da soma das leituras    (corrigível)
+  manifesto                  tamanho/checksum diferentes da entrada do manifesto do mês, ou dia fora dele (corrigível)
+
+Meses ainda sem manifesto aparecem uma vez em meses_sem_manifesto (e não em cada dia); com corrigir, o
+manifesto deles é reconstruído.
+
+Com corrigir=True, os documentos com problemas corrigíveis são regravados com a mesma mescla da ingestão
+(SerieLeituras: ordena, remove duplicatas mantendo a primeira leitura e completando a chuva ausente) e a
+entrada do manifesto é atualizada. Um dia arquivado é corrigido recriando o arquivo solto, que prevalece
+na leitura e volta para o arquivo mensal na próxima compactação. O arquivo só é substituído se não mudou
+desde a leitura (mtime e tamanho), para não desfazer uma gravação concorrente.
+
+O relatório (varredura_relatorio.json) lista os problemas por arquivo e os totais por tipo. No modo
+incremental, arquivos soltos e ZIPs com o mesmo mtime e tamanho da varredura anterior não são relidos
+(os problemas conhecidos deles são mantidos no relatório); o estado fica em varredura_estado.json.
+"""
+
+import os
+import json
+import time
+import zipfile
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from server.apis.ana.utils.leituras import CAMPOS, SerieLeituras, texto_para_segundos
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.utils.arquivo_mensal import DIRETORIO_ARQUIVO, caminho_dia, grupo_da_estacao
+from server.apis.ana.utils.manifesto_mensal import (
+    ler_manifesto, atualizar_manifesto, reconstruir_manifesto, resumo_dia
+)
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+ARQUIVO_RELATORIO = "varredura_relatorio.json"
+ARQUIVO_ESTADO = "varredura_estado.json"
+# Arquivos soltos por tarefa do pool (cada ZIP é uma tarefa)
+ARQUIVOS_POR_TAREFA = 256
+
+ESQUEMAS = {
+    "hidroweb": set(CAMPOS),
+    "cemaden": {"Chuva_Adotada", "Data_Hora_Medicao"},
+}
+_NUMERICOS = ("Chuva_Adotada", "Cota_Adotada", "Vazao_Adotada")
+_STATUS = ("Chuva_Adotada_Status", "Cota_Adotada_Status", "Vazao_Adotada_Status")
+CORRIGIVEIS = {"cabecalho", "registro_sem_medicao", "duplicados", "fora_de_ordem", "chuva_acumulada", "manifesto"}
+
+
+def _problema(tipo, detalhe=None):
+    return {"tipo": tipo, "detalhe": detalhe, "corrigivel": tipo in CORRIGIVEIS}
+
+
+def _texto_chuva_acumulada(serie):
+    """Mesmo formato de cemaden_data_scheduler._finalizar_dia."""
+    total = serie.chuva_acumulada()
+    return f"{total:.2f}" if total > 0 else "0.00"
+
+
+def verificar_documento(conteudo, codigo, data_str):
+    """
+    Confere o documento de um dia.
+
+    @param conteudo: Conteúdo (bytes) do arquivo diário.
+    @param codigo, data_str: Estação e dia indicados pelo caminho.
+    @return: (problemas, documento decodificado ou None).
+    """
+    try:
+        documento = json.loads(conteudo)
+    except ValueError as e:
+        tipo = "json_invalido" if conteudo.rstrip().endswith(b"}") else "truncado"
+        return [_problema(tipo, str(e))], None
+    if not isinstance(documento, dict) or not isinstance(documento.get("dados"), list):
+        return [_problema("documento_invalido", "Documento sem a lista 'dados'.")], None
+
+    problemas = []
+    fonte = "cemaden" if "idestacao" in documento else "hidroweb"
+    codigo_documento = documento.get("codigoestacao") or documento.get("idestacao")
+    if str(codigo_documento) != codigo or documento.get("data") != data_str:
+        problemas.append(_problema("cabecalho", f"codigoestacao={codigo_documento!r}, data={documento.get('data')!r}"))
+
+    inicio_dia = texto_para_segundos(f"{data_str} 00:00:00")
+    if fonte == "cemaden":
+        # Os dias do Cemaden são montados em UTC e as medições convertidas para o horário de Brasília
+        janela = (inicio_dia - 86400, inicio_dia + 2 * 86400)
+    else:
+        janela = (inicio_dia, inicio_dia + 86400)
+    esquema = ESQUEMAS[fonte]
+    sem_medicao = fora_do_dia = 0
+    ausentes, desconhecidos, invalidos = {}, {}, {}
+    medicoes = []
+    chuvas = {}  # Chuva por medição, com a regra de duplicatas de SerieLeituras (para a chuvaAcumulada)
+    for registro in documento["dados"]:
+        if not isinstance(registro, dict):
+            sem_medicao += 1
+            continue
+        try:
+            medicao = texto_para_segundos(registro["Data_Hora_Medicao"].strip())
+        except (KeyError, AttributeError, ValueError):
+            sem_medicao += 1
+            continue
+        medicoes.append(medicao)
+        if not janela[0] <= medicao < janela[1]:
+            fora_do_dia += 1
+        for campo in esquema:
+            if campo not in registro:
+                ausentes[campo] = ausentes.get(campo, 0) + 1
+        for campo, valor in registro.items():
+            if campo not in ESQUEMAS["hidroweb"]:
+                desconhecidos[campo] = desconhecidos.get(campo, 0) + 1
+            elif valor is not None and (campo in _NUMERICOS or campo in _STATUS):
+                try:
+                    float(valor) if campo in _NUMERICOS else int(valor)
+                except (TypeError, ValueError):
+                    invalidos[campo] = invalidos.get(campo, 0) + 1
+        if chuvas.get(medicao) is None:
+            try:
+                chuvas[medicao] = float(registro.get("Chuva_Adotada"))
+            except (TypeError, ValueError):
+                chuvas[medicao] = None
+
+    if sem_medicao:
+        problemas.append(_problema("registro_sem_medicao", sem_medicao))
+    if len(set(medicoes)) < len(medicoes):
+        problemas.append(_problema("duplicados", len(medicoes) - len(set(medicoes))))
+    if any(atual < anterior for anterior, atual in zip(medicoes, medicoes[1:])):
+        problemas.append(_problema("fora_de_ordem"))
+    if fora_do_dia:
+        problemas.append(_problema("fora_do_dia", fora_do_dia))
+    if ausentes:
+        problemas.append(_problema("campos_ausentes", ausentes))
+    if desconhecidos:
+        problemas.append(_problema("campos_desconhecidos", desconhecidos))
+    if invalidos:
+        problemas.append(_problema("valores_invalidos", invalidos))
+    if fonte == "cemaden":
+        total = sum(chuva for chuva in chuvas.values() if chuva is not None)
+        esperado = f"{total:.2f}" if total > 0 else "0.00"
+        if documento.get("chuvaAcumulada") != esperado:
+            problemas.append(_problema("chuva_acumulada", f"{documento.get('chuvaAcumulada')!r} != {esperado!r}"))
+    return problemas, documento
+
+
+def corrigir_documento(documento, codigo, data_str):
+    """
+    Documento corrigido (mesma mescla e serialização da ingestão).
+
+    @return: Conteúdo (str) do documento corrigido.
+    """
+    serie = SerieLeituras.de_json(documento["dados"], descartar_invalidos=True)
+    if "idestacao" in documento and not documento.get("codigoestacao"):
+        # Estações do Cemaden sem código: o arquivo é nomeado pelo idestacao
+        documento["idestacao"] = codigo
+    else:
+        documento["codigoestacao"] = codigo
+    if "idestacao" in documento:
+        documento["chuvaAcumulada"] = _texto_chuva_acumulada(serie)
+    documento["data"] = data_str
+    documento["dados"] = serie.para_json()
+    return json.dumps(documento, ensure_ascii=False, indent=4)
+
+
+def _identificar(nome):
+    """(codigo, data_str) de um membro "YYYY-MM-DD/codigoestacao_X.json" ou de um caminho relativo equivalente."""
+    data_str, _, nome_arquivo = nome.replace(os.sep, "/").rpartition("/")
+    return nome_arquivo[len("codigoestacao_"):-len(".json")], data_str.rpartition("/")[2]
+
+
+def _verificar_dia(root_dir, conteudo, codigo, data_str, esperado, corrigir, assinatura, caminho_vivo):
+    """
+    Confere um dia; com corrigir, regrava-o.
+
+    @param esperado: Entrada do manifesto do dia (None se o dia não estiver nele; False se o mês não tiver manifesto).
+    @return: (problemas, corrigido, resumo para o manifesto ou None).
+    """
+    problemas, documento = verificar_documento(conteudo, codigo, data_str)
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+    if esperado is not False and (esperado is None or esperado.get("sha256") != sha256
+                                  or esperado.get("bytes") != len(conteudo)):
+        problemas.append(_problema("manifesto", "Dia fora do manifesto." if esperado is None
+                                   else "Tamanho ou checksum diferentes do manifesto."))
+    resumo = None
+    corrigido = False
+    if corrigir and documento is not None and any(p["corrigivel"] for p in problemas):
+        novo = conteudo
+        if any(p["corrigivel"] and p["tipo"] != "manifesto" for p in problemas):
+            novo = corrigir_documento(documento, codigo, data_str).encode("utf-8")
+        if novo != conteudo:
+            # Não desfaz uma gravação concorrente: só substitui o arquivo solto se ele não mudou
+            atual = None
+            try:
+                info = os.stat(caminho_vivo)
+                atual = (info.st_mtime_ns, info.st_size)
+            except OSError:
+                pass
+            if atual != assinatura:
+                return problemas, False, None
+            os.makedirs(os.path.dirname(caminho_vivo), exist_ok=True)
+            gravar_arquivo_atomico(caminho_vivo, novo.decode("utf-8"))
+        resumo = resumo_dia(novo)
+        corrigido = True
+    return problemas, corrigido, resumo
+
+
+def _esperado(manifesto, sem_manifesto, codigo, data_str):
+    return False if data_str[:7] in sem_manifesto else manifesto.get((codigo, data_str))
+
+
+def _verificar_tarefa(root_dir, tarefa, manifesto, sem_manifesto, corrigir):
+    """
+    Executa uma tarefa do pool: uma lista de arquivos soltos ou um ZIP mensal.
+
+    @param tarefa: ("vivos", [(relativo, mtime_ns, tamanho), ...]) ou ("zip", relativo).
+    @param manifesto: Entradas do manifesto dos dias da tarefa {(codigo, data_str): entrada}.
+    @param sem_manifesto: Meses ("YYYY-MM") sem manifesto, cujos dias não são conferidos com ele.
+    @return: Lista de (relativo, membro, problemas, corrigido, codigo, data_str, resumo).
+    """
+    tipo, itens = tarefa
+    resultados = []
+    if tipo == "vivos":
+        for relativo, mtime_ns, tamanho in itens:
+            codigo, data_str = _identificar(relativo)
+            caminho = os.path.join(root_dir, relativo)
+            try:
+                with open(caminho, "rb") as f:
+                    conteudo = f.read()
+            except OSError:
+                continue  # Removido (ex.: compactado) depois da listagem
+            problemas, corrigido, resumo = _verificar_dia(
+                root_dir, conteudo, codigo, data_str, _esperado(manifesto, sem_manifesto, codigo, data_str),
+                corrigir, (mtime_ns, tamanho), caminho)
+            resultados.append((relativo, None, problemas, corrigido, codigo, data_str, resumo))
+        return resultados
+
+    try:
+        arquivo = zipfile.ZipFile(os.path.join(root_dir, itens), "r")
+    except (OSError, zipfile.BadZipFile) as e:
+        return [(itens, None, [_problema("truncado", f"Arquivo mensal ilegível: {e}")], False, None, None, None)]
+    with arquivo:
+        for membro in arquivo.namelist():
+            codigo, data_str = _identificar(membro)
+            caminho_vivo = caminho_dia(root_dir, codigo, data_str)
+            if os.path.exists(caminho_vivo):
+                continue  # O arquivo solto prevalece e é verificado à parte
+            try:
+                conteudo = arquivo.read(membro)
+            except (OSError, zipfile.BadZipFile, ValueError) as e:  # CRC incorreto ou membro corrompido
+                resultados.append((itens, membro, [_problema("truncado", str(e))], False, codigo, data_str, None))
+                continue
+            problemas, corrigido, resumo = _verificar_dia(
+                root_dir, conteudo, codigo, data_str, _esperado(manifesto, sem_manifesto, codigo, data_str),
+                corrigir, None, caminho_vivo)
+            resultados.append((itens, membro, problemas, corrigido, codigo, data_str, resumo))
+    return resultados
+
+
+def _listar(root_dir):
+    """
+    Arquivos das duas camadas, com as assinaturas (mtime_ns, tamanho).
+
+    @return: (vivos {relativo: assinatura}, zips {relativo: assinatura}), caminhos relativos a root_dir.
+    """
+    vivos, zips = {}, {}
+    for ano in sorted(os.listdir(root_dir)) if os.path.isdir(root_dir) else []:
+        dir_ano = os.path.join(root_dir, ano)
+        if not ano.isdigit() or not os.path.isdir(dir_ano):
+            continue
+        for mes in sorted(os.listdir(dir_ano)):
+            dir_mes = os.path.join(dir_ano, mes)
+            if not os.path.isdir(dir_mes):
+                continue
+            for entrada in os.scandir(dir_mes):
+                if not entrada.is_dir():
+                    continue
+                for arquivo in os.scandir(entrada.path):
+                    if entrada.name == DIRETORIO_ARQUIVO:
+                        valido = arquivo.name.endswith(".zip")
+                    else:
+                        valido = arquivo.name.startswith("codigoestacao_") and arquivo.name.endswith(".json")
+                    if valido:
+                        info = arquivo.stat()
+                        destino = zips if entrada.name == DIRETORIO_ARQUIVO else vivos
+                        destino[os.path.join(ano, mes, entrada.name, arquivo.name)] = (info.st_mtime_ns, info.st_size)
+    return vivos, zips
+
+
+def _ler_estado(root_dir):
+    try:
+        with open(os.path.join(root_dir, ARQUIVO_ESTADO), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def varrer(root_dir=DATA_ROOT, corrigir=False, incremental=False, max_workers=None, usar_processos=True):
+    """
+    Verifica (e opcionalmente corrige) os arquivos diários e grava o relatório.
+
+    @param corrigir: Regrava os documentos com problemas corrigíveis e atualiza os manifestos.
+    @param incremental: Relê apenas arquivos soltos e ZIPs alterados desde a varredura anterior.
+    @param max_workers: Processos do pool (padrão: número de CPUs).
+    @param usar_processos: Se False, usa threads (ex.: em testes).
+    @return: Relatório (dicionário), também gravado em root_dir/varredura_relatorio.json.
+    """
+    inicio = time.time()
+    vivos, zips = _listar(root_dir)
+    estado_anterior = _ler_estado(root_dir).get("arquivos", {}) if incremental else {}
+    estado = {}
+    tarefas, pendentes_vivos = [], []
+    ocorrencias = []  # (relativo, ocorrência) para o relatório
+    for relativo, assinatura in sorted(zips.items()) + sorted(vivos.items()):
+        anterior = estado_anterior.get(relativo)
+        if anterior is not None and tuple(anterior["assinatura"]) == assinatura:
+            estado[relativo] = anterior
+            ocorrencias.extend((relativo, ocorrencia) for ocorrencia in anterior["problemas"])
+            continue
+        if relativo in zips:
+            tarefas.append(("zip", relativo))
+        else:
+            pendentes_vivos.append((relativo,) + assinatura)
+    for i in range(0, len(pendentes_vivos), ARQUIVOS_POR_TAREFA):
+        tarefas.append(("vivos", pendentes_vivos[i:i + ARQUIVOS_POR_TAREFA]))
+
+    # Entradas do manifesto de cada tarefa (cada processo recebe só as dos seus dias)
+    manifestos = {}
+    sem_manifesto = set()
+
+    def do_mes(ano, mes):
+        if (ano, mes) not in manifestos:
+            manifesto = ler_manifesto(root_dir, ano, mes)
+            if manifesto is None:
+                sem_manifesto.add(f"{ano}-{mes}")
+            manifestos[(ano, mes)] = (manifesto or {}).get("estacoes", {})
+        return manifestos[(ano, mes)]
+
+    def entradas(tarefa):
+        if tarefa[0] == "zip":
+            ano, mes, _, nome_zip = tarefa[1].split(os.sep)
+            grupo = int(nome_zip[len("grupo_"):-len(".zip")])
+            return {(codigo, data_str): entrada for codigo, dias in do_mes(ano, mes).items()
+                    if grupo_da_estacao(codigo) == grupo for data_str, entrada in dias.items()}
+        resultado = {}
+        for relativo, _, _ in tarefa[1]:
+            codigo, data_str = _identificar(relativo)
+            entrada = do_mes(data_str[:4], data_str[5:7]).get(codigo, {}).get(data_str)
+            if entrada is not None:
+                resultado[(codigo, data_str)] = entrada
+        return resultado
+
+    executor = ProcessPoolExecutor if usar_processos else ThreadPoolExecutor
+    atualizacoes = {}
+    corrigidos = 0
+    with executor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+        futuros = []
+        for tarefa in tarefas:
+            manifesto = entradas(tarefa)
+            futuros.append((tarefa, pool.submit(_verificar_tarefa, root_dir, tarefa, manifesto, set(sem_manifesto),
+                                                corrigir)))
+        for tarefa, futuro in futuros:
+            relativo_tarefa = tarefa[1] if tarefa[0] == "zip" else None
+            if relativo_tarefa is not None:
+                estado[relativo_tarefa] = {"assinatura": list(zips[relativo_tarefa]), "problemas": []}
+            for relativo, membro, problemas, corrigido, codigo, data_str, resumo in futuro.result():
+                if relativo_tarefa is None:
+                    estado[relativo] = {"assinatura": list(vivos[relativo]), "problemas": []}
+                if problemas:
+                    ocorrencia = {"membro": membro, "problemas": problemas, "corrigido": corrigido}
+                    ocorrencias.append((relativo, ocorrencia))
+                    if not corrigido:
+                        # O estado guarda só o que continua pendente; um arquivo corrigido tem outra assinatura
+                        # (ou, para um dia arquivado, passa a ser o arquivo solto) e é verificado de novo
+                        estado[relativo]["problemas"].append(ocorrencia)
+                if corrigido:
+                    corrigidos += 1
+                    atualizacoes.setdefault((data_str[:4], data_str[5:7]), {})[(codigo, data_str)] = resumo
+
+    for (ano, mes), entradas_mes in sorted(atualizacoes.items()):
+        if f"{ano}-{mes}" not in sem_manifesto:
+            atualizar_manifesto(root_dir, ano, mes, entradas_mes)
+    if corrigir:
+        for mes_str in sorted(sem_manifesto):
+            reconstruir_manifesto(root_dir, mes_str[:4], mes_str[5:7])
+
+    arquivos_com_problemas = []
+    por_tipo = {}
+    for relativo, ocorrencia in sorted(ocorrencias, key=lambda item: (item[0], item[1]["membro"] or "")):
+        arquivos_com_problemas.append({"arquivo": relativo.replace(os.sep, "/"), **ocorrencia})
+        for problema in ocorrencia["problemas"]:
+            por_tipo[problema["tipo"]] = por_tipo.get(problema["tipo"], 0) + 1
+    relatorio = {
+        "gerado_em": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "modo": "incremental" if incremental else "completo",
+        "corrigir": corrigir,
+        "arquivos_soltos": len(vivos),
+        "arquivos_mensais": len(zips),
+        "verificados": len(pendentes_vivos) + sum(1 for tarefa in tarefas if tarefa[0] == "zip"),
+        "corrigidos": corrigidos,
+        "duracao_s": round(time.time() - inicio, 3),
+        "problemas_por_tipo": dict(sorted(por_tipo.items())),
+        "meses_sem_manifesto": sorted(sem_manifesto),
+        "arquivos_com_problemas": arquivos_com_problemas,
+    }
+    gravar_arquivo_atomico(os.path.join(root_dir, ARQUIVO_ESTADO),
+                           json.dumps({"arquivos": estado}, ensure_ascii=False, separators=(",", ":")))
+    gravar_arquivo_atomico(os.path.join(root_dir, ARQUIVO_RELATORIO), json.dumps(relatorio, ensure_ascii=False, indent=2))
+    logger.info(f"[varredura] {relatorio['verificados']} arquivos verificados em {relatorio['duracao_s']}s; "
+                f"{len(arquivos_com_problemas)} com problemas, {corrigidos} corrigidos.")
+    return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica a integridade dos arquivos diários das estações.")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--corrigir", action="store_true", help="Corrige o que for possível (ordem, duplicatas, ...).")
+    parser.add_argument("--incremental", action="store_true", help="Relê só o que mudou desde a última varredura.")
+    parser.add_argument("--processos", type=int, help="Número de processos (padrão: número de CPUs).")
+    args = parser.parse_args()
+    relatorio = varrer(args.root_dir, corrigir=args.corrigir, incremental=args.incremental, max_workers=args.processos)
+    print(f"{relatorio['verificados']} arquivos verificados em {relatorio['duracao_s']}s "
+          f"({relatorio['arquivos_soltos']} soltos, {relatorio['arquivos_mensais']} arquivos mensais); "
+          f"{relatorio['corrigidos']} corrigidos.")
+    for tipo, total in relatorio["problemas_por_tipo"].items():
+        print(f"  {tipo}: {total}")
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.archive_scrubber --incremental --corrigir
@@ -3,71 +3,87 @@ import json
 import requests
 from datetime import datetime, timedelta
 from apscheduler.schedulers.blocking import BlockingScheduler
-import concurrent.futures
+import functools
+import argparse
+
+from server.apis.ana.utils.data_storage import DataStorage, SUFIXO_CORROMPIDO
+from server.apis.ana.utils.arquivo_mensal import ler_conteudo_dia
+from server.apis.ana.utils.manifesto_mensal import resumo_dia
+from server.apis.ana.utils.leituras import SerieLeituras
+from server.apis.ana.services.ingest_pipeline import PipelineIngestao
+from server.apis.ana.services.inventory_refresher import carregar_registro_estacoes
+from server.apis.ana.services.ingest_sharding import CoordenadorShards, resumo_shard, CAMINHO_SHARDS
+from server.apis.ana.services.data_freshness import META_ATRASO_S
+from server.apis.ana.services.ingest_observers import montar_observadores
+from server.apis.ana.services.ingest_journal import DiarioIngestao, MaterializadorDiario, caminho_diario
+
+# URL base da API do Cemaden. Pode ser sobrescrita pela variável de ambiente CEMADEN_BASE_URL
+# (ex.: para apontar o ciclo para o servidor mock usado nos testes de carga).
+CEMADEN_BASE_URL = "https://mapservices.cemaden.gov.br/MapaInterativoWS/resources"
+
+# Diretório raiz padrão dos arquivos diários das estações
+DATA_ROOT = os.path.join("public", "data")
+
+
+def _como_serie(dados):
+    """Converte a lista "dados" de um dia (dicionários ou SerieLeituras) em SerieLeituras."""
+    if isinstance(dados, SerieLeituras):
+        return dados
+    return SerieLeituras.de_json(dados)
+
+
+def _mesclar_series(antigo, novo):
+    """
+    Mescla as leituras de 'novo' nas de 'antigo' e retorna (serie_mesclada, leituras_alteradas).
+    Duplicatas dentro de cada lado mantêm a primeira leitura, completando a chuva ausente; entre os
+    dois lados, uma chuva não nula em 'novo' substitui a existente.
+    """
+    serie = _como_serie(antigo.get("dados", []))
+    alteradas = serie.mesclar(_como_serie(novo.get("dados", [])), atualizar_chuva=True)
+    return serie, alteradas
+
+
+def _finalizar_dia(antigo, serie):
+    """Grava no dicionário do dia a lista ordenada de leituras e a chuva acumulada."""
+    total_chuva = serie.chuva_acumulada()
+    antigo["dados"] = serie.para_json()
+    antigo["chuvaAcumulada"] = f"{total_chuva:.2f}" if total_chuva > 0 else "0.00"
+    return antigo
+
 
 def merge_day_info(antigo, novo):
     """
     Mescla os dados do dia 'novo' com 'antigo', unificando duplicatas
     e retendo sempre a leitura mais 'informativa'.
+    "dados" pode ser a lista de registros do arquivo ou uma SerieLeituras já convertida.
     Retorna o dicionário final mesclado, pronto para ser salvo.
     """
-    existing_data = {}
-    for rec in antigo.get("dados", []):
-        ts = rec["Data_Hora_Medicao"].strip()
-        if ts in existing_data:
-            if existing_data[ts]["Chuva_Adotada"] is None and rec["Chuva_Adotada"] is not None:
-                existing_data[ts]["Chuva_Adotada"] = rec["Chuva_Adotada"]
-        else:
-            existing_data[ts] = rec
-
-    cleaned_novo = {}
-    for rec in novo.get("dados", []):
-        ts = rec["Data_Hora_Medicao"].strip()
-        if ts in cleaned_novo:
-            if cleaned_novo[ts]["Chuva_Adotada"] is None and rec["Chuva_Adotada"] is not None:
-                cleaned_novo[ts]["Chuva_Adotada"] = rec["Chuva_Adotada"]
-        else:
-            cleaned_novo[ts] = rec
-
-    for ts, rec in cleaned_novo.items():
-        if ts not in existing_data:
-            existing_data[ts] = rec
-        else:
-            if rec["Chuva_Adotada"] is not None:
-                existing_data[ts]["Chuva_Adotada"] = rec["Chuva_Adotada"]
-
-    merged_list = list(existing_data.values())
-    merged_list.sort(key=lambda x: x["Data_Hora_Medicao"])
-
-    total_chuva = 0.0
-    for item in merged_list:
-        val = 0.0
-        if item["Chuva_Adotada"] is not None:
-            try:
-                val = float(item["Chuva_Adotada"])
-            except:
-                pass
-        total_chuva += val
+    serie, _ = _mesclar_series(antigo, novo)
+    return _finalizar_dia(antigo, serie)
 
-    antigo["dados"] = merged_list
-    antigo["chuvaAcumulada"] = f"{total_chuva:.2f}" if total_chuva > 0 else "0.00"
-
-    return antigo
 
-
-def fetch_station_data(station_id):
+def fetch_station_data(station_id, base_url=None):
     """Obtém o JSON direto da API do Cemaden com timeout aumentado."""
-    url = f"https://mapservices.cemaden.gov.br/MapaInterativoWS/resources/horario/{station_id}/24"
     try:
-        # Timeout aumentado para 90 segundos
-        resp = requests.get(url, timeout=90)
-        resp.raise_for_status()
-        return resp.json()
+        return json.loads(fetch_station_payload(station_id, base_url=base_url))
     except Exception as e:
         print(f"Erro ao buscar dados para {station_id}: {e}")
         return None
 
 
+def fetch_station_payload(station_id, base_url=None):
+    """
+    Obtém o corpo bruto (bytes) da resposta da API do Cemaden, sem decodificar o JSON.
+    Levanta exceção em caso de erro de rede ou status HTTP de erro.
+    """
+    base_url = base_url or os.getenv("CEMADEN_BASE_URL") or CEMADEN_BASE_URL
+    url = f"{base_url}/horario/{station_id}/24"
+    # Timeout aumentado para 90 segundos
+    resp = requests.get(url, timeout=90)
+    resp.raise_for_status()
+    return resp.content
+
+
 def process_cemaden_data(data, station_id):
     """
     Processa o JSON de uma estação e separa, dia a dia, apenas as horas que pertencem a cada data.
@@ -162,77 +178,195 @@ def process_cemaden_data(data, station_id):
     return resultados
 
 
-def save_by_date(results):
-    for day_info in results:
-        data_str = day_info["data"]
-        cod_estacao = day_info["codigoestacao"] or day_info["idestacao"]
-
-        year, month, day = data_str.split("-")
-        dir_path = os.path.join("public", "data", year, month, data_str)
-        os.makedirs(dir_path, exist_ok=True)
+def prepare_day_file(day_info, root_dir=DATA_ROOT):
+    """
+    Mescla um dia processado com o arquivo existente e serializa o resultado, sem gravar em disco.
+    Retorna {"caminho", "data", "conteudo", "novos", "manifesto"}, em que "novos" são as leituras (Leitura) inéditas
+    ou cuja chuva foi alterada pela mescla, e "corrompido" quando o arquivo existente estava ilegível.
+    """
+    data_str = day_info["data"]
+    cod_estacao = day_info["codigoestacao"] or day_info["idestacao"]
 
-        filename = os.path.join(dir_path, f"codigoestacao_{cod_estacao}.json")
+    year, month, day = data_str.split("-")
+    filename = os.path.join(root_dir, year, month, data_str, f"codigoestacao_{cod_estacao}.json")
 
-        if os.path.exists(filename):
-            with open(filename, "r", encoding="utf-8") as f:
-                antigo = json.load(f)
-        else:
-            antigo = {
-                "idestacao": day_info["idestacao"],
-                "codigoestacao": day_info["codigoestacao"],
-                "data": data_str,
-                "chuvaAcumulada": None,
-                "dados": []
-            }
+    # Dia existente em qualquer camada (arquivo solto ou arquivo mensal)
+    antigo = None
+    corrompido = None
+    conteudo_antigo = ler_conteudo_dia(root_dir, cod_estacao, data_str)
+    if conteudo_antigo is not None:
+        try:
+            antigo = json.loads(conteudo_antigo)
+        except ValueError as e:
+            # Como em DataStorage._mesclar_dia: o dia é regravado a partir das leituras novas e o conteúdo
+            # ilegível é preservado por gravar_lote em <arquivo>.corrompido
+            print(f"Arquivo {filename} ilegível ({e}); o dia será regravado a partir das leituras novas "
+                  f"e o conteúdo original preservado em {filename}{SUFIXO_CORROMPIDO}.")
+            corrompido = conteudo_antigo
+    if antigo is None:
+        antigo = {
+            "idestacao": day_info["idestacao"],
+            "codigoestacao": day_info["codigoestacao"],
+            "data": data_str,
+            "chuvaAcumulada": None,
+            "dados": []
+        }
+
+    serie, novos = _mesclar_series(antigo, day_info)
+    final_data = _finalizar_dia(antigo, serie)
+    conteudo = json.dumps(final_data, ensure_ascii=False, indent=4)
+
+    preparado = {
+        "caminho": filename,
+        "data": data_str,
+        "conteudo": conteudo,
+        "novos": novos,
+        "manifesto": resumo_dia(conteudo, final_data),
+    }
+    if corrompido is not None:
+        preparado["corrompido"] = corrompido
+    return preparado
+
+
+def save_by_date(results, root_dir=DATA_ROOT):
+    arquivos = [prepare_day_file(day_info, root_dir=root_dir) for day_info in results]
+    DataStorage(root_dir=root_dir).gravar_lote(arquivos)
+    for arquivo in arquivos:
+        print(f"Salvo: {arquivo['caminho']}")
+
+
+def normalizar_resposta(station_id, payload):
+    """
+    Decodifica a resposta bruta e separa os dias (process_cemaden_data). No modo diário, é o estágio de CPU
+    do pipeline e o resultado é acrescentado ao diário de ingestão.
+    Retorna {"fonte", "estacao", "registros"} (registros = lista de dias) ou None quando a resposta não contém dados.
+    """
+    days_info = process_cemaden_data(json.loads(payload), station_id)
+    if not days_info:
+        print(f"Nenhum dado retornado para {station_id}.")
+        return None
+    return {"fonte": "cemaden", "estacao": days_info[0]["codigoestacao"] or str(station_id), "registros": days_info}
 
-        final_data = merge_day_info(antigo, day_info)
 
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(final_data, f, ensure_ascii=False, indent=4)
-        print(f"Salvo: {filename}")
+def preparar_entrada(entrada, root_dir=DATA_ROOT):
+    """Prepara os arquivos mesclados de cada dia de uma resposta normalizada, sem gravar."""
+    return {
+        "fonte": "cemaden",
+        "estacao": entrada["estacao"],
+        "arquivos": [prepare_day_file(day_info, root_dir=root_dir) for day_info in entrada["registros"]],
+    }
 
 
-def process_station(station_id):
-    print(f"\nProcessando estação {station_id}...")
-    raw_data = fetch_station_data(station_id)
-    if raw_data:
-        days_info = process_cemaden_data(raw_data, station_id)
-        save_by_date(days_info)
-    else:
-        print(f"Nenhum dado retornado para {station_id}.")
+def prepare_station_files(station_id, payload, root_dir=DATA_ROOT):
+    """
+    Estágio de CPU do pipeline: decodifica a resposta bruta, separa os dias e prepara os arquivos
+    mesclados da estação. Executado no pool de processos, por isso é uma função de módulo.
+    Retorna None quando a resposta não contém dados.
+    """
+    entrada = normalizar_resposta(station_id, payload)
+    if entrada is None:
+        return None
+    return preparar_entrada(entrada, root_dir=root_dir)
 
 
-def update_stations_data():
+def update_stations_data(station_ids=None, base_url=None, root_dir=DATA_ROOT, usar_processos=True, observadores=None,
+                         publicar_feed=True, shard=None, avaliar_alertas=True,
+                         calcular_derivadas=True, atualizar_baselines=True, manter_anel=True,
+                         medir_frescor=True, meta_frescor_s=META_ATRASO_S, manter_quadros=True, usar_diario=False):
     """
     Realiza o ciclo completo de:
       1) Obter lista de estações
       2) Para cada estação, buscar dados (em paralelo, 5 por vez)
-      3) Processar e salvar os dados
-    """
-    station_ids = [
-        7883, 7884, 7885, 7886, 7887, 7888, 7889, 7890, 7891, 7892,
-        7893, 7894, 7895, 7896, 7897, 7898, 7899, 7900, 7901, 7902,
-        7903, 7904, 7905, 7907, 8753
-    ]
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(process_station, sid): sid for sid in station_ids}
-        for future in concurrent.futures.as_completed(futures):
-            sid = futures[future]
-            try:
-                future.result()
-            except Exception as e:
-                print(f"Erro ao processar a estação {sid}: {e}")
+      3) Processar (pool de processos) e salvar os dados (gravação em lotes)
+
+    Os parâmetros opcionais permitem substituir a lista de estações, a URL base da API
+    e o diretório de dados (ex.: testes de carga contra o servidor mock).
+    Ao final do ciclo, publica uma versão do feed de alterações (publicar_feed) e recalcula as
+    estatísticas e a superfície interpolada de chuva (estatisticas_chuva.json e tiles/chuva).
+    Com um CoordenadorShards (shard), busca apenas as estações reivindicadas por este worker no ciclo.
+    Com avaliar_alertas, as leituras novas passam pelo motor de alertas (alertas.sqlite3), e com
+    calcular_derivadas, atualizam as variáveis derivadas (public/data/derivadas). Com atualizar_baselines,
+    alimentam os percentis de cota e vazão de cada estação (baselines_estacoes.json). Com manter_anel,
+    são gravadas no anel em memória mapeada das últimas 48h (anel_recente.bin). Com medir_frescor, o atraso
+    de cada leitura nova até a publicação é medido e publicado em frescor_dados.json, com as estações
+    acima de meta_frescor_s segundos. Com manter_quadros, as horas com leituras novas são atualizadas nos
+    quadros horários de todas as estações (public/data/quadros), usados na animação do mapa. Com usar_diario,
+    o pipeline só acrescenta as respostas normalizadas ao diário de ingestão do Cemaden (public/data/diario/cemaden),
+    e os arquivos diários e os observadores são atualizados pelo materializador do diário ao final da busca.
+    Retorna o número de estações processadas com sucesso.
+    """
+    # Ids do registro de estações (public/data/registro_estacoes.json ou server/apis/ana/config/estacoes.json)
+    station_ids = station_ids or carregar_registro_estacoes(root_dir=root_dir)["cemaden"]
+    if shard is not None:
+        station_ids = shard.reivindicar("cemaden", station_ids)
+    storage = DataStorage(root_dir=root_dir)
+    ciclo = montar_observadores(root_dir, "cemaden", {
+        "publicar_feed": publicar_feed, "avaliar_alertas": avaliar_alertas, "calcular_derivadas": calcular_derivadas,
+        "manter_anel": manter_anel, "manter_quadros": manter_quadros, "atualizar_baselines": atualizar_baselines,
+        "medir_frescor": medir_frescor, "meta_frescor_s": meta_frescor_s,
+    }, observadores=observadores)
+    observadores = ciclo.lista
+
+    def gravar(lote):
+        storage.gravar_lote([arquivo for resultado in lote for arquivo in resultado["arquivos"]])
+
+    processar = functools.partial(prepare_station_files, root_dir=root_dir)
+    materializador = None
+    if usar_diario:
+        diario = DiarioIngestao(caminho_diario(root_dir, "cemaden"))
+        materializador = MaterializadorDiario(diario.diretorio, root_dir=root_dir, observadores=observadores,
+                                              usar_processos=usar_processos)
+        processar, gravar, observadores = normalizar_resposta, diario.anexar, []
+
+    pipeline = PipelineIngestao(
+        buscar=lambda sid: fetch_station_payload(sid, base_url=base_url),
+        processar=processar,
+        gravar=gravar,
+        nome="cemaden",
+        max_fetch_workers=5,
+        usar_processos=usar_processos,
+        observadores=observadores,
+    )
+    resumo = pipeline.executar(station_ids)
+    if materializador is not None and materializador.materializar() is None:
+        # As entradas continuam no diário e são aplicadas pela próxima materialização
+        print("Diário não materializado neste ciclo (trava ocupada); publicação sem as entradas.")
+    if shard is not None:
+        shard.registrar_metricas("cemaden", resumo_shard(resumo))
+    ciclo.concluir(shard)
+    print(f"Ciclo concluído: {resumo['sucesso']}/{resumo['total']} estações em {resumo['duracao_s']:.2f}s")
+    return resumo["sucesso"]
 
 
 def main():
     """Inicia um scheduler que chama update_stations_data a cada 10 minutos."""
+    parser = argparse.ArgumentParser(description="Scheduler de atualização das estações do Cemaden.")
+    parser.add_argument("--shard", action="store_true",
+                        help="Divide as estações com os outros workers registrados em --shards-db.")
+    parser.add_argument("--worker-id", default=None, help="Identificador do worker (padrão: host-pid).")
+    parser.add_argument("--shards-db", default=CAMINHO_SHARDS)
+    parser.add_argument("--diario", action="store_true",
+                        help="Grava as respostas no diário de ingestão e materializa os arquivos ao final do ciclo.")
+    args = parser.parse_args()
+
     scheduler = BlockingScheduler()
-    scheduler.add_job(update_stations_data, 'interval', minutes=10, next_run_time=datetime.now())
+    shard = None
+    ciclo = functools.partial(update_stations_data, usar_diario=args.diario)
+    if args.shard:
+        shard = CoordenadorShards(args.shards_db, worker_id=args.worker_id)
+        shard.heartbeat()
+        # Todos os workers disparam no início de cada janela de 10 minutos
+        scheduler.add_job(functools.partial(ciclo, shard=shard), 'cron', minute='*/10',
+                          max_instances=1, coalesce=True)
+        scheduler.add_job(shard.heartbeat, 'interval', seconds=shard.ttl_s // 3)
+    else:
+        scheduler.add_job(ciclo, 'interval', minutes=10, next_run_time=datetime.now())
     print("Scheduler iniciado. Atualizações a cada 10 minutos.")
     try:
         scheduler.start()
     except (KeyboardInterrupt, SystemExit):
+        if shard is not None:
+            shard.encerrar()
         print("Scheduler interrompido.")
 
 
@@ -241,4 +375,4 @@ if __name__ == "__main__":
 
 
 # Instrução para executar este script:
-# python server\apis\ana\services\cemaden_data_scheduler.py
+# python -m server.apis.ana.services.cemaden_data_scheduler
@@ -0,0 +1,268 @@
+"""
+@file server/apis/ana/services/change_feed.py
+@description Feed versionado de alterações das estações, para atualização incremental dos marcadores.
+
+Cada ciclo de ingestão publica uma nova versão (inteiro crescente). A versão registra apenas o delta:
+o resumo (última leitura, chuva acumulada e classificações, ver utils/classificacao.py) das estações
+que mudaram naquele ciclo. Os clientes pedem "alterações desde a versão N" e recebem somente essas
+estações; se N for antigo demais (fora da retenção) ou 0, recebem o estado completo.
+
+O feed é um banco SQLite (biblioteca padrão), pois é escrito pelos dois schedulers (HidroWeb e
+Cemaden, em processos separados) e lido pelo serviço de leitura: as transações garantem a numeração
+monotônica das versões entre processos.
+
+Uso nos schedulers:
+    coletor = ColetorCiclo(FeedAlteracoes())
+    pipeline = PipelineIngestao(..., observadores=[coletor])
+    pipeline.executar(itens)
+    coletor.publicar("hidroweb")
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from server.apis.ana.utils.classificacao import resumir_estacao, status_atualizacao, datas_referencia
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+CAMINHO_FEED = os.path.join(DATA_ROOT, "feed_alteracoes.sqlite3")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS versoes (
+    versao INTEGER PRIMARY KEY AUTOINCREMENT,
+    gerado_em TEXT NOT NULL,
+    fonte TEXT NOT NULL,
+    delta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS estado (
+    codigoestacao TEXT PRIMARY KEY,
+    resumo TEXT NOT NULL,
+    versao INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+def codigo_do_arquivo(caminho):
+    """Extrai o código da estação do nome de um arquivo diário (codigoestacao_<codigo>.json)."""
+    nome = os.path.basename(caminho)
+    return nome[len("codigoestacao_"):-len(".json")]
+
+
+class FeedAlteracoes:
+    """Publica e consulta as versões do feed de alterações."""
+
+    def __init__(self, caminho=CAMINHO_FEED, root_dir=DATA_ROOT, max_versoes=2000, intervalo_verificacao_s=1.0):
+        """
+        @param caminho: Arquivo SQLite do feed.
+        @param root_dir: Diretório raiz dos arquivos diários.
+        @param max_versoes: Número de versões mantidas; clientes mais atrasados recebem o estado completo.
+        @param intervalo_verificacao_s: Intervalo com que os long-polls verificam novas versões.
+        """
+        self.caminho = caminho
+        self.root_dir = root_dir
+        self.max_versoes = max_versoes
+        self.intervalo_verificacao_s = intervalo_verificacao_s
+        self._local = threading.local()
+        self._condicao = threading.Condition()
+        self._versao_vista = None
+        self._vigia = None
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with self._conexao() as conexao:
+            conexao.executescript(_ESQUEMA)
+
+    def _conexao(self):
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads por padrão)."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def versao_atual(self):
+        linha = self._conexao().execute("SELECT MAX(versao) FROM versoes").fetchone()
+        return linha[0] or 0
+
+    def publicar(self, estacoes, fonte="ingestao", agora_utc=None):
+        """
+        Publica uma nova versão com as estações cujo resumo mudou.
+
+        @param estacoes: Códigos das estações gravadas no ciclo (seus resumos são recalculados).
+        @param fonte: Nome da fonte do ciclo (ex.: "hidroweb", "cemaden").
+        @param agora_utc: Instante de referência (padrão: agora).
+        @return: (versao, delta) — delta é o dicionário {codigo: resumo} das estações alteradas.
+        """
+        agora_utc = agora_utc or datetime.utcnow()
+        hoje, _ = datas_referencia(agora_utc)
+        conexao = self._conexao()
+
+        # Na virada do dia a janela (hoje + ontem) muda para todas as estações: recalcula todas
+        linha = conexao.execute("SELECT valor FROM meta WHERE chave = 'dia_referencia'").fetchone()
+        recalcular = set(str(codigo) for codigo in estacoes)
+        if linha is None or linha[0] != hoje:
+            recalcular.update(codigo for (codigo,) in conexao.execute("SELECT codigoestacao FROM estado"))
+
+        # Leitura dos arquivos fora da transação, para não segurar o lock do banco
+        novos_resumos = {codigo: resumir_estacao(self.root_dir, codigo, agora_utc) for codigo in recalcular}
+
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            atuais = {codigo: json.loads(resumo) for codigo, resumo in conexao.execute(
+                "SELECT codigoestacao, resumo FROM estado")}
+            delta = {}
+            for codigo, resumo in novos_resumos.items():
+                # Estações ainda sem leituras recentes só entram no feed depois da primeira leitura
+                if resumo != atuais.get(codigo) and (codigo in atuais or resumo["Data_Hora_Medicao"]):
+                    delta[codigo] = resumo
+            # O status de atualização muda com o tempo, mesmo sem leituras novas
+            for codigo, resumo in atuais.items():
+                if codigo in novos_resumos:
+                    continue
+                status = status_atualizacao(resumo.get("Data_Hora_Medicao"), agora_utc - timedelta(hours=3))
+                if status != resumo.get("statusAtualizacao"):
+                    delta[codigo] = dict(resumo, statusAtualizacao=status)
+
+            cursor = conexao.execute(
+                "INSERT INTO versoes (gerado_em, fonte, delta) VALUES (?, ?, ?)",
+                (agora_utc.strftime("%Y-%m-%dT%H:%M:%SZ"), fonte, json.dumps(delta, ensure_ascii=False)))
+            versao = cursor.lastrowid
+            conexao.executemany(
+                "INSERT OR REPLACE INTO estado (codigoestacao, resumo, versao) VALUES (?, ?, ?)",
+                [(codigo, json.dumps(resumo, ensure_ascii=False), versao) for codigo, resumo in delta.items()])
+            conexao.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('dia_referencia', ?)", (hoje,))
+            conexao.execute("DELETE FROM versoes WHERE versao <= ?", (versao - self.max_versoes,))
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+        logger.info(f"[feed] Versão {versao} ({fonte}): {len(delta)} estações alteradas.")
+        return versao, delta
+
+    def resumos(self):
+        """Estado atual do feed: dicionário {codigoestacao: resumo} de todas as estações publicadas."""
+        return {codigo: json.loads(resumo) for codigo, resumo in self._conexao().execute(
+            "SELECT codigoestacao, resumo FROM estado")}
+
+    def alteracoes_desde(self, versao):
+        """
+        Retorna as alterações posteriores à versão informada.
+
+        @param versao: Última versão conhecida pelo cliente (0 ou None para o estado completo).
+        @return: {"versao", "desde", "completo", "estacoes": [resumos]}.
+        """
+        conexao = self._conexao()
+        conexao.execute("BEGIN")
+        try:
+            atual = conexao.execute("SELECT MAX(versao) FROM versoes").fetchone()[0] or 0
+            menor = conexao.execute("SELECT MIN(versao) FROM versoes").fetchone()[0] or 0
+            versao = int(versao or 0)
+            completo = versao <= 0 or versao < menor - 1 or versao > atual
+            if completo:
+                estacoes = {codigo: json.loads(resumo) for codigo, resumo in conexao.execute(
+                    "SELECT codigoestacao, resumo FROM estado")}
+            else:
+                estacoes = {}
+                for (delta,) in conexao.execute("SELECT delta FROM versoes WHERE versao > ? ORDER BY versao", (versao,)):
+                    estacoes.update(json.loads(delta))
+        finally:
+            conexao.execute("COMMIT")
+        return {"versao": atual, "desde": versao, "completo": completo, "estacoes": list(estacoes.values())}
+
+    def aguardar_alteracoes(self, versao, timeout_s=25.0):
+        """
+        Long-poll: aguarda até haver alterações posteriores à versão informada ou até o timeout.
+        Versões sem estações alteradas não acordam o cliente, nem um estado completo vazio (feed ainda sem
+        versões): nos dois casos a requisição espera a próxima versão. Um único vigia por processo consulta o
+        banco; as requisições em espera apenas aguardam a notificação.
+
+        @return: O mesmo formato de alteracoes_desde (lista vazia em caso de timeout).
+        """
+        prazo = time.monotonic() + max(float(timeout_s), 0.0)
+        while True:
+            resultado = self.alteracoes_desde(versao)
+            if resultado["estacoes"]:
+                return resultado
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                return resultado
+            self._iniciar_vigia()
+            with self._condicao:
+                self._condicao.wait_for(lambda: (self._versao_vista or 0) > resultado["versao"], timeout=restante)
+
+    def _iniciar_vigia(self):
+        with self._condicao:
+            if self._vigia is not None and self._vigia.is_alive():
+                return
+            self._vigia = threading.Thread(target=self._vigiar, name="feed-vigia", daemon=True)
+            self._vigia.start()
+
+    def _vigiar(self):
+        while True:
+            try:
+                versao = self.versao_atual()
+            except sqlite3.Error as e:
+                logger.error(f"[feed] Erro ao consultar a versão atual: {e}")
+                versao = self._versao_vista
+            with self._condicao:
+                if versao != self._versao_vista:
+                    self._versao_vista = versao
+                    self._condicao.notify_all()
+            time.sleep(self.intervalo_verificacao_s)
+
+
+class ColetorCiclo:
+    """
+    Observador do pipeline que coleta as estações gravadas durante um ciclo e, ao final, publica
+    uma única versão do feed com as que mudaram.
+
+    As tarefas de `apos_publicar` (ex.: estatísticas de chuva) são chamadas com (feed, versao, delta)
+    depois de cada publicação bem-sucedida; uma falha em uma tarefa não afeta as demais.
+    `ultima_publicacao` guarda o instante (epoch UTC) da última versão publicada, usado na medição
+    do frescor dos dados (data_freshness.py).
+    """
+
+    def __init__(self, feed, apos_publicar=None):
+        self.feed = feed
+        self.apos_publicar = list(apos_publicar or [])
+        self.ultima_publicacao = None
+        self.estacoes = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, lote):
+        with self._lock:
+            for resultado in lote:
+                for arquivo in resultado.get("arquivos", []):
+                    self.estacoes.add(codigo_do_arquivo(arquivo["caminho"]))
+
+    def publicar(self, fonte, executar_tarefas=True):
+        """
+        Publica a versão do ciclo e reinicia a coleta. Falhas no feed não interrompem a ingestão.
+
+        @param executar_tarefas: Se False, não executa as tarefas de apos_publicar (em modo shard, só o worker
+                                 eleito por CoordenadorShards.concluir_ciclo as executa).
+        """
+        with self._lock:
+            estacoes, self.estacoes = self.estacoes, set()
+        try:
+            versao, delta = self.feed.publicar(estacoes, fonte=fonte)
+        except Exception as e:
+            logger.error(f"[feed] Falha ao publicar a versão do ciclo {fonte}: {e}")
+            return None
+        self.ultima_publicacao = time.time()
+        for tarefa in (self.apos_publicar if executar_tarefas else []):
+            try:
+                tarefa(self.feed, versao, delta)
+            except Exception as e:
+                logger.error(f"[feed] Falha na tarefa pós-ciclo {getattr(tarefa, '__name__', tarefa)}: {e}")
+        return versao, delta
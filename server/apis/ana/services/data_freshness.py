@@ -0,0 +1,307 @@
+"""
+@file server/apis/ana/services/data_freshness.py
+@description Frescor dos dados de ponta a ponta: latências por etapa, por estação e por fonte.
+
+Para cada leitura nova, o pipeline de ingestão entrega os instantes de busca ("buscado_em") e de
+gravação ("gravado_em"); a leitura traz a medição (Data_Hora_Medicao) e a atualização no HidroWeb
+(Data_Atualizacao), ambas no horário de Brasília, e o ColetorCiclo informa quando a versão do ciclo
+foi publicada. Com esses instantes, cada leitura contribui para as etapas:
+
+  medicao_atualizacao  Data_Hora_Medicao → Data_Atualizacao (atraso na origem)
+  atualizacao_busca    Data_Atualizacao → busca pelo scheduler (cadência de consulta)
+  busca_gravacao       busca → gravação em disco (processamento e filas do pipeline)
+  gravacao_publicacao  gravação → publicação da versão do ciclo
+  ponta_a_ponta        Data_Hora_Medicao → publicação (o atraso visto pelo usuário)
+
+As latências alimentam histogramas em fluxo (utils/histograma.py) por fonte (hidroweb, cemaden) e por
+estação, gravados em SQLite e com decaimento exponencial (meia-vida configurável), de modo que os
+percentis refletem as últimas semanas sem guardar as leituras. Leituras mais antigas que
+IDADE_MAXIMA_S no momento da busca (carga do histórico) não são contadas.
+
+Ao final de cada ciclo, publicar() grava public/data/frescor_dados.json (versionado) com os percentis
+de cada etapa por fonte, a idade atual e os percentis de ponta a ponta de cada estação e a lista das
+estações que violam a meta de atraso (p90 de ponta a ponta ou idade atual acima de meta_atraso_s).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from server.apis.ana.utils.histograma import HistogramaLatencias
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.services.change_feed import codigo_do_arquivo
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+CAMINHO_FRESCOR = os.path.join(DATA_ROOT, "frescor.sqlite3")
+ARQUIVO_FRESCOR = "frescor_dados.json"
+
+ETAPAS = ("medicao_atualizacao", "atualizacao_busca", "busca_gravacao", "gravacao_publicacao", "ponta_a_ponta")
+PERCENTIS = (0.50, 0.90, 0.99)
+# Data_Hora_Medicao e Data_Atualizacao estão no horário de Brasília (UTC-3)
+DESLOCAMENTO_UTC_S = 3 * 3600
+META_ATRASO_S = 3 * 3600
+MEIA_VIDA_S = 7 * 24 * 3600
+IDADE_MAXIMA_S = 7 * 24 * 3600
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS histogramas (
+    escopo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    histograma TEXT NOT NULL,
+    atualizado_em REAL NOT NULL,
+    PRIMARY KEY (escopo, chave, etapa)
+);
+CREATE TABLE IF NOT EXISTS estacoes (
+    codigoestacao TEXT PRIMARY KEY,
+    fonte TEXT NOT NULL,
+    ultima_medicao REAL NOT NULL,
+    ultima_publicacao REAL
+);
+"""
+
+
+def _nome_percentil(q):
+    return f"p{round(q * 100):02d}"
+
+
+def _resumo(histograma):
+    """Percentis, média e máximo de um histograma (em segundos)."""
+    valores = {_nome_percentil(q): round(valor, 1) for q, valor in histograma.quantis(PERCENTIS).items()}
+    return {"n": round(histograma.total, 1), "media": round(histograma.media(), 1),
+            "maximo": round(histograma.maximo, 1), **valores}
+
+
+class RastreadorFrescor:
+    """Observador do pipeline que mede o atraso das leituras novas até a publicação."""
+
+    def __init__(self, caminho=CAMINHO_FRESCOR, root_dir=DATA_ROOT, fonte="hidroweb", meta_atraso_s=META_ATRASO_S,
+                 meia_vida_s=MEIA_VIDA_S, idade_maxima_s=IDADE_MAXIMA_S):
+        """
+        @param caminho: Arquivo SQLite com os histogramas (compartilhado pelas fontes).
+        @param root_dir: Diretório onde frescor_dados.json é publicado.
+        @param fonte: Fonte das leituras observadas ("hidroweb" ou "cemaden").
+        @param meta_atraso_s: Meta de atraso de ponta a ponta, em segundos.
+        @param meia_vida_s: Meia-vida do decaimento dos histogramas, em segundos.
+        @param idade_maxima_s: Leituras mais antigas que isso na busca não são contadas.
+        """
+        self.caminho = caminho
+        self.root_dir = root_dir
+        self.fonte = fonte
+        self.meta_atraso_s = meta_atraso_s
+        self.meia_vida_s = meia_vida_s
+        self.idade_maxima_s = idade_maxima_s
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Leituras do ciclo ainda não publicadas: {codigo: [(medicao_utc, atualizacao_utc, buscado, gravado)]}
+        self._pendentes = {}
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao().executescript(_ESQUEMA)
+
+    def _conexao(self):
+        """Uma conexão por thread (o pipeline chama os observadores na thread de gravação)."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def __call__(self, lote):
+        """Observador do pipeline: guarda os instantes das leituras novas do lote."""
+        with self._lock:
+            for resultado in lote:
+                buscado = resultado.get("buscado_em")
+                gravado = resultado.get("gravado_em")
+                if buscado is None or gravado is None:
+                    continue
+                for arquivo in resultado.get("arquivos", []):
+                    amostras = []
+                    for leitura in arquivo.get("novos") or []:
+                        medicao = leitura.medicao + DESLOCAMENTO_UTC_S
+                        if buscado - medicao > self.idade_maxima_s:
+                            continue
+                        atualizacao = None
+                        if leitura.atualizacao_ms is not None:
+                            atualizacao = leitura.atualizacao_ms / 1000 + DESLOCAMENTO_UTC_S
+                        amostras.append((medicao, atualizacao, buscado, gravado))
+                    if amostras:
+                        self._pendentes.setdefault(codigo_do_arquivo(arquivo["caminho"]), []).extend(amostras)
+
+    @staticmethod
+    def latencias(medicao, atualizacao, buscado, gravado, publicado):
+        """Latência (s) de cada etapa para uma leitura; etapas sem os dois instantes ficam de fora."""
+        etapas = {"busca_gravacao": gravado - buscado, "gravacao_publicacao": publicado - gravado,
+                  "ponta_a_ponta": publicado - medicao}
+        if atualizacao is not None:
+            etapas["medicao_atualizacao"] = atualizacao - medicao
+            etapas["atualizacao_busca"] = buscado - atualizacao
+        return etapas
+
+    def _carregar(self, conexao, escopo, chave, etapa, agora):
+        """Histograma gravado, já com o decaimento desde a última atualização."""
+        linha = conexao.execute("SELECT histograma, atualizado_em FROM histogramas "
+                                "WHERE escopo = ? AND chave = ? AND etapa = ?", (escopo, chave, etapa)).fetchone()
+        if linha is None:
+            return HistogramaLatencias()
+        histograma = HistogramaLatencias.de_dict(json.loads(linha[0]))
+        histograma.decair(0.5 ** (max(agora - linha[1], 0) / self.meia_vida_s))
+        return histograma
+
+    def registrar(self, publicado_em=None):
+        """
+        Incorpora as leituras pendentes aos histogramas (numa única transação).
+        Sem publicação no ciclo, a etapa de publicação é medida até agora.
+
+        @return: Número de leituras incorporadas.
+        """
+        agora = time.time()
+        publicado = publicado_em or agora
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+        if not pendentes:
+            return 0
+
+        por_fonte = {etapa: HistogramaLatencias() for etapa in ETAPAS}
+        por_estacao = {}
+        for codigo, amostras in pendentes.items():
+            histogramas = por_estacao[codigo] = {etapa: HistogramaLatencias() for etapa in ETAPAS}
+            for amostra in amostras:
+                for etapa, valor in self.latencias(*amostra, publicado).items():
+                    histogramas[etapa].adicionar(valor)
+                    por_fonte[etapa].adicionar(valor)
+
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linhas = []
+            grupos = [("fonte", self.fonte, por_fonte)] + [("estacao", codigo, histogramas)
+                                                          for codigo, histogramas in por_estacao.items()]
+            for escopo, chave, histogramas in grupos:
+                for etapa, novo in histogramas.items():
+                    if not novo.total:
+                        continue
+                    histograma = self._carregar(conexao, escopo, chave, etapa, agora)
+                    histograma.mesclar(novo)
+                    linhas.append((escopo, chave, etapa, json.dumps(histograma.para_dict(), separators=(",", ":")),
+                                   agora))
+            conexao.executemany("INSERT OR REPLACE INTO histogramas (escopo, chave, etapa, histograma, atualizado_em) "
+                                "VALUES (?, ?, ?, ?, ?)", linhas)
+            conexao.executemany(
+                "INSERT INTO estacoes (codigoestacao, fonte, ultima_medicao, ultima_publicacao) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(codigoestacao) DO UPDATE SET fonte = excluded.fonte, "
+                "ultima_medicao = MAX(ultima_medicao, excluded.ultima_medicao), "
+                "ultima_publicacao = excluded.ultima_publicacao",
+                [(codigo, self.fonte, max(amostra[0] for amostra in amostras), publicado)
+                 for codigo, amostras in pendentes.items()])
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+        return sum(len(amostras) for amostras in pendentes.values())
+
+    def relatorio(self, agora=None):
+        """Percentis por fonte e etapa, frescor de cada estação e estações acima da meta."""
+        agora = agora or time.time()
+        conexao = self._conexao()
+        fontes = {}
+        estacoes = {}
+        violadoras = []
+        for escopo, chave, etapa, histograma, atualizado_em in conexao.execute(
+                "SELECT escopo, chave, etapa, histograma, atualizado_em FROM histogramas ORDER BY escopo, chave"):
+            histograma = HistogramaLatencias.de_dict(json.loads(histograma))
+            histograma.decair(0.5 ** (max(agora - atualizado_em, 0) / self.meia_vida_s))
+            if escopo == "fonte":
+                fontes.setdefault(chave, {"etapas": {}})["etapas"][etapa] = _resumo(histograma)
+            elif etapa == "ponta_a_ponta":
+                estacoes[chave] = _resumo(histograma)
+
+        for codigo, fonte, ultima_medicao in conexao.execute(
+                "SELECT codigoestacao, fonte, ultima_medicao FROM estacoes ORDER BY codigoestacao"):
+            entrada = estacoes.setdefault(codigo, {})
+            entrada["fonte"] = fonte
+            entrada["idade_s"] = round(agora - ultima_medicao, 1)
+            entrada["ultima_medicao"] = datetime.utcfromtimestamp(ultima_medicao).strftime("%Y-%m-%dT%H:%M:%SZ")
+            resumo_fonte = fontes.setdefault(fonte, {"etapas": {}})
+            resumo_fonte["estacoes"] = resumo_fonte.get("estacoes", 0) + 1
+            motivos = []
+            if entrada.get("p90") is not None and entrada["p90"] > self.meta_atraso_s:
+                motivos.append("atraso")
+            if entrada["idade_s"] > self.meta_atraso_s:
+                motivos.append("idade")
+            if motivos:
+                violadoras.append({"codigoestacao": codigo, "fonte": fonte, "motivos": motivos,
+                                   "idade_s": entrada["idade_s"], "p90_s": entrada.get("p90")})
+
+        for violadora in violadoras:
+            fonte = fontes[violadora["fonte"]]
+            fonte["violadoras"] = fonte.get("violadoras", 0) + 1
+        violadoras.sort(key=lambda v: -max(v["idade_s"], v["p90_s"] or 0))
+        return {"fontes": fontes, "estacoes": estacoes, "violadoras": violadoras}
+
+    def publicar(self, publicado_em=None, agora_utc=None):
+        """
+        Fim do ciclo: registra as leituras pendentes e grava frescor_dados.json.
+
+        @param publicado_em: Instante (epoch UTC) da publicação da versão do ciclo (ColetorCiclo.ultima_publicacao).
+        @return: Versão do arquivo.
+        """
+        self.registrar(publicado_em)
+        documento = self.relatorio()
+
+        caminho = os.path.join(self.root_dir, ARQUIVO_FRESCOR)
+        anterior = {}
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                anterior = json.load(f)
+        except (OSError, ValueError):
+            pass
+        versao = anterior.get("versao", 0) + 1
+        documento = {
+            "versao": versao,
+            "gerado_em": (agora_utc or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "meta_atraso_s": self.meta_atraso_s,
+            "meia_vida_s": self.meia_vida_s,
+            "percentis": [_nome_percentil(q) for q in PERCENTIS],
+            **documento,
+        }
+        os.makedirs(self.root_dir, exist_ok=True)
+        gravar_arquivo_atomico(caminho, json.dumps(documento, ensure_ascii=False, separators=(",", ":")))
+        print(f"Frescor dos dados atualizado (versão {versao}): {len(documento['estacoes'])} estações, "
+              f"{len(documento['violadoras'])} acima da meta de {self.meta_atraso_s}s.")
+        return versao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frescor dos dados por estação e por fonte.")
+    parser.add_argument("--caminho", default=CAMINHO_FRESCOR)
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--meta", type=float, default=META_ATRASO_S, help="Meta de atraso de ponta a ponta (s).")
+    parser.add_argument("--publicar", action="store_true", help="Regrava frescor_dados.json.")
+    args = parser.parse_args()
+    rastreador = RastreadorFrescor(args.caminho, root_dir=args.root_dir, meta_atraso_s=args.meta)
+    if args.publicar:
+        rastreador.publicar()
+        return
+    relatorio = rastreador.relatorio()
+    for fonte, resumo in relatorio["fontes"].items():
+        print(f"{fonte}: {resumo.get('estacoes', 0)} estações, {resumo.get('violadoras', 0)} acima da meta")
+        for etapa in ETAPAS:
+            if etapa in resumo["etapas"]:
+                print(f"    {etapa}: {json.dumps(resumo['etapas'][etapa])}")
+    for violadora in relatorio["violadoras"][:20]:
+        print(json.dumps(violadora, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.data_freshness --meta 10800
@@ -0,0 +1,324 @@
+"""
+@file server/apis/ana/services/derived_variables.py
+@description Variáveis derivadas das séries das estações, calculadas em lote com NumPy a cada ingestão.
+
+Variáveis (colunas gravadas ao lado das leituras brutas chuva/cota/vazao):
+  - intensidade_chuva: chuva da leitura dividida pelo intervalo desde a leitura anterior, em mm/h
+    (intervalos maiores que 1h contam como 1h: após uma falha a leitura não é espalhada pela lacuna);
+  - chuva_3h, chuva_6h, chuva_24h: soma da chuva nas janelas (t - N horas, t];
+  - dh_dt: taxa de variação da cota em relação à leitura de cota anterior, em cm/h (NaN se a anterior
+    estiver a mais de 6h);
+  - vazao_media: média móvel da vazão nos últimos 30 dias; anomalia_vazao: vazão menos essa média.
+
+Armazenamento: um arquivo .npz por estação e mês (public/data/derivadas/YYYY-MM/<codigo>.npz), com a
+coluna "medicao" (segundos, horário local, ver leituras.py), as colunas brutas e as derivadas.
+
+Recalculo incremental: cada valor derivado depende apenas das leituras dos 30 dias anteriores. Quando
+chegam leituras a partir do instante t0, só as linhas com medição >= t0 (até 30 dias após a última
+leitura nova) são recalculadas, usando como contexto os 30 dias anteriores a t0. Assim, o custo de um
+lote é proporcional às leituras novas (mais uma janela de contexto), não ao histórico. Os trechos de
+todas as estações do lote são concatenados e calculados de uma vez (somas acumuladas + searchsorted),
+com um deslocamento no tempo entre estações para que nenhuma janela atravesse de uma estação a outra.
+
+O motor é um observador do pipeline de ingestão (ver PipelineIngestao), como o motor de alertas.
+Para recalcular o histórico a partir dos arquivos diários:
+    python -m server.apis.ana.services.derived_variables --reconstruir
+"""
+
+import io
+import os
+import json
+import logging
+import argparse
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from server.apis.ana.utils.leituras import SerieLeituras, texto_para_segundos
+from server.apis.ana.utils.arquivo_mensal import ler_dia
+from server.apis.ana.utils.manifesto_mensal import dias_indexados
+from server.apis.ana.services.change_feed import codigo_do_arquivo
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+DIRETORIO_DERIVADAS = "derivadas"
+
+COLUNAS_BRUTAS = ("chuva", "cota", "vazao")
+JANELAS_CHUVA_H = (3, 6, 24)
+JANELA_MEDIA_VAZAO_H = 30 * 24
+INTERVALO_MAXIMO_H = 1
+LIMITE_DH_DT_H = 6
+COLUNAS_DERIVADAS = ("intensidade_chuva", *(f"chuva_{horas}h" for horas in JANELAS_CHUVA_H), "dh_dt",
+                     "vazao_media", "anomalia_vazao")
+
+# Maior janela usada por qualquer variável: contexto necessário para recalcular a cauda
+CONTEXTO_S = max(JANELA_MEDIA_VAZAO_H, *JANELAS_CHUVA_H, LIMITE_DH_DT_H) * 3600
+# Deslocamento no tempo entre as estações de um lote (~35 mil anos, maior que qualquer série)
+_DESLOCAMENTO_ESTACAO = 1 << 40
+
+
+def _soma_janela(t, valores, janela_s):
+    """Soma e contagem dos valores válidos em (t - janela_s, t] para cada linha (t ordenado)."""
+    validos = ~np.isnan(valores)
+    soma = np.concatenate(([0.0], np.cumsum(np.where(validos, valores, 0.0))))
+    contagem = np.concatenate(([0], np.cumsum(validos)))
+    inicio = np.searchsorted(t, t - janela_s, side="right")
+    fim = np.arange(1, len(t) + 1)
+    return soma[fim] - soma[inicio], contagem[fim] - contagem[inicio]
+
+
+def calcular_derivadas(medicao, chuva, cota, vazao, grupo=None):
+    """
+    Calcula as variáveis derivadas de uma ou mais séries concatenadas.
+
+    @param medicao: Instantes (segundos), ordenados dentro de cada grupo.
+    @param chuva, cota, vazao: Valores brutos (NaN = ausente).
+    @param grupo: Índice da estação de cada linha (linhas agrupadas e em ordem crescente de grupo);
+                  None quando todas as linhas são da mesma estação.
+    @return: Dicionário {coluna derivada: np.ndarray}.
+    """
+    t = np.asarray(medicao, dtype=np.int64)
+    if grupo is not None:
+        t = t + np.asarray(grupo, dtype=np.int64) * _DESLOCAMENTO_ESTACAO
+    chuva, cota, vazao = (np.asarray(coluna, dtype=np.float64) for coluna in (chuva, cota, vazao))
+    if not len(t):
+        return {coluna: np.zeros(0, dtype=np.float64) for coluna in COLUNAS_DERIVADAS}
+    derivadas = {}
+
+    # Intervalo desde a leitura anterior, limitado a INTERVALO_MAXIMO_H (a primeira leitura conta como 1h)
+    intervalo_h = np.minimum(np.diff(t, prepend=t[0] - 3600) / 3600.0, INTERVALO_MAXIMO_H)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        derivadas["intensidade_chuva"] = np.where(intervalo_h > 0, chuva / intervalo_h, np.nan)
+
+    for horas in JANELAS_CHUVA_H:
+        soma, contagem = _soma_janela(t, chuva, horas * 3600)
+        derivadas[f"chuva_{horas}h"] = np.where(contagem > 0, soma, np.nan)
+
+    # dH/dt em relação à última cota válida anterior (índice acumulado das linhas com cota)
+    indices = np.where(~np.isnan(cota), np.arange(len(t)), -1)
+    anterior = np.concatenate(([-1], np.maximum.accumulate(indices)[:-1]))
+    base = np.maximum(anterior, 0)
+    delta_h = (t - t[base]) / 3600.0
+    valido = (anterior >= 0) & (delta_h > 0) & (delta_h <= LIMITE_DH_DT_H)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        derivadas["dh_dt"] = np.where(valido, (cota - cota[base]) / delta_h, np.nan)
+
+    soma, contagem = _soma_janela(t, vazao, JANELA_MEDIA_VAZAO_H * 3600)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media = np.where(contagem > 0, soma / np.maximum(contagem, 1), np.nan)
+    derivadas["vazao_media"] = media
+    derivadas["anomalia_vazao"] = vazao - media
+    return derivadas
+
+
+def _mes(segundos):
+    """Mês "YYYY-MM" de um instante em segundos."""
+    return date.fromordinal(int(segundos) // 86400 + date(1970, 1, 1).toordinal()).strftime("%Y-%m")
+
+
+def _meses_entre(inicio_s, fim_s):
+    mes, ultimo = _mes(inicio_s), _mes(fim_s)
+    meses = []
+    while mes <= ultimo:
+        meses.append(mes)
+        ano, numero = int(mes[:4]), int(mes[5:7])
+        mes = f"{ano + numero // 12}-{numero % 12 + 1:02d}"
+    return meses
+
+
+def _colunas_vazias():
+    colunas = {"medicao": np.zeros(0, dtype=np.int64)}
+    for coluna in (*COLUNAS_BRUTAS, *COLUNAS_DERIVADAS):
+        colunas[coluna] = np.zeros(0, dtype=np.float64)
+    return colunas
+
+
+class MotorDerivadas:
+    """Mantém as colunas derivadas por estação, recalculando só a cauda afetada por cada lote."""
+
+    def __init__(self, root_dir=DATA_ROOT):
+        """@param root_dir: Diretório raiz dos dados (os arquivos ficam em <root_dir>/derivadas)."""
+        self.root_dir = root_dir
+        self.diretorio = os.path.join(root_dir, DIRETORIO_DERIVADAS)
+        self._lock = threading.Lock()
+        self.estatisticas = {"lotes": 0, "linhas_recalculadas": 0, "arquivos_gravados": 0}
+
+    def caminho_arquivo(self, codigo, mes):
+        return os.path.join(self.diretorio, mes, f"{codigo}.npz")
+
+    def _ler_mes(self, codigo, mes):
+        caminho = self.caminho_arquivo(codigo, mes)
+        if not os.path.exists(caminho):
+            return None
+        try:
+            with np.load(caminho) as arquivo:
+                return {coluna: arquivo[coluna] for coluna in arquivo.files}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Erro ao ler {caminho}: {e}")
+            return None
+
+    def _gravar_mes(self, codigo, mes, colunas):
+        caminho = self.caminho_arquivo(codigo, mes)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **colunas)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temporario, caminho)
+
+    def __call__(self, lote):
+        """Observador do pipeline: atualiza as derivadas das estações gravadas no lote."""
+        novas = {}
+        for resultado in lote:
+            for arquivo in resultado.get("arquivos", []):
+                if arquivo.get("novos"):
+                    novas.setdefault(codigo_do_arquivo(arquivo["caminho"]), []).extend(arquivo["novos"])
+        if novas:
+            self.atualizar(novas)
+
+    def atualizar(self, leituras_por_estacao):
+        """
+        Mescla as leituras nas colunas de cada estação e recalcula as derivadas afetadas, em um único
+        cálculo para todas as estações. Leituras com a mesma medição de uma já gravada a substituem.
+
+        @param leituras_por_estacao: Dicionário {codigoestacao: [Leitura]}.
+        @return: Número de linhas recalculadas.
+        """
+        with self._lock:
+            trechos = []
+            for codigo, leituras in leituras_por_estacao.items():
+                if leituras:
+                    trechos.append(self._preparar_estacao(codigo, leituras))
+            if not trechos:
+                return 0
+
+            # Um único cálculo sobre os trechos (contexto + cauda) de todas as estações
+            partes = [colunas["medicao"][inicio:] for _, _, colunas, inicio, _ in trechos]
+            grupo = np.repeat(np.arange(len(partes)), [len(parte) for parte in partes])
+            derivadas = calcular_derivadas(
+                np.concatenate(partes),
+                *(np.concatenate([colunas[coluna][inicio:] for _, _, colunas, inicio, _ in trechos])
+                  for coluna in COLUNAS_BRUTAS),
+                grupo=grupo)
+
+            recalculadas = 0
+            deslocamento = 0
+            for codigo, meses, colunas, inicio, t0 in trechos:
+                tamanho = len(colunas["medicao"]) - inicio
+                cauda = colunas["medicao"][inicio:] >= t0
+                for coluna in COLUNAS_DERIVADAS:
+                    trecho = colunas[coluna][inicio:]
+                    trecho[cauda] = derivadas[coluna][deslocamento:deslocamento + tamanho][cauda]
+                recalculadas += int(cauda.sum())
+                deslocamento += tamanho
+                self._gravar_meses(codigo, meses, colunas, t0)
+
+            self.estatisticas["lotes"] += 1
+            self.estatisticas["linhas_recalculadas"] += recalculadas
+            return recalculadas
+
+    def _preparar_estacao(self, codigo, leituras):
+        """Carrega os meses afetados, mescla as leituras e indica a partir de onde recalcular."""
+        medicoes = np.fromiter((leitura.medicao for leitura in leituras), dtype=np.int64, count=len(leituras))
+        t0, t_max = int(medicoes.min()), int(medicoes.max())
+        meses = _meses_entre(t0 - CONTEXTO_S, t_max + CONTEXTO_S)
+        existentes = [colunas for colunas in (self._ler_mes(codigo, mes) for mes in meses) if colunas is not None]
+
+        novas = _colunas_vazias()
+        novas["medicao"] = medicoes
+        for coluna in COLUNAS_BRUTAS:
+            novas[coluna] = np.array([np.nan if getattr(leitura, coluna) is None else getattr(leitura, coluna)
+                                      for leitura in leituras], dtype=np.float64)
+        for coluna in COLUNAS_DERIVADAS:
+            novas[coluna] = np.full(len(leituras), np.nan)
+
+        # Concatena (gravadas primeiro) e mantém a última ocorrência de cada medição
+        todas = {coluna: np.concatenate([*(colunas[coluna] for colunas in existentes), novas[coluna]])
+                 for coluna in novas}
+        ordem = np.argsort(todas["medicao"], kind="stable")
+        ordenadas = todas["medicao"][ordem]
+        ultima = np.concatenate((ordenadas[1:] != ordenadas[:-1], [True]))
+        colunas = {coluna: valores[ordem][ultima] for coluna, valores in todas.items()}
+        inicio = int(np.searchsorted(colunas["medicao"], t0 - CONTEXTO_S, side="left"))
+        return codigo, meses, colunas, inicio, t0
+
+    def _gravar_meses(self, codigo, meses, colunas, t0):
+        """Regrava os meses a partir do mês de t0 (os anteriores só serviram de contexto)."""
+        mes_linha = colunas["medicao"].astype("datetime64[s]").astype("datetime64[M]").astype(str)
+        for mes in meses:
+            if mes < _mes(t0):
+                continue
+            selecao = mes_linha == mes
+            if selecao.any():
+                self._gravar_mes(codigo, mes, {coluna: valores[selecao] for coluna, valores in colunas.items()})
+                self.estatisticas["arquivos_gravados"] += 1
+
+    def ler(self, codigo, inicio_s, fim_s):
+        """
+        Colunas brutas e derivadas de uma estação no intervalo [inicio_s, fim_s].
+
+        @return: pandas.DataFrame indexado pelo instante da medição (horário local).
+        """
+        partes = [colunas for colunas in (self._ler_mes(codigo, mes) for mes in _meses_entre(inicio_s, fim_s))
+                  if colunas is not None]
+        colunas = {coluna: np.concatenate([parte[coluna] for parte in partes]) for coluna in _colunas_vazias()} \
+            if partes else _colunas_vazias()
+        selecao = (colunas["medicao"] >= inicio_s) & (colunas["medicao"] <= fim_s)
+        df = pd.DataFrame({coluna: colunas[coluna][selecao] for coluna in (*COLUNAS_BRUTAS, *COLUNAS_DERIVADAS)},
+                          index=pd.to_datetime(colunas["medicao"][selecao], unit="s"))
+        df.index.name = "medicao"
+        return df
+
+    def reconstruir(self, codigos=None):
+        """
+        Recalcula as derivadas a partir dos arquivos diários (public/data/YYYY/MM/YYYY-MM-DD).
+
+        @param codigos: Estações a reconstruir (None = todas as encontradas).
+        @return: Número de estações processadas.
+        """
+        # Dias soltos e arquivados, pelos manifestos mensais (utils/manifesto_mensal.py)
+        dias_por_estacao = dias_indexados(self.root_dir, set(codigos) if codigos is not None else None)
+        for codigo, datas in sorted(dias_por_estacao.items()):
+            leituras = []
+            for data_str in datas:
+                try:
+                    documento = ler_dia(self.root_dir, codigo, data_str)
+                    if documento is not None:
+                        leituras.extend(SerieLeituras.de_json(documento.get("dados", [])))
+                except (OSError, ValueError, AttributeError) as e:
+                    print(f"Erro ao ler o dia {data_str} da estação {codigo}: {e}")
+            if leituras:
+                self.atualizar({codigo: leituras})
+        return len(dias_por_estacao)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variáveis derivadas das estações.")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--reconstruir", action="store_true", help="Recalcula a partir dos arquivos diários.")
+    parser.add_argument("--estacao", help="Exibe as colunas de uma estação (CSV).")
+    parser.add_argument("--inicio", help="YYYY-MM-DD")
+    parser.add_argument("--fim", help="YYYY-MM-DD")
+    args = parser.parse_args()
+    motor = MotorDerivadas(args.root_dir)
+    if args.reconstruir:
+        total = motor.reconstruir()
+        print(f"{total} estações reconstruídas: {json.dumps(motor.estatisticas)}")
+    if args.estacao:
+        if not (args.inicio and args.fim):
+            raise ValueError("Informe --inicio e --fim.")
+        df = motor.ler(args.estacao, texto_para_segundos(f"{args.inicio} 00:00:00"),
+                       texto_para_segundos(f"{args.fim} 23:59:59"))
+        print(df.to_csv())
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.derived_variables --reconstruir
+# python -m server.apis.ana.services.derived_variables --estacao 15043000 --inicio 2025-02-01 --fim 2025-02-07
@@ -30,19 +30,22 @@ class HidroWebAPI:
     """
     BASE_URL = "https://www.ana.gov.br/hidrowebservice"
 
-    def __init__(self, username=None, password=None):
+    def __init__(self, username=None, password=None, base_url=None):
         """
         Inicializa a instância da classe HidroWebAPI com as credenciais para autenticação.
 
         Args:
             username (str, optional): Nome de usuário para a API. Se não for fornecido, será lido da variável de ambiente "HIDROWEB_USERNAME".
             password (str, optional): Senha para a API. Se não for fornecido, será lido da variável de ambiente "HIDROWEB_PASSWORD".
+            base_url (str, optional): URL base da API. Se não for fornecida, será lida da variável de ambiente
+                "HIDROWEB_BASE_URL" ou, na ausência desta, será usada a URL oficial (BASE_URL).
 
         Raises:
             ValueError: Se as credenciais não forem fornecidas via parâmetro ou variáveis de ambiente.
         """
         self.username = username or os.getenv("HIDROWEB_USERNAME")
         self.password = password or os.getenv("HIDROWEB_PASSWORD")
+        self.base_url = base_url or os.getenv("HIDROWEB_BASE_URL") or self.BASE_URL
         self.token = None
 
         # Verifica se as credenciais foram definidas, caso contrário, levanta uma exceção.
@@ -77,7 +80,7 @@ class HidroWebAPI:
             Exception: Se o token não puder ser obtido após o número máximo de tentativas.
         """
         # Monta a URL de autenticação a partir da base URL e do endpoint
-        url = f"{self.BASE_URL}/EstacoesTelemetricas/OAUth/v1"
+        url = f"{self.base_url}/EstacoesTelemetricas/OAUth/v1"
         # Define os headers necessários para a autenticação
         headers = {
             "Identificador": self.username,
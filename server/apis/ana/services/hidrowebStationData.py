@@ -47,13 +47,15 @@ class HidroWebStationData:
     # URL base da API HidroWeb.
     BASE_URL = "https://www.ana.gov.br/hidrowebservice"
 
-    def __init__(self, token=None):
+    def __init__(self, token=None, base_url=None):
         """
         Inicializa a classe com o token de autenticação.
 
         Args:
             token (str, optional): Token de autenticação JWT.
                 Caso o token não seja fornecido, uma exceção será levantada.
+            base_url (str, optional): URL base da API. Se não for fornecida, será lida da variável de ambiente
+                "HIDROWEB_BASE_URL" ou, na ausência desta, será usada a URL oficial (BASE_URL).
 
         Raises:
             ValueError: Se o token não for fornecido.
@@ -64,6 +66,8 @@ class HidroWebStationData:
         
         # Armazena o token para uso nas requisições.
         self.token = token
+        # Permite apontar a classe para outro servidor (ex.: servidor mock de testes de carga).
+        self.base_url = base_url or os.getenv("HIDROWEB_BASE_URL") or self.BASE_URL
 
     def fetch_station_data(self, station_code, filtro_data, data_busca, intervalo_busca):
         """
@@ -84,29 +88,9 @@ class HidroWebStationData:
         Raises:
             Exception: Se ocorrer um erro durante a requisição, como problemas de rede, autenticação ou parâmetros inválidos.
         """
-        # Constrói a URL completa para a requisição à API.
-        url = f"{self.BASE_URL}/EstacoesTelemetricas/HidroinfoanaSerieTelemetricaAdotada/v1"
-        
-        # Define os cabeçalhos da requisição, incluindo o token de autenticação.
-        headers = {
-            "Authorization": f"Bearer {self.token}",  # Token JWT no formato "Bearer <token>".
-            "accept": "*/*"                           # Indica que a resposta deve ser no formato JSON.
-        }
-        
-        # Define os parâmetros da requisição.
-        params = {
-            "Código da Estação": station_code,
-            "Tipo Filtro Data": filtro_data,
-            "Data de Busca (yyyy-MM-dd)": data_busca,
-            "Range Intervalo de busca": intervalo_busca,
-        }
-
         try:
-            # Realiza a requisição GET à API com um timeout de 5 segundos.
-            response = requests.get(url, headers=headers, params=params, timeout=5)
-            
-            # Verifica o status da resposta e trata possíveis erros.
-            self._handle_response(response)
+            # Realiza a requisição e verifica o status da resposta.
+            response = self._request_station_data(station_code, filtro_data, data_busca, intervalo_busca)
             
             # Converte a resposta para JSON.
             data = response.json()
@@ -126,6 +110,62 @@ class HidroWebStationData:
             logger.error(f"Erro ao buscar dados da estação {station_code}: {e}")
             raise Exception(f"Erro ao buscar dados da estação {station_code}: {e}")
 
+    def fetch_station_data_raw(self, station_code, filtro_data, data_busca, intervalo_busca):
+        """
+        Obtém o corpo bruto (bytes) da resposta da API para uma estação, sem decodificar o JSON.
+
+        Usado pelo pipeline de ingestão, que decodifica e processa as respostas em um pool de processos
+        separado das threads de I/O.
+
+        Args:
+            station_code (str): Código único da estação hidrométrica.
+            filtro_data (str): Tipo de filtro de data (ex.: "DATA_LEITURA").
+            data_busca (str): Data inicial para a busca no formato "yyyy-MM-dd".
+            intervalo_busca (str): Intervalo de busca (ex.: "HORA_2").
+
+        Returns:
+            bytes: Corpo da resposta da API.
+
+        Raises:
+            Exception: Se ocorrer um erro durante a requisição, como problemas de rede, autenticação ou parâmetros inválidos.
+        """
+        try:
+            return self._request_station_data(station_code, filtro_data, data_busca, intervalo_busca).content
+        except requests.RequestException as e:
+            logger.error(f"Erro ao buscar dados da estação {station_code}: {e}")
+            raise Exception(f"Erro ao buscar dados da estação {station_code}: {e}")
+
+    def _request_station_data(self, station_code, filtro_data, data_busca, intervalo_busca):
+        """
+        Realiza a requisição GET de dados telemétricos e verifica o status da resposta.
+
+        Returns:
+            requests.Response: Resposta da API com status 200.
+        """
+        # Constrói a URL completa para a requisição à API.
+        url = f"{self.base_url}/EstacoesTelemetricas/HidroinfoanaSerieTelemetricaAdotada/v1"
+        
+        # Define os cabeçalhos da requisição, incluindo o token de autenticação.
+        headers = {
+            "Authorization": f"Bearer {self.token}",  # Token JWT no formato "Bearer <token>".
+            "accept": "*/*"                           # Indica que a resposta deve ser no formato JSON.
+        }
+        
+        # Define os parâmetros da requisição.
+        params = {
+            "Código da Estação": station_code,
+            "Tipo Filtro Data": filtro_data,
+            "Data de Busca (yyyy-MM-dd)": data_busca,
+            "Range Intervalo de busca": intervalo_busca,
+        }
+
+        # Realiza a requisição GET à API com um timeout de 5 segundos.
+        response = requests.get(url, headers=headers, params=params, timeout=5)
+        
+        # Verifica o status da resposta e trata possíveis erros.
+        self._handle_response(response)
+        return response
+
     def _handle_response(self, response):
         """
         Verifica o código de status da resposta e levanta exceções em caso de erro.
@@ -0,0 +1,373 @@
+"""
+@file server/apis/ana/services/hourly_frames.py
+@description Quadros horários: um arquivo pequeno por hora com os valores de todas as estações (layout por tempo).
+
+Os arquivos diários são organizados por estação; animar a chuva ou o nível das estações hora a hora
+exigiria ler a série completa de cada estação. Aqui a ingestão mantém a mesma informação transposta:
+
+  public/data/quadros/estacoes.json        índice das estações: a posição de cada código nos quadros
+  public/data/quadros/catalogo.json        primeira e última hora disponíveis (para o player)
+  public/data/quadros/YYYY/MM/DD/HH.bin    quadro da hora HH (horário de Brasília)
+
+O índice começa na ordem do inventário (inventario_estacoes.json) e só cresce: estações que aparecem
+depois são acrescentadas ao final, de modo que a posição de uma estação nunca muda e quadros antigos
+continuam válidos. Quadros gravados antes de uma estação entrar no índice são simplesmente mais curtos.
+
+Layout do quadro (little-endian): cabeçalho de 16 bytes (assinatura "QH01", número de estações n,
+hora = medicao // 3600) seguido de três vetores float32 de n posições — chuva, cota e vazão —, com NaN
+onde a estação não tem leitura na hora. "Mostrar a hora T para todas as estações" é uma única leitura de
+~12 bytes por estação, e o player lê cada variável como um Float32Array sem interpretar nada. No mapa, os
+quadros são lidos por src/utils/ana/quadrosHorarios.js e animados na camada "Chuva Horária - Animação"
+(src/components/ana/camadaAnimacaoChuva.js).
+
+Agregação da hora (a mesma do anel das últimas 48h): chuva somada, cota e vazão da última leitura.
+O observador recalcula as horas com leituras novas a partir do documento completo do dia (que já vem no
+lote), então regravar um lote não altera os quadros.
+"""
+
+import os
+import json
+import shutil
+import struct
+import logging
+import argparse
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from server.apis.ana.utils.leituras import SerieLeituras, segundos_para_texto, texto_para_segundos
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.utils.arquivo_mensal import listar_dias_mes, ler_conteudo_dia
+from server.apis.ana.utils.manifesto_mensal import ler_manifesto
+from server.apis.ana.services.change_feed import codigo_do_arquivo
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+DIRETORIO_QUADROS = "quadros"
+ARQUIVO_ESTACOES = "estacoes.json"
+ARQUIVO_CATALOGO = "catalogo.json"
+ARQUIVO_TRAVA = ".quadros.lock"
+VERSAO_FORMATO = 1
+
+ASSINATURA = b"QH01"
+_CABECALHO = struct.Struct("<4sIq")  # assinatura, número de estações, hora
+VARIAVEIS = ("chuva", "cota", "vazao")
+
+
+def diretorio_quadros(root_dir=DATA_ROOT):
+    return os.path.join(root_dir, DIRETORIO_QUADROS)
+
+
+def caminho_quadro(root_dir, hora):
+    """Caminho do quadro da hora (medicao // 3600, horário de Brasília)."""
+    texto = segundos_para_texto(hora * 3600)
+    return os.path.join(diretorio_quadros(root_dir), texto[:4], texto[5:7], texto[8:10], f"{texto[11:13]}.bin")
+
+
+def agregar_horas(leituras, horas=None):
+    """
+    Valores horários das leituras: chuva somada, cota e vazão da última leitura com valor.
+
+    @param leituras: Leituras (Leitura) em ordem cronológica.
+    @param horas: Conjunto de horas a agregar (None = todas).
+    @return: Dicionário {hora: (chuva, cota, vazao)} com NaN para os valores ausentes.
+    """
+    valores = {}
+    for leitura in leituras:
+        hora = leitura.medicao // 3600
+        if horas is not None and hora not in horas:
+            continue
+        chuva, cota, vazao = valores.get(hora, (np.nan, np.nan, np.nan))
+        if leitura.chuva is not None:
+            chuva = leitura.chuva if np.isnan(chuva) else chuva + leitura.chuva
+        if leitura.cota is not None:
+            cota = leitura.cota
+        if leitura.vazao is not None:
+            vazao = leitura.vazao
+        valores[hora] = (chuva, cota, vazao)
+    return valores
+
+
+def codificar_quadro(hora, valores):
+    """Bytes do quadro; valores é um array float32 (3, n) com chuva, cota e vazão."""
+    return _CABECALHO.pack(ASSINATURA, valores.shape[1], hora) + valores.astype("<f4").tobytes()
+
+
+def decodificar_quadro(conteudo):
+    """
+    @return: (hora, array float32 (3, n)).
+    @raise ValueError: Se o conteúdo não for um quadro válido.
+    """
+    if len(conteudo) < _CABECALHO.size:
+        raise ValueError("Quadro truncado.")
+    assinatura, n, hora = _CABECALHO.unpack_from(conteudo, 0)
+    if assinatura != ASSINATURA or len(conteudo) != _CABECALHO.size + 3 * n * 4:
+        raise ValueError("Conteúdo não é um quadro horário válido.")
+    return hora, np.frombuffer(conteudo, dtype="<f4", offset=_CABECALHO.size).reshape(3, n).astype(np.float32)
+
+
+def ler_quadro(root_dir, hora, n_estacoes=None):
+    """
+    Valores de todas as estações na hora.
+
+    @param n_estacoes: Completa com NaN até este tamanho (quadros gravados antes de estações novas).
+    @return: Array float32 (3, n) com chuva, cota e vazão por posição do índice, ou None se não houver quadro.
+    """
+    try:
+        with open(caminho_quadro(root_dir, hora), "rb") as f:
+            _, valores = decodificar_quadro(f.read())
+    except (OSError, ValueError):
+        return None
+    if n_estacoes is not None and valores.shape[1] < n_estacoes:
+        valores = np.concatenate([valores, np.full((3, n_estacoes - valores.shape[1]), np.nan, np.float32)], axis=1)
+    return valores
+
+
+def ler_indice(root_dir=DATA_ROOT):
+    """Códigos das estações na ordem das posições dos quadros ([] se o índice ainda não existir)."""
+    try:
+        with open(os.path.join(diretorio_quadros(root_dir), ARQUIVO_ESTACOES), "r", encoding="utf-8") as f:
+            return json.load(f)["estacoes"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def ler_catalogo(root_dir=DATA_ROOT):
+    try:
+        with open(os.path.join(diretorio_quadros(root_dir), ARQUIVO_CATALOGO), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _travado(diretorio):
+    """Trava exclusiva entre processos (schedulers do HidroWeb e do Cemaden gravam os mesmos quadros)."""
+    os.makedirs(diretorio, exist_ok=True)
+    with open(os.path.join(diretorio, ARQUIVO_TRAVA), "a+b") as trava:
+        if fcntl is not None:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_EX)
+        else:
+            trava.seek(0)
+            msvcrt.locking(trava.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(trava.fileno(), fcntl.LOCK_UN)
+            else:
+                trava.seek(0)
+                msvcrt.locking(trava.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _codigos_inventario(root_dir):
+    try:
+        with open(os.path.join(root_dir, "inventario_estacoes.json"), "r", encoding="utf-8") as f:
+            return [str(estacao["codigoestacao"]) for estacao in json.load(f) if estacao.get("codigoestacao")]
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        logger.warning(f"Inventário indisponível para o índice dos quadros: {e}")
+        return []
+
+
+def _gravar_json(caminho, documento):
+    gravar_arquivo_atomico(caminho, json.dumps(documento, ensure_ascii=False, separators=(",", ":")))
+
+
+def _posicoes(root_dir, codigos):
+    """
+    Posições dos códigos no índice, acrescentando os que faltam (chamar sob a trava).
+
+    @return: (lista de códigos do índice, {codigo: posicao}).
+    """
+    indice = ler_indice(root_dir)
+    alterado = False
+    if not indice:
+        indice = list(dict.fromkeys(_codigos_inventario(root_dir)))
+        alterado = True
+    posicoes = {codigo: posicao for posicao, codigo in enumerate(indice)}
+    for codigo in codigos:
+        if codigo not in posicoes:
+            posicoes[codigo] = len(indice)
+            indice.append(codigo)
+            alterado = True
+    if alterado:
+        _gravar_json(os.path.join(diretorio_quadros(root_dir), ARQUIVO_ESTACOES),
+                     {"versao_formato": VERSAO_FORMATO, "estacoes": indice})
+    return indice, posicoes
+
+
+def gravar_quadros(root_dir, valores_por_hora, substituir=False):
+    """
+    Grava os valores horários nos quadros, sob a trava.
+
+    @param valores_por_hora: Dicionário {hora: {codigo: (chuva, cota, vazao)}}.
+    @param substituir: Se True, o quadro passa a conter só os valores informados (reconstrução);
+                       caso contrário, os valores das demais estações são mantidos.
+    @return: Número de quadros gravados.
+    """
+    if not valores_por_hora:
+        return 0
+    diretorio = diretorio_quadros(root_dir)
+    with _travado(diretorio):
+        codigos = sorted({codigo for valores in valores_por_hora.values() for codigo in valores})
+        indice, posicoes = _posicoes(root_dir, codigos)
+        for hora, valores in valores_por_hora.items():
+            quadro = None if substituir else ler_quadro(root_dir, hora, len(indice))
+            if quadro is None:
+                quadro = np.full((3, len(indice)), np.nan, np.float32)
+            for codigo, trio in valores.items():
+                quadro[:, posicoes[codigo]] = trio
+            caminho = caminho_quadro(root_dir, hora)
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(codificar_quadro(hora, quadro))
+            os.replace(temporario, caminho)
+        _atualizar_catalogo(root_dir, len(indice), min(valores_por_hora), max(valores_por_hora))
+    return len(valores_por_hora)
+
+
+def _atualizar_catalogo(root_dir, n_estacoes, primeira, ultima):
+    catalogo = ler_catalogo(root_dir) or {}
+    if catalogo.get("primeira_hora"):
+        primeira = min(primeira, texto_para_segundos(catalogo["primeira_hora"]) // 3600)
+    if catalogo.get("ultima_hora"):
+        ultima = max(ultima, texto_para_segundos(catalogo["ultima_hora"]) // 3600)
+    _gravar_json(os.path.join(diretorio_quadros(root_dir), ARQUIVO_CATALOGO), {
+        "versao_formato": VERSAO_FORMATO,
+        "estacoes": n_estacoes,
+        "variaveis": list(VARIAVEIS),
+        "primeira_hora": segundos_para_texto(primeira * 3600),
+        "ultima_hora": segundos_para_texto(ultima * 3600),
+        "atualizado_em": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+    })
+
+
+class QuadrosHorarios:
+    """Observador do pipeline de ingestão que mantém os quadros das horas com leituras novas."""
+
+    def __init__(self, root_dir=DATA_ROOT):
+        self.root_dir = root_dir
+
+    def __call__(self, lote):
+        valores_por_hora = {}
+        for resultado in lote:
+            for arquivo in resultado.get("arquivos", []):
+                novos = arquivo.get("novos")
+                if not novos:
+                    continue
+                try:
+                    documento = json.loads(arquivo["conteudo"])
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Quadros horários: arquivo {arquivo.get('caminho')} ignorado: {e}")
+                    continue
+                horas = {leitura.medicao // 3600 for leitura in novos}
+                serie = SerieLeituras.de_json(documento.get("dados", []))
+                codigo = codigo_do_arquivo(arquivo["caminho"])
+                for hora, trio in agregar_horas(serie.ordenadas(), horas).items():
+                    valores_por_hora.setdefault(hora, {})[codigo] = trio
+        if valores_por_hora:
+            gravados = gravar_quadros(self.root_dir, valores_por_hora)
+            logger.debug(f"[quadros] {gravados} quadros horários atualizados.")
+
+
+def reconstruir(root_dir, data_inicio, data_fim):
+    """
+    Regrava os quadros dos dias [data_inicio, data_fim] ("YYYY-MM-DD") a partir dos arquivos diários
+    (ambas as camadas), por exemplo para gerar o histórico anterior à ativação dos quadros.
+
+    @return: Número de quadros gravados.
+    """
+    dia = date.fromisoformat(data_inicio)
+    ultimo = date.fromisoformat(data_fim)
+    if ultimo < dia:
+        raise ValueError("A data final deve ser posterior à inicial.")
+    gravados = 0
+    estacoes_do_mes = {}
+    while dia <= ultimo:
+        data_str = dia.isoformat()
+        ano, mes = data_str[:4], data_str[5:7]
+        if (ano, mes) not in estacoes_do_mes:
+            manifesto = ler_manifesto(root_dir, ano, mes)
+            estacoes_do_mes[(ano, mes)] = (manifesto["estacoes"] if manifesto is not None
+                                           else listar_dias_mes(root_dir, ano, mes))
+        valores_por_hora = {}
+        for codigo, datas in sorted(estacoes_do_mes[(ano, mes)].items()):
+            if data_str not in datas:
+                continue
+            try:
+                documento = json.loads(ler_conteudo_dia(root_dir, codigo, data_str) or b"{}")
+            except ValueError as e:
+                print(f"Dia {data_str} da estação {codigo} ignorado: {e}")
+                continue
+            serie = SerieLeituras.de_json(documento.get("dados", []))
+            for hora, trio in agregar_horas(serie.ordenadas()).items():
+                valores_por_hora.setdefault(hora, {})[codigo] = trio
+        gravados += gravar_quadros(root_dir, valores_por_hora, substituir=True)
+        dia += timedelta(days=1)
+    return gravados
+
+
+def podar(root_dir, dias_retencao, agora_utc=None):
+    """
+    Remove os quadros dos dias anteriores à janela de retenção.
+
+    @return: Número de dias removidos.
+    """
+    agora_local = (agora_utc or datetime.utcnow()) - timedelta(hours=3)
+    limite = (agora_local.date() - timedelta(days=dias_retencao)).isoformat()
+    diretorio = diretorio_quadros(root_dir)
+    removidos = 0
+    with _travado(diretorio):
+        for raiz, subdiretorios, _ in os.walk(diretorio):
+            partes = os.path.relpath(raiz, diretorio).split(os.sep)
+            if len(partes) != 2:
+                continue
+            for nome in list(subdiretorios):
+                if f"{partes[0]}-{partes[1]}-{nome}" < limite:
+                    shutil.rmtree(os.path.join(raiz, nome), ignore_errors=True)
+                    subdiretorios.remove(nome)
+                    removidos += 1
+        catalogo = ler_catalogo(root_dir)
+        if removidos and catalogo and catalogo.get("primeira_hora", "") < f"{limite} 00:00:00":
+            catalogo["primeira_hora"] = f"{limite} 00:00:00"
+            _gravar_json(os.path.join(diretorio, ARQUIVO_CATALOGO), catalogo)
+    return removidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quadros horários das estações (layout por tempo).")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--reconstruir", nargs=2, metavar=("INICIO", "FIM"), help="Regrava os quadros dos dias.")
+    parser.add_argument("--podar-dias", type=int, help="Remove os quadros com mais de N dias.")
+    parser.add_argument("--hora", help="Exibe o quadro da hora (\"YYYY-MM-DD HH\").")
+    args = parser.parse_args()
+    if args.reconstruir:
+        print(f"{reconstruir(args.root_dir, *args.reconstruir)} quadros gravados.")
+    if args.podar_dias is not None:
+        print(f"{podar(args.root_dir, args.podar_dias)} dias removidos.")
+    if args.hora:
+        indice = ler_indice(args.root_dir)
+        quadro = ler_quadro(args.root_dir, texto_para_segundos(f"{args.hora}:00:00") // 3600, len(indice))
+        if quadro is None:
+            print("Quadro inexistente.")
+            return
+        for posicao, codigo in enumerate(indice):
+            if not np.isnan(quadro[:, posicao]).all():
+                print(codigo, *(f"{valor:.2f}" for valor in quadro[:, posicao]))
+    print(ler_catalogo(args.root_dir))
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.hourly_frames --reconstruir 2025-01-01 2025-01-31
@@ -0,0 +1,543 @@
+"""
+@file server/apis/ana/services/ingest_journal.py
+@description Diário de ingestão (write-ahead log) somente de acréscimo, que separa a busca da materialização
+dos arquivos diários.
+
+No modo diário dos schedulers (--diario), o estágio de gravação do pipeline não mescla nem regrava arquivos
+diários: cada resposta normalizada ({"fonte", "estacao", "buscado_em", "registros"}) é acrescentada a um
+segmento sequencial do diário da fonte (public/data/diario/<fonte>/segmento_NNNNNNNN.log), uma escrita
+sequencial por lote. O materializador aplica depois as entradas aos arquivos diários, ao manifesto e aos
+observadores do ciclo (feed, alertas, derivadas, anel, quadros, baselines, frescor), em lotes, e avança um
+checkpoint.
+
+Formato de um segmento: sequência de quadros, um por lote do pipeline, cada um com
+  - cabeçalho (12 bytes, little-endian): assinatura "DIA1", tamanho do corpo e CRC32 do corpo;
+  - corpo: lista JSON das entradas do lote, comprimida com zlib.
+O segmento é trocado por um novo ao atingir tamanho_segmento bytes. Um quadro incompleto ou com CRC
+inválido no final do último segmento é de um escritor interrompido: leitores param nele e o próximo
+escritor o trunca antes de acrescentar.
+
+Idempotência: o checkpoint ({"segmento", "posicao"}) só avança depois que um quadro foi gravado e os
+observadores notificados. Após uma queda, o quadro é reaplicado; como a mescla só acrescenta leituras
+inéditas (ver leituras.py), a reaplicação não duplica leituras nem gera leituras "novas" para os observadores.
+Leituras gravadas nos arquivos antes da queda, mas não entregues aos observadores, só chegam às
+estruturas derivadas reconstruindo-as a partir do diário (reconstruir). Uma falha ao preparar ou gravar
+uma entrada também interrompe a materialização antes do checkpoint; só as entradas que nunca poderão ser
+aplicadas (EntradaInvalida: fonte desconhecida, sem estação ou registros) são descartadas.
+
+Cada fonte tem o seu diário, checkpoint e materializador: as entradas de uma fonte só chegam aos
+observadores montados para ela (ex.: o motor de alertas do HidroWeb nunca recebe leituras do Cemaden).
+Os workers de uma mesma fonte em modo shard compartilham o diário dela e se excluem por uma trava de
+arquivo a cada acréscimo. Um único materializador roda por vez em cada diário: os demais esperam a trava
+por até espera_s segundos (e então encontram o diário já aplicado, inclusive as suas entradas) e, se o
+tempo acabar, desistem com um aviso e materializar() retorna None.
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import logging
+import argparse
+import importlib
+import functools
+import concurrent.futures
+from contextlib import contextmanager
+
+from server.apis.ana.utils.data_storage import DataStorage, gravar_arquivo_atomico
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+DIRETORIO_DIARIO = "diario"
+ARQUIVO_CHECKPOINT = "checkpoint.json"
+TAMANHO_SEGMENTO = 64 * 1024 * 1024
+# Tempo máximo de espera pela trava do materializador de um diário
+ESPERA_MATERIALIZADOR_S = 300
+
+ASSINATURA = b"DIA1"
+_CABECALHO = struct.Struct("<4sII")  # assinatura, tamanho do corpo comprimido, crc32 do corpo
+_PREFIXO = "segmento_"
+_SUFIXO = ".log"
+
+# Preparação de uma entrada por fonte: (módulo, função(entrada, data_root) -> resultado | None).
+# Importadas sob demanda porque os schedulers importam este módulo.
+PREPARADORES = {
+    "hidroweb": ("server.apis.ana.services.station_data_scheduler", "preparar_entrada"),
+    "cemaden": ("server.apis.ana.services.cemaden_data_scheduler", "preparar_entrada"),
+}
+
+
+class EntradaInvalida(ValueError):
+    """Entrada do diário que nunca poderá ser aplicada (fonte desconhecida ou sem estação/registros)."""
+
+
+def caminho_diario(root_dir=DATA_ROOT, fonte="hidroweb"):
+    """Diretório do diário de uma fonte (public/data/diario/<fonte>)."""
+    if fonte not in PREPARADORES:
+        raise ValueError(f"Fonte desconhecida: {fonte}")
+    return os.path.join(root_dir, DIRETORIO_DIARIO, fonte)
+
+
+def nome_segmento(numero):
+    return f"{_PREFIXO}{numero:08d}{_SUFIXO}"
+
+
+def segmentos(diretorio):
+    """Números dos segmentos existentes no diário, em ordem."""
+    if not os.path.isdir(diretorio):
+        return []
+    numeros = []
+    for nome in os.listdir(diretorio):
+        if nome.startswith(_PREFIXO) and nome.endswith(_SUFIXO):
+            try:
+                numeros.append(int(nome[len(_PREFIXO):-len(_SUFIXO)]))
+            except ValueError:
+                continue
+    return sorted(numeros)
+
+
+def codificar_quadro(entradas):
+    corpo = zlib.compress(json.dumps(entradas, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+    return _CABECALHO.pack(ASSINATURA, len(corpo), zlib.crc32(corpo)) + corpo
+
+
+def _ler_quadro(f):
+    """
+    Lê o quadro na posição atual do arquivo.
+    @return: Lista de entradas, ou None se o quadro estiver incompleto ou inválido (cauda interrompida).
+    """
+    cabecalho = f.read(_CABECALHO.size)
+    if len(cabecalho) < _CABECALHO.size:
+        return None
+    assinatura, tamanho, crc = _CABECALHO.unpack(cabecalho)
+    if assinatura != ASSINATURA:
+        return None
+    corpo = f.read(tamanho)
+    if len(corpo) < tamanho or zlib.crc32(corpo) != crc:
+        return None
+    try:
+        return json.loads(zlib.decompress(corpo).decode("utf-8"))
+    except (zlib.error, ValueError):
+        return None
+
+
+def _fim_valido(caminho, posicao=0):
+    """Posição logo após o último quadro válido do segmento, a partir de 'posicao' (início de um quadro)."""
+    with open(caminho, "rb") as f:
+        f.seek(posicao)
+        while _ler_quadro(f) is not None:
+            posicao = f.tell()
+    return posicao
+
+
+def ler_quadros(diretorio, desde=None):
+    """
+    Percorre os quadros do diário a partir de uma posição.
+
+    @param desde: (segmento, posicao) do checkpoint; None lê o diário desde o início.
+    @return: Gerador de (segmento, posicao_inicial, posicao_final, entradas). Para no primeiro quadro inválido
+             do último segmento (ainda em escrita); num segmento anterior, registra a corrupção e segue para o próximo.
+    """
+    numeros = segmentos(diretorio)
+    segmento_inicial, posicao_inicial = desde or (0, 0)
+    for indice, numero in enumerate(numeros):
+        if numero < segmento_inicial:
+            continue
+        posicao = posicao_inicial if numero == segmento_inicial else 0
+        with open(os.path.join(diretorio, nome_segmento(numero)), "rb") as f:
+            tamanho = os.fstat(f.fileno()).st_size
+            f.seek(posicao)
+            while posicao < tamanho:
+                entradas = _ler_quadro(f)
+                if entradas is None:
+                    if indice == len(numeros) - 1:
+                        return
+                    logger.error(f"Segmento {nome_segmento(numero)} corrompido na posição {posicao}; "
+                                 f"{tamanho - posicao} bytes ignorados.")
+                    break
+                fim = f.tell()
+                yield numero, posicao, fim, entradas
+                posicao = fim
+
+
+def _tentar_travar(f, bloquear):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if bloquear else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if bloquear else msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def _travado(caminho, bloquear=True, espera_s=None):
+    """
+    Trava exclusiva entre processos sobre um arquivo auxiliar.
+    Com espera_s, tenta obter a trava até esse tempo; produz False se não conseguir (ou se bloquear=False e
+    já estiver travado).
+    """
+    with open(caminho, "a+b") as f:
+        if espera_s is None:
+            obtida = _tentar_travar(f, bloquear)
+        else:
+            limite = time.monotonic() + espera_s
+            obtida = _tentar_travar(f, False)
+            while not obtida and time.monotonic() < limite:
+                time.sleep(0.2)
+                obtida = _tentar_travar(f, False)
+        if not obtida:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class DiarioIngestao:
+    """Escritor do diário: acrescenta um quadro por lote ao segmento atual."""
+
+    def __init__(self, diretorio, tamanho_segmento=TAMANHO_SEGMENTO, sincronizar=True):
+        """
+        @param diretorio: Diretório dos segmentos (ex.: public/data/diario).
+        @param tamanho_segmento: Tamanho a partir do qual um novo segmento é iniciado.
+        @param sincronizar: Se True, cada quadro é levado ao disco (fsync) antes de anexar() retornar.
+        """
+        self.diretorio = diretorio
+        self.tamanho_segmento = tamanho_segmento
+        self.sincronizar = sincronizar
+        os.makedirs(diretorio, exist_ok=True)
+        self._trava = os.path.join(diretorio, "escrita.lock")
+        # Fim conhecido do último segmento: só o trecho escrito por outros processos depois dele é revalidado
+        self._conhecido = (None, 0)
+
+    def anexar(self, entradas):
+        """
+        Acrescenta as entradas ao diário como um único quadro. Pode ser usado diretamente como a função
+        de gravação do pipeline (recebe a lista de resultados do lote).
+
+        @param entradas: Lista de dicionários serializáveis em JSON.
+        @return: (segmento, posicao_final) do quadro gravado.
+        """
+        entradas = list(entradas)
+        if not entradas:
+            return None
+        quadro = codificar_quadro(entradas)
+        with _travado(self._trava):
+            numero, fim = self._preparar_cauda()
+            if fim > 0 and fim + len(quadro) > self.tamanho_segmento:
+                numero, fim = numero + 1, 0
+            caminho = os.path.join(self.diretorio, nome_segmento(numero))
+            with open(caminho, "ab") as f:
+                f.write(quadro)
+                f.flush()
+                if self.sincronizar:
+                    os.fsync(f.fileno())
+            fim += len(quadro)
+            self._conhecido = (numero, fim)
+        return numero, fim
+
+    def _preparar_cauda(self):
+        """Retorna (segmento, fim) do último segmento, truncando um quadro interrompido no final (sob a trava)."""
+        numeros = segmentos(self.diretorio)
+        if not numeros:
+            return 1, 0
+        numero = numeros[-1]
+        caminho = os.path.join(self.diretorio, nome_segmento(numero))
+        tamanho = os.path.getsize(caminho)
+        segmento_conhecido, fim_conhecido = self._conhecido
+        if segmento_conhecido == numero and fim_conhecido == tamanho:
+            return numero, tamanho
+        inicio = fim_conhecido if segmento_conhecido == numero and fim_conhecido < tamanho else 0
+        fim = _fim_valido(caminho, inicio)
+        if fim < tamanho:
+            logger.warning(f"Quadro interrompido no final de {nome_segmento(numero)}: {tamanho - fim} bytes truncados.")
+            with open(caminho, "r+b") as f:
+                f.truncate(fim)
+        return numero, fim
+
+
+def ler_checkpoint(caminho):
+    """Posição (segmento, posicao) até a qual o diário já foi materializado, ou None."""
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        return int(dados["segmento"]), int(dados["posicao"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def gravar_checkpoint(caminho, segmento, posicao):
+    gravar_arquivo_atomico(caminho, json.dumps({
+        "segmento": segmento,
+        "posicao": posicao,
+        "atualizado_em": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }))
+
+
+def preparar_entrada(entrada, data_root=DATA_ROOT):
+    """
+    Prepara (mescla, ordena e serializa) os arquivos diários de uma entrada do diário, sem gravar.
+    Função de módulo para poder ser executada no pool de processos.
+
+    @return: {"fonte", "estacao", "arquivos"} ou None se a entrada não tiver registros.
+    @raise EntradaInvalida: Se a fonte for desconhecida ou faltar a estação ou os registros.
+    """
+    fonte = entrada.get("fonte")
+    if fonte not in PREPARADORES:
+        raise EntradaInvalida(f"Fonte desconhecida no diário: {fonte}")
+    if not entrada.get("estacao") or not isinstance(entrada.get("registros"), list):
+        raise EntradaInvalida(f"Entrada de {fonte} sem estação ou registros")
+    modulo, funcao = PREPARADORES[fonte]
+    return getattr(importlib.import_module(modulo), funcao)(entrada, data_root)
+
+
+def _sublotes(entradas):
+    """Divide as entradas de um quadro em sublotes sem estação repetida, preservando a ordem de cada estação."""
+    sublotes = []
+    for entrada in entradas:
+        chave = (entrada.get("fonte"), entrada.get("estacao"))
+        for sublote in sublotes:
+            if chave not in sublote:
+                break
+        else:
+            sublote = {}
+            sublotes.append(sublote)
+        sublote[chave] = entrada
+    return [list(sublote.values()) for sublote in sublotes]
+
+
+class MaterializadorDiario:
+    """
+    Aplica as entradas do diário aos arquivos diários e aos observadores, a partir do checkpoint.
+    Cada quadro é dividido em sublotes sem estação repetida: as entradas de um sublote são preparadas em
+    paralelo (pool de processos), gravadas em um único gravar_lote e entregues aos observadores.
+    """
+
+    def __init__(self, diretorio, root_dir=DATA_ROOT, observadores=None, checkpoint=None, usar_processos=True,
+                 max_workers=None):
+        """
+        @param diretorio: Diretório dos segmentos do diário.
+        @param root_dir: Diretório raiz dos arquivos diários a materializar.
+        @param observadores: Callables chamados com cada lote gravado (como no PipelineIngestao).
+        @param checkpoint: Caminho do checkpoint (padrão: checkpoint.json no diretório do diário).
+        @param usar_processos: Se False, a preparação usa threads.
+        @param max_workers: Número de processos de preparação (padrão: número de CPUs).
+        """
+        self.diretorio = diretorio
+        self.root_dir = root_dir
+        self.observadores = list(observadores or [])
+        self.checkpoint = checkpoint or os.path.join(diretorio, ARQUIVO_CHECKPOINT)
+        self.usar_processos = usar_processos
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.storage = DataStorage(root_dir=root_dir)
+
+    def materializar(self, limite_quadros=None, espera_s=ESPERA_MATERIALIZADOR_S):
+        """
+        Aplica os quadros ainda não materializados. Se outro materializador estiver aplicando o mesmo diário,
+        espera até espera_s segundos que ele termine.
+
+        @param limite_quadros: Número máximo de quadros aplicados nesta chamada (None = todos).
+        @param espera_s: Tempo máximo de espera pela trava (0 = não espera).
+        @return: Resumo com quadros, entradas, estações sem dados, arquivos gravados, erros e duração,
+                 ou None se a trava não foi obtida a tempo (nada foi aplicado nem entregue aos observadores).
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        with _travado(os.path.join(self.diretorio, "materializador.lock"), espera_s=espera_s) as travado:
+            if not travado:
+                logger.warning(f"Materialização de {self.diretorio} ignorada: outro materializador ocupou a trava "
+                               f"por mais de {espera_s}s.")
+                return None
+            return self._materializar(limite_quadros)
+
+    def _materializar(self, limite_quadros):
+        inicio = time.perf_counter()
+        resumo = {"quadros": 0, "entradas": 0, "sem_dados": 0, "arquivos": 0, "erros": 0}
+        preparar = functools.partial(preparar_entrada, data_root=self.root_dir)
+        executor = concurrent.futures.ProcessPoolExecutor if self.usar_processos \
+            else concurrent.futures.ThreadPoolExecutor
+        with executor(max_workers=self.max_workers) as pool:
+            for segmento, _, fim, entradas in ler_quadros(self.diretorio, ler_checkpoint(self.checkpoint)):
+                if limite_quadros is not None and resumo["quadros"] >= limite_quadros:
+                    break
+                try:
+                    for sublote in _sublotes(entradas):
+                        self._aplicar(pool, preparar, sublote, resumo)
+                except OSError as e:
+                    # O checkpoint não avança: o quadro é reaplicado na próxima materialização
+                    logger.error(f"Materialização interrompida em {nome_segmento(segmento)}: {e}")
+                    resumo["erros"] += 1
+                    break
+                gravar_checkpoint(self.checkpoint, segmento, fim)
+                resumo["quadros"] += 1
+                resumo["entradas"] += len(entradas)
+        resumo["duracao_s"] = round(time.perf_counter() - inicio, 3)
+        if resumo["quadros"]:
+            logger.info(f"Diário materializado: {resumo}")
+        return resumo
+
+    def _aplicar(self, pool, preparar, sublote, resumo):
+        resultados = []
+        for entrada, futuro in [(entrada, pool.submit(preparar, entrada)) for entrada in sublote]:
+            try:
+                resultado = futuro.result()
+            except EntradaInvalida as e:
+                # Nunca poderá ser aplicada: é descartada e o quadro segue
+                logger.error(f"Entrada do diário ignorada: {e}")
+                resumo["erros"] += 1
+                continue
+            except Exception as e:
+                # Falhas de leitura dos arquivos existentes podem ser transitórias: o quadro não é concluído
+                raise OSError(f"Erro ao preparar a entrada {entrada.get('fonte')}/{entrada.get('estacao')}: "
+                              f"{e}") from e
+            if resultado is None:
+                resumo["sem_dados"] += 1
+                continue
+            resultado["buscado_em"] = entrada.get("buscado_em")
+            resultados.append(resultado)
+        if not resultados:
+            return
+        arquivos = [arquivo for resultado in resultados for arquivo in resultado["arquivos"]]
+        gravados = self.storage.gravar_lote(arquivos)
+        resumo["arquivos"] += gravados
+        if gravados < len(arquivos):
+            raise OSError(f"{len(arquivos) - gravados} de {len(arquivos)} arquivos não foram gravados")
+        gravado_em = time.time()
+        for resultado in resultados:
+            resultado["gravado_em"] = gravado_em
+        for observador in self.observadores:
+            try:
+                observador(resultados)
+            except Exception as e:
+                logger.error(f"Erro em observador do materializador: {e}")
+
+    def pendente(self):
+        """Número de bytes do diário ainda não materializados."""
+        segmento_checkpoint, posicao = ler_checkpoint(self.checkpoint) or (0, 0)
+        total = 0
+        for numero in segmentos(self.diretorio):
+            if numero < segmento_checkpoint:
+                continue
+            tamanho = os.path.getsize(os.path.join(self.diretorio, nome_segmento(numero)))
+            total += max(tamanho - posicao, 0) if numero == segmento_checkpoint else tamanho
+        return total
+
+
+def reconstruir(diretorio, destino, observadores=None, usar_processos=True, max_workers=None):
+    """
+    Reaplica o diário inteiro em outro diretório raiz (vazio ou parcial), com um checkpoint próprio
+    (diario_checkpoint_<fonte>.json no destino). Os observadores recebem as leituras como na ingestão original,
+    o que permite reconstruir qualquer estrutura derivada.
+
+    @return: Resumo da materialização.
+    """
+    diretorio = os.path.abspath(diretorio)
+    if os.path.abspath(destino) in (os.path.dirname(diretorio), os.path.dirname(os.path.dirname(diretorio))):
+        raise ValueError("O destino da reconstrução deve ser diferente do diretório de dados do diário.")
+    os.makedirs(destino, exist_ok=True)
+    checkpoint = os.path.join(destino, f"diario_checkpoint_{os.path.basename(diretorio)}.json")
+    materializador = MaterializadorDiario(diretorio, root_dir=destino, observadores=observadores,
+                                          checkpoint=checkpoint,
+                                          usar_processos=usar_processos, max_workers=max_workers)
+    return materializador.materializar()
+
+
+def podar(diretorio, dias, checkpoint=None):
+    """
+    Remove os segmentos inteiramente materializados (anteriores ao segmento do checkpoint) e sem
+    modificação há mais de 'dias' dias. Segmentos removidos deixam de estar disponíveis para reconstruir.
+
+    @return: Lista dos segmentos removidos.
+    """
+    if dias < 0:
+        raise ValueError("O número de dias deve ser maior ou igual a zero.")
+    posicao = ler_checkpoint(checkpoint or os.path.join(diretorio, ARQUIVO_CHECKPOINT))
+    if posicao is None:
+        return []
+    limite = time.time() - dias * 86400
+    removidos = []
+    for numero in segmentos(diretorio):
+        if numero >= posicao[0]:
+            break
+        caminho = os.path.join(diretorio, nome_segmento(numero))
+        if os.path.getmtime(caminho) < limite:
+            os.remove(caminho)
+            removidos.append(numero)
+    return removidos
+
+
+def status(diretorio, checkpoint=None):
+    """Resumo do diário: segmentos, tamanho total, checkpoint e bytes pendentes de materialização."""
+    numeros = segmentos(diretorio)
+    materializador = MaterializadorDiario(diretorio, checkpoint=checkpoint)
+    return {
+        "segmentos": len(numeros),
+        "primeiro": numeros[0] if numeros else None,
+        "ultimo": numeros[-1] if numeros else None,
+        "bytes": sum(os.path.getsize(os.path.join(diretorio, nome_segmento(n))) for n in numeros),
+        "checkpoint": ler_checkpoint(materializador.checkpoint),
+        "pendente_bytes": materializador.pendente(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diário de ingestão: estado, materialização, reconstrução e poda.")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--fonte", choices=sorted(PREPARADORES), action="append",
+                        help="Diário a usar (pode ser repetido; padrão: todas as fontes).")
+    parser.add_argument("--status", action="store_true", help="Mostra o estado do diário.")
+    parser.add_argument("--materializar", action="store_true",
+                        help="Aplica as entradas pendentes aos arquivos diários e aos observadores do ciclo da fonte.")
+    parser.add_argument("--reconstruir", metavar="DESTINO",
+                        help="Reaplica o diário inteiro no diretório DESTINO.")
+    parser.add_argument("--com-derivados", action="store_true",
+                        help="Na reconstrução, refaz também as derivadas, o anel recente e os quadros horários.")
+    parser.add_argument("--podar-dias", type=int, help="Remove segmentos materializados mais antigos que N dias.")
+    args = parser.parse_args()
+
+    for fonte in args.fonte or sorted(PREPARADORES):
+        diretorio = caminho_diario(args.root_dir, fonte)
+        if args.materializar:
+            # O checkpoint só avança com as leituras entregues aos mesmos observadores do ciclo da fonte
+            from server.apis.ana.services.ingest_observers import montar_observadores
+            ciclo = montar_observadores(args.root_dir, fonte)
+            print(MaterializadorDiario(diretorio, root_dir=args.root_dir, observadores=ciclo.lista).materializar())
+            ciclo.concluir()
+        if args.reconstruir:
+            observadores = []
+            if args.com_derivados:
+                from server.apis.ana.services.derived_variables import MotorDerivadas
+                from server.apis.ana.services.recent_ring import AnelRecente, caminho_anel
+                from server.apis.ana.services.hourly_frames import QuadrosHorarios
+                observadores = [MotorDerivadas(args.reconstruir), QuadrosHorarios(args.reconstruir),
+                                AnelRecente(caminho_anel(args.reconstruir), escrita=True, root_dir=args.reconstruir)]
+            print(reconstruir(diretorio, args.reconstruir, observadores=observadores))
+        if args.podar_dias is not None:
+            removidos = podar(diretorio, args.podar_dias)
+            print(f"{fonte}: {len(removidos)} segmentos removidos.")
+        if args.status or not (args.materializar or args.reconstruir or args.podar_dias is not None):
+            print(json.dumps({fonte: status(diretorio)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.ingest_journal --status
+# python -m server.apis.ana.services.ingest_journal --materializar --fonte cemaden
+# python -m server.apis.ana.services.ingest_journal --reconstruir /tmp/dados --com-derivados
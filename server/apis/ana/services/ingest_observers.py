@@ -0,0 +1,115 @@
+"""
+@file server/apis/ana/services/ingest_observers.py
+@description Montagem dos observadores de um ciclo de ingestão, comum aos schedulers (HidroWeb e Cemaden).
+
+Cada lote gravado pelo pipeline (ou aplicado pelo materializador do diário) é entregue aos observadores:
+
+  publicar_feed        ColetorCiclo do feed de alterações, com as tarefas pós-publicação (estatísticas e
+                       superfície de chuva, agrupamentos de marcadores)
+  avaliar_alertas      MotorAlertas (alertas.sqlite3)
+  calcular_derivadas   MotorDerivadas (public/data/derivadas)
+  manter_anel          AnelRecente das últimas 48h (anel_recente.bin)
+  manter_quadros       QuadrosHorarios (public/data/quadros)
+  atualizar_baselines  BaselinesEstacoes (baselines.sqlite3 / baselines_estacoes.json)
+  medir_frescor        RastreadorFrescor (frescor.sqlite3 / frescor_dados.json), com a meta meta_frescor_s
+
+Ao final do ciclo, ObservadoresCiclo.concluir executa as etapas que dependem do ciclo inteiro (silêncio das
+estações, publicação dos percentis, do feed e do frescor), na mesma ordem para as duas fontes.
+"""
+
+import os
+
+from server.apis.ana.services.change_feed import FeedAlteracoes, ColetorCiclo
+from server.apis.ana.services.rainfall_stats import tarefa_estatisticas_chuva
+from server.apis.ana.services.rainfall_grid import tarefa_superficie_chuva
+from server.apis.ana.services.marker_clusters import tarefa_clusters_marcadores
+from server.apis.ana.services.alert_engine import MotorAlertas
+from server.apis.ana.services.derived_variables import MotorDerivadas
+from server.apis.ana.services.station_baselines import BaselinesEstacoes
+from server.apis.ana.services.data_freshness import RastreadorFrescor, META_ATRASO_S
+from server.apis.ana.services.recent_ring import AnelRecente, caminho_anel
+from server.apis.ana.services.hourly_frames import QuadrosHorarios
+
+# Opções aceitas por montar_observadores e seus valores padrão (todos os observadores ativos)
+OPCOES_PADRAO = {
+    "publicar_feed": True,
+    "avaliar_alertas": True,
+    "calcular_derivadas": True,
+    "manter_anel": True,
+    "manter_quadros": True,
+    "atualizar_baselines": True,
+    "medir_frescor": True,
+    "meta_frescor_s": META_ATRASO_S,
+}
+
+
+class ObservadoresCiclo:
+    """Observadores de um ciclo e as referências usadas nas etapas de conclusão."""
+
+    def __init__(self, fonte, lista, coletor=None, motor_alertas=None, baselines=None, frescor=None):
+        self.fonte = fonte
+        self.lista = lista
+        self.coletor = coletor
+        self.motor_alertas = motor_alertas
+        self.baselines = baselines
+        self.frescor = frescor
+
+    def concluir(self, shard=None):
+        """
+        Etapas de fim de ciclo: silêncio das estações, percentis, feed de alterações e frescor.
+
+        @param shard: CoordenadorShards em modo shard; a verificação de silêncio, a publicação dos percentis e
+                      as tarefas pós-publicação do feed rodam só no último worker a concluir o ciclo da fonte.
+        """
+        eleito = shard is None or shard.concluir_ciclo(self.fonte)
+        if self.motor_alertas is not None and eleito:
+            self.motor_alertas.verificar_silencio()
+        if self.baselines is not None and eleito:
+            self.baselines.publicar()
+        publicado_em = None
+        if self.coletor is not None and self.coletor.publicar(self.fonte, executar_tarefas=eleito) is not None:
+            publicado_em = self.coletor.ultima_publicacao
+        if self.frescor is not None:
+            # Sem publicação neste ciclo (feed desligado ou falha), a etapa de publicação é medida até agora
+            self.frescor.publicar(publicado_em)
+
+
+def montar_observadores(root_dir, fonte, opcoes=None, observadores=None):
+    """
+    Cria os observadores de um ciclo de ingestão.
+
+    @param root_dir: Diretório raiz dos dados.
+    @param fonte: "hidroweb" ou "cemaden" (alertas, frescor e publicação do feed).
+    @param opcoes: Dicionário com as chaves de OPCOES_PADRAO (as ausentes usam o padrão).
+    @param observadores: Observadores adicionais, notificados antes dos criados aqui.
+    @return: ObservadoresCiclo.
+    @raise ValueError: Para opções desconhecidas.
+    """
+    desconhecidas = set(opcoes or {}) - set(OPCOES_PADRAO)
+    if desconhecidas:
+        raise ValueError(f"Opções de observadores desconhecidas: {', '.join(sorted(desconhecidas))}.")
+    opcoes = dict(OPCOES_PADRAO, **(opcoes or {}))
+
+    ciclo = ObservadoresCiclo(fonte, list(observadores or []))
+    if opcoes["publicar_feed"]:
+        feed = FeedAlteracoes(os.path.join(root_dir, "feed_alteracoes.sqlite3"), root_dir=root_dir)
+        ciclo.coletor = ColetorCiclo(feed, apos_publicar=[tarefa_estatisticas_chuva, tarefa_superficie_chuva,
+                                                          tarefa_clusters_marcadores])
+        ciclo.lista.append(ciclo.coletor)
+    if opcoes["avaliar_alertas"]:
+        ciclo.motor_alertas = MotorAlertas(os.path.join(root_dir, "alertas.sqlite3"), fonte=fonte)
+        ciclo.lista.append(ciclo.motor_alertas)
+    if opcoes["calcular_derivadas"]:
+        ciclo.lista.append(MotorDerivadas(root_dir))
+    if opcoes["manter_anel"]:
+        ciclo.lista.append(AnelRecente(caminho_anel(root_dir), escrita=True, root_dir=root_dir))
+    if opcoes["manter_quadros"]:
+        ciclo.lista.append(QuadrosHorarios(root_dir))
+    if opcoes["atualizar_baselines"]:
+        ciclo.baselines = BaselinesEstacoes(os.path.join(root_dir, "baselines.sqlite3"), root_dir=root_dir)
+        ciclo.lista.append(ciclo.baselines)
+    if opcoes["medir_frescor"]:
+        ciclo.frescor = RastreadorFrescor(os.path.join(root_dir, "frescor.sqlite3"), root_dir=root_dir, fonte=fonte,
+                                          meta_atraso_s=opcoes["meta_frescor_s"])
+        ciclo.lista.append(ciclo.frescor)
+    return ciclo
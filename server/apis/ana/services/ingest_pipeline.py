@@ -0,0 +1,272 @@
+"""
+@file server/apis/ana/services/ingest_pipeline.py
+@description Pipeline de ingestão em estágios (busca → processamento → gravação) com filas limitadas.
+
+Cada ciclo dos schedulers é dividido em três estágios independentes:
+  1. Busca (I/O): um pool de threads realiza as requisições HTTP e entrega o corpo bruto da resposta.
+  2. Processamento (CPU): decodificação do JSON, ordenação, mesclagem com os arquivos existentes e
+     serialização, executados em um pool de processos para usar todos os núcleos (fora do GIL).
+  3. Gravação: uma única thread agrupa os resultados em lotes e grava os arquivos.
+
+Os estágios se comunicam por filas limitadas: quando um estágio posterior fica para trás, o anterior
+bloqueia (backpressure) em vez de acumular respostas em memória. Cada estágio mantém contadores de
+itens, erros, tempo ocupado e tempo bloqueado, reportados ao final do ciclo.
+
+Para medir o frescor dos dados, os resultados em dicionário recebem os instantes (epoch UTC, em
+segundos) em que o payload foi buscado ("buscado_em") e em que o lote foi gravado ("gravado_em"),
+antes de serem entregues aos observadores.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+import concurrent.futures
+
+logger = logging.getLogger(__name__)
+
+# Marcador de fim de fluxo entre os estágios
+_FIM = object()
+
+
+class MetricasEstagio:
+    """Contadores de vazão de um estágio do pipeline (seguros para uso concorrente)."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.entrada = 0
+        self.saida = 0
+        self.erros = 0
+        self.ocupado_s = 0.0
+        self.bloqueado_s = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, entrada=0, saida=0, erros=0, ocupado_s=0.0, bloqueado_s=0.0):
+        with self._lock:
+            self.entrada += entrada
+            self.saida += saida
+            self.erros += erros
+            self.ocupado_s += ocupado_s
+            self.bloqueado_s += bloqueado_s
+
+    def como_dict(self, duracao_s):
+        """
+        @param duracao_s: Duração total do ciclo, usada para calcular a vazão do estágio.
+        """
+        with self._lock:
+            return {
+                "entrada": self.entrada,
+                "saida": self.saida,
+                "erros": self.erros,
+                "ocupado_s": round(self.ocupado_s, 3),
+                "bloqueado_s": round(self.bloqueado_s, 3),
+                "vazao_por_s": round(self.saida / duracao_s, 2) if duracao_s > 0 else None,
+            }
+
+
+class PipelineIngestao:
+    """
+    Executa um ciclo de ingestão em estágios com filas limitadas.
+
+    As funções de cada estágio são fornecidas pelo scheduler:
+      - buscar(item) -> payload | None: executada em threads; None indica "sem dados" (não é erro).
+      - processar(item, payload) -> resultado | None: executada no pool de processos, portanto deve ser
+        uma função de nível de módulo (ou functools.partial de uma) e receber/retornar objetos serializáveis.
+        None também indica "sem dados".
+      - gravar(lote) -> None: executada por uma única thread com a lista de resultados do lote.
+    Observadores (callables) recebem cada lote após a gravação, para atualizar estruturas derivadas.
+    """
+
+    def __init__(self, buscar, processar, gravar, nome="ingestao", max_fetch_workers=12, max_cpu_workers=None,
+                 tamanho_fila=64, tamanho_lote=32, intervalo_lote_s=0.5, usar_processos=True, observadores=None):
+        """
+        @param buscar: Função do estágio de busca.
+        @param processar: Função do estágio de processamento.
+        @param gravar: Função do estágio de gravação.
+        @param nome: Nome do pipeline (usado nos logs).
+        @param max_fetch_workers: Número de threads de busca.
+        @param max_cpu_workers: Número de processos de processamento (padrão: número de CPUs).
+        @param tamanho_fila: Capacidade de cada fila entre estágios.
+        @param tamanho_lote: Número máximo de resultados por lote de gravação.
+        @param intervalo_lote_s: Tempo máximo de espera antes de gravar um lote incompleto.
+        @param usar_processos: Se False, o processamento usa threads (útil em testes e ambientes restritos).
+        @param observadores: Lista de callables chamados com cada lote gravado.
+        """
+        self.buscar = buscar
+        self.processar = processar
+        self.gravar = gravar
+        self.nome = nome
+        self.max_fetch_workers = max_fetch_workers
+        self.max_cpu_workers = max_cpu_workers or os.cpu_count() or 1
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_lote_s = intervalo_lote_s
+        self.usar_processos = usar_processos
+        self.observadores = list(observadores or [])
+
+    def executar(self, itens):
+        """
+        Executa o ciclo completo para os itens informados (ex.: códigos de estação).
+
+        @return: Dicionário com o total de itens, itens gravados com sucesso, itens sem dados,
+                 duração do ciclo e as métricas de cada estágio.
+        """
+        itens = list(itens)
+        metricas = {nome: MetricasEstagio(nome) for nome in ("busca", "processamento", "gravacao")}
+        fila_bruta = queue.Queue(maxsize=self.tamanho_fila)
+        fila_gravacao = queue.Queue(maxsize=self.tamanho_fila)
+        estado = {"sem_dados": 0, "sucesso": 0}
+        lock_estado = threading.Lock()
+        inicio = time.perf_counter()
+
+        despachante = threading.Thread(
+            target=self._estagio_processamento,
+            args=(fila_bruta, fila_gravacao, metricas["processamento"], estado, lock_estado),
+            name=f"{self.nome}-processamento", daemon=True)
+        gravador = threading.Thread(
+            target=self._estagio_gravacao, args=(fila_gravacao, metricas["gravacao"], estado, lock_estado),
+            name=f"{self.nome}-gravacao", daemon=True)
+        despachante.start()
+        gravador.start()
+
+        def buscar_item(item):
+            inicio_item = time.perf_counter()
+            try:
+                payload = self.buscar(item)
+            except Exception as e:
+                logger.error(f"[{self.nome}] Erro na busca de {item}: {e}")
+                metricas["busca"].registrar(entrada=1, erros=1, ocupado_s=time.perf_counter() - inicio_item)
+                return
+            ocupado = time.perf_counter() - inicio_item
+            if payload is None:
+                with lock_estado:
+                    estado["sem_dados"] += 1
+                metricas["busca"].registrar(entrada=1, ocupado_s=ocupado)
+                return
+            buscado_em = time.time()
+            inicio_espera = time.perf_counter()
+            fila_bruta.put((item, payload, buscado_em))  # Bloqueia se o processamento estiver atrasado
+            metricas["busca"].registrar(entrada=1, saida=1, ocupado_s=ocupado,
+                                        bloqueado_s=time.perf_counter() - inicio_espera)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_fetch_workers,
+                                                   thread_name_prefix=f"{self.nome}-busca") as executor:
+            list(executor.map(buscar_item, itens))
+
+        fila_bruta.put(_FIM)
+        despachante.join()
+        gravador.join()
+
+        duracao = time.perf_counter() - inicio
+        resumo = {
+            "total": len(itens),
+            "sucesso": estado["sucesso"],
+            "sem_dados": estado["sem_dados"],
+            "duracao_s": round(duracao, 3),
+            "estagios": {nome: m.como_dict(duracao) for nome, m in metricas.items()},
+        }
+        logger.info(f"[{self.nome}] Ciclo concluído: {resumo}")
+        return resumo
+
+    def _criar_pool(self):
+        if self.usar_processos:
+            return concurrent.futures.ProcessPoolExecutor(max_workers=self.max_cpu_workers)
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.max_cpu_workers)
+
+    def _estagio_processamento(self, fila_bruta, fila_gravacao, metricas, estado, lock_estado):
+        """Despacha os payloads para o pool de CPU mantendo um número limitado de tarefas em andamento."""
+        limite_em_andamento = self.max_cpu_workers * 2
+        em_andamento = {}
+
+        def coletar(futuros):
+            for futuro in futuros:
+                item, enviado_em, buscado_em = em_andamento.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    logger.error(f"[{self.nome}] Erro no processamento de {item}: {e}")
+                    metricas.registrar(erros=1, ocupado_s=time.perf_counter() - enviado_em)
+                    continue
+                metricas.registrar(saida=1, ocupado_s=time.perf_counter() - enviado_em)
+                if resultado is None:
+                    # Resposta válida, porém sem registros
+                    with lock_estado:
+                        estado["sem_dados"] += 1
+                    continue
+                inicio_espera = time.perf_counter()
+                fila_gravacao.put((item, resultado, buscado_em))  # Bloqueia se a gravação estiver atrasada
+                metricas.registrar(bloqueado_s=time.perf_counter() - inicio_espera)
+
+        try:
+            with self._criar_pool() as pool:
+                while True:
+                    elemento = fila_bruta.get()
+                    if elemento is _FIM:
+                        break
+                    item, payload, buscado_em = elemento
+                    metricas.registrar(entrada=1)
+                    if len(em_andamento) >= limite_em_andamento:
+                        concluidos, _ = concurrent.futures.wait(
+                            em_andamento, return_when=concurrent.futures.FIRST_COMPLETED)
+                        coletar(concluidos)
+                    em_andamento[pool.submit(self.processar, item, payload)] = (item, time.perf_counter(),
+                                                                                 buscado_em)
+                while em_andamento:
+                    concluidos, _ = concurrent.futures.wait(
+                        em_andamento, return_when=concurrent.futures.FIRST_COMPLETED)
+                    coletar(concluidos)
+        except Exception as e:
+            logger.error(f"[{self.nome}] Falha no estágio de processamento: {e}")
+            # Esvazia a fila de entrada para não travar as threads de busca
+            while fila_bruta.get() is not _FIM:
+                pass
+        finally:
+            fila_gravacao.put(_FIM)
+
+    def _estagio_gravacao(self, fila_gravacao, metricas, estado, lock_estado):
+        """Agrupa os resultados em lotes e os grava em uma única thread."""
+        lote = []
+        prazo = None
+        while True:
+            timeout = None if prazo is None else max(prazo - time.perf_counter(), 0)
+            try:
+                elemento = fila_gravacao.get(timeout=timeout)
+            except queue.Empty:
+                elemento = None
+            if elemento is not None and elemento is not _FIM:
+                lote.append(elemento)
+                if prazo is None:
+                    prazo = time.perf_counter() + self.intervalo_lote_s
+            lote_cheio = len(lote) >= self.tamanho_lote
+            if lote and (lote_cheio or elemento is None or elemento is _FIM):
+                self._gravar_lote(lote, metricas, estado, lock_estado)
+                lote = []
+                prazo = None
+            if elemento is _FIM:
+                break
+
+    def _gravar_lote(self, lote, metricas, estado, lock_estado):
+        resultados = [resultado for _, resultado, _ in lote]
+        for _, resultado, buscado_em in lote:
+            if isinstance(resultado, dict):
+                resultado["buscado_em"] = buscado_em
+        inicio = time.perf_counter()
+        try:
+            self.gravar(resultados)
+        except Exception as e:
+            logger.error(f"[{self.nome}] Erro na gravação de um lote com {len(lote)} itens: {e}")
+            metricas.registrar(entrada=len(lote), erros=len(lote), ocupado_s=time.perf_counter() - inicio)
+            return
+        metricas.registrar(entrada=len(lote), saida=len(lote), ocupado_s=time.perf_counter() - inicio)
+        gravado_em = time.time()
+        for resultado in resultados:
+            if isinstance(resultado, dict):
+                resultado["gravado_em"] = gravado_em
+        with lock_estado:
+            estado["sucesso"] += len(lote)
+        for observador in self.observadores:
+            try:
+                observador(resultados)
+            except Exception as e:
+                logger.error(f"[{self.nome}] Erro em observador do pipeline: {e}")
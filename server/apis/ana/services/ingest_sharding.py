@@ -0,0 +1,307 @@
+"""
+@file server/apis/ana/services/ingest_sharding.py
+@description Divisão das estações entre vários workers de ingestão (shards), no mesmo host ou em vários.
+
+Cada worker dos schedulers (StationDataFetcher / update_stations_data) registra um lease em uma tabela
+SQLite compartilhada e o renova periodicamente (heartbeat). No início de cada ciclo o worker:
+  1) lê os workers com lease válido (heartbeat mais recente que ttl_s);
+  2) distribui o registro de estações entre eles por hashing consistente (anel com nós virtuais), de modo
+     que a entrada ou saída de um worker só move as estações vizinhas dele no anel;
+  3) reivindica as estações que caíram com ele na tabela de reivindicações do ciclo. A chave
+     (fonte, ciclo, estação) é única, portanto uma estação nunca é buscada duas vezes no mesmo ciclo,
+     mesmo que dois workers tenham visões diferentes dos membros ativos por alguns segundos.
+
+Ao final do ciclo, cada worker registra a conclusão (concluir_ciclo). As tarefas pós-publicação do feed
+(estatísticas e superfície de chuva, clusters), que percorrem o acervo inteiro, são executadas só pelo
+último worker com lease válido a concluir o ciclo da fonte, em vez de uma vez por worker.
+
+O ciclo é a janela de relógio de intervalo_min minutos (os schedulers em modo shard são disparados
+alinhados a essa janela). Quando um worker morre, o lease dele expira e, no ciclo seguinte, as estações
+que eram dele são redistribuídas entre os restantes. As métricas do último ciclo de cada shard ficam
+na própria tabela de leases (ver status()).
+
+Com vários hosts, o arquivo SQLite deve ficar em um volume compartilhado com suporte a travas de
+arquivo; o diretório public/data também precisa ser compartilhado.
+
+Para ver os shards ativos e as métricas de cada um:
+    python -m server.apis.ana.services.ingest_sharding --status
+"""
+
+import os
+import json
+import time
+import socket
+import bisect
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+CAMINHO_SHARDS = os.path.join(DATA_ROOT, "shards_ingestao.sqlite3")
+
+# Número de nós virtuais de cada worker no anel (quanto mais, mais uniforme a divisão)
+NOS_VIRTUAIS = 128
+TTL_LEASE_S = 90
+INTERVALO_CICLO_MIN = 10
+# Ciclos de reivindicações mantidos na tabela (os anteriores são apagados)
+CICLOS_RETIDOS = 6
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    iniciado_em REAL NOT NULL,
+    heartbeat REAL NOT NULL,
+    metricas TEXT
+);
+CREATE TABLE IF NOT EXISTS reivindicacoes (
+    fonte TEXT NOT NULL,
+    ciclo INTEGER NOT NULL,
+    codigo TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    PRIMARY KEY (fonte, ciclo, codigo)
+);
+CREATE TABLE IF NOT EXISTS conclusoes (
+    fonte TEXT NOT NULL,
+    ciclo INTEGER NOT NULL,
+    worker_id TEXT NOT NULL,
+    PRIMARY KEY (fonte, ciclo, worker_id)
+);
+CREATE TABLE IF NOT EXISTS tarefas_ciclo (
+    fonte TEXT NOT NULL,
+    ciclo INTEGER NOT NULL,
+    worker_id TEXT NOT NULL,
+    PRIMARY KEY (fonte, ciclo)
+);
+"""
+
+
+def _hash(texto):
+    return int.from_bytes(hashlib.md5(texto.encode("utf-8")).digest()[:8], "big")
+
+
+def worker_id_padrao():
+    """Identificador do worker: variável SHARD_WORKER_ID ou host-pid."""
+    return os.getenv("SHARD_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class AnelConsistente:
+    """Anel de hashing consistente sobre um conjunto de membros."""
+
+    def __init__(self, membros, nos_virtuais=NOS_VIRTUAIS):
+        """
+        @param membros: Identificadores dos membros (workers).
+        @param nos_virtuais: Pontos de cada membro no anel.
+        """
+        self.membros = sorted(set(membros))
+        if not self.membros:
+            raise ValueError("O anel precisa de ao menos um membro.")
+        pontos = sorted((_hash(f"{membro}#{i}"), membro) for membro in self.membros for i in range(nos_virtuais))
+        self._posicoes = [posicao for posicao, _ in pontos]
+        self._donos = [membro for _, membro in pontos]
+
+    def dono(self, chave):
+        """Membro responsável pela chave: o primeiro ponto do anel no sentido horário."""
+        indice = bisect.bisect(self._posicoes, _hash(str(chave))) % len(self._posicoes)
+        return self._donos[indice]
+
+    def particionar(self, chaves):
+        """@return: Dicionário {membro: [chaves]} (preserva a ordem das chaves)."""
+        particoes = {membro: [] for membro in self.membros}
+        for chave in chaves:
+            particoes[self.dono(chave)].append(chave)
+        return particoes
+
+
+class CoordenadorShards:
+    """Lease, heartbeat e reivindicação das estações de um worker."""
+
+    def __init__(self, caminho=CAMINHO_SHARDS, worker_id=None, ttl_s=TTL_LEASE_S,
+                 intervalo_ciclo_min=INTERVALO_CICLO_MIN):
+        """
+        @param caminho: Arquivo SQLite compartilhado pelos workers.
+        @param worker_id: Identificador deste worker (padrão: worker_id_padrao()).
+        @param ttl_s: Tempo sem heartbeat após o qual o worker é considerado morto.
+        @param intervalo_ciclo_min: Duração da janela de um ciclo, em minutos.
+        """
+        self.caminho = caminho
+        self.worker_id = worker_id or worker_id_padrao()
+        self.ttl_s = ttl_s
+        self.intervalo_ciclo_s = intervalo_ciclo_min * 60
+        self._local = threading.local()
+        self._iniciado_em = time.time()
+        self._ciclos = {}  # fonte -> ciclo da última reivindicação (um ciclo pode terminar na janela seguinte)
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao().executescript(_ESQUEMA)
+
+    def _conexao(self):
+        """Uma conexão por thread (o heartbeat roda em outra thread do scheduler)."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def ciclo(self, agora=None):
+        """Número da janela de ciclo que contém o instante informado (epoch, em segundos)."""
+        return int((agora if agora is not None else time.time()) // self.intervalo_ciclo_s)
+
+    def heartbeat(self, agora=None):
+        """Cria ou renova o lease deste worker."""
+        self._conexao().execute(
+            "INSERT INTO workers (worker_id, host, pid, iniciado_em, heartbeat) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+            (self.worker_id, socket.gethostname(), os.getpid(), self._iniciado_em,
+             agora if agora is not None else time.time()))
+
+    def membros_ativos(self, agora=None):
+        """Workers com lease válido (inclui este worker se o heartbeat estiver em dia)."""
+        limite = (agora if agora is not None else time.time()) - self.ttl_s
+        linhas = self._conexao().execute(
+            "SELECT worker_id FROM workers WHERE heartbeat >= ? ORDER BY worker_id", (limite,)).fetchall()
+        return [linha[0] for linha in linhas]
+
+    def reivindicar(self, fonte, codigos, agora=None):
+        """
+        Renova o lease e reivindica, para o ciclo atual, as estações que o anel atribui a este worker.
+
+        @param fonte: Nome da fonte ("hidroweb", "cemaden"); cada fonte tem suas próprias reivindicações.
+        @param codigos: Registro completo de estações da fonte.
+        @return: Estações que este worker deve buscar neste ciclo (na ordem do registro).
+        """
+        agora = agora if agora is not None else time.time()
+        self.heartbeat(agora)
+        ciclo = self.ciclo(agora)
+        self._ciclos[fonte] = ciclo
+        membros = self.membros_ativos(agora)
+        if self.worker_id not in membros:
+            membros.append(self.worker_id)
+        meus = AnelConsistente(membros).particionar([str(codigo) for codigo in codigos])[self.worker_id]
+
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            conexao.executemany(
+                "INSERT OR IGNORE INTO reivindicacoes (fonte, ciclo, codigo, worker_id) VALUES (?, ?, ?, ?)",
+                [(fonte, ciclo, codigo, self.worker_id) for codigo in meus])
+            conexao.execute("DELETE FROM reivindicacoes WHERE ciclo < ?", (ciclo - CICLOS_RETIDOS,))
+            reivindicados = {linha[0] for linha in conexao.execute(
+                "SELECT codigo FROM reivindicacoes WHERE fonte = ? AND ciclo = ? AND worker_id = ?",
+                (fonte, ciclo, self.worker_id))}
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+        # Códigos numéricos (ids do Cemaden) voltam ao tipo original
+        selecionados = [codigo for codigo in codigos if str(codigo) in reivindicados]
+        logger.info(f"[shard {self.worker_id}] {fonte}: {len(selecionados)}/{len(codigos)} estações "
+                    f"no ciclo {ciclo} ({len(membros)} workers ativos)")
+        return selecionados
+
+    def concluir_ciclo(self, fonte, agora=None):
+        """
+        Registra a conclusão do ciclo atual da fonte por este worker e decide se ele executa as tarefas
+        pós-publicação: só o último a concluir, entre os workers com lease válido que reivindicaram estações
+        no ciclo, e uma única vez por ciclo. Um worker que morre no meio do ciclo deixa de ser esperado
+        quando o lease expira; se isso ocorrer depois que os demais concluíram, as tarefas ficam para o próximo ciclo.
+
+        @return: True se este worker deve executar as tarefas pós-publicação do ciclo.
+        """
+        agora = agora if agora is not None else time.time()
+        ciclo = self._ciclos.get(fonte, self.ciclo(agora))
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            conexao.execute("INSERT OR IGNORE INTO conclusoes (fonte, ciclo, worker_id) VALUES (?, ?, ?)",
+                            (fonte, ciclo, self.worker_id))
+            pendentes = conexao.execute(
+                "SELECT COUNT(DISTINCT r.worker_id) FROM reivindicacoes r JOIN workers w ON w.worker_id = r.worker_id "
+                "WHERE r.fonte = ? AND r.ciclo = ? AND w.heartbeat >= ? AND r.worker_id NOT IN "
+                "(SELECT worker_id FROM conclusoes WHERE fonte = ? AND ciclo = ?)",
+                (fonte, ciclo, agora - self.ttl_s, fonte, ciclo)).fetchone()[0]
+            eleito = False
+            if not pendentes:
+                eleito = conexao.execute(
+                    "INSERT OR IGNORE INTO tarefas_ciclo (fonte, ciclo, worker_id) VALUES (?, ?, ?)",
+                    (fonte, ciclo, self.worker_id)).rowcount == 1
+            conexao.execute("DELETE FROM conclusoes WHERE ciclo < ?", (ciclo - CICLOS_RETIDOS,))
+            conexao.execute("DELETE FROM tarefas_ciclo WHERE ciclo < ?", (ciclo - CICLOS_RETIDOS,))
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+        if eleito:
+            logger.info(f"[shard {self.worker_id}] {fonte}: executa as tarefas pós-publicação do ciclo {ciclo}")
+        return eleito
+
+    def registrar_metricas(self, fonte, resumo, agora=None):
+        """Guarda o resumo do último ciclo desta fonte no lease do worker."""
+        conexao = self._conexao()
+        linha = conexao.execute("SELECT metricas FROM workers WHERE worker_id = ?", (self.worker_id,)).fetchone()
+        metricas = json.loads(linha[0]) if linha and linha[0] else {}
+        metricas[fonte] = dict(resumo, ciclo=self.ciclo(agora),
+                               concluido_em=datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"))
+        conexao.execute("UPDATE workers SET metricas = ? WHERE worker_id = ?",
+                        (json.dumps(metricas, ensure_ascii=False), self.worker_id))
+
+    def encerrar(self):
+        """Remove o lease (saída limpa: as estações são redistribuídas já no próximo ciclo)."""
+        self._conexao().execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+
+    def status(self, agora=None):
+        """Lista os workers conhecidos com o estado do lease e as métricas do último ciclo."""
+        agora = agora if agora is not None else time.time()
+        linhas = self._conexao().execute(
+            "SELECT worker_id, host, pid, iniciado_em, heartbeat, metricas FROM workers ORDER BY worker_id")
+        return [{
+            "worker_id": worker_id,
+            "host": host,
+            "pid": pid,
+            "ativo": heartbeat >= agora - self.ttl_s,
+            "segundos_desde_heartbeat": round(agora - heartbeat, 1),
+            "metricas": json.loads(metricas) if metricas else {},
+        } for worker_id, host, pid, iniciado_em, heartbeat, metricas in linhas]
+
+
+def resumo_shard(resumo):
+    """Métricas de um ciclo do pipeline guardadas por shard (sem o detalhamento por estágio)."""
+    duracao = resumo.get("duracao_s") or 0
+    return {
+        "total": resumo.get("total", 0),
+        "sucesso": resumo.get("sucesso", 0),
+        "sem_dados": resumo.get("sem_dados", 0),
+        "duracao_s": duracao,
+        "estacoes_por_s": round(resumo.get("total", 0) / duracao, 2) if duracao > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estado dos shards de ingestão.")
+    parser.add_argument("--caminho", default=CAMINHO_SHARDS)
+    parser.add_argument("--status", action="store_true", help="Lista os workers e as métricas de cada shard.")
+    args = parser.parse_args()
+    if not os.path.exists(args.caminho):
+        print(f"Nenhum shard registrado em {args.caminho}.")
+        return
+    # Só consulta a tabela; nenhum lease é criado para este processo
+    for worker in CoordenadorShards(args.caminho, worker_id="status").status():
+        estado = "ativo" if worker["ativo"] else "expirado"
+        print(f"{worker['worker_id']} ({worker['host']}, pid {worker['pid']}): {estado}, "
+              f"heartbeat há {worker['segundos_desde_heartbeat']:.0f}s")
+        for fonte, resumo in worker["metricas"].items():
+            print(f"    {fonte}: {json.dumps(resumo, ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.ingest_sharding --status
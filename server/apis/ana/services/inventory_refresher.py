@@ -0,0 +1,324 @@
+"""
+@file server/apis/ana/services/inventory_refresher.py
+@description Atualização do inventário de estações a partir da configuração (server/apis/ana/config/estacoes.json).
+
+A configuração define quais estações são monitoradas, sem listas fixas no código dos schedulers:
+  - hidroweb.regioes: lista de filtros {"uf": "MT"} e/ou {"codigo_bacia": "6"}; cada filtro é uma única
+    consulta ao HidroInventarioEstacoes que retorna todas as estações da região;
+  - hidroweb.somente_telemetricas / somente_operando: filtros aplicados às estações das regiões;
+  - hidroweb.estacoes: códigos incluídos sempre (consultados um a um, sem filtro);
+  - hidroweb.tamanho_lote / max_workers / timeout_s: tamanho dos lotes de consultas, número de consultas
+    simultâneas de cada lote e timeout de cada consulta;
+  - cemaden.estacoes: entradas completas das estações do Cemaden (não existe inventário do Cemaden na ANA).
+
+A cada execução as consultas são feitas em lotes paralelos, o resultado é comparado com o inventário atual
+e os arquivos só são regravados quando alguma estação foi adicionada, removida ou alterada:
+  - inventario_estacoes.json: inventário completo (todos os campos da HidroWeb);
+  - inventario_estacoes_mapa.json: projeção com os campos usados pelo mapa e pelas rotas do Node;
+  - registro_estacoes.json: códigos HidroWeb e ids do Cemaden lidos pelos schedulers ao iniciar.
+
+Se a consulta de uma estação ou região falhar, as entradas já conhecidas são mantidas (uma falha temporária
+da API não remove estações do mapa).
+
+Para executar (uma vez por dia):
+    python -m server.apis.ana.services.inventory_refresher
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from server.apis.ana.controllers.hidrowebInventory import HidroWebInventory
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+CAMINHO_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "estacoes.json")
+
+ARQUIVO_INVENTARIO = "inventario_estacoes.json"
+ARQUIVO_INVENTARIO_MAPA = "inventario_estacoes_mapa.json"
+ARQUIVO_REGISTRO = "registro_estacoes.json"
+
+# Campos mantidos na projeção do mapa (os usados em /estacoes/todas, nos popups e na classificação)
+CAMPOS_MAPA = (
+    "codigoestacao", "Estacao_Nome", "Latitude", "Longitude", "Altitude", "Area_Drenagem",
+    "Bacia_Nome", "Sub_Bacia_Codigo", "Sub_Bacia_Nome", "Rio_Codigo", "Rio_Nome",
+    "Municipio_Codigo", "Municipio_Nome", "UF_Estacao", "UF_Nome_Estacao",
+    "Operadora_Codigo", "Operadora_Sigla", "Responsavel_Codigo", "Responsavel_Sigla",
+    "Operando", "Tipo_Estacao", "id_Estacao", "sigla",
+)
+
+SIGLA_CEMADEN = "CEMADEN"
+
+
+def carregar_config(caminho=CAMINHO_CONFIG):
+    """Lê a configuração das estações monitoradas."""
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _ler_json(caminho, padrao=None):
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return padrao
+
+
+def registro_da_config(config):
+    """Monta o registro das estações apenas com o que está explícito na configuração (sem consultar a API)."""
+    return {
+        "hidroweb": [str(codigo) for codigo in config.get("hidroweb", {}).get("estacoes", [])],
+        "cemaden": [int(estacao["id_Estacao"]) for estacao in config.get("cemaden", {}).get("estacoes", [])],
+    }
+
+
+def carregar_registro_estacoes(root_dir=DATA_ROOT, caminho_config=CAMINHO_CONFIG):
+    """
+    Lê o registro gerado pela última atualização do inventário. Se ele ainda não existir (ou estiver
+    corrompido), usa as estações explícitas da configuração.
+
+    @return: Dicionário {"hidroweb": [códigos], "cemaden": [ids]}.
+    """
+    registro = _ler_json(os.path.join(root_dir, ARQUIVO_REGISTRO))
+    if isinstance(registro, dict) and isinstance(registro.get("hidroweb"), list) \
+            and isinstance(registro.get("cemaden"), list):
+        return {"hidroweb": registro["hidroweb"], "cemaden": registro["cemaden"]}
+    logger.warning(f"Registro de estações não encontrado em {root_dir}; usando a configuração.")
+    return registro_da_config(carregar_config(caminho_config))
+
+
+def projetar_mapa(inventario):
+    """Reduz cada estação aos campos de CAMPOS_MAPA (campos ausentes são omitidos)."""
+    return [{campo: estacao[campo] for campo in CAMPOS_MAPA if campo in estacao} for estacao in inventario]
+
+
+def comparar_inventarios(atual, novo):
+    """
+    Compara dois inventários pelo código da estação.
+
+    @return: Dicionário com as listas de códigos "adicionadas", "removidas" e "alteradas".
+    """
+    anteriores = {estacao["codigoestacao"]: estacao for estacao in atual}
+    novos = {estacao["codigoestacao"]: estacao for estacao in novo}
+    return {
+        "adicionadas": sorted(codigo for codigo in novos if codigo not in anteriores),
+        "removidas": sorted(codigo for codigo in anteriores if codigo not in novos),
+        "alteradas": sorted(codigo for codigo in novos
+                            if codigo in anteriores and novos[codigo] != anteriores[codigo]),
+    }
+
+
+def _pertence_regiao(estacao, regiao):
+    if regiao.get("uf") and estacao.get("UF_Estacao") != regiao["uf"]:
+        return False
+    if regiao.get("codigo_bacia") not in (None, "") and str(estacao.get("codigobacia")) != str(regiao["codigo_bacia"]):
+        return False
+    return True
+
+
+def _chave(tarefa):
+    """Chave hashável de uma tarefa de consulta (os filtros de região são dicionários)."""
+    tipo, valor = tarefa
+    if tipo == "regiao":
+        return tipo, tuple(sorted((chave, str(v)) for chave, v in valor.items()))
+    return tipo, str(valor)
+
+
+class AtualizadorInventario:
+    """Consulta o inventário das estações configuradas e atualiza os arquivos derivados."""
+
+    def __init__(self, config=None, root_dir=DATA_ROOT, cliente=None, base_url=None):
+        """
+        @param config: Configuração das estações (padrão: lida de CAMINHO_CONFIG).
+        @param root_dir: Diretório onde ficam o inventário e o registro.
+        @param cliente: Instância de HidroWebInventory (padrão: criada e autenticada a cada execução).
+        @param base_url: URL base da API HidroWeb usada ao criar o cliente.
+        """
+        self.config = config if config is not None else carregar_config()
+        self.root_dir = root_dir
+        self.cliente = cliente
+        self.base_url = base_url
+        hidroweb = self.config.get("hidroweb", {})
+        self.tamanho_lote = max(int(hidroweb.get("tamanho_lote", 25)), 1)
+        self.max_workers = max(int(hidroweb.get("max_workers", 8)), 1)
+        self.timeout = hidroweb.get("timeout_s", 30)
+
+    def _consultar(self, cliente, tarefa):
+        tipo, valor = tarefa
+        if tipo == "regiao":
+            return cliente.fetch_inventory(uf=valor.get("uf"), basin_code=valor.get("codigo_bacia"),
+                                           timeout=self.timeout)
+        return cliente.fetch_inventory(station_code=valor, timeout=self.timeout)
+
+    def buscar(self, tarefas):
+        """
+        Executa as consultas em lotes de tamanho_lote, com até max_workers consultas simultâneas por lote.
+
+        @param tarefas: Lista de ("regiao", filtro) ou ("estacao", código).
+        @return: (resultados, falhas): {tarefa: itens} das consultas bem-sucedidas e a lista de tarefas que falharam.
+        """
+        cliente = self.cliente or HidroWebInventory(base_url=self.base_url, max_connections=self.max_workers)
+        resultados, falhas = {}, []
+
+        def consultar(tarefa):
+            try:
+                return tarefa, self._consultar(cliente, tarefa), None
+            except Exception as e:
+                return tarefa, None, e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for inicio in range(0, len(tarefas), self.tamanho_lote):
+                lote = tarefas[inicio:inicio + self.tamanho_lote]
+                for tarefa, itens, erro in executor.map(consultar, lote):
+                    if erro is None:
+                        resultados[_chave(tarefa)] = itens
+                    else:
+                        logger.error(f"Falha ao consultar o inventário ({tarefa[0]} {tarefa[1]}): {erro}")
+                        falhas.append(tarefa)
+                logger.info(f"Inventário: {min(inicio + len(lote), len(tarefas))}/{len(tarefas)} consultas concluídas.")
+        return resultados, falhas
+
+    def montar_inventario(self, atual, resultados):
+        """
+        Combina as respostas das consultas em um novo inventário, mantendo a ordem das estações já conhecidas
+        (as novas entram no final, ordenadas pelo código).
+        """
+        hidroweb = self.config.get("hidroweb", {})
+        somente_telemetricas = hidroweb.get("somente_telemetricas", True)
+        somente_operando = hidroweb.get("somente_operando", False)
+        anteriores = {estacao["codigoestacao"]: estacao for estacao in atual}
+        novas = {}
+
+        for regiao in hidroweb.get("regioes", []):
+            itens = resultados.get(_chave(("regiao", regiao)))
+            if itens is None:
+                # Consulta falhou: mantém as estações da região que já estavam no inventário
+                novas.update({codigo: estacao for codigo, estacao in anteriores.items()
+                              if estacao.get("sigla") != SIGLA_CEMADEN and _pertence_regiao(estacao, regiao)})
+                continue
+            for item in itens:
+                if somente_telemetricas and str(item.get("Tipo_Estacao_Telemetrica")) != "1":
+                    continue
+                if somente_operando and str(item.get("Operando")) != "1":
+                    continue
+                novas[str(item["codigoestacao"])] = item
+
+        for codigo in hidroweb.get("estacoes", []):
+            codigo = str(codigo)
+            itens = resultados.get(_chave(("estacao", codigo)))
+            if itens is None:
+                if codigo in anteriores:
+                    novas[codigo] = anteriores[codigo]
+                continue
+            for item in itens:
+                if str(item.get("codigoestacao")) == codigo:
+                    novas[codigo] = item
+
+        for estacao in self.config.get("cemaden", {}).get("estacoes", []):
+            novas[estacao["codigoestacao"]] = dict(estacao, sigla=SIGLA_CEMADEN)
+
+        ordem = [codigo for codigo in anteriores if codigo in novas]
+        ordem += sorted(codigo for codigo in novas if codigo not in anteriores)
+        return [novas[codigo] for codigo in ordem]
+
+    def montar_registro(self, inventario):
+        """Códigos HidroWeb (os explícitos na configuração e os encontrados nas regiões) e ids do Cemaden."""
+        registro = registro_da_config(self.config)
+        explicitos = set(registro["hidroweb"])
+        registro["hidroweb"] += sorted(estacao["codigoestacao"] for estacao in inventario
+                                       if estacao.get("sigla") != SIGLA_CEMADEN
+                                       and estacao["codigoestacao"] not in explicitos)
+        return registro
+
+    def executar(self, agora_utc=None):
+        """
+        Atualiza o inventário, a projeção do mapa e o registro das estações.
+
+        @return: Resumo com o total de estações, as diferenças, as falhas e se os arquivos foram regravados.
+        """
+        inicio = time.time()
+        hidroweb = self.config.get("hidroweb", {})
+        tarefas = [("regiao", regiao) for regiao in hidroweb.get("regioes", [])]
+        tarefas += [("estacao", str(codigo)) for codigo in hidroweb.get("estacoes", [])]
+
+        caminho_inventario = os.path.join(self.root_dir, ARQUIVO_INVENTARIO)
+        caminho_mapa = os.path.join(self.root_dir, ARQUIVO_INVENTARIO_MAPA)
+        caminho_registro = os.path.join(self.root_dir, ARQUIVO_REGISTRO)
+        atual = _ler_json(caminho_inventario, padrao=[])
+
+        resultados, falhas = self.buscar(tarefas) if tarefas else ({}, [])
+        inventario = self.montar_inventario(atual, resultados)
+        diferencas = comparar_inventarios(atual, inventario)
+        registro = self.montar_registro(inventario)
+
+        alterado = any(diferencas.values()) or [e["codigoestacao"] for e in atual] != [e["codigoestacao"] for e in inventario]
+        os.makedirs(self.root_dir, exist_ok=True)
+        if alterado:
+            gravar_arquivo_atomico(caminho_inventario, json.dumps(inventario, ensure_ascii=False, indent=4))
+        if alterado or not os.path.exists(caminho_mapa):
+            gravar_arquivo_atomico(caminho_mapa, json.dumps(projetar_mapa(inventario), ensure_ascii=False,
+                                                            separators=(",", ":")))
+
+        anterior = _ler_json(caminho_registro, padrao={}) or {}
+        if anterior.get("hidroweb") != registro["hidroweb"] or anterior.get("cemaden") != registro["cemaden"]:
+            documento = {
+                "versao": anterior.get("versao", 0) + 1,
+                "gerado_em": (agora_utc or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                **registro,
+            }
+            gravar_arquivo_atomico(caminho_registro, json.dumps(documento, ensure_ascii=False, indent=4))
+            alterado = True
+
+        resumo = {
+            "estacoes": len(inventario),
+            "hidroweb": len(registro["hidroweb"]),
+            "cemaden": len(registro["cemaden"]),
+            **diferencas,
+            "falhas": [valor if tipo == "estacao" else dict(valor) for tipo, valor in falhas],
+            "alterado": alterado,
+            "duracao_s": round(time.time() - inicio, 2),
+        }
+        print(f"Inventário: {resumo['estacoes']} estações, {len(diferencas['adicionadas'])} adicionadas, "
+              f"{len(diferencas['removidas'])} removidas, {len(diferencas['alteradas'])} alteradas, "
+              f"{len(falhas)} falhas em {resumo['duracao_s']:.2f}s"
+              + ("" if alterado else " (sem alterações)"))
+        return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza o inventário e o registro das estações monitoradas.")
+    parser.add_argument("--config", default=CAMINHO_CONFIG)
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--intervalo-h", type=int, default=24)
+    parser.add_argument("--uma-vez", action="store_true", help="Executa uma única atualização e encerra.")
+    args = parser.parse_args()
+
+    atualizador = AtualizadorInventario(config=carregar_config(args.config), root_dir=args.root_dir)
+    if args.uma_vez:
+        atualizador.executar()
+        return
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(atualizador.executar, 'interval', hours=args.intervalo_h, next_run_time=datetime.now(),
+                      max_instances=1, coalesce=True)
+    logger.info(f"Atualização do inventário iniciada (a cada {args.intervalo_h} horas)...")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Atualização do inventário interrompida.")
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.inventory_refresher
@@ -0,0 +1,223 @@
+"""
+@file server/apis/ana/services/load_test_cycle.py
+@description Teste de carga de um ciclo completo dos schedulers contra o servidor mock local.
+
+Executa um ciclo do StationDataFetcher (HidroWeb) e/ou do update_stations_data (Cemaden) apontados para
+o servidor mock (mock_upstream_server), com a lista de estações multiplicada por um fator (ex.: 10x),
+gravando em um diretório temporário. Ao final, reporta:
+  - tempo de ciclo e vazão (estações/s) de cada fonte
+  - requisições atendidas pelo mock, por endpoint e status
+  - pico de memória alocada pelo Python durante o ciclo (tracemalloc)
+
+Com --shards N, o ciclo da HidroWeb é executado por N workers simultâneos em modo shard
+(ingest_sharding), cada um buscando só a sua parte das estações. O relatório inclui as métricas de cada
+shard e o total buscado somando os shards, que deve ser igual ao número de estações (nenhuma buscada duas
+vezes). Nesse modo o feed não é publicado, para medir só a ingestão (compare --shards 1 com --shards 4).
+
+Para executar:
+    python -m server.apis.ana.services.load_test_cycle --multiplicador 10 --latencia-ms 150 --taxa-5xx 0.02
+Para usar um mock já em execução (ex.: em outra máquina), informe --mock-url http://host:porta.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import threading
+import urllib.request
+
+from server.apis.ana.services.mock_upstream_server import iniciar_servidor_mock, PREFIXO_CEMADEN
+from server.apis.ana.services.station_data_scheduler import StationDataFetcher
+from server.apis.ana.services import cemaden_data_scheduler
+from server.apis.ana.services.inventory_refresher import carregar_registro_estacoes
+from server.apis.ana.services.ingest_sharding import CoordenadorShards
+
+logger = logging.getLogger(__name__)
+
+# Offsets usados para criar códigos sintéticos distintos dos reais, estação a estação
+OFFSET_CODIGO_HIDROWEB = 10 ** 8
+OFFSET_ID_CEMADEN = 100000
+
+
+def multiplicar_codigos_hidroweb(codigos, fator):
+    """Retorna os códigos originais seguidos de (fator - 1) cópias sintéticas de cada um."""
+    return [str(int(codigo) + k * OFFSET_CODIGO_HIDROWEB) for k in range(fator) for codigo in codigos]
+
+
+def multiplicar_ids_cemaden(ids, fator):
+    """Retorna os ids originais seguidos de (fator - 1) cópias sintéticas de cada um."""
+    return [int(sid) + k * OFFSET_ID_CEMADEN for k in range(fator) for sid in ids]
+
+
+def _medir(funcao):
+    """Executa a função medindo tempo de parede e pico de memória alocada. Retorna (resultado, segundos, pico_mb)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        resultado = funcao()
+    finally:
+        decorrido = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return resultado, decorrido, pico / (1024 * 1024)
+
+
+def _ler_json(url, corpo=None):
+    dados = json.dumps(corpo).encode("utf-8") if corpo is not None else None
+    requisicao = urllib.request.Request(url, data=dados, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(requisicao, timeout=10) as resposta:
+        return json.loads(resposta.read().decode("utf-8"))
+
+
+def executar_ciclo_shards(codigos, shards, base_url, data_root, max_workers=None):
+    """
+    Executa um ciclo da HidroWeb com `shards` workers simultâneos (threads), cada um com seu lease.
+
+    @return: (sucesso, métricas de cada shard, total de estações buscadas somando os shards).
+    """
+    caminho = os.path.join(data_root, "shards_ingestao.sqlite3")
+    fetchers = []
+    for indice in range(shards):
+        fetcher = StationDataFetcher(codigos, base_url=base_url, data_root=data_root)
+        fetcher.publicar_feed = False
+        fetcher.usar_processos = False
+        if max_workers:
+            fetcher.max_workers = max_workers
+        fetcher.shard = CoordenadorShards(caminho, worker_id=f"carga-{indice}")
+        fetcher.shard.heartbeat()
+        fetchers.append(fetcher)
+
+    threads = [threading.Thread(target=fetcher.fetch_all_stations) for fetcher in fetchers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    resumos = [fetcher.ultimo_resumo for fetcher in fetchers if fetcher.ultimo_resumo]
+    sucesso = sum(resumo["sucesso"] for resumo in resumos)
+    buscadas = sum(resumo["total"] for resumo in resumos)
+    metricas = {worker["worker_id"]: worker["metricas"].get("hidroweb") for worker in fetchers[0].shard.status()}
+    return sucesso, metricas, buscadas
+
+
+def executar_teste_carga(multiplicador=10, fontes=("hidroweb", "cemaden"), mock_url=None, config_falhas=None,
+                         modo='misto', max_workers=None, manter_dados=False, shards=None):
+    """
+    Executa o teste de carga e retorna um dicionário com as métricas de cada fonte.
+
+    @param multiplicador: Fator de multiplicação da lista de estações de cada scheduler.
+    @param fontes: Fontes a exercitar ("hidroweb" e/ou "cemaden").
+    @param mock_url: URL raiz de um mock já em execução; se None, um mock é iniciado neste processo.
+    @param config_falhas: Configuração de falhas enviada ao mock antes do ciclo (ver CONFIG_PADRAO).
+    @param modo: Modo de dados do mock iniciado localmente.
+    @param max_workers: Sobrescreve o número de threads do StationDataFetcher.
+    @param manter_dados: Se True, não remove o diretório temporário com os arquivos gravados.
+    @param shards: Se informado, executa o ciclo da HidroWeb com esse número de workers em modo shard.
+    """
+    servidor = None
+    if mock_url is None:
+        servidor = iniciar_servidor_mock(modo=modo)
+        mock_url = servidor.url_raiz
+    mock_url = mock_url.rstrip("/")
+    if config_falhas:
+        _ler_json(f"{mock_url}/__mock__/config", config_falhas)
+
+    # O mock aceita quaisquer credenciais; só garante que o cliente não recuse por falta delas
+    os.environ.setdefault("HIDROWEB_USERNAME", "mock")
+    os.environ.setdefault("HIDROWEB_PASSWORD", "mock")
+
+    data_root = tempfile.mkdtemp(prefix="carga_ciclo_")
+    relatorio = {"multiplicador": multiplicador, "mock_url": mock_url, "data_root": data_root, "fontes": {}}
+    try:
+        if "hidroweb" in fontes and shards:
+            codigos = multiplicar_codigos_hidroweb(carregar_registro_estacoes(root_dir=data_root)["hidroweb"],
+                                                   multiplicador)
+            (sucesso, metricas, buscadas), segundos, pico_mb = _medir(lambda: executar_ciclo_shards(
+                codigos, shards, f"{mock_url}/hidrowebservice", data_root, max_workers))
+            relatorio["fontes"]["hidroweb"] = dict(_metricas(len(codigos), sucesso, segundos, pico_mb),
+                                                   shards=metricas, buscadas=buscadas)
+        elif "hidroweb" in fontes:
+            fetcher = StationDataFetcher(base_url=f"{mock_url}/hidrowebservice", data_root=data_root)
+            fetcher.station_codes = multiplicar_codigos_hidroweb(fetcher.station_codes, multiplicador)
+            if max_workers:
+                fetcher.max_workers = max_workers
+            sucesso, segundos, pico_mb = _medir(fetcher.fetch_all_stations)
+            relatorio["fontes"]["hidroweb"] = _metricas(len(fetcher.station_codes), sucesso, segundos, pico_mb)
+
+        if "cemaden" in fontes:
+            ids = multiplicar_ids_cemaden(carregar_registro_estacoes(root_dir=data_root)["cemaden"], multiplicador)
+            sucesso, segundos, pico_mb = _medir(lambda: cemaden_data_scheduler.update_stations_data(
+                station_ids=ids, base_url=f"{mock_url}{PREFIXO_CEMADEN}", root_dir=data_root))
+            relatorio["fontes"]["cemaden"] = _metricas(len(ids), sucesso, segundos, pico_mb)
+
+        relatorio["mock_stats"] = _ler_json(f"{mock_url}/__mock__/stats")
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+            servidor.server_close()
+        if not manter_dados:
+            shutil.rmtree(data_root, ignore_errors=True)
+    return relatorio
+
+
+def _metricas(total, sucesso, segundos, pico_mb):
+    return {
+        "estacoes": total,
+        "sucesso": sucesso,
+        "tempo_ciclo_s": round(segundos, 3),
+        "estacoes_por_s": round(total / segundos, 2) if segundos > 0 else None,
+        "pico_memoria_mb": round(pico_mb, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga de um ciclo dos schedulers contra o mock local.")
+    parser.add_argument("--multiplicador", type=int, default=10)
+    parser.add_argument("--fontes", default="hidroweb,cemaden")
+    parser.add_argument("--mock-url", default=None)
+    parser.add_argument("--modo", choices=("replay", "sintetico", "misto"), default="misto")
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--latencia-ms", type=float, default=0)
+    parser.add_argument("--latencia-sigma", type=float, default=None,
+                        help="Se informado, usa distribuição lognormal com mediana --latencia-ms")
+    parser.add_argument("--taxa-401", type=float, default=0.0)
+    parser.add_argument("--taxa-5xx", type=float, default=0.0)
+    parser.add_argument("--taxa-timeout", type=float, default=0.0)
+    parser.add_argument("--taxa-corpo-lento", type=float, default=0.0)
+    parser.add_argument("--manter-dados", action="store_true")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Número de workers simultâneos em modo shard para o ciclo da HidroWeb")
+    args = parser.parse_args()
+
+    latencia = {"distribuicao": "fixa", "ms": args.latencia_ms}
+    if args.latencia_sigma is not None:
+        latencia = {"distribuicao": "lognormal", "ms": args.latencia_ms, "sigma": args.latencia_sigma}
+    config = {
+        "latencia": latencia,
+        "taxa_401": args.taxa_401,
+        "taxa_5xx": args.taxa_5xx,
+        "taxa_timeout": args.taxa_timeout,
+        "taxa_corpo_lento": args.taxa_corpo_lento,
+    }
+    relatorio = executar_teste_carga(
+        multiplicador=args.multiplicador,
+        fontes=tuple(f.strip() for f in args.fontes.split(",") if f.strip()),
+        mock_url=args.mock_url,
+        config_falhas=config,
+        modo=args.modo,
+        max_workers=args.max_workers,
+        manter_dados=args.manter_dados,
+        shards=args.shards,
+    )
+    print(json.dumps(relatorio, ensure_ascii=False, indent=4))
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.load_test_cycle --multiplicador 10
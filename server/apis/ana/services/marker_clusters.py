@@ -0,0 +1,345 @@
+"""
+@file server/apis/ana/services/marker_clusters.py
+@description Agrupamentos (clusters) de marcadores pré-calculados por zoom para cada camada de classificação.
+
+O Leaflet.markercluster (gerenciadorDeMarcadores.createClusterIcon) reagrupa todas as estações em cada
+navegador a cada zoom e movimento do mapa, uma vez por camada de classificação. Aqui o agrupamento é
+feito uma vez por ciclo, após a publicação do feed de alterações (ColetorCiclo.apos_publicar):
+
+  - para cada camada (CAMADAS: chuva, nível, vazão, status e rio), as estações do inventário recebem a
+    classe do seu resumo no feed;
+  - os agrupamentos são hierárquicos, como no supercluster: partindo das estações no zoom ZOOM_MAXIMO + 1,
+    cada zoom agrupa os itens do zoom seguinte que estão a menos de RAIO_PX pixels entre si (vizinhos
+    buscados em uma grade de células do tamanho do raio). Cada agrupamento guarda a posição média
+    (ponderada pelo número de estações), o número de estações por classe, a classe dominante e os limites;
+  - cada zoom é gravado em um arquivo JSON compacto, public/data/clusters/<camada>/<versao>/<z>.json:
+        {"z", "itens": [{"x": lon, "y": lat, "n", "c": índice da classe dominante,
+                         "k": [estações por classe], "b": [oeste, sul, leste, norte]}]}
+    (estações isoladas têm "n": 1 e "id" com o código em vez de "k" e "b");
+  - as camadas de classificação do mapa (ex.: "Chuva - Forte") mostram uma classe por vez, então cada
+    classe também é agrupada separadamente (agrupar_por_classe), em public/data/clusters/<camada>/<versao>/
+    classes/<z>.json: todos os agrupamentos têm uma única classe ("c") e o cliente filtra pela sua.
+
+A versão de cada camada é derivada das entradas (estações, coordenadas e classes), como em
+rainfall_grid.py: camadas sem mudança não são regravadas, e cada versão tem o seu diretório, de modo que
+os arquivos podem ficar em cache indefinidamente. O manifesto (public/data/clusters/manifest.json)
+indica a versão atual e a lista de classes de cada camada. No navegador, o custo de desenhar passa a ser
+o número de agrupamentos visíveis, e não o número de estações.
+
+Para gerar manualmente:
+    python -m server.apis.ana.services.marker_clusters
+"""
+
+import os
+import json
+import math
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.utils.classificacao import CONFIG_CLASSIFICACAO, status_atualizacao
+from server.apis.ana.services.change_feed import FeedAlteracoes
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+DIRETORIO_CLUSTERS = "clusters"  # relativo a DATA_ROOT
+URL_CLUSTERS = "/data/clusters"  # URL do diretório acima (public/ é servido na raiz)
+
+# Zooms do mapa com agrupamentos; acima de ZOOM_MAXIMO as estações aparecem isoladas
+ZOOM_MINIMO = 2
+ZOOM_MAXIMO = 16
+# Mesmo raio (em pixels) do markerClusterGroup das camadas de classificação
+RAIO_PX = 40
+TAMANHO_TILE = 256
+CASAS_DECIMAIS = 5
+# Muda quando o conteúdo dos diretórios de versão muda, para que as versões antigas sejam regravadas
+FORMATO = 2
+
+# Versões antigas só são apagadas depois deste tempo, para não quebrar clientes com o manifesto anterior
+RETENCAO_VERSOES_S = 15 * 60
+
+_CHUVA = CONFIG_CLASSIFICACAO["chuva"]
+_NIVEL = CONFIG_CLASSIFICACAO["nivel"]
+_VAZAO = CONFIG_CLASSIFICACAO["vazao"]
+
+# Camada -> (campo do resumo ou do inventário, classes em ordem crescente de severidade ou None se dinâmicas)
+# Em caso de empate na contagem, a classe dominante é a mais severa.
+CAMADAS = {
+    "chuva": ("classificacaoChuva", [_CHUVA["indefinido"], _CHUVA["sem_chuva"]]
+              + [classe for _, classe in _CHUVA["limiares"]] + [_CHUVA["acima"]]),
+    "nivel": ("classificacaoNivel", [_NIVEL["indefinido"], _NIVEL["baixo"][0], _NIVEL["normal"][0], _NIVEL["acima"]]),
+    "vazao": ("classificacaoVazao", [_VAZAO["indefinido"], _VAZAO["baixo"][0], _VAZAO["normal"][0], _VAZAO["acima"]]),
+    "status": ("statusAtualizacao", ["Atualizado", "Desatualizado"]),
+    "rio": ("Rio_Nome", None),
+}
+RIO_DESCONHECIDO = "Desconhecido"
+
+
+def _mercator(lon, lat):
+    """lon/lat -> Web Mercator normalizado [0, 1] (y cresce para o sul)."""
+    seno = math.sin(math.radians(max(min(lat, 85.0511), -85.0511)))
+    return lon / 360.0 + 0.5, 0.5 - 0.25 * math.log((1 + seno) / (1 - seno)) / math.pi
+
+
+def _lat_de_y(y):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+def estacoes_por_camada(inventario, resumos):
+    """
+    Estações com coordenadas e a classe de cada camada.
+
+    @param inventario: Lista de estações (inventario_estacoes.json).
+    @param resumos: Dicionário {codigoestacao: resumo} do feed de alterações.
+    @return: (lista de (codigo, lon, lat), {camada: [classe de cada estação]}, {camada: [classes]})
+    """
+    estacoes = []
+    valores = {camada: [] for camada in CAMADAS}
+    for estacao in sorted(inventario, key=lambda e: str(e.get("codigoestacao"))):
+        try:
+            lon, lat = float(estacao["Longitude"]), float(estacao["Latitude"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        codigo = str(estacao.get("codigoestacao"))
+        resumo = resumos.get(codigo) or {}
+        estacoes.append((codigo, lon, lat))
+        for camada, (campo, classes) in CAMADAS.items():
+            if camada == "rio":
+                valor = (estacao.get(campo) or "").strip() or RIO_DESCONHECIDO
+            elif camada == "status":
+                valor = resumo.get(campo) or status_atualizacao(None)
+            else:
+                valor = resumo.get(campo) or classes[0]
+            valores[camada].append(valor)
+
+    classes_por_camada = {}
+    for camada, (_, classes) in CAMADAS.items():
+        if classes is None:
+            classes = sorted(set(valores[camada]))
+        else:
+            # Classes fora da lista (ex.: rótulo novo no resumo) vão para o fim
+            classes = classes + sorted(set(valores[camada]) - set(classes))
+        classes_por_camada[camada] = classes
+    return estacoes, valores, classes_por_camada
+
+
+def _classe_dominante(contagens):
+    """Índice da classe mais frequente; empates vão para a classe mais severa (de índice maior)."""
+    return max(range(len(contagens)), key=lambda i: (contagens[i], i))
+
+
+def agrupar(estacoes, classes_estacoes, classes, zoom_minimo=ZOOM_MINIMO, zoom_maximo=ZOOM_MAXIMO, raio_px=RAIO_PX):
+    """
+    Agrupamento hierárquico das estações, do zoom máximo ao mínimo.
+
+    @param estacoes: Lista de (codigo, lon, lat).
+    @param classes_estacoes: Classe de cada estação (mesma ordem).
+    @param classes: Lista de classes da camada (índices usados em "c" e "k").
+    @return: Dicionário {zoom: [itens]} para zoom_minimo..zoom_maximo + 1 (o último com as estações isoladas).
+    """
+    indice_classe = {classe: i for i, classe in enumerate(classes)}
+    itens = []
+    for (codigo, lon, lat), classe in zip(estacoes, classes_estacoes):
+        x, y = _mercator(lon, lat)
+        contagens = [0] * len(classes)
+        contagens[indice_classe[classe]] = 1
+        itens.append({"x": x, "y": y, "n": 1, "k": contagens, "b": [lon, lat, lon, lat], "id": codigo})
+
+    niveis = {zoom_maximo + 1: itens}
+    for zoom in range(zoom_maximo, zoom_minimo - 1, -1):
+        raio = raio_px / (TAMANHO_TILE * (1 << zoom))
+        # Grade de células do tamanho do raio: os vizinhos estão na célula do item ou nas oito ao redor
+        celulas = {}
+        for indice, item in enumerate(itens):
+            celulas.setdefault((int(item["x"] // raio), int(item["y"] // raio)), []).append(indice)
+
+        agrupados = [False] * len(itens)
+        proximos = []
+        for indice, item in enumerate(itens):
+            if agrupados[indice]:
+                continue
+            agrupados[indice] = True
+            cx, cy = int(item["x"] // raio), int(item["y"] // raio)
+            vizinhos = [
+                outro for dx in (-1, 0, 1) for dy in (-1, 0, 1) for outro in celulas.get((cx + dx, cy + dy), ())
+                if not agrupados[outro]
+                and (itens[outro]["x"] - item["x"]) ** 2 + (itens[outro]["y"] - item["y"]) ** 2 <= raio * raio
+            ]
+            if not vizinhos:
+                proximos.append(item)
+                continue
+            membros = [item] + [itens[outro] for outro in vizinhos]
+            for outro in vizinhos:
+                agrupados[outro] = True
+            total = sum(membro["n"] for membro in membros)
+            proximos.append({
+                "x": sum(membro["x"] * membro["n"] for membro in membros) / total,
+                "y": sum(membro["y"] * membro["n"] for membro in membros) / total,
+                "n": total,
+                "k": [sum(contagens) for contagens in zip(*(membro["k"] for membro in membros))],
+                "b": [min(m["b"][0] for m in membros), min(m["b"][1] for m in membros),
+                      max(m["b"][2] for m in membros), max(m["b"][3] for m in membros)],
+            })
+        itens = proximos
+        niveis[zoom] = itens
+    return niveis
+
+
+def agrupar_por_classe(estacoes, classes_estacoes, classes, zoom_minimo=ZOOM_MINIMO, zoom_maximo=ZOOM_MAXIMO,
+                       raio_px=RAIO_PX):
+    """
+    Agrupa as estações de cada classe separadamente (agrupamentos nunca misturam classes).
+
+    @return: Dicionário {zoom: [itens de todas as classes]}, como em agrupar.
+    """
+    niveis = {zoom: [] for zoom in range(zoom_minimo, zoom_maximo + 2)}
+    for classe in classes:
+        membros = [(estacao, valor) for estacao, valor in zip(estacoes, classes_estacoes) if valor == classe]
+        if not membros:
+            continue
+        por_zoom = agrupar([estacao for estacao, _ in membros], [valor for _, valor in membros], classes,
+                           zoom_minimo, zoom_maximo, raio_px)
+        for zoom, itens in por_zoom.items():
+            niveis[zoom].extend(itens)
+    return niveis
+
+
+def _gravar_niveis(diretorio, niveis):
+    os.makedirs(diretorio, exist_ok=True)
+    for zoom, itens in niveis.items():
+        with open(os.path.join(diretorio, f"{zoom}.json"), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"z": zoom, "itens": [_serializar(item) for item in itens]},
+                               ensure_ascii=False, separators=(",", ":")))
+
+
+def _serializar(item):
+    lon = round((item["x"] - 0.5) * 360.0, CASAS_DECIMAIS)
+    lat = round(_lat_de_y(item["y"]), CASAS_DECIMAIS)
+    saida = {"x": lon, "y": lat, "n": item["n"], "c": _classe_dominante(item["k"])}
+    if item["n"] == 1 and "id" in item:
+        saida["id"] = item["id"]
+    else:
+        saida["k"] = item["k"]
+        saida["b"] = [round(valor, CASAS_DECIMAIS) for valor in item["b"]]
+    return saida
+
+
+def assinatura_entradas(estacoes, classes_estacoes, classes, zoom_minimo, zoom_maximo):
+    """Identifica as entradas de uma camada; muda se qualquer estação, coordenada ou classe mudar."""
+    h = hashlib.sha1()
+    h.update(json.dumps([FORMATO, zoom_minimo, zoom_maximo, RAIO_PX, TAMANHO_TILE, CASAS_DECIMAIS, classes],
+                        ensure_ascii=False).encode("utf-8"))
+    h.update(json.dumps([list(e) + [c] for e, c in zip(estacoes, classes_estacoes)],
+                        ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _ler_manifesto(caminho):
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"camadas": {}}
+
+
+def _remover_versoes_antigas(diretorio_camada, versao_atual):
+    limite = time.time() - RETENCAO_VERSOES_S
+    for nome in os.listdir(diretorio_camada):
+        caminho = os.path.join(diretorio_camada, nome)
+        if nome != versao_atual and os.path.isdir(caminho) and os.path.getmtime(caminho) < limite:
+            shutil.rmtree(caminho, ignore_errors=True)
+
+
+def gerar_clusters(resumos, root_dir=DATA_ROOT, inventario=None, camadas=None, zoom_minimo=ZOOM_MINIMO,
+                   zoom_maximo=ZOOM_MAXIMO, agora_utc=None, forcar=False):
+    """
+    Gera (ou mantém) os arquivos de agrupamentos de cada camada e atualiza o manifesto.
+
+    @param resumos: Dicionário {codigoestacao: resumo} (ver change_feed.FeedAlteracoes.resumos).
+    @param root_dir: Diretório raiz dos dados (inventário e arquivos de saída).
+    @param inventario: Lista de estações (padrão: root_dir/inventario_estacoes.json).
+    @param camadas: Camadas a gerar (padrão: todas as de CAMADAS).
+    @param forcar: Se True, regrava todas as camadas mesmo sem mudança nas entradas.
+    @return: Lista com os nomes das camadas regravadas.
+    """
+    inicio = time.time()
+    agora_utc = agora_utc or datetime.utcnow()
+    if inventario is None:
+        with open(os.path.join(root_dir, "inventario_estacoes.json"), "r", encoding="utf-8") as f:
+            inventario = json.load(f)
+
+    estacoes, valores, classes_por_camada = estacoes_por_camada(inventario, resumos)
+    diretorio = os.path.join(root_dir, DIRETORIO_CLUSTERS)
+    caminho_manifesto = os.path.join(diretorio, "manifest.json")
+    manifesto = _ler_manifesto(caminho_manifesto)
+    regeradas = []
+
+    for camada in camadas or CAMADAS:
+        classes = classes_por_camada[camada]
+        versao = assinatura_entradas(estacoes, valores[camada], classes, zoom_minimo, zoom_maximo)
+        destino = os.path.join(diretorio, camada, versao)
+        anterior = manifesto["camadas"].get(camada, {})
+        if not forcar and anterior.get("versao") == versao and os.path.isdir(destino):
+            continue
+
+        niveis = agrupar(estacoes, valores[camada], classes, zoom_minimo, zoom_maximo)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        _gravar_niveis(temporario, niveis)
+        _gravar_niveis(os.path.join(temporario, "classes"),
+                       agrupar_por_classe(estacoes, valores[camada], classes, zoom_minimo, zoom_maximo))
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporario, destino)
+
+        manifesto["camadas"][camada] = {
+            "versao": versao,
+            "url": f"{URL_CLUSTERS}/{camada}/{versao}/{{z}}.json",
+            "url_classes": f"{URL_CLUSTERS}/{camada}/{versao}/classes/{{z}}.json",
+            "classes": classes,
+            "estacoes": len(estacoes),
+            "gerado_em": agora_utc.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "itens_por_zoom": {str(zoom): len(itens) for zoom, itens in sorted(niveis.items())},
+        }
+        logger.info(f"[clusters] Camada {camada}: {len(estacoes)} estações, "
+                    f"{len(niveis[zoom_minimo])} agrupamentos no zoom {zoom_minimo}.")
+        regeradas.append(camada)
+
+    if regeradas or not os.path.exists(caminho_manifesto):
+        # Zoom máximo do arquivo: acima dele o cliente usa o último (estações isoladas)
+        manifesto.update({"zooms": [zoom_minimo, zoom_maximo + 1], "raio_px": RAIO_PX})
+        gravar_arquivo_atomico(caminho_manifesto, json.dumps(manifesto, ensure_ascii=False, indent=2))
+    for camada, info in manifesto["camadas"].items():
+        diretorio_camada = os.path.join(diretorio, camada)
+        if os.path.isdir(diretorio_camada):
+            _remover_versoes_antigas(diretorio_camada, info["versao"])
+
+    print(f"Agrupamentos de marcadores: {len(regeradas)} camadas regravadas em {time.time() - inicio:.2f}s "
+          f"({', '.join(regeradas) or 'nenhuma'}).")
+    return regeradas
+
+
+def tarefa_clusters_marcadores(feed, versao=None, delta=None):
+    """Tarefa pós-ciclo (ColetorCiclo.apos_publicar): reagrupa as camadas cujas classes mudaram."""
+    return gerar_clusters(feed.resumos(), root_dir=feed.root_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera os agrupamentos de marcadores por zoom de cada camada.")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--forcar", action="store_true", help="Regrava todas as camadas.")
+    args = parser.parse_args()
+    feed = FeedAlteracoes(os.path.join(args.root_dir, "feed_alteracoes.sqlite3"), root_dir=args.root_dir)
+    gerar_clusters(feed.resumos(), root_dir=args.root_dir, forcar=args.forcar)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.marker_clusters
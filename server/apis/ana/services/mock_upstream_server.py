@@ -0,0 +1,597 @@
+"""
+@file server/apis/ana/services/mock_upstream_server.py
+@description Servidor HTTP local que substitui as APIs da HidroWeb (ANA) e do Cemaden em testes de carga.
+
+O servidor implementa os mesmos caminhos das APIs reais:
+  - /hidrowebservice/EstacoesTelemetricas/OAUth/v1
+  - /hidrowebservice/EstacoesTelemetricas/HidroinfoanaSerieTelemetricaAdotada/v1
+  - /hidrowebservice/EstacoesTelemetricas/HidroInventarioEstacoes/v1
+  - /MapaInterativoWS/resources/horario/{id}/{horas}
+
+Os dados são reproduzidos a partir do acervo existente em public/data (modo "replay"), gerados
+sinteticamente (modo "sintetico") ou uma combinação dos dois (modo "misto", padrão: replay com
+fallback sintético). Estações desconhecidas (ex.: códigos criados para testes 10x) são mapeadas de
+forma determinística para uma estação real do acervo.
+
+Falhas podem ser injetadas sob demanda via POST /__mock__/config (JSON), sem reiniciar o servidor:
+  - latencia: {"distribuicao": "fixa" | "uniforme" | "lognormal", "ms": ..., "min_ms": ..., "max_ms": ..., "sigma": ...}
+  - taxa_401, taxa_5xx, taxa_timeout, taxa_corpo_lento: probabilidades entre 0 e 1
+  - timeout_s: tempo que a requisição fica "pendurada" quando um timeout é sorteado
+  - corpo_lento_chunk_bytes / corpo_lento_atraso_s: tamanho e intervalo dos pedaços de um corpo lento
+  - token_ttl_s: validade dos tokens emitidos pelo endpoint OAuth
+  - endpoints: {"oauth" | "hidroweb_dados" | "hidroweb_inventario" | "cemaden": {...}} sobrescreve por endpoint
+
+As estatísticas de atendimento ficam disponíveis em GET /__mock__/stats.
+
+Para executar:
+    python -m server.apis.ana.services.mock_upstream_server --porta 8765 --modo misto
+Depois aponte os clientes para o servidor:
+    HIDROWEB_BASE_URL=http://127.0.0.1:8765/hidrowebservice
+    CEMADEN_BASE_URL=http://127.0.0.1:8765/MapaInterativoWS/resources
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prefixos dos caminhos servidos, espelhando as URLs reais
+PREFIXO_HIDROWEB = "/hidrowebservice/EstacoesTelemetricas"
+PREFIXO_CEMADEN = "/MapaInterativoWS/resources"
+
+# Configuração padrão de falhas: nenhuma latência extra e nenhuma falha injetada
+CONFIG_PADRAO = {
+    "latencia": {"distribuicao": "fixa", "ms": 0},
+    "taxa_401": 0.0,
+    "taxa_5xx": 0.0,
+    "taxa_timeout": 0.0,
+    "taxa_corpo_lento": 0.0,
+    "timeout_s": 120.0,
+    "corpo_lento_chunk_bytes": 512,
+    "corpo_lento_atraso_s": 0.05,
+    "token_ttl_s": 3600,
+    "endpoints": {},
+}
+
+FORMATO_MEDICAO = "%Y-%m-%d %H:%M:%S.0"
+
+
+def _intervalo_em_horas(intervalo_busca):
+    """
+    Converte o parâmetro "Range Intervalo de busca" da HidroWeb (ex.: "HORA_24", "DIAS_2") em horas.
+    Valores não reconhecidos resultam em 24 horas.
+    """
+    match = re.match(r"^(HORA|DIAS?)_(\d+)$", str(intervalo_busca or "").upper())
+    if not match:
+        return 24
+    quantidade = int(match.group(2))
+    return quantidade if match.group(1) == "HORA" else quantidade * 24
+
+
+def _semente(*partes):
+    """Gera uma semente estável (independente de PYTHONHASHSEED) a partir das partes informadas."""
+    return zlib.crc32("|".join(str(p) for p in partes).encode("utf-8"))
+
+
+class FonteDadosMock:
+    """
+    Fonte de dados do servidor mock.
+
+    Indexa uma única vez o acervo de arquivos diários (apenas a listagem de diretórios; os arquivos são
+    lidos sob demanda e mantidos em cache) e o inventário, e produz respostas no formato das APIs reais.
+    """
+
+    def __init__(self, root_dir='public/data', modo='misto'):
+        """
+        @param root_dir: Diretório raiz do acervo (public/data).
+        @param modo: "replay", "sintetico" ou "misto" (replay com fallback sintético).
+        """
+        if modo not in ("replay", "sintetico", "misto"):
+            raise ValueError(f"Modo de dados inválido: {modo}")
+        self.root_dir = root_dir
+        self.modo = modo
+        self._lock = threading.Lock()
+        self._cache_arquivos = {}
+        # codigoestacao -> lista ordenada de caminhos dos arquivos diários
+        self.dias_por_estacao = {}
+        # idestacao (Cemaden) -> codigoestacao
+        self.cemaden_ids = {}
+        self.inventario = {}
+        if modo != "sintetico":
+            self._indexar_acervo()
+        self._carregar_inventario()
+        self._codigos_hidroweb = sorted(c for c in self.dias_por_estacao if c.isdigit() and len(c) == 8)
+        self._codigos_cemaden = sorted(set(self.cemaden_ids.values()))
+
+    def _indexar_acervo(self):
+        padrao = re.compile(r"^codigoestacao_(.+)\.json$")
+        if not os.path.isdir(self.root_dir):
+            return
+        for ano in sorted(os.listdir(self.root_dir)):
+            dir_ano = os.path.join(self.root_dir, ano)
+            if not (ano.isdigit() and os.path.isdir(dir_ano)):
+                continue
+            for mes in sorted(os.listdir(dir_ano)):
+                dir_mes = os.path.join(dir_ano, mes)
+                if not os.path.isdir(dir_mes):
+                    continue
+                for dia in sorted(os.listdir(dir_mes)):
+                    dir_dia = os.path.join(dir_mes, dia)
+                    if not os.path.isdir(dir_dia):
+                        continue
+                    for nome in os.listdir(dir_dia):
+                        match = padrao.match(nome)
+                        if match:
+                            self.dias_por_estacao.setdefault(match.group(1), []).append(os.path.join(dir_dia, nome))
+        for caminhos in self.dias_por_estacao.values():
+            caminhos.sort()
+        # Estações do Cemaden não usam o código de 8 dígitos da ANA; o idestacao fica dentro do arquivo
+        for codigo, caminhos in self.dias_por_estacao.items():
+            if codigo.isdigit() and len(codigo) == 8:
+                continue
+            documento = self._ler_arquivo(caminhos[-1])
+            if documento and documento.get("idestacao"):
+                self.cemaden_ids[str(documento["idestacao"])] = codigo
+
+    def _carregar_inventario(self):
+        caminho = os.path.join(self.root_dir, "inventario_estacoes.json")
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                self.inventario = {item["codigoestacao"]: item for item in json.load(f)}
+        except (OSError, json.JSONDecodeError, KeyError, TypeError):
+            self.inventario = {}
+
+    def _ler_arquivo(self, caminho):
+        with self._lock:
+            if caminho in self._cache_arquivos:
+                return self._cache_arquivos[caminho]
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                documento = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            documento = None
+        with self._lock:
+            self._cache_arquivos[caminho] = documento
+        return documento
+
+    def _estacao_base(self, codigo, candidatos):
+        """Mapeia deterministicamente um código (real ou sintético) para uma estação existente no acervo."""
+        if codigo in self.dias_por_estacao:
+            return codigo
+        if not candidatos:
+            return None
+        return candidatos[_semente(codigo) % len(candidatos)]
+
+    def _registros_acervo(self, codigo_base, minimo):
+        """
+        Retorna pelo menos `minimo` registros mais recentes do acervo de uma estação (quando houver),
+        ordenados pela data de medição. Os arquivos são lidos do mais recente para o mais antigo.
+        """
+        registros = []
+        for caminho in reversed(self.dias_por_estacao.get(codigo_base, [])):
+            documento = self._ler_arquivo(caminho)
+            if documento:
+                registros.extend(r for r in documento.get("dados", []) if r.get("Data_Hora_Medicao"))
+            if len(registros) >= minimo:
+                break
+        registros.sort(key=lambda r: r["Data_Hora_Medicao"])
+        return registros
+
+    def _janela_replay(self, codigo_base, fim, horas):
+        """
+        Seleciona as últimas `horas` leituras do acervo da estação e desloca os horários para terminar em `fim`.
+        Assim o replay funciona para qualquer data pedida, mesmo fora do período coberto pelo acervo.
+        """
+        registros = self._registros_acervo(codigo_base, horas)
+        if not registros:
+            return []
+        janela = registros[-horas:]
+        ultimo = datetime.strptime(janela[-1]["Data_Hora_Medicao"][:19], "%Y-%m-%d %H:%M:%S")
+        deslocamento = fim - ultimo
+        resultado = []
+        for registro in janela:
+            novo = dict(registro)
+            medicao = datetime.strptime(registro["Data_Hora_Medicao"][:19], "%Y-%m-%d %H:%M:%S") + deslocamento
+            novo["Data_Hora_Medicao"] = medicao.strftime(FORMATO_MEDICAO)
+            if "Data_Atualizacao" in registro:
+                novo["Data_Atualizacao"] = (medicao + timedelta(minutes=55)).strftime("%Y-%m-%d %H:%M:%S.%f")[:23]
+            resultado.append(novo)
+        return resultado
+
+    @staticmethod
+    def _registros_sinteticos(codigo, fim, horas, com_nivel=True):
+        """Gera uma série horária plausível e determinística para a estação."""
+        base = random.Random(_semente(codigo))
+        cota_media = base.uniform(80, 800)
+        vazao_media = base.uniform(5, 2000)
+        fase = base.uniform(0, 2 * math.pi)
+        registros = []
+        for i in range(horas - 1, -1, -1):
+            medicao = fim - timedelta(hours=i)
+            rng = random.Random(_semente(codigo, medicao.isoformat()))
+            chuva = rng.expovariate(0.4) if rng.random() < 0.12 else 0.0
+            registro = {"Chuva_Adotada": f"{chuva:.2f}", "Data_Hora_Medicao": medicao.strftime(FORMATO_MEDICAO)}
+            if com_nivel:
+                onda = math.sin(medicao.timestamp() / 86400.0 + fase)
+                registro.update({
+                    "Chuva_Adotada_Status": "0",
+                    "Cota_Adotada": f"{cota_media * (1 + 0.02 * onda):.2f}",
+                    "Cota_Adotada_Status": "0",
+                    "Data_Atualizacao": (medicao + timedelta(minutes=55)).strftime("%Y-%m-%d %H:%M:%S.%f")[:23],
+                    "Vazao_Adotada": f"{vazao_media * (1 + 0.05 * onda):.2f}",
+                    "Vazao_Adotada_Status": "0",
+                })
+            registros.append(registro)
+        return registros
+
+    def serie_hidroweb(self, codigo, data_busca, intervalo_busca):
+        """Monta a resposta de HidroinfoanaSerieTelemetricaAdotada para a estação e a janela pedidas."""
+        horas = _intervalo_em_horas(intervalo_busca)
+        try:
+            fim = datetime.strptime(data_busca, "%Y-%m-%d").replace(hour=23)
+        except (TypeError, ValueError):
+            fim = datetime.now().replace(minute=0, second=0, microsecond=0)
+        # Não devolve leituras "do futuro" quando a data pedida é o dia corrente
+        agora = (datetime.utcnow() - timedelta(hours=3)).replace(minute=0, second=0, microsecond=0)
+        fim = min(fim, agora) if fim.date() == agora.date() else fim
+
+        registros = []
+        if self.modo != "sintetico":
+            base = self._estacao_base(codigo, self._codigos_hidroweb)
+            if base:
+                registros = self._janela_replay(base, fim, horas)
+        if not registros and self.modo != "replay":
+            registros = self._registros_sinteticos(codigo, fim, horas)
+        items = [dict(r, codigoestacao=codigo) for r in registros]
+        return {"status": "OK", "code": 200, "message": "Sucesso", "items": items}
+
+    def inventario_hidroweb(self, codigo, uf=None, codigo_bacia=None):
+        """
+        Monta a resposta de HidroInventarioEstacoes para a estação pedida ou, sem código, para todas as
+        estações HidroWeb da UF e/ou bacia informadas.
+        """
+        if not codigo:
+            items = []
+            if uf or codigo_bacia:
+                items = [item for item in self.inventario.values()
+                         if item.get("sigla") != "CEMADEN"
+                         and (not uf or item.get("UF_Estacao") == uf)
+                         and (not codigo_bacia or str(item.get("codigobacia")) == str(codigo_bacia))]
+            return {"status": "OK", "code": 200, "message": "Sucesso", "items": items}
+        item = self.inventario.get(codigo)
+        if item is None and self.inventario and self.modo != "replay":
+            chaves = sorted(self.inventario)
+            modelo = self.inventario[chaves[_semente(codigo) % len(chaves)]]
+            rng = random.Random(_semente(codigo, "inventario"))
+            item = dict(modelo, codigoestacao=codigo,
+                        Estacao_Nome=f"ESTACAO SINTETICA {codigo}",
+                        Latitude=f"{float(modelo['Latitude']) + rng.uniform(-0.5, 0.5):.4f}",
+                        Longitude=f"{float(modelo['Longitude']) + rng.uniform(-0.5, 0.5):.4f}")
+        return {"status": "OK", "code": 200, "message": "Sucesso", "items": [item] if item else []}
+
+    def horario_cemaden(self, station_id, horas=24):
+        """
+        Monta a resposta de /horario/{id}/{horas} no formato do Cemaden: horários em UTC, uma lista de
+        datas e uma matriz de acumulados (uma linha por data, uma coluna por horário).
+        """
+        station_id = str(station_id)
+        fim_utc = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        fim_local = fim_utc - timedelta(hours=3)
+
+        codigo = self.cemaden_ids.get(station_id)
+        registros = []
+        if self.modo != "sintetico":
+            base = codigo or self._estacao_base(f"cemaden-{station_id}", self._codigos_cemaden)
+            if base:
+                codigo = codigo or base
+                registros = self._janela_replay(base, fim_local, horas + 1)
+        if not registros and self.modo != "replay":
+            registros = self._registros_sinteticos(station_id, fim_local, horas + 1, com_nivel=False)
+        if not registros:
+            return {"datas": [], "horarios": [], "acumulados": [], "estacao": {"codEstacao": codigo or station_id}}
+
+        # Valores indexados pelo horário UTC
+        valores = {}
+        for registro in registros:
+            medicao = datetime.strptime(registro["Data_Hora_Medicao"][:19], "%Y-%m-%d %H:%M:%S") + timedelta(hours=3)
+            chuva = registro.get("Chuva_Adotada")
+            valores[medicao] = float(chuva) if chuva is not None else None
+
+        inicio_utc = fim_utc - timedelta(hours=horas)
+        horarios_dt = [inicio_utc + timedelta(hours=h) for h in range(horas + 1)]
+        datas_dt = sorted({h.date() for h in horarios_dt})
+        acumulados = []
+        for data in datas_dt:
+            linha = []
+            for h in horarios_dt:
+                linha.append(valores.get(h) if h.date() == data else None)
+            acumulados.append(linha)
+        return {
+            "datas": [d.strftime("%d/%m/%Y") for d in datas_dt],
+            "horarios": [f"{h.hour}h" for h in horarios_dt],
+            "acumulados": acumulados,
+            "estacao": {"codEstacao": codigo or station_id, "idEstacao": station_id},
+        }
+
+
+class EstadoMock:
+    """Estado compartilhado entre as threads do servidor: configuração de falhas, tokens e estatísticas."""
+
+    def __init__(self, config=None, seed=None):
+        self._lock = threading.Lock()
+        self.config = json.loads(json.dumps(CONFIG_PADRAO))
+        self.tokens = {}
+        self.rng = random.Random(seed)
+        self.stats = {"requisicoes": 0, "bytes_enviados": 0, "em_andamento": 0, "por_endpoint": {}, "por_status": {}}
+        if config:
+            self.atualizar_config(config)
+
+    def atualizar_config(self, novos_valores):
+        """Mescla os valores informados na configuração corrente (endpoints são mesclados por chave)."""
+        with self._lock:
+            for chave, valor in novos_valores.items():
+                if chave == "endpoints":
+                    for endpoint, overrides in (valor or {}).items():
+                        self.config["endpoints"].setdefault(endpoint, {}).update(overrides)
+                elif chave == "latencia" and isinstance(valor, dict):
+                    self.config["latencia"] = dict(valor)
+                elif chave in CONFIG_PADRAO:
+                    self.config[chave] = valor
+                else:
+                    raise ValueError(f"Chave de configuração desconhecida: {chave}")
+            return json.loads(json.dumps(self.config))
+
+    def config_endpoint(self, endpoint):
+        with self._lock:
+            efetiva = {k: v for k, v in self.config.items() if k != "endpoints"}
+            efetiva.update(self.config["endpoints"].get(endpoint, {}))
+            return efetiva
+
+    def sortear(self, probabilidade):
+        with self._lock:
+            return self.rng.random() < float(probabilidade or 0)
+
+    def latencia_s(self, latencia):
+        """Sorteia a latência (em segundos) conforme a distribuição configurada."""
+        distribuicao = latencia.get("distribuicao", "fixa")
+        with self._lock:
+            if distribuicao == "uniforme":
+                ms = self.rng.uniform(latencia.get("min_ms", 0), latencia.get("max_ms", latencia.get("ms", 0)))
+            elif distribuicao == "lognormal":
+                mediana = max(float(latencia.get("ms", 1)), 1e-3)
+                ms = self.rng.lognormvariate(math.log(mediana), float(latencia.get("sigma", 0.5)))
+            else:
+                ms = float(latencia.get("ms", 0))
+        return max(ms, 0) / 1000.0
+
+    def emitir_token(self):
+        with self._lock:
+            token = f"mock-{uuid.uuid4().hex}"
+            self.tokens[token] = time.time() + float(self.config["token_ttl_s"])
+            return token
+
+    def token_valido(self, token):
+        with self._lock:
+            expira = self.tokens.get(token)
+            return expira is not None and expira > time.time()
+
+    def registrar(self, endpoint, status, tamanho):
+        with self._lock:
+            self.stats["requisicoes"] += 1
+            self.stats["bytes_enviados"] += tamanho
+            por_endpoint = self.stats["por_endpoint"].setdefault(endpoint, {})
+            por_endpoint[str(status)] = por_endpoint.get(str(status), 0) + 1
+            self.stats["por_status"][str(status)] = self.stats["por_status"].get(str(status), 0) + 1
+
+    def ajustar_em_andamento(self, delta):
+        with self._lock:
+            self.stats["em_andamento"] += delta
+
+    def snapshot_stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+
+class ManipuladorMock(BaseHTTPRequestHandler):
+    """Roteia as requisições para os endpoints simulados e aplica a injeção de falhas."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MockUpstream/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        self.server.estado.ajustar_em_andamento(1)
+        try:
+            self._rotear("GET")
+        finally:
+            self.server.estado.ajustar_em_andamento(-1)
+
+    def do_POST(self):
+        self._rotear("POST")
+
+    def _rotear(self, metodo):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        caminho = url.path.rstrip("/")
+
+        if caminho == "/__mock__/config":
+            if metodo == "POST":
+                try:
+                    tamanho = int(self.headers.get("Content-Length", 0))
+                    corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+                    config = self.server.estado.atualizar_config(corpo)
+                except (ValueError, json.JSONDecodeError) as e:
+                    return self._responder_json("controle", 400, {"erro": str(e)}, aplicar_falhas=False)
+                return self._responder_json("controle", 200, config, aplicar_falhas=False)
+            return self._responder_json("controle", 200, self.server.estado.config_endpoint("controle"), aplicar_falhas=False)
+        if caminho == "/__mock__/stats":
+            return self._responder_json("controle", 200, self.server.estado.snapshot_stats(), aplicar_falhas=False)
+
+        fonte = self.server.fonte
+        if caminho == f"{PREFIXO_HIDROWEB}/OAUth/v1":
+            if not self.headers.get("Identificador") or not self.headers.get("Senha"):
+                return self._responder_json("oauth", 401, {"message": "Credenciais ausentes"})
+            return self._responder_json("oauth", 200, lambda: {
+                "status": "OK", "code": 200, "message": "Sucesso",
+                "items": {"tokenautenticacao": self.server.estado.emitir_token()},
+            })
+        if caminho == f"{PREFIXO_HIDROWEB}/HidroinfoanaSerieTelemetricaAdotada/v1":
+            if not self._autorizado():
+                return self._responder_json("hidroweb_dados", 401, {"message": "Token inválido ou expirado"})
+            return self._responder_json("hidroweb_dados", 200, lambda: fonte.serie_hidroweb(
+                params.get("Código da Estação", ""),
+                params.get("Data de Busca (yyyy-MM-dd)"),
+                params.get("Range Intervalo de busca"),
+            ))
+        if caminho == f"{PREFIXO_HIDROWEB}/HidroInventarioEstacoes/v1":
+            if not self._autorizado():
+                return self._responder_json("hidroweb_inventario", 401, {"message": "Token inválido ou expirado"})
+            return self._responder_json("hidroweb_inventario", 200,
+                                        lambda: fonte.inventario_hidroweb(params.get("Código da Estação", ""),
+                                                                          params.get("Unidade Federativa"),
+                                                                          params.get("Código da Bacia")))
+        match = re.match(rf"^{PREFIXO_CEMADEN}/horario/([^/]+)/(\d+)$", caminho)
+        if match:
+            return self._responder_json("cemaden", 200,
+                                        lambda: fonte.horario_cemaden(match.group(1), int(match.group(2))))
+        return self._responder_json("desconhecido", 404, {"message": f"Caminho não encontrado: {caminho}"},
+                                    aplicar_falhas=False)
+
+    def _autorizado(self):
+        autorizacao = self.headers.get("Authorization", "")
+        return autorizacao.startswith("Bearer ") and self.server.estado.token_valido(autorizacao[7:])
+
+    def _responder_json(self, endpoint, status, corpo, aplicar_falhas=True):
+        """
+        Envia a resposta JSON aplicando, quando habilitado, latência, 401, 5xx, timeout e corpo lento.
+        `corpo` pode ser um dicionário ou uma função que o produz (evita montar respostas que serão descartadas).
+        """
+        estado = self.server.estado
+        lento = False
+        if aplicar_falhas:
+            config = estado.config_endpoint(endpoint)
+            atraso = estado.latencia_s(config["latencia"])
+            if atraso:
+                time.sleep(atraso)
+            if estado.sortear(config["taxa_timeout"]):
+                # Segura a conexão sem responder; o cliente deve estourar o próprio timeout
+                time.sleep(float(config["timeout_s"]))
+                estado.registrar(endpoint, "timeout", 0)
+                self.close_connection = True
+                return
+            if status == 200 and estado.sortear(config["taxa_401"]):
+                status, corpo = 401, {"message": "Falha de autenticação injetada"}
+            elif status == 200 and estado.sortear(config["taxa_5xx"]):
+                with estado._lock:
+                    status = estado.rng.choice((500, 502, 503))
+                corpo = {"message": "Falha de servidor injetada"}
+            lento = estado.sortear(config["taxa_corpo_lento"])
+
+        dados = json.dumps(corpo() if callable(corpo) else corpo, ensure_ascii=False).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            if lento:
+                tamanho = max(int(config["corpo_lento_chunk_bytes"]), 1)
+                for inicio in range(0, len(dados), tamanho):
+                    self.wfile.write(dados[inicio:inicio + tamanho])
+                    self.wfile.flush()
+                    time.sleep(float(config["corpo_lento_atraso_s"]))
+            else:
+                self.wfile.write(dados)
+        except (BrokenPipeError, ConnectionResetError):
+            # O cliente desistiu (ex.: timeout de leitura durante um corpo lento)
+            self.close_connection = True
+        estado.registrar(endpoint, status, len(dados))
+
+
+class ServidorMock(ThreadingHTTPServer):
+    """Servidor HTTP multithread que carrega a fonte de dados e o estado de falhas."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco, fonte, estado):
+        super().__init__(endereco, ManipuladorMock)
+        self.fonte = fonte
+        self.estado = estado
+
+    @property
+    def url_raiz(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    @property
+    def hidroweb_base_url(self):
+        """Valor a ser usado em HIDROWEB_BASE_URL (ou no parâmetro base_url dos clientes HidroWeb)."""
+        return f"{self.url_raiz}/hidrowebservice"
+
+    @property
+    def cemaden_base_url(self):
+        """Valor a ser usado em CEMADEN_BASE_URL (ou no parâmetro base_url do scheduler do Cemaden)."""
+        return f"{self.url_raiz}{PREFIXO_CEMADEN}"
+
+
+def iniciar_servidor_mock(host="127.0.0.1", porta=0, root_dir='public/data', modo='misto', config=None, seed=None):
+    """
+    Inicia o servidor mock em uma thread de fundo.
+
+    @param host: Endereço de escuta.
+    @param porta: Porta de escuta (0 = porta livre escolhida pelo sistema).
+    @param root_dir: Diretório do acervo usado no replay.
+    @param modo: "replay", "sintetico" ou "misto".
+    @param config: Configuração inicial de falhas (ver CONFIG_PADRAO).
+    @param seed: Semente do sorteio de falhas, para execuções reprodutíveis.
+    @return: Instância de ServidorMock já atendendo; encerre com servidor.shutdown() e servidor.server_close().
+    """
+    servidor = ServidorMock((host, porta), FonteDadosMock(root_dir, modo), EstadoMock(config, seed))
+    thread = threading.Thread(target=servidor.serve_forever, name="mock-upstream", daemon=True)
+    thread.start()
+    logger.info(f"Servidor mock ativo em {servidor.url_raiz} (modo {modo})")
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor mock das APIs HidroWeb e Cemaden.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--root-dir", default="public/data")
+    parser.add_argument("--modo", choices=("replay", "sintetico", "misto"), default="misto")
+    parser.add_argument("--config", help="JSON com a configuração inicial de falhas")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = json.loads(args.config) if args.config else None
+    servidor = ServidorMock((args.host, args.porta), FonteDadosMock(args.root_dir, args.modo), EstadoMock(config, args.seed))
+    logger.info(f"HIDROWEB_BASE_URL={servidor.hidroweb_base_url}")
+    logger.info(f"CEMADEN_BASE_URL={servidor.cemaden_base_url}")
+    try:
+        servidor.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Servidor mock interrompido.")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.mock_upstream_server --porta 8765 --modo misto
@@ -0,0 +1,104 @@
+/**
+ * @file server/apis/ana/services/node/arquivoMensal.js
+ * @description Leitura dos dias das estações nas duas camadas de armazenamento (ver
+ * server/apis/ana/utils/arquivo_mensal.py): arquivos soltos em public/data/YYYY/MM/YYYY-MM-DD/ e dias
+ * fechados compactados em ZIPs mensais (public/data/YYYY/MM/_arquivo/grupo_NN.zip). Os ZIPs são gravados
+ * pelo zipfile do Python sem ZIP64, com membros "deflate"; o diretório central é usado como índice.
+ */
+
+import fs from 'fs/promises';
+import path from 'path';
+import zlib from 'zlib';
+
+export const DIRETORIO_ARQUIVO = '_arquivo';
+
+/**
+ * Lê o diretório central de um ZIP e retorna os membros do dia informado.
+ *
+ * @param {Buffer} zip - Conteúdo do arquivo ZIP.
+ * @param {Set<string>} dias - Dias desejados ("YYYY-MM-DD").
+ * @returns {Array<{nome: string, conteudo: string}>}
+ */
+function membrosDosDias(zip, dias) {
+  // Registro de fim do diretório central (procurado a partir do fim, antes do comentário)
+  let fim = zip.length - 22;
+  while (fim >= 0 && zip.readUInt32LE(fim) !== 0x06054b50) fim -= 1;
+  if (fim < 0) throw new Error('ZIP inválido: diretório central não encontrado');
+
+  const totalMembros = zip.readUInt16LE(fim + 10);
+  let posicao = zip.readUInt32LE(fim + 16);
+  const membros = [];
+  for (let i = 0; i < totalMembros; i += 1) {
+    if (zip.readUInt32LE(posicao) !== 0x02014b50) throw new Error('ZIP inválido: entrada do diretório central');
+    const metodo = zip.readUInt16LE(posicao + 10);
+    const tamanhoComprimido = zip.readUInt32LE(posicao + 20);
+    const tamanhoNome = zip.readUInt16LE(posicao + 28);
+    const tamanhoExtra = zip.readUInt16LE(posicao + 30);
+    const tamanhoComentario = zip.readUInt16LE(posicao + 32);
+    const deslocamentoLocal = zip.readUInt32LE(posicao + 42);
+    const nome = zip.toString('utf-8', posicao + 46, posicao + 46 + tamanhoNome);
+    posicao += 46 + tamanhoNome + tamanhoExtra + tamanhoComentario;
+
+    if (!dias.has(nome.split('/')[0])) continue;
+    const inicioDados = deslocamentoLocal + 30
+      + zip.readUInt16LE(deslocamentoLocal + 26) + zip.readUInt16LE(deslocamentoLocal + 28);
+    const dados = zip.subarray(inicioDados, inicioDados + tamanhoComprimido);
+    const conteudo = metodo === 8 ? zlib.inflateRawSync(dados) : dados;
+    membros.push({ nome, conteudo: conteudo.toString('utf-8') });
+  }
+  return membros;
+}
+
+/**
+ * Lê os documentos de todas as estações nos dias informados de um mês, em qualquer camada.
+ * Um arquivo solto prevalece sobre o mesmo dia arquivado.
+ *
+ * @param {string} baseDir - Diretório do mês (ex.: public/data/2025/02).
+ * @param {Iterable<string>} dias - Dias desejados ("YYYY-MM-DD").
+ * @returns {Promise<Array<Object>>} Documentos diários ({ codigoestacao, data, dados, ... }).
+ */
+export async function lerDiasDoMes(baseDir, dias) {
+  const desejados = new Set(dias);
+  const documentos = new Map(); // "dia/arquivo" -> documento
+
+  await Promise.all([...desejados].map(async (dia) => {
+    const diaPath = path.join(baseDir, dia);
+    let arquivos = [];
+    try {
+      arquivos = await fs.readdir(diaPath);
+    } catch (err) {
+      if (err.code !== 'ENOENT') console.error(`Erro ao ler o diretório ${diaPath}: ${err.message}`);
+      return;
+    }
+    await Promise.all(arquivos
+      .filter((arquivo) => arquivo.endsWith('.json'))
+      .map(async (arquivo) => {
+        const filePath = path.join(diaPath, arquivo);
+        try {
+          documentos.set(`${dia}/${arquivo}`, JSON.parse(await fs.readFile(filePath, 'utf-8')));
+        } catch (err) {
+          console.error(`Erro ao ler arquivo ${filePath}: ${err.message}`);
+        }
+      }));
+  }));
+
+  const dirArquivo = path.join(baseDir, DIRETORIO_ARQUIVO);
+  let zips = [];
+  try {
+    zips = (await fs.readdir(dirArquivo)).filter((nome) => nome.endsWith('.zip'));
+  } catch {
+    // Mês sem dias arquivados
+  }
+  await Promise.all(zips.map(async (nome) => {
+    const zipPath = path.join(dirArquivo, nome);
+    try {
+      membrosDosDias(await fs.readFile(zipPath), desejados).forEach(({ nome: membro, conteudo }) => {
+        if (!documentos.has(membro)) documentos.set(membro, JSON.parse(conteudo));
+      });
+    } catch (err) {
+      console.error(`Erro ao ler o arquivo mensal ${zipPath}: ${err.message}`);
+    }
+  }));
+
+  return [...documentos.values()];
+}
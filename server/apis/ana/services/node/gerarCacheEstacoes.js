@@ -9,6 +9,8 @@ import { addHours } from 'date-fns';
 import * as dateFnsTz from 'date-fns-tz';
 import { getHistoricalStationData } from './historicalStationData.js';
 
+// Projeção do inventário para o mapa (inventory_refresher.py); sem ela, usa o inventário completo
+const INVENTARIO_MAPA_PATH = path.join('public', 'data', 'inventario_estacoes_mapa.json');
 const INVENTARIO_PATH = path.join('public', 'data', 'inventario_estacoes.json');
 const OUTPUT_DIR = path.join('public', 'data', 'merged');
 
@@ -39,7 +41,9 @@ async function gerarCacheEstacoes() {
 
   // 📥 Carrega dados
   const [inventarioRaw, historico24h] = await Promise.all([
-    fs.readFile(INVENTARIO_PATH, 'utf-8').then(JSON.parse),
+    fs.readFile(INVENTARIO_MAPA_PATH, 'utf-8')
+      .catch(() => fs.readFile(INVENTARIO_PATH, 'utf-8'))
+      .then(JSON.parse),
     getHistoricalStationData(24, today)
   ]);
 
@@ -1,57 +1,21 @@
-import fs from 'fs/promises';
 import path from 'path';
+import { lerDiasDoMes } from './arquivoMensal.js';
 
 /**
- * Carrega os dados de todos os arquivos JSON de um diretório base.
- * Essa função processa os subdiretórios (dias) em paralelo.
+ * Carrega os registros dos dias informados de um diretório base (mês), tanto dos arquivos soltos
+ * quanto dos dias já compactados no arquivo mensal (ver arquivoMensal.js).
  *
  * @param {string} baseDir - Diretório base dos dados (ex.: /public/data/2025/02).
+ * @param {Iterable<string>} dias - Dias a carregar ("YYYY-MM-DD").
  * @returns {Promise<Array>} - Array com todos os registros carregados.
  */
-async function carregarDados(baseDir) {
-  let dias;
-  try {
-    dias = await fs.readdir(baseDir);
-  } catch (err) {
-    throw new Error(`Erro ao ler o diretório ${baseDir}: ${err.message}`);
-  }
-
-  const registrosPorDia = await Promise.all(
-    dias.map(async (dia) => {
-      const diaPath = path.join(baseDir, dia);
-      let arquivos = [];
-      try {
-        arquivos = await fs.readdir(diaPath);
-      } catch (err) {
-        console.error(`Erro ao ler o diretório ${diaPath}: ${err.message}`);
-        return []; // Se der erro, retorna array vazio para esse dia
-      }
-
-      const registrosArquivos = await Promise.all(
-        arquivos
-          .filter((arquivo) => arquivo.endsWith('.json'))
-          .map(async (arquivo) => {
-            const filePath = path.join(diaPath, arquivo);
-            try {
-              const content = await fs.readFile(filePath, 'utf-8');
-              const jsonData = JSON.parse(content);
-              if (Array.isArray(jsonData.dados)) {
-                const stationCode = jsonData.codigoestacao;
-                return jsonData.dados.map(r => ({ ...r, stationCode }));
-              }
-            } catch (err) {
-              console.error(`Erro ao ler arquivo ${filePath}: ${err.message}`);
-            }
-            return [];
-          })
-      );
-
-      // Retorna todos os registros deste dia (achatando o array)
-      return registrosArquivos.flat();
-    })
-  );
-
-  return registrosPorDia.flat();
+async function carregarDados(baseDir, dias) {
+  const documentos = await lerDiasDoMes(baseDir, dias);
+  return documentos.flatMap((jsonData) => {
+    if (!Array.isArray(jsonData.dados)) return [];
+    const stationCode = jsonData.codigoestacao;
+    return jsonData.dados.map(r => ({ ...r, stationCode }));
+  });
 }
 
 /**
@@ -109,7 +73,7 @@ export async function getHistoricalStationData(intervalHours, dateStr) {
   await Promise.all(
     Object.entries(baseDirs).map(async ([baseDir, diasSet]) => {
       try {
-        const registros = await carregarDados(baseDir);
+        const registros = await carregarDados(baseDir, diasSet);
         diasSet.forEach((dia) => {
           // Filtra os registros do dia específico
           dadosDoPeriodo = dadosDoPeriodo.concat(
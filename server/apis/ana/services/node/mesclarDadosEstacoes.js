@@ -25,14 +25,19 @@ function formatDate(date) {
     return validDate.toISOString().split('T')[0];
 }
 
+// Projeção do inventário com os campos usados pelo mapa, gerada por server/apis/ana/services/inventory_refresher.py.
+// Enquanto ela não existir, o inventário completo é usado.
+const INVENTORY_MAP_PATH = path.join('public', 'data', 'inventario_estacoes_mapa.json');
+const INVENTORY_PATH = path.join('public', 'data', 'inventario_estacoes.json');
+
 /**
  * Carrega o inventário de estações.
  * @returns {Promise<Object>}
  */
 async function loadInventory() {
     try {
-        const inventoryPath = path.join('public', 'data', 'inventario_estacoes.json');
-        const inventoryContent = await fs.readFile(inventoryPath, 'utf-8');
+        const inventoryContent = await fs.readFile(INVENTORY_MAP_PATH, 'utf-8')
+            .catch(() => fs.readFile(INVENTORY_PATH, 'utf-8'));
         return JSON.parse(inventoryContent);
     } catch (error) {
         console.error('Erro ao ler o inventário:', error);
@@ -0,0 +1,390 @@
+"""
+@file server/apis/ana/services/rainfall_grid.py
+@description Superfície de chuva interpolada (IDW) e pirâmide de tiles XYZ em PNG, gerada após cada ciclo.
+
+Para cada janela de acumulação (JANELAS_H: 1h, 3h, 6h, 12h e 24h):
+  1) soma a chuva de cada estação atualizada na janela que termina na sua última leitura
+     (mesma regra da chuvaAcumulada dos marcadores, ver utils/classificacao.py);
+  2) interpola os valores em uma grade regular sobre a área monitorada por IDW (inverso da distância
+     ao quadrado) com os k vizinhos mais próximos, buscados em uma árvore k-d (utils/kdtree.py);
+     células a mais de RAIO_MAXIMO_GRAUS da estação mais próxima ficam sem valor;
+  3) desenha a grade em tiles PNG 256x256 (Web Mercator) para os níveis de zoom ZOOMS, com as cores
+     das classes de chuva dos marcadores (MARKER_STYLE_CONFIG.chuva em src/utils/config.js).
+
+Os tiles de cada janela ficam em public/data/tiles/chuva/<janela>/<versao>/{z}/{x}/{y}.png, onde a
+versão é derivada do conteúdo das entradas (estações, coordenadas e valores): se as entradas de uma
+janela não mudaram desde a última geração, os tiles dela não são refeitos. O manifesto
+(public/data/tiles/chuva/manifest.json) indica a versão atual de cada janela, e o navegador monta a URL
+dos tiles a partir dele; como cada versão tem seu próprio diretório, os tiles podem ser armazenados em
+cache indefinidamente. Tiles totalmente transparentes não são gravados.
+
+Para gerar manualmente:
+    python -m server.apis.ana.services.rainfall_grid
+"""
+
+import os
+import json
+import math
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from server.apis.ana.utils.kdtree import ArvoreKD
+from server.apis.ana.utils.png import codificar_png_rgba
+from server.apis.ana.utils.tiles_xyz import tiles_cobrindo
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.utils.classificacao import (
+    CONFIG_CLASSIFICACAO, datas_referencia, status_atualizacao
+)
+from server.apis.ana.services.recent_ring import AnelRecente, carregar_serie_recente_anel
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+DIRETORIO_TILES = os.path.join("tiles", "chuva")  # relativo a DATA_ROOT
+URL_TILES = "/data/tiles/chuva"                  # URL do diretório acima (public/ é servido na raiz)
+
+JANELAS_H = (1, 3, 6, 12, 24)
+ZOOMS = tuple(range(4, 10))
+TAMANHO_TILE = 256
+
+RESOLUCAO_GRAUS = 0.025    # espaçamento da grade (~2,8 km)
+MARGEM_GRAUS = 0.25        # margem em torno das estações
+RAIO_MAXIMO_GRAUS = 0.75   # células mais distantes que isso da estação mais próxima ficam sem valor
+VIZINHOS = 8
+POTENCIA_IDW = 2.0
+
+# Versões antigas só são apagadas depois deste tempo, para não quebrar clientes com o manifesto anterior
+RETENCAO_VERSOES_S = 15 * 60
+
+# Cores RGBA por classe (índice 0: sem chuva / sem valor, transparente), na ordem dos limiares
+_ALFA = 170
+CORES_CLASSES = np.array([
+    (0, 0, 0, 0),
+    (0x00, 0xFF, 0x00, _ALFA),  # Fraca
+    (0xFF, 0xFF, 0x00, _ALFA),  # Moderada
+    (0xFF, 0xA5, 0x00, _ALFA),  # Forte
+    (0xFF, 0x00, 0x00, _ALFA),  # Muito Forte
+    (0x27, 0x04, 0x6B, _ALFA),  # Extrema
+], dtype=np.uint8)
+LIMIARES_CHUVA = np.array([limiar for limiar, _ in CONFIG_CLASSIFICACAO["chuva"]["limiares"]], dtype=np.float64)
+
+
+def nome_janela(horas):
+    return f"{int(horas)}h"
+
+
+# ---------------------------------------------------------------------------
+# Entradas: chuva por estação e janela
+# ---------------------------------------------------------------------------
+
+def carregar_chuva_estacoes(root_dir, inventario, agora_utc=None, janelas_h=JANELAS_H):
+    """
+    Soma a chuva de cada estação atualizada em cada janela.
+
+    @return: (codigos, coordenadas (n, 2) em [longitude, latitude], valores (n, janelas) com NaN
+             onde a estação não tem chuva válida na janela).
+    """
+    agora_utc = agora_utc or datetime.utcnow()
+    datas = datas_referencia(agora_utc)
+    agora_local = agora_utc - timedelta(hours=3)
+    janelas_s = np.array(janelas_h, dtype=np.float64) * 3600
+
+    # Leituras recentes pelo anel em memória mapeada (recent_ring), quando a ingestão o mantém
+    anel = AnelRecente.abrir_leitura(root_dir)
+    codigos, coordenadas, valores = [], [], []
+    for estacao in inventario:
+        try:
+            coordenada = (float(estacao["Longitude"]), float(estacao["Latitude"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        codigo = str(estacao.get("codigoestacao"))
+        leituras = carregar_serie_recente_anel(anel, root_dir, codigo, datas).ordenadas()
+        if not leituras or status_atualizacao(leituras[-1].medicao_texto, agora_local) != "Atualizado":
+            continue
+        medicoes = np.array([l.medicao for l in leituras], dtype=np.float64)
+        chuvas = np.array([np.nan if l.chuva is None else l.chuva for l in leituras], dtype=np.float64)
+        # Janela [ultima - w, ultima] para cada w (matriz janelas x leituras)
+        dentro = medicoes[None, :] >= medicoes[-1] - janelas_s[:, None]
+        validos = dentro & ~np.isnan(chuvas)[None, :]
+        somas = np.where(validos, np.nan_to_num(chuvas)[None, :], 0.0).sum(axis=1)
+        somas[~validos.any(axis=1)] = np.nan
+        codigos.append(codigo)
+        coordenadas.append(coordenada)
+        valores.append(np.round(somas, 2))
+
+    return (codigos, np.array(coordenadas, dtype=np.float64).reshape(-1, 2),
+            np.array(valores, dtype=np.float64).reshape(-1, len(janelas_h)))
+
+
+# ---------------------------------------------------------------------------
+# Grade e interpolação
+# ---------------------------------------------------------------------------
+
+class Grade:
+    """Grade regular em graus: células centradas em (lon0 + i * res, lat0 + j * res)."""
+
+    def __init__(self, oeste, sul, leste, norte, resolucao=RESOLUCAO_GRAUS):
+        self.resolucao = float(resolucao)
+        self.lon0, self.lat0 = float(oeste), float(sul)
+        self.nx = int(math.floor((leste - oeste) / self.resolucao)) + 1
+        self.ny = int(math.floor((norte - sul) / self.resolucao)) + 1
+        # Fator para aproximar distâncias em km na latitude média (1° de longitude encolhe com o cosseno)
+        self.escala_lon = math.cos(math.radians((sul + norte) / 2))
+
+    @classmethod
+    def envolvendo(cls, coordenadas, margem=MARGEM_GRAUS, resolucao=RESOLUCAO_GRAUS):
+        minimos = np.floor((coordenadas.min(axis=0) - margem) / resolucao) * resolucao
+        maximos = np.ceil((coordenadas.max(axis=0) + margem) / resolucao) * resolucao
+        return cls(minimos[0], minimos[1], maximos[0], maximos[1], resolucao)
+
+    @property
+    def limites(self):
+        """(oeste, sul, leste, norte) dos centros das células."""
+        return (self.lon0, self.lat0, self.lon0 + (self.nx - 1) * self.resolucao,
+                self.lat0 + (self.ny - 1) * self.resolucao)
+
+    def projetar(self, coordenadas):
+        """Coordenadas [lon, lat] em um plano aproximadamente isométrico (graus de latitude)."""
+        return np.column_stack([coordenadas[:, 0] * self.escala_lon, coordenadas[:, 1]])
+
+    def centros(self):
+        lons = self.lon0 + np.arange(self.nx) * self.resolucao
+        lats = self.lat0 + np.arange(self.ny) * self.resolucao
+        malha_lon, malha_lat = np.meshgrid(lons, lats)
+        return np.column_stack([malha_lon.ravel(), malha_lat.ravel()])
+
+
+class VizinhancaGrade:
+    """Vizinhos mais próximos de cada célula da grade (calculados uma vez por conjunto de estações)."""
+
+    def __init__(self, grade, coordenadas, k=VIZINHOS, raio_maximo=RAIO_MAXIMO_GRAUS):
+        arvore = ArvoreKD(grade.projetar(coordenadas))
+        self.distancias, self.indices = arvore.consultar(grade.projetar(grade.centros()), k)
+        self.cobertas = self.distancias[:, 0] <= raio_maximo
+        self.forma = (grade.ny, grade.nx)
+
+    def interpolar(self, valores, potencia=POTENCIA_IDW):
+        """IDW: média dos vizinhos ponderada por 1/d^p; células sobre uma estação recebem o valor dela."""
+        vizinhos = valores[self.indices]
+        with np.errstate(divide="ignore"):
+            pesos = 1.0 / np.power(self.distancias, potencia)
+        exatas = self.distancias[:, 0] == 0
+        pesos[exatas] = 0.0
+        pesos[exatas, 0] = 1.0
+        resultado = (pesos * vizinhos).sum(axis=1) / pesos.sum(axis=1)
+        resultado[~self.cobertas] = np.nan
+        return resultado.reshape(self.forma)
+
+
+# ---------------------------------------------------------------------------
+# Tiles
+# ---------------------------------------------------------------------------
+
+def _coordenadas_pixels(zoom, x, y, tamanho=TAMANHO_TILE):
+    """Longitudes (colunas) e latitudes (linhas) dos centros dos pixels de um tile."""
+    total = tamanho * 2 ** zoom
+    px = (x * tamanho + np.arange(tamanho) + 0.5) / total
+    py = (y * tamanho + np.arange(tamanho) + 0.5) / total
+    lons = px * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * py))))
+    return lons, lats
+
+
+def amostrar_grade(grade, valores, lons, lats):
+    """Amostra a grade (ny, nx) nos pixels (interpolação bilinear; vizinho mais próximo junto às bordas sem valor)."""
+    gx = (lons - grade.lon0) / grade.resolucao
+    gy = (lats - grade.lat0) / grade.resolucao
+    gx, gy = np.meshgrid(gx, gy)
+    fora = (gx < -0.5) | (gx > grade.nx - 0.5) | (gy < -0.5) | (gy > grade.ny - 0.5)
+
+    gx = np.clip(gx, 0, grade.nx - 1)
+    gy = np.clip(gy, 0, grade.ny - 1)
+    x0 = np.minimum(np.floor(gx).astype(np.int64), grade.nx - 2) if grade.nx > 1 else np.zeros_like(gx, np.int64)
+    y0 = np.minimum(np.floor(gy).astype(np.int64), grade.ny - 2) if grade.ny > 1 else np.zeros_like(gy, np.int64)
+    x1 = np.minimum(x0 + 1, grade.nx - 1)
+    y1 = np.minimum(y0 + 1, grade.ny - 1)
+    fx, fy = gx - x0, gy - y0
+    resultado = ((valores[y0, x0] * (1 - fx) + valores[y0, x1] * fx) * (1 - fy)
+                 + (valores[y1, x0] * (1 - fx) + valores[y1, x1] * fx) * fy)
+
+    sem_valor = np.isnan(resultado)
+    if sem_valor.any():
+        proximos = valores[np.rint(gy).astype(np.int64), np.rint(gx).astype(np.int64)]
+        resultado[sem_valor] = proximos[sem_valor]
+    resultado[fora] = np.nan
+    return resultado
+
+
+def colorir(valores):
+    """Converte valores de chuva em RGBA pelas classes (0 ou sem valor: transparente)."""
+    classes = np.zeros(valores.shape, dtype=np.int64)
+    com_chuva = np.nan_to_num(valores, nan=0.0) > 0
+    classes[com_chuva] = 1 + np.searchsorted(LIMIARES_CHUVA, valores[com_chuva], side="left")
+    return CORES_CLASSES[classes]
+
+
+def renderizar_tiles(grade, valores, destino, zooms=ZOOMS):
+    """
+    Grava a pirâmide de tiles da grade em destino/{z}/{x}/{y}.png.
+
+    @return: Número de tiles gravados (os totalmente transparentes são omitidos).
+    """
+    gravados = 0
+    for zoom in zooms:
+        x_min, x_max, y_min, y_max = tiles_cobrindo(grade.limites, zoom)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                lons, lats = _coordenadas_pixels(zoom, x, y)
+                imagem = colorir(amostrar_grade(grade, valores, lons, lats))
+                if not imagem[..., 3].any():
+                    continue
+                caminho = os.path.join(destino, str(zoom), str(x), f"{y}.png")
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                with open(caminho, "wb") as f:
+                    f.write(codificar_png_rgba(imagem))
+                gravados += 1
+    return gravados
+
+
+# ---------------------------------------------------------------------------
+# Geração incremental
+# ---------------------------------------------------------------------------
+
+def assinatura_entradas(grade, codigos, coordenadas, valores, zooms):
+    """Identifica as entradas de uma janela; muda se qualquer estação, coordenada ou valor mudar."""
+    h = hashlib.sha1()
+    h.update(json.dumps([grade.limites, grade.resolucao, list(zooms), RAIO_MAXIMO_GRAUS, VIZINHOS,
+                         POTENCIA_IDW, CORES_CLASSES.tolist(), LIMIARES_CHUVA.tolist()]).encode("utf-8"))
+    h.update("\n".join(codigos).encode("utf-8"))
+    h.update(np.ascontiguousarray(coordenadas).tobytes())
+    h.update(np.ascontiguousarray(valores).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _ler_manifesto(caminho):
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"janelas": {}}
+
+
+def _remover_versoes_antigas(diretorio_janela, versao_atual):
+    limite = time.time() - RETENCAO_VERSOES_S
+    for nome in os.listdir(diretorio_janela):
+        caminho = os.path.join(diretorio_janela, nome)
+        if nome != versao_atual and os.path.isdir(caminho) and os.path.getmtime(caminho) < limite:
+            shutil.rmtree(caminho, ignore_errors=True)
+
+
+def gerar_superficies_chuva(root_dir=DATA_ROOT, agora_utc=None, inventario=None, janelas_h=JANELAS_H,
+                            zooms=ZOOMS, forcar=False):
+    """
+    Gera (ou mantém) os tiles de cada janela e atualiza o manifesto.
+
+    @param root_dir: Diretório raiz dos dados (inventário, arquivos diários e tiles).
+    @param inventario: Lista de estações (padrão: root_dir/inventario_estacoes.json).
+    @param forcar: Se True, regera todas as janelas mesmo sem mudança nas entradas.
+    @return: Lista com os nomes das janelas regeradas.
+    """
+    inicio = time.time()
+    agora_utc = agora_utc or datetime.utcnow()
+    if inventario is None:
+        with open(os.path.join(root_dir, "inventario_estacoes.json"), "r", encoding="utf-8") as f:
+            inventario = json.load(f)
+
+    coordenadas_inventario = []
+    for estacao in inventario:
+        try:
+            coordenadas_inventario.append((float(estacao["Longitude"]), float(estacao["Latitude"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if not coordenadas_inventario:
+        raise ValueError("O inventário não possui estações com coordenadas.")
+    # A grade cobre todo o inventário, para ficar estável entre ciclos
+    grade = Grade.envolvendo(np.array(coordenadas_inventario))
+
+    codigos, coordenadas, valores = carregar_chuva_estacoes(root_dir, inventario, agora_utc, janelas_h)
+    diretorio = os.path.join(root_dir, DIRETORIO_TILES)
+    caminho_manifesto = os.path.join(diretorio, "manifest.json")
+    manifesto = _ler_manifesto(caminho_manifesto)
+    vizinhancas = {}
+    regeradas = []
+
+    for coluna, horas in enumerate(janelas_h):
+        janela = nome_janela(horas)
+        validos = ~np.isnan(valores[:, coluna]) if len(valores) else np.zeros(0, dtype=bool)
+        codigos_janela = [c for c, v in zip(codigos, validos) if v]
+        coordenadas_janela, valores_janela = coordenadas[validos], valores[validos, coluna]
+        versao = assinatura_entradas(grade, codigos_janela, coordenadas_janela, valores_janela, zooms)
+        destino = os.path.join(diretorio, janela, versao)
+
+        anterior = manifesto["janelas"].get(janela, {})
+        if not forcar and anterior.get("versao") == versao and os.path.isdir(destino):
+            continue
+
+        if not os.path.isdir(destino) or forcar:
+            temporario = f"{destino}.{os.getpid()}.tmp"
+            shutil.rmtree(temporario, ignore_errors=True)
+            tiles = 0
+            if len(codigos_janela):
+                chave = tuple(codigos_janela)
+                if chave not in vizinhancas:
+                    vizinhancas[chave] = VizinhancaGrade(grade, coordenadas_janela)
+                superficie = vizinhancas[chave].interpolar(valores_janela)
+                tiles = renderizar_tiles(grade, superficie, temporario, zooms)
+            os.makedirs(temporario, exist_ok=True)
+            shutil.rmtree(destino, ignore_errors=True)
+            os.replace(temporario, destino)
+            logger.info(f"[superficie] Janela {janela}: {len(codigos_janela)} estações, {tiles} tiles.")
+
+        manifesto["janelas"][janela] = {
+            "versao": versao,
+            "url": f"{URL_TILES}/{janela}/{versao}/{{z}}/{{x}}/{{y}}.png",
+            "gerado_em": agora_utc.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "estacoes": len(codigos_janela),
+            "maximo": float(np.max(valores_janela)) if len(valores_janela) else None,
+        }
+        regeradas.append(janela)
+
+    if regeradas or not os.path.exists(caminho_manifesto):
+        oeste, sul, leste, norte = grade.limites
+        manifesto.update({"limites": [[sul, oeste], [norte, leste]], "zooms": [min(zooms), max(zooms)]})
+        gravar_arquivo_atomico(caminho_manifesto, json.dumps(manifesto, ensure_ascii=False, indent=2))
+    for janela in manifesto["janelas"]:
+        diretorio_janela = os.path.join(diretorio, janela)
+        if os.path.isdir(diretorio_janela):
+            _remover_versoes_antigas(diretorio_janela, manifesto["janelas"][janela]["versao"])
+
+    print(f"Superfícies de chuva: {len(regeradas)} janelas regeradas em {time.time() - inicio:.2f}s "
+          f"({', '.join(regeradas) or 'nenhuma'}).")
+    return regeradas
+
+
+def tarefa_superficie_chuva(feed, versao=None, delta=None):
+    """Tarefa pós-ciclo (ColetorCiclo.apos_publicar): atualiza as superfícies de chuva."""
+    return gerar_superficies_chuva(root_dir=feed.root_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera os tiles da superfície de chuva interpolada.")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--agora", help="Instante de referência em UTC (YYYY-MM-DDTHH:MM), para dados antigos.")
+    parser.add_argument("--forcar", action="store_true", help="Regera todas as janelas.")
+    args = parser.parse_args()
+    agora = datetime.strptime(args.agora, "%Y-%m-%dT%H:%M") if args.agora else None
+    gerar_superficies_chuva(args.root_dir, agora_utc=agora, forcar=args.forcar)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.rainfall_grid
@@ -0,0 +1,143 @@
+"""
+@file server/apis/ana/services/rainfall_stats.py
+@description Estatísticas de chuva acumulada por município, bacia, sub-bacia e UF, calculadas uma vez por ciclo.
+
+A chuva acumulada de cada estação vem dos resumos do feed de alterações (mesma regra do categorizeStation:
+soma das últimas 24h até a última leitura). As estatísticas são calculadas com group-bys do pandas e
+gravadas em um único arquivo JSON compacto (public/data/estatisticas_chuva.json), com um número de
+versão que só é incrementado quando o conteúdo muda. O servidor Node e o navegador leem esse arquivo
+em vez de recalcular média, mediana e desvio padrão a cada requisição.
+
+Convenções (as mesmas de /estacoes/chuvaPorCidade e estatisticasChuva.js):
+  - nomes dos grupos sem espaços nas pontas e em maiúsculas; ausentes viram "DESCONHECIDO";
+  - estações sem chuva acumulada válida são ignoradas (não contam como zero);
+  - desvio padrão populacional (ddof=0).
+"""
+
+import os
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.utils.classificacao import CONFIG_CLASSIFICACAO
+
+DATA_ROOT = os.path.join("public", "data")
+ARQUIVO_ESTATISTICAS = "estatisticas_chuva.json"
+
+# Campo do inventário -> nome do agrupamento no arquivo
+AGRUPAMENTOS = ("Municipio_Nome", "Bacia_Nome", "Sub_Bacia_Nome", "UF_Estacao")
+
+
+def _normalizar_nome(valor):
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return "DESCONHECIDO"
+    texto = str(valor).strip().upper()
+    return texto or "DESCONHECIDO"
+
+
+def _estatisticas_serie(valores):
+    """Estatísticas de um conjunto de valores (usado para o resumo geral)."""
+    if valores.empty:
+        return {"numEstacoes": 0, "media": None, "mediana": None, "desvioPadrao": None, "maximo": None}
+    return {
+        "numEstacoes": int(valores.count()),
+        "media": round(float(valores.mean()), 2),
+        "mediana": round(float(valores.median()), 2),
+        "desvioPadrao": round(float(valores.std(ddof=0)), 2),
+        "maximo": round(float(valores.max()), 2),
+    }
+
+
+def calcular_estatisticas(inventario, resumos):
+    """
+    Calcula as estatísticas de chuva por agrupamento.
+
+    @param inventario: Lista de estações do inventário (inventario_estacoes.json).
+    @param resumos: Dicionário {codigoestacao: resumo} com "chuvaAcumulada" (ver change_feed.FeedAlteracoes.resumos).
+    @return: Dicionário com "geral", "grupos" e "estacoes" (sem versão e data de geração).
+    """
+    colunas = ["codigoestacao", "Estacao_Nome", *AGRUPAMENTOS]
+    df = pd.DataFrame([{coluna: estacao.get(coluna) for coluna in colunas} for estacao in inventario], columns=colunas)
+    df["codigoestacao"] = df["codigoestacao"].astype(str)
+    df = df.drop_duplicates("codigoestacao")
+    df["chuva"] = pd.to_numeric(
+        df["codigoestacao"].map(lambda codigo: (resumos.get(codigo) or {}).get("chuvaAcumulada")), errors="coerce")
+    df = df.dropna(subset=["chuva"])
+    for coluna in AGRUPAMENTOS:
+        df[coluna] = df[coluna].map(_normalizar_nome)
+
+    grupos = {}
+    for coluna in AGRUPAMENTOS:
+        agrupado = df.groupby(coluna, sort=True)
+        tabela = agrupado["chuva"].agg(["count", "mean", "median", "max"])
+        tabela["std"] = agrupado["chuva"].std(ddof=0)
+        tabela["estacoes"] = agrupado["codigoestacao"].agg(list)
+        tabela[["mean", "median", "max", "std"]] = tabela[["mean", "median", "max", "std"]].round(2)
+        grupos[coluna] = [
+            {
+                "nome": nome,
+                "numEstacoes": int(linha["count"]),
+                "media": float(linha["mean"]),
+                "mediana": float(linha["median"]),
+                "desvioPadrao": float(linha["std"]),
+                "maximo": float(linha["max"]),
+                "estacoes": linha["estacoes"],
+            }
+            for nome, linha in tabela.iterrows()
+        ]
+
+    geral = _estatisticas_serie(df["chuva"])
+    if not df.empty:
+        maior = df.loc[df["chuva"].idxmax()]
+        geral["estacaoMaximo"] = {"codigoestacao": maior["codigoestacao"], "Municipio_Nome": maior["Municipio_Nome"]}
+
+    estacoes = {
+        linha.codigoestacao: {"Estacao_Nome": linha.Estacao_Nome, "chuvaAcumulada": round(float(linha.chuva), 2)}
+        for linha in df.itertuples(index=False)
+    }
+    return {"geral": geral, "grupos": grupos, "estacoes": estacoes}
+
+
+def atualizar_estatisticas_chuva(resumos, root_dir=DATA_ROOT, inventario=None, agora_utc=None):
+    """
+    Recalcula as estatísticas e regrava o arquivo somente se o conteúdo mudou.
+
+    @param resumos: Dicionário {codigoestacao: resumo} das estações.
+    @param root_dir: Diretório onde ficam o inventário e o arquivo de estatísticas.
+    @param inventario: Lista de estações (padrão: lida de root_dir/inventario_estacoes.json).
+    @return: Versão do arquivo após a atualização.
+    """
+    if inventario is None:
+        with open(os.path.join(root_dir, "inventario_estacoes.json"), "r", encoding="utf-8") as f:
+            inventario = json.load(f)
+
+    conteudo = calcular_estatisticas(inventario, resumos)
+    caminho = os.path.join(root_dir, ARQUIVO_ESTATISTICAS)
+    anterior = None
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    campos = ("geral", "grupos", "estacoes")
+    if anterior and all(anterior.get(campo) == conteudo[campo] for campo in campos):
+        return anterior.get("versao", 0)
+
+    versao = (anterior or {}).get("versao", 0) + 1
+    documento = {
+        "versao": versao,
+        "gerado_em": (agora_utc or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "periodo_h": CONFIG_CLASSIFICACAO["periodo_acumulacao_chuva_h"],
+        **conteudo,
+    }
+    gravar_arquivo_atomico(caminho, json.dumps(documento, ensure_ascii=False, separators=(",", ":")))
+    print(f"Estatísticas de chuva atualizadas (versão {versao}): {conteudo['geral']['numEstacoes']} estações.")
+    return versao
+
+
+def tarefa_estatisticas_chuva(feed, versao=None, delta=None):
+    """Tarefa pós-ciclo (ColetorCiclo.apos_publicar): recalcula as estatísticas a partir do estado do feed."""
+    return atualizar_estatisticas_chuva(feed.resumos(), root_dir=feed.root_dir)
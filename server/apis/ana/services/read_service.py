@@ -0,0 +1,257 @@
+"""
+@file server/apis/ana/services/read_service.py
+@description Serviço HTTP de leitura sobre o acervo de dados das estações (e importação de camadas vetoriais).
+
+Endpoints:
+  - GET /series/{codigoestacao}?inicio=YYYY-MM-DD&fim=YYYY-MM-DD&variaveis=cota,vazao&pontos=500&metodo=lttb
+    Série de um intervalo arbitrário, reduzida no servidor para no máximo `pontos` pontos por variável.
+    Responde com ETag; se o cliente enviar If-None-Match com a mesma ETag, a resposta é 304 sem corpo.
+  - GET /alteracoes?desde=N&timeout=25
+    Long-poll do feed de alterações (ver change_feed.py): responde assim que houver estações alteradas
+    após a versão N, ou com a lista vazia ao fim do timeout. Sem "desde" (ou 0), retorna o estado completo.
+  - GET /alteracoes/versao
+    Versão atual do feed.
+  - GET /alteracoes/stream?desde=N
+    As mesmas alterações como Server-Sent Events (um evento por versão com estações alteradas).
+  - GET /status
+    Estatísticas dos caches do serviço.
+  - POST /camadas?nome=arquivo.kml
+    Importa um arquivo vetorial (corpo da requisição) e responde com o manifesto da pirâmide de tiles
+    (ver vector_tiles.py); os tiles são servidos estaticamente em /data/camadas/<chave>/{z}/{x}/{y}.json.
+
+O servidor Node encaminha as requisições de /api/stationData/estacoes/serie/... para este serviço
+(variável de ambiente READ_SERVICE_URL). Para executar:
+    python -m server.apis.ana.services.read_service --porta 5001
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+from server.apis.ana.services.series_query import ConsultaSeries, DATA_ROOT, PONTOS_PADRAO
+from server.apis.ana.services.change_feed import FeedAlteracoes
+from server.apis.ana.services.vector_tiles import importar_arquivo
+
+# Tempo máximo de espera de um long-poll e intervalo entre comentários de keep-alive do SSE
+TIMEOUT_MAXIMO_LONG_POLL_S = 55
+INTERVALO_KEEPALIVE_SSE_S = 15
+# Tamanho máximo de um arquivo vetorial importado por POST /camadas
+TAMANHO_MAXIMO_CAMADA = 512 * 1024 * 1024
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ManipuladorLeitura(BaseHTTPRequestHandler):
+    """Encaminha cada requisição para a rota correspondente (método e caminho) de ServicoLeitura."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MtDashboardRead/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        self.atender("GET")
+
+    def do_POST(self):
+        self.atender("POST")
+
+    def atender(self, metodo):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        caminho = url.path.rstrip("/") or "/"
+        for metodo_rota, padrao, rota in self.server.rotas:
+            match = padrao.match(caminho) if metodo_rota == metodo else None
+            if match:
+                try:
+                    resposta = rota(self, match, params)
+                except ValueError as e:
+                    resposta = (400, {"error": str(e)}, {})
+                except Exception as e:
+                    logger.error(f"Erro ao atender {self.path}: {e}")
+                    resposta = (500, {"error": "Erro interno no serviço de leitura."}, {})
+                if resposta is not None:
+                    self.responder_json(*resposta)
+                return
+        self.responder_json(404, {"error": "Rota não encontrada."}, {})
+
+    def responder_json(self, status, corpo, cabecalhos):
+        """Envia a resposta JSON (ou apenas os cabeçalhos, no caso de 304)."""
+        dados = b"" if status == 304 else json.dumps(corpo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        try:
+            self.send_response(status)
+            if status != 304:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            for nome, valor in cabecalhos.items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            if dados:
+                self.wfile.write(dados)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+def rota_series(manipulador, match, params):
+    consulta = manipulador.server.consulta_series
+    variaveis = [v.strip() for v in params.get("variaveis", "cota,vazao,chuva").split(",") if v.strip()]
+    try:
+        pontos = int(params.get("pontos", PONTOS_PADRAO))
+    except ValueError:
+        raise ValueError("O parâmetro 'pontos' deve ser um número inteiro.")
+    if "inicio" not in params or "fim" not in params:
+        raise ValueError("Os parâmetros 'inicio' e 'fim' são obrigatórios.")
+
+    etag, resultado = consulta.consultar(
+        unquote(match.group(1)), params["inicio"], params["fim"], variaveis=variaveis, pontos=pontos,
+        metodo=params.get("metodo", "lttb"), etag_cliente=manipulador.headers.get("If-None-Match"))
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    if resultado is None:
+        return 304, None, cabecalhos
+    return 200, resultado, cabecalhos
+
+
+def _versao_parametro(params):
+    try:
+        return int(params.get("desde", 0) or 0)
+    except ValueError:
+        raise ValueError("O parâmetro 'desde' deve ser um número inteiro.")
+
+
+def rota_alteracoes(manipulador, match, params):
+    try:
+        timeout = min(float(params.get("timeout", 25)), TIMEOUT_MAXIMO_LONG_POLL_S)
+    except ValueError:
+        raise ValueError("O parâmetro 'timeout' deve ser numérico.")
+    resultado = manipulador.server.feed.aguardar_alteracoes(_versao_parametro(params), timeout_s=timeout)
+    return 200, resultado, {"Cache-Control": "no-store"}
+
+
+def rota_versao_alteracoes(manipulador, match, params):
+    return 200, {"versao": manipulador.server.feed.versao_atual()}, {"Cache-Control": "no-store"}
+
+
+def rota_stream_alteracoes(manipulador, match, params):
+    """Server-Sent Events: mantém a conexão aberta e envia um evento a cada versão com alterações."""
+    feed = manipulador.server.feed
+    versao = _versao_parametro(params) or int(manipulador.headers.get("Last-Event-ID", 0) or 0)
+    manipulador.send_response(200)
+    manipulador.send_header("Content-Type", "text/event-stream; charset=utf-8")
+    manipulador.send_header("Cache-Control", "no-store")
+    manipulador.send_header("Connection", "close")
+    manipulador.end_headers()
+    manipulador.close_connection = True
+    try:
+        primeiro = True
+        while True:
+            resultado = feed.aguardar_alteracoes(versao, timeout_s=INTERVALO_KEEPALIVE_SSE_S)
+            completo_novo = resultado["completo"] and (primeiro or resultado["versao"] != versao)
+            if resultado["estacoes"] or completo_novo:
+                dados = json.dumps(resultado, ensure_ascii=False, separators=(",", ":"))
+                manipulador.wfile.write(f"id: {resultado['versao']}\nevent: alteracoes\ndata: {dados}\n\n".encode("utf-8"))
+            else:
+                if resultado["completo"]:
+                    # Feed ainda vazio: aguardar_alteracoes retorna imediatamente, então espera aqui
+                    time.sleep(INTERVALO_KEEPALIVE_SSE_S)
+                manipulador.wfile.write(b": keep-alive\n\n")
+            manipulador.wfile.flush()
+            primeiro = False
+            versao = resultado["versao"]
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    return None
+
+
+def rota_status(manipulador, match, params):
+    return 200, {"series": dict(manipulador.server.consulta_series.estatisticas)}, {}
+
+
+def rota_importar_camada(manipulador, match, params):
+    nome = params.get("nome")
+    if not nome:
+        raise ValueError("Informe o nome do arquivo (parâmetro 'nome').")
+    tamanho = int(manipulador.headers.get("Content-Length") or 0)
+    if tamanho <= 0:
+        raise ValueError("O corpo da requisição deve conter o arquivo.")
+    if tamanho > TAMANHO_MAXIMO_CAMADA:
+        manipulador.close_connection = True
+        return 413, {"error": "Arquivo maior que o limite de importação."}, {}
+    conteudo = manipulador.rfile.read(tamanho)
+    manifesto = importar_arquivo(conteudo, os.path.basename(nome), manipulador.server.root_dir)
+    return (200 if manifesto["reaproveitado"] else 201), manifesto, {}
+
+
+class ServicoLeitura(ThreadingHTTPServer):
+    """Servidor HTTP do serviço de leitura; novas rotas podem ser registradas com adicionar_rota."""
+
+    daemon_threads = True
+
+    def __init__(self, endereco, root_dir=DATA_ROOT, consulta_series=None, feed=None):
+        super().__init__(endereco, ManipuladorLeitura)
+        self.root_dir = root_dir
+        self.consulta_series = consulta_series or ConsultaSeries(root_dir)
+        self.feed = feed or FeedAlteracoes(os.path.join(root_dir, "feed_alteracoes.sqlite3"), root_dir=root_dir)
+        self.rotas = []
+        self.adicionar_rota(r"^/series/([^/]+)$", rota_series)
+        self.adicionar_rota(r"^/alteracoes$", rota_alteracoes)
+        self.adicionar_rota(r"^/alteracoes/versao$", rota_versao_alteracoes)
+        self.adicionar_rota(r"^/alteracoes/stream$", rota_stream_alteracoes)
+        self.adicionar_rota(r"^/status$", rota_status)
+        self.adicionar_rota(r"^/camadas$", rota_importar_camada, metodo="POST")
+
+    def adicionar_rota(self, padrao, rota, metodo="GET"):
+        """
+        @param padrao: Expressão regular aplicada ao caminho da URL.
+        @param rota: Função (manipulador, match, params) -> (status, corpo, cabeçalhos) ou None se já respondeu.
+        @param metodo: Método HTTP atendido pela rota.
+        """
+        self.rotas.append((metodo, re.compile(padrao), rota))
+
+    @property
+    def url_raiz(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+
+def iniciar_servico_leitura(host="127.0.0.1", porta=0, root_dir=DATA_ROOT):
+    """
+    Inicia o serviço de leitura em uma thread de fundo (usado em testes e junto aos schedulers).
+
+    @return: Instância de ServicoLeitura já atendendo; encerre com servico.shutdown() e servico.server_close().
+    """
+    servico = ServicoLeitura((host, porta), root_dir)
+    thread = threading.Thread(target=servico.serve_forever, name="read-service", daemon=True)
+    thread.start()
+    logger.info(f"Serviço de leitura ativo em {servico.url_raiz}")
+    return servico
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP de leitura das séries das estações.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=5001)
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    args = parser.parse_args()
+
+    servico = ServicoLeitura((args.host, args.porta), args.root_dir)
+    logger.info(f"Serviço de leitura ativo em {servico.url_raiz}")
+    try:
+        servico.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Serviço de leitura interrompido.")
+    finally:
+        servico.server_close()
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.read_service --porta 5001
@@ -0,0 +1,368 @@
+"""
+@file server/apis/ana/services/recent_ring.py
+@description Anel circular em memória mapeada (mmap) com as últimas 48h de leituras horárias das estações.
+
+Os construtores de produtos (ex.: a superfície de chuva) precisam só das leituras recentes, mas liam e
+interpretavam os arquivos diários JSON de hoje e de ontem de cada estação. O ingestor já tem essas
+leituras em memória; aqui ele as grava em um arquivo binário de tamanho fixo (public/data/anel_recente.bin)
+que outros processos mapeiam somente para leitura e consultam sem interpretar JSON.
+
+Layout (little-endian):
+  - cabeçalho (64 bytes): assinatura "ANELREC1", horas, capacidade, número de estações, sequência
+    (seqlock) e a hora mais recente gravada;
+  - índice: capacidade x 32 bytes com o código de cada estação (UTF-8, completado com zeros);
+  - dados: capacidade x horas registros (medicao i8, atualizacao_ms i8, chuva f8, cota f8, vazao f8).
+    A leitura da hora h (medicao // 3600) fica no registro h % horas da estação; o campo medicao do
+    registro indica a que hora ele pertence, de modo que registros de horas antigas são reconhecidos.
+
+Leituras da mesma hora (estações com leituras a cada 10/15 min): cota e vazão da última leitura,
+chuva somada. Leituras com medição anterior ou igual à última já incorporada na hora são ignoradas,
+o que torna a gravação idempotente.
+
+Concorrência: os escritores (schedulers do HidroWeb e do Cemaden, workers em modo shard) se excluem por
+uma trava de arquivo. Os leitores usam o contador de sequência (seqlock): o escritor o torna ímpar antes
+de alterar o anel e par ao terminar; o leitor copia os registros da estação entre duas leituras do
+contador e repete a cópia se ele mudou ou estava ímpar, nunca vendo valores pela metade.
+
+Uma estação é incluída no anel na primeira vez em que aparece em um lote, já com as leituras dos
+arquivos diários das últimas 48h, e a partir daí o anel é completo para ela.
+"""
+
+import os
+import mmap
+import time
+import struct
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from server.apis.ana.utils.leituras import Leitura, SerieLeituras, segundos_para_texto, texto_para_segundos
+from server.apis.ana.utils.classificacao import carregar_serie_recente
+from server.apis.ana.services.change_feed import codigo_do_arquivo
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+ARQUIVO_ANEL = "anel_recente.bin"
+HORAS = 48
+CAPACIDADE = 2048
+
+ASSINATURA = b"ANELREC1"
+_CABECALHO = struct.Struct("<8sIII4xQq")  # assinatura, horas, capacidade, estacoes, sequencia, hora_recente
+TAMANHO_CABECALHO = 64
+_OFFSET_ESTACOES = 16
+_OFFSET_SEQUENCIA = 24
+_OFFSET_HORA_RECENTE = 32
+TAMANHO_CODIGO = 32
+REGISTRO = np.dtype([("medicao", "<i8"), ("atualizacao_ms", "<i8"), ("chuva", "<f8"), ("cota", "<f8"),
+                     ("vazao", "<f8")])
+_VAZIO = -1
+
+
+def caminho_anel(root_dir=DATA_ROOT):
+    return os.path.join(root_dir, ARQUIVO_ANEL)
+
+
+def _tamanho_arquivo(horas, capacidade):
+    return TAMANHO_CABECALHO + capacidade * TAMANHO_CODIGO + capacidade * horas * REGISTRO.itemsize
+
+
+class AnelRecente:
+    """Acesso ao anel: escrita (ingestão) ou somente leitura (demais processos)."""
+
+    def __init__(self, caminho, escrita=False, root_dir=DATA_ROOT, horas=HORAS, capacidade=CAPACIDADE):
+        """
+        @param caminho: Arquivo do anel.
+        @param escrita: Se True, cria o arquivo (se preciso) e permite gravar; se False, o arquivo precisa existir.
+        @param root_dir: Diretório dos arquivos diários (carga inicial das estações novas, apenas na escrita).
+        @param horas, capacidade: Geometria usada ao criar o arquivo (na leitura vale a do cabeçalho).
+        @raise ValueError: Se o arquivo existente não for um anel válido (na leitura).
+        """
+        self.caminho = caminho
+        self.escrita = escrita
+        self.root_dir = root_dir
+        self._lock = threading.Lock()
+        if escrita:
+            self._preparar_arquivo(horas, capacidade)
+        self._arquivo = open(caminho, "r+b" if escrita else "rb")
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_WRITE if escrita else mmap.ACCESS_READ)
+        assinatura, self.horas, self.capacidade, _, _, _ = _CABECALHO.unpack_from(self._mapa, 0)
+        if assinatura != ASSINATURA or len(self._mapa) != _tamanho_arquivo(self.horas, self.capacidade):
+            self.fechar()
+            raise ValueError(f"{caminho} não é um anel de leituras válido.")
+        self._codigos = np.frombuffer(self._mapa, dtype=f"S{TAMANHO_CODIGO}", count=self.capacidade,
+                                      offset=TAMANHO_CABECALHO)
+        # Visão (sem cópia) dos registros: [estação, hora % horas]
+        self._dados = np.frombuffer(self._mapa, dtype=REGISTRO, count=self.capacidade * self.horas,
+                                    offset=TAMANHO_CABECALHO + self.capacidade * TAMANHO_CODIGO
+                                    ).reshape(self.capacidade, self.horas)
+        self._indice = {}
+        self._atualizar_indice()
+
+    @staticmethod
+    def abrir_leitura(root_dir=DATA_ROOT):
+        """Abre o anel de root_dir somente para leitura; None se ele ainda não existir ou for inválido."""
+        caminho = caminho_anel(root_dir)
+        if not os.path.exists(caminho):
+            return None
+        try:
+            return AnelRecente(caminho)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Anel de leituras indisponível: {e}")
+            return None
+
+    def _preparar_arquivo(self, horas, capacidade):
+        """Cria o arquivo vazio (ou recria, se a geometria mudou) trocando-o atomicamente."""
+        tamanho = _tamanho_arquivo(horas, capacidade)
+        if os.path.exists(self.caminho) and os.path.getsize(self.caminho) == tamanho:
+            with open(self.caminho, "rb") as f:
+                assinatura, horas_arquivo, capacidade_arquivo, _, _, _ = _CABECALHO.unpack(f.read(_CABECALHO.size))
+            if (assinatura, horas_arquivo, capacidade_arquivo) == (ASSINATURA, horas, capacidade):
+                return
+        os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+        dados = np.zeros(capacidade * horas, dtype=REGISTRO)
+        dados["medicao"] = _VAZIO
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, "wb") as f:
+            cabecalho = bytearray(TAMANHO_CABECALHO)
+            _CABECALHO.pack_into(cabecalho, 0, ASSINATURA, horas, capacidade, 0, 0, _VAZIO)
+            f.write(cabecalho)
+            f.write(bytes(capacidade * TAMANHO_CODIGO))
+            f.write(dados.tobytes())
+        os.replace(temporario, self.caminho)
+
+    def fechar(self):
+        self._codigos = self._dados = None
+        self._mapa.close()
+        self._arquivo.close()
+
+    # --- Seqlock ---
+
+    def _sequencia(self):
+        return struct.unpack_from("<Q", self._mapa, _OFFSET_SEQUENCIA)[0]
+
+    def _ler_consistente(self, funcao, tentativas=1000):
+        """Executa funcao() (uma cópia de trecho do anel) até obter uma cópia sem escrita concorrente."""
+        for tentativa in range(tentativas):
+            antes = self._sequencia()
+            if antes % 2 == 0:
+                resultado = funcao()
+                if self._sequencia() == antes:
+                    return resultado
+            time.sleep(0 if tentativa < 10 else 0.001)
+        raise Exception(f"Não foi possível ler {self.caminho}: escrita em andamento por tempo demais.")
+
+    @contextmanager
+    def _escrevendo(self):
+        """Trava de escrita entre processos + sequência ímpar durante a alteração."""
+        if not self.escrita:
+            raise Exception("Anel aberto somente para leitura.")
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+            else:
+                self._arquivo.seek(0)
+                msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                # Uma sequência ímpar aqui é de um escritor que morreu no meio da escrita
+                sequencia = self._sequencia()
+                struct.pack_into("<Q", self._mapa, _OFFSET_SEQUENCIA, sequencia + sequencia % 2 + 1)
+                try:
+                    yield
+                finally:
+                    struct.pack_into("<Q", self._mapa, _OFFSET_SEQUENCIA, self._sequencia() + 1)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._arquivo.seek(0)
+                    msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _atualizar_indice(self, travado=False):
+        """Relê o índice de estações se outro processo incluiu estações novas (travado: dentro de _escrevendo)."""
+        total = struct.unpack_from("<I", self._mapa, _OFFSET_ESTACOES)[0]
+        if total != len(self._indice):
+            copiar = lambda: self._codigos[:total].copy()
+            codigos = copiar() if travado else self._ler_consistente(copiar)
+            self._indice = {codigo.decode("utf-8"): posicao for posicao, codigo in enumerate(codigos)}
+
+    # --- Escrita ---
+
+    def __call__(self, lote):
+        """Observador do pipeline: grava no anel as leituras novas do lote."""
+        novas = {}
+        for resultado in lote:
+            for arquivo in resultado.get("arquivos", []):
+                if arquivo.get("novos"):
+                    novas.setdefault(codigo_do_arquivo(arquivo["caminho"]), []).extend(arquivo["novos"])
+        if novas:
+            self.gravar(novas)
+
+    def gravar(self, leituras_por_estacao):
+        """
+        Incorpora as leituras ao anel. Estações novas são incluídas com a carga inicial dos arquivos diários.
+
+        @param leituras_por_estacao: Dicionário {codigoestacao: [Leitura]}.
+        @return: Número de leituras incorporadas.
+        """
+        # A carga inicial lê os arquivos fora da trava
+        self._atualizar_indice()
+        iniciais = {}
+        for codigo, leituras in leituras_por_estacao.items():
+            if str(codigo) not in self._indice and leituras:
+                recente = max(leitura.medicao for leitura in leituras)
+                datas = [segundos_para_texto(recente - dias * 86400)[:10] for dias in range(self.horas // 24 + 1)]
+                iniciais[str(codigo)] = carregar_serie_recente(self.root_dir, codigo, datas).ordenadas()
+
+        incorporadas = 0
+        with self._escrevendo():
+            self._atualizar_indice(travado=True)
+            hora_recente = struct.unpack_from("<q", self._mapa, _OFFSET_HORA_RECENTE)[0]
+            for codigo, leituras in leituras_por_estacao.items():
+                codigo = str(codigo)
+                posicao = self._indice.get(codigo)
+                if posicao is None:
+                    posicao = self._incluir_estacao(codigo)
+                    if posicao is None:
+                        continue
+                    leituras = iniciais.get(codigo, []) + list(leituras)
+                for leitura in sorted(leituras, key=lambda l: l.medicao):
+                    if self._incorporar(posicao, leitura):
+                        incorporadas += 1
+                        hora_recente = max(hora_recente, leitura.medicao // 3600)
+            struct.pack_into("<q", self._mapa, _OFFSET_HORA_RECENTE, hora_recente)
+        return incorporadas
+
+    def _incluir_estacao(self, codigo):
+        total = len(self._indice)
+        if total >= self.capacidade:
+            logger.warning(f"Anel de leituras cheio ({self.capacidade} estações): {codigo} não incluída.")
+            return None
+        self._codigos[total] = codigo.encode("utf-8")[:TAMANHO_CODIGO]
+        self._dados[total]["medicao"] = _VAZIO
+        struct.pack_into("<I", self._mapa, _OFFSET_ESTACOES, total + 1)
+        self._indice[codigo] = total
+        return total
+
+    def _incorporar(self, posicao, leitura):
+        hora = leitura.medicao // 3600
+        registro = self._dados[posicao, hora % self.horas]
+        atual = int(registro["medicao"])
+        if atual != _VAZIO and atual // 3600 > hora:
+            return False  # O registro já pertence a uma hora mais nova
+        if atual != _VAZIO and atual // 3600 == hora:
+            if leitura.medicao <= atual:
+                return False
+            chuva = registro["chuva"]
+            if leitura.chuva is not None:
+                chuva = leitura.chuva if np.isnan(chuva) else chuva + leitura.chuva
+        else:
+            chuva = np.nan if leitura.chuva is None else leitura.chuva
+            registro["cota"] = registro["vazao"] = np.nan
+            registro["atualizacao_ms"] = _VAZIO
+        registro["medicao"] = leitura.medicao
+        registro["chuva"] = chuva
+        if leitura.cota is not None:
+            registro["cota"] = leitura.cota
+        if leitura.vazao is not None:
+            registro["vazao"] = leitura.vazao
+        if leitura.atualizacao_ms is not None:
+            registro["atualizacao_ms"] = leitura.atualizacao_ms
+        return True
+
+    # --- Leitura ---
+
+    def contem(self, codigo):
+        self._atualizar_indice()
+        return str(codigo) in self._indice
+
+    def registros(self, codigo, inicio_s=None, fim_s=None):
+        """
+        Registros horários da estação em ordem cronológica (cópia consistente, sem interpretar JSON).
+
+        @return: Array NumPy com o dtype REGISTRO, ou None se a estação não estiver no anel.
+        """
+        self._atualizar_indice()
+        posicao = self._indice.get(str(codigo))
+        if posicao is None:
+            return None
+        registros = self._ler_consistente(lambda: self._dados[posicao].copy())
+        registros = registros[registros["medicao"] != _VAZIO]
+        if inicio_s is not None:
+            registros = registros[registros["medicao"] >= inicio_s]
+        if fim_s is not None:
+            registros = registros[registros["medicao"] <= fim_s]
+        return np.sort(registros, order="medicao")
+
+    def serie(self, codigo, inicio_s=None, fim_s=None):
+        """Registros da estação como SerieLeituras (None se a estação não estiver no anel)."""
+        registros = self.registros(codigo, inicio_s, fim_s)
+        if registros is None:
+            return None
+        leituras = []
+        for registro in registros:
+            leitura = Leitura(int(registro["medicao"]),
+                              *(None if np.isnan(registro[campo]) else float(registro[campo])
+                                for campo in ("chuva", "cota", "vazao")),
+                              atualizacao_ms=None if registro["atualizacao_ms"] == _VAZIO
+                              else int(registro["atualizacao_ms"]))
+            leituras.append(leitura)
+        return SerieLeituras(leituras)
+
+    def serie_recente(self, codigo, datas):
+        """Equivalente a classificacao.carregar_serie_recente para as datas ("YYYY-MM-DD") cobertas pelo anel."""
+        inicio = texto_para_segundos(f"{min(datas)} 00:00:00")
+        fim = texto_para_segundos(f"{max(datas)} 23:59:59")
+        return self.serie(codigo, inicio, fim)
+
+    def status(self):
+        self._atualizar_indice()
+        _, horas, capacidade, estacoes, sequencia, hora_recente = _CABECALHO.unpack_from(self._mapa, 0)
+        return {
+            "horas": horas,
+            "capacidade": capacidade,
+            "estacoes": estacoes,
+            "sequencia": sequencia,
+            "hora_mais_recente": None if hora_recente == _VAZIO else segundos_para_texto(hora_recente * 3600),
+            "bytes": len(self._mapa),
+        }
+
+
+def carregar_serie_recente_anel(anel, root_dir, codigo, datas):
+    """Série recente pelo anel quando a estação está nele; pelos arquivos diários caso contrário."""
+    if anel is not None:
+        serie = anel.serie_recente(codigo, datas)
+        if serie is not None:
+            return serie
+    return carregar_serie_recente(root_dir, codigo, datas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anel de leituras recentes (últimas 48h).")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--estacao", help="Exibe os registros de uma estação.")
+    args = parser.parse_args()
+    anel = AnelRecente.abrir_leitura(args.root_dir)
+    if anel is None:
+        print(f"Nenhum anel em {caminho_anel(args.root_dir)}.")
+        return
+    print(anel.status())
+    if args.estacao:
+        for leitura in anel.serie(args.estacao) or []:
+            print(leitura)
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.recent_ring --estacao 15043000
@@ -0,0 +1,285 @@
+"""
+@file server/apis/ana/services/series_query.py
+@description Consulta de séries temporais de uma estação em intervalos arbitrários, com redução
+do número de pontos no servidor para os gráficos.
+
+Uma consulta é definida por (estação, início, fim, variáveis, pontos, método). O resultado é mantido
+em um cache limitado (LRU) e identificado por uma ETag derivada dos manifestos mensais
+(utils/manifesto_mensal.py) dos meses do intervalo: para cada mês, um resumo das entradas da estação
+(tamanho e checksum de cada dia). O manifesto de um mês só é relido quando muda (inode, mtime e tamanho), então
+uma consulta respondida pelo cache ou por If-None-Match custa um stat por mês, sem localizar cada dia.
+Se um dia for regravado pela ingestão, a entrada do manifesto muda, o resultado em cache deixa de valer
+e a ETag muda. Meses ainda sem manifesto usam a assinatura (mtime e tamanho) de cada arquivo diário.
+Quando a ingestão roda no mesmo processo, o observador do pipeline (observador_pipeline) também descarta
+imediatamente as entradas afetadas.
+
+Os arquivos diários já lidos ficam em um segundo cache, em colunas NumPy, para que consultas
+diferentes sobre os mesmos dias não releiam o JSON. Dias já compactados em arquivos mensais são lidos
+do ZIP (utils/arquivo_mensal.py), com a assinatura do membro (CRC e tamanho) no lugar da do arquivo.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+
+from server.apis.ana.utils.leituras import SerieLeituras, texto_para_segundos, segundos_para_texto
+from server.apis.ana.utils.downsampling import METODOS, reduzir
+from server.apis.ana.utils.arquivo_mensal import caminho_dia, localizar_dia, ler_localizado
+from server.apis.ana.utils.manifesto_mensal import caminho_manifesto, ler_manifesto
+
+DATA_ROOT = os.path.join("public", "data")
+
+# Variáveis disponíveis -> atributo da Leitura
+VARIAVEIS = {"chuva": "chuva", "cota": "cota", "vazao": "vazao"}
+
+PONTOS_PADRAO = 500
+PONTOS_MAXIMO = 5000
+# Intervalo máximo de uma consulta, para limitar a leitura de arquivos
+DIAS_MAXIMO = 366 * 5
+
+
+def interpretar_instante(texto, fim=False):
+    """
+    Converte "YYYY-MM-DD" ou "YYYY-MM-DD HH:MM[:SS]" (também aceita "T" como separador) em segundos.
+    Para datas sem horário, o fim do intervalo é o último segundo do dia.
+
+    @raise ValueError: Se o texto não estiver em um dos formatos aceitos.
+    """
+    texto = (texto or "").strip().replace("T", " ")
+    if len(texto) == 10:
+        return texto_para_segundos(f"{texto} 23:59:59" if fim else f"{texto} 00:00:00")
+    if len(texto) == 16:
+        texto = f"{texto}:00"
+    return texto_para_segundos(texto[:19])
+
+
+class ConsultaSeries:
+    """Executa consultas de séries por intervalo sobre os arquivos diários das estações."""
+
+    def __init__(self, root_dir=DATA_ROOT, max_resultados=256, max_dias_em_cache=8192):
+        """
+        @param root_dir: Diretório raiz dos arquivos diários.
+        @param max_resultados: Número máximo de resultados de consultas mantidos em cache.
+        @param max_dias_em_cache: Número máximo de arquivos diários mantidos em memória (em colunas).
+        """
+        self.root_dir = root_dir
+        self.max_resultados = max_resultados
+        self.max_dias_em_cache = max_dias_em_cache
+        self._resultados = OrderedDict()
+        self._dias = OrderedDict()
+        self._meses = {}  # {(ano, mes): ((inode, mtime_ns, tamanho) do manifesto, {codigo: resumo das entradas})}
+        self._lock = threading.Lock()
+        self.estatisticas = {"consultas": 0, "acertos_cache": 0, "dias_lidos": 0, "invalidacoes": 0}
+
+    def caminho_arquivo(self, estacao, dia):
+        return caminho_dia(self.root_dir, estacao, dia.isoformat())
+
+    def _arquivos(self, estacao, inicio_s, fim_s):
+        """
+        Lista (caminho, membro, assinatura) dos dias existentes no intervalo, em qualquer camada
+        (membro é None para os arquivos soltos; ver arquivo_mensal.localizar_dia).
+        """
+        primeiro = date.fromisoformat(segundos_para_texto(inicio_s)[:10])
+        ultimo = date.fromisoformat(segundos_para_texto(fim_s)[:10])
+        arquivos = []
+        dia = primeiro
+        while dia <= ultimo:
+            local = localizar_dia(self.root_dir, estacao, dia.isoformat())
+            if local is not None:
+                arquivos.append(local)
+            dia += timedelta(days=1)
+        return arquivos
+
+    def _resumo_mes(self, estacao, ano, mes):
+        """
+        Resumo das entradas da estação no manifesto do mês ("" se a estação não tiver dias no mês),
+        ou None se o mês ainda não tiver manifesto. O manifesto só é relido quando muda.
+        """
+        try:
+            info = os.stat(caminho_manifesto(self.root_dir, ano, mes))
+        except OSError:
+            return None
+        marca = (info.st_ino, info.st_mtime_ns, info.st_size)
+        with self._lock:
+            em_cache = self._meses.get((ano, mes))
+        if em_cache is None or em_cache[0] != marca:
+            manifesto = ler_manifesto(self.root_dir, ano, mes)
+            if manifesto is None:
+                return None
+            resumos = {codigo: hashlib.sha1(json.dumps(dias, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+                       for codigo, dias in manifesto.get("estacoes", {}).items()}
+            em_cache = (marca, resumos)
+            with self._lock:
+                self._meses[(ano, mes)] = em_cache
+        return em_cache[1].get(str(estacao), "")
+
+    def _assinatura(self, estacao, inicio_s, fim_s):
+        """Assinatura do intervalo: o resumo de cada mês no manifesto (ou os dias do mês, sem manifesto)."""
+        primeiro = date.fromisoformat(segundos_para_texto(inicio_s)[:10])
+        ultimo = date.fromisoformat(segundos_para_texto(fim_s)[:10])
+        assinatura = []
+        inicio_mes = primeiro
+        while inicio_mes <= ultimo:
+            proximo_mes = (inicio_mes.replace(day=1) + timedelta(days=32)).replace(day=1)
+            ano, mes = f"{inicio_mes.year:04d}", f"{inicio_mes.month:02d}"
+            resumo = self._resumo_mes(estacao, ano, mes)
+            if resumo is None:
+                fim_mes = min(ultimo, proximo_mes - timedelta(days=1))
+                resumo = tuple(self._arquivos(estacao, texto_para_segundos(f"{inicio_mes.isoformat()} 00:00:00"),
+                                              texto_para_segundos(f"{fim_mes.isoformat()} 00:00:00")))
+            assinatura.append((ano, mes, resumo))
+            inicio_mes = proximo_mes
+        return tuple(assinatura)
+
+    def _colunas_do_dia(self, caminho, membro, assinatura):
+        """Lê um dia (ou reaproveita o cache) e retorna suas colunas NumPy."""
+        chave = (caminho, membro)
+        with self._lock:
+            em_cache = self._dias.get(chave)
+            if em_cache is not None and em_cache[0] == assinatura:
+                self._dias.move_to_end(chave)
+                return em_cache[1]
+
+        try:
+            serie = SerieLeituras.de_json(json.loads(ler_localizado(caminho, membro)).get("dados", []))
+        except (OSError, KeyError, ValueError, AttributeError) as e:
+            print(f"Erro ao ler {membro or caminho}: {e}")
+            serie = SerieLeituras()
+
+        leituras = serie.ordenadas()
+        colunas = {"t": np.fromiter((leitura.medicao for leitura in leituras), dtype=np.int64, count=len(leituras))}
+        for variavel, atributo in VARIAVEIS.items():
+            colunas[variavel] = np.array(
+                [np.nan if getattr(leitura, atributo) is None else getattr(leitura, atributo) for leitura in leituras],
+                dtype=np.float64)
+
+        with self._lock:
+            self.estatisticas["dias_lidos"] += 1
+            self._dias[chave] = (assinatura, colunas)
+            self._dias.move_to_end(chave)
+            while len(self._dias) > self.max_dias_em_cache:
+                self._dias.popitem(last=False)
+        return colunas
+
+    def consultar(self, estacao, inicio, fim, variaveis=("cota", "vazao", "chuva"), pontos=PONTOS_PADRAO,
+                  metodo="lttb", etag_cliente=None):
+        """
+        Consulta as séries de uma estação no intervalo [inicio, fim].
+
+        @param estacao: Código da estação (nome usado nos arquivos diários).
+        @param inicio: Início do intervalo ("YYYY-MM-DD" ou "YYYY-MM-DD HH:MM:SS").
+        @param fim: Fim do intervalo (inclusive).
+        @param variaveis: Variáveis desejadas ("chuva", "cota", "vazao").
+        @param pontos: Número máximo de pontos por variável.
+        @param metodo: Método de redução ("lttb" ou "minmax").
+        @param etag_cliente: Valor do cabeçalho If-None-Match; se coincidir, o corpo não é montado.
+        @return: (etag, resultado) — resultado é None quando etag_cliente ainda é válida.
+        @raise ValueError: Para parâmetros inválidos.
+        """
+        inicio_s = interpretar_instante(inicio)
+        fim_s = interpretar_instante(fim, fim=True)
+        if fim_s < inicio_s:
+            raise ValueError("O fim do intervalo deve ser posterior ao início.")
+        if (fim_s - inicio_s) > DIAS_MAXIMO * 86400:
+            raise ValueError(f"Intervalo máximo de {DIAS_MAXIMO} dias excedido.")
+        variaveis = tuple(dict.fromkeys(variaveis))
+        invalidas = [v for v in variaveis if v not in VARIAVEIS]
+        if not variaveis or invalidas:
+            raise ValueError(f"Variáveis inválidas: {', '.join(invalidas) or '(nenhuma)'}. "
+                             f"Use {', '.join(VARIAVEIS)}.")
+        pontos = int(pontos)
+        if not 3 <= pontos <= PONTOS_MAXIMO:
+            raise ValueError(f"O número de pontos deve estar entre 3 e {PONTOS_MAXIMO}.")
+        if metodo not in METODOS:
+            raise ValueError(f"Método de redução inválido: {metodo}. Use um de {', '.join(METODOS)}.")
+
+        chave = (str(estacao), inicio_s, fim_s, variaveis, pontos, metodo)
+        assinatura = self._assinatura(estacao, inicio_s, fim_s)
+        etag = '"' + hashlib.sha1(repr((chave, assinatura)).encode("utf-8")).hexdigest()[:20] + '"'
+
+        with self._lock:
+            self.estatisticas["consultas"] += 1
+            if etag_cliente is not None and etag in [e.strip() for e in etag_cliente.split(",")]:
+                self.estatisticas["acertos_cache"] += 1
+                return etag, None
+            em_cache = self._resultados.get(chave)
+            if em_cache is not None and em_cache[0] == etag:
+                self._resultados.move_to_end(chave)
+                self.estatisticas["acertos_cache"] += 1
+                return etag, em_cache[1]
+
+        # Os dias só são localizados para montar o resultado; a ETag já veio dos manifestos
+        resultado = self._montar(estacao, inicio_s, fim_s, variaveis, pontos, metodo,
+                                 self._arquivos(estacao, inicio_s, fim_s))
+        with self._lock:
+            self._resultados[chave] = (etag, resultado)
+            self._resultados.move_to_end(chave)
+            while len(self._resultados) > self.max_resultados:
+                self._resultados.popitem(last=False)
+        return etag, resultado
+
+    def _montar(self, estacao, inicio_s, fim_s, variaveis, pontos, metodo, arquivos):
+        dias = [self._colunas_do_dia(caminho, membro, assinatura) for caminho, membro, assinatura in arquivos]
+        if dias:
+            t = np.concatenate([d["t"] for d in dias])
+            mascara = (t >= inicio_s) & (t <= fim_s)
+            t = t[mascara]
+        else:
+            t, mascara = np.empty(0, dtype=np.int64), None
+
+        series = {}
+        for variavel in variaveis:
+            if dias:
+                valores = np.concatenate([d[variavel] for d in dias])[mascara]
+                validos = ~np.isnan(valores)
+                tv, valores = t[validos], valores[validos]
+            else:
+                tv, valores = t, np.empty(0)
+            indices = reduzir(tv, valores, pontos, metodo) if len(tv) else np.empty(0, dtype=np.int64)
+            series[variavel] = {
+                "total": int(len(tv)),
+                "horarios": [segundos_para_texto(int(s)) for s in tv[indices]],
+                "valores": [round(float(v), 2) for v in valores[indices]],
+            }
+
+        return {
+            "codigoestacao": str(estacao),
+            "inicio": segundos_para_texto(inicio_s),
+            "fim": segundos_para_texto(fim_s),
+            "pontos": pontos,
+            "metodo": metodo,
+            "series": series,
+        }
+
+    def invalidar(self, estacao=None):
+        """
+        Descarta do cache os resultados de uma estação (ou de todas, se estacao for None).
+        Os dias em cache não precisam ser descartados: são revalidados pela assinatura do arquivo.
+        """
+        with self._lock:
+            if estacao is None:
+                removidos = len(self._resultados)
+                self._resultados.clear()
+            else:
+                chaves = [chave for chave in self._resultados if chave[0] == str(estacao)]
+                for chave in chaves:
+                    del self._resultados[chave]
+                removidos = len(chaves)
+            self.estatisticas["invalidacoes"] += removidos
+        return removidos
+
+    def observador_pipeline(self, lote):
+        """
+        Observador para PipelineIngestao: invalida os resultados das estações gravadas no lote.
+        Os arquivos do lote são identificados pelo nome, pois o código do Cemaden no arquivo
+        (codigoestacao) difere do identificador usado na busca.
+        """
+        for resultado in lote:
+            for arquivo in resultado.get("arquivos", []):
+                nome = os.path.basename(arquivo["caminho"])
+                self.invalidar(nome[len("codigoestacao_"):-len(".json")])
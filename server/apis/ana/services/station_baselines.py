@@ -0,0 +1,253 @@
+"""
+@file server/apis/ana/services/station_baselines.py
+@description Linhas de base por estação: percentis de cota e vazão mantidos em sketches de quantis.
+
+CONFIG_CLASSIFICACAO (espelho de STATION_CLASSIFICATION_CONFIG) usa os mesmos limiares de nível e vazão
+para todos os rios, o que classifica um córrego e o rio Paraguai na mesma escala. Aqui cada estação
+tem, para cada variável, um t-digest (utils/quantis.py) atualizado na ingestão apenas com as leituras
+novas de cada lote (o pipeline já entrega só os timestamps inéditos, então nenhuma leitura é contada
+duas vezes). O sketch tem tamanho limitado (~100 centróides), é gravado em SQLite entre as execuções
+e nunca exige reler o histórico.
+
+Faixas de classificação por percentis (FAIXAS_PERCENTIS): abaixo do p10 a estação está "Baixo"/"Baixa",
+até o p90 "Normal" e acima disso "Alto"/"Alta" (os mesmos rótulos de CONFIG_CLASSIFICACAO). Estações com
+menos de MIN_AMOSTRAS leituras continuam com os limiares fixos.
+
+Ao final de cada ciclo, publicar() grava public/data/baselines_estacoes.json (percentis e limiares de
+cada estação, versionado como estatisticas_chuva.json), indexado por código de estação. Por enquanto o
+arquivo é apenas produzido: nenhuma rota do servidor nem o navegador o lê, e a classificação das estações
+(classificacao.py e categorizacaoEstacoes.js) continua com os limiares fixos. classificar() mostra como
+as faixas por estação seriam aplicadas.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from server.apis.ana.utils.quantis import TDigest
+from server.apis.ana.utils.classificacao import CONFIG_CLASSIFICACAO, _classificar_faixa
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.services.change_feed import codigo_do_arquivo
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+CAMINHO_SKETCHES = os.path.join(DATA_ROOT, "baselines.sqlite3")
+ARQUIVO_BASELINES = "baselines_estacoes.json"
+
+# Classificação -> (atributo da Leitura, percentil do limite inferior, percentil do limite superior)
+FAIXAS_PERCENTIS = {"nivel": ("cota", 0.10, 0.90), "vazao": ("vazao", 0.10, 0.90)}
+PERCENTIS = (0.05, 0.10, 0.25, 0.50, 0.75, 0.90, 0.95)
+# Uma semana de leituras horárias
+MIN_AMOSTRAS = 24 * 7
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sketches (
+    codigoestacao TEXT NOT NULL,
+    variavel TEXT NOT NULL,
+    sketch TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL,
+    PRIMARY KEY (codigoestacao, variavel)
+);
+"""
+
+
+def _nome_percentil(q):
+    return f"p{round(q * 100):02d}"
+
+
+class BaselinesEstacoes:
+    """Sketches de quantis por estação e variável, com as faixas de classificação derivadas deles."""
+
+    def __init__(self, caminho=CAMINHO_SKETCHES, root_dir=DATA_ROOT, min_amostras=MIN_AMOSTRAS):
+        """
+        @param caminho: Arquivo SQLite com os sketches.
+        @param root_dir: Diretório onde baselines_estacoes.json é publicado.
+        @param min_amostras: Leituras necessárias para usar os percentis em vez dos limiares fixos.
+        """
+        self.caminho = caminho
+        self.root_dir = root_dir
+        self.min_amostras = min_amostras
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao().executescript(_ESQUEMA)
+
+    def _conexao(self):
+        """Uma conexão por thread (o pipeline chama os observadores na thread de gravação)."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def sketch(self, codigo, variavel):
+        """
+        Sketch da estação e variável, sempre relido do SQLite (novo se ainda não houver). Não há cache em
+        memória: em modo shard a estação pode ter sido atualizada por outro worker desde a última leitura.
+        """
+        linha = self._conexao().execute(
+            "SELECT sketch FROM sketches WHERE codigoestacao = ? AND variavel = ?", (str(codigo), variavel)).fetchone()
+        return TDigest.de_dict(json.loads(linha[0])) if linha else TDigest()
+
+    def __call__(self, lote):
+        """Observador do pipeline: incorpora aos sketches as leituras novas do lote."""
+        novas = {}
+        for resultado in lote:
+            for arquivo in resultado.get("arquivos", []):
+                if arquivo.get("novos"):
+                    novas.setdefault(codigo_do_arquivo(arquivo["caminho"]), []).extend(arquivo["novos"])
+        if novas:
+            self.atualizar(novas)
+
+    def atualizar(self, leituras_por_estacao):
+        """
+        Adiciona as leituras aos sketches e grava os sketches alterados numa única transação. Cada sketch é
+        relido dentro da transação, de modo que as leituras somadas por outro worker não são sobrescritas.
+
+        @param leituras_por_estacao: Dicionário {codigoestacao: [Leitura]}.
+        """
+        valores_por_sketch = {}
+        for codigo, leituras in leituras_por_estacao.items():
+            for atributo, _, _ in FAIXAS_PERCENTIS.values():
+                valores = [getattr(leitura, atributo) for leitura in leituras
+                           if getattr(leitura, atributo) is not None]
+                if valores:
+                    valores_por_sketch.setdefault((str(codigo), atributo), []).extend(valores)
+        if not valores_por_sketch:
+            return 0
+
+        agora = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        with self._lock:
+            conexao = self._conexao()
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                alterados = []
+                for (codigo, atributo), valores in valores_por_sketch.items():
+                    sketch = self.sketch(codigo, atributo)
+                    sketch.adicionar_varios(valores)
+                    alterados.append((codigo, atributo, json.dumps(sketch.para_dict(), separators=(",", ":")), agora))
+                conexao.executemany(
+                    "INSERT OR REPLACE INTO sketches (codigoestacao, variavel, sketch, atualizado_em) "
+                    "VALUES (?, ?, ?, ?)", alterados)
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+            return len(alterados)
+
+    def percentis(self, codigo, variavel):
+        """Percentis (PERCENTIS) e número de leituras do sketch; None se a estação não tiver leituras."""
+        return self._percentis(self.sketch(codigo, variavel))
+
+    @staticmethod
+    def _percentis(sketch):
+        if not sketch.total:
+            return None
+        valores = {_nome_percentil(q): round(valor, 2) for q, valor in sketch.quantis(PERCENTIS).items()}
+        return {"n": len(sketch), "minimo": sketch.minimo, "maximo": sketch.maximo, **valores}
+
+    def faixas(self, codigo, classificacao):
+        """
+        Configuração de faixas no formato de CONFIG_CLASSIFICACAO["nivel"/"vazao"], com os limites nos
+        percentis da estação; os limiares fixos quando ainda não há leituras suficientes.
+        """
+        return self._faixas(self.sketch(codigo, FAIXAS_PERCENTIS[classificacao][0]), classificacao)
+
+    def _faixas(self, sketch, classificacao):
+        config = CONFIG_CLASSIFICACAO[classificacao]
+        _, q_baixo, q_alto = FAIXAS_PERCENTIS[classificacao]
+        if sketch.total < self.min_amostras:
+            return config
+        return {
+            "indefinido": config["indefinido"],
+            "baixo": (config["baixo"][0], round(sketch.quantil(q_baixo), 2)),
+            "normal": (config["normal"][0], round(sketch.quantil(q_alto), 2)),
+            "acima": config["acima"],
+        }
+
+    def classificar(self, codigo, classificacao, valor):
+        """Classe do valor ("nivel" ou "vazao") nas faixas da estação."""
+        return _classificar_faixa(valor, self.faixas(codigo, classificacao))
+
+    def mesclar(self, codigos, variavel):
+        """Sketch combinado de várias estações (ex.: uma bacia), sem alterar os sketches individuais."""
+        combinado = TDigest()
+        for codigo in codigos:
+            combinado.mesclar(self.sketch(codigo, variavel))
+        return combinado
+
+    def publicar(self, agora_utc=None):
+        """
+        Grava baselines_estacoes.json com os percentis e as faixas de todas as estações (somente se mudou).
+        Em modo shard deve rodar num único worker por ciclo (ObservadoresCiclo.concluir).
+
+        @return: Versão do arquivo após a atualização.
+        """
+        with self._lock:
+            sketches = {(codigo, variavel): TDigest.de_dict(json.loads(texto)) for codigo, variavel, texto in
+                        self._conexao().execute("SELECT codigoestacao, variavel, sketch FROM sketches")}
+            estacoes = {}
+            for codigo in sorted({codigo for codigo, _ in sketches}):
+                entrada = {}
+                for classificacao, (atributo, _, _) in FAIXAS_PERCENTIS.items():
+                    sketch = sketches.get((codigo, atributo), TDigest())
+                    percentis = self._percentis(sketch)
+                    if percentis is None:
+                        continue
+                    faixas = self._faixas(sketch, classificacao)
+                    entrada[atributo] = dict(percentis, porPercentil=faixas is not CONFIG_CLASSIFICACAO[classificacao],
+                                             limiarBaixo=faixas["baixo"][1], limiarNormal=faixas["normal"][1])
+                estacoes[codigo] = entrada
+
+        caminho = os.path.join(self.root_dir, ARQUIVO_BASELINES)
+        anterior = None
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                anterior = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if anterior and anterior.get("estacoes") == estacoes:
+            return anterior.get("versao", 0)
+
+        versao = (anterior or {}).get("versao", 0) + 1
+        documento = {
+            "versao": versao,
+            "gerado_em": (agora_utc or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "percentis": {classificacao: [_nome_percentil(q_baixo), _nome_percentil(q_alto)]
+                          for classificacao, (_, q_baixo, q_alto) in FAIXAS_PERCENTIS.items()},
+            "min_amostras": self.min_amostras,
+            "estacoes": estacoes,
+        }
+        os.makedirs(self.root_dir, exist_ok=True)
+        gravar_arquivo_atomico(caminho, json.dumps(documento, ensure_ascii=False, separators=(",", ":")))
+        print(f"Linhas de base atualizadas (versão {versao}): {len(estacoes)} estações.")
+        return versao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Percentis de cota e vazão por estação.")
+    parser.add_argument("--caminho", default=CAMINHO_SKETCHES)
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--estacao", help="Exibe os percentis e as faixas de uma estação.")
+    parser.add_argument("--publicar", action="store_true", help="Regrava baselines_estacoes.json.")
+    args = parser.parse_args()
+    baselines = BaselinesEstacoes(args.caminho, root_dir=args.root_dir)
+    if args.estacao:
+        for classificacao, (atributo, _, _) in FAIXAS_PERCENTIS.items():
+            print(f"{atributo}: {json.dumps(baselines.percentis(args.estacao, atributo), ensure_ascii=False)}")
+            print(f"    faixas: {baselines.faixas(args.estacao, classificacao)}")
+    if args.publicar:
+        baselines.publicar()
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.station_baselines --estacao 15043000
@@ -8,13 +8,20 @@ das estações, buscando os dados via API e salvando-os localmente.
 from apscheduler.schedulers.blocking import BlockingScheduler  # Scheduler que bloqueia a thread principal durante a execução dos jobs
 from datetime import datetime, timedelta, timezone                 # Utilizado para manipulação de datas e fusos horários
 import logging                                                      # Biblioteca para log de informações, avisos e erros
-import concurrent.futures                                           # Permite a execução paralela de funções (ThreadPoolExecutor)
 import time                                                         # Utilizado para medir o tempo de execução
 import json                                                         # Para manipulação e formatação de dados em JSON
+import functools                                                    # Para fixar parâmetros da função executada no pool de processos
+import argparse                                                     # Opções de linha de comando (modo shard)
 
 from server.apis.ana.services.hidrowebAuth import HidroWebAPI
 from server.apis.ana.services.hidrowebStationData import HidroWebStationData    # Módulo para buscar dados de uma estação via API HidroWeb
 from server.apis.ana.utils.data_storage import DataStorage             # Módulo para salvar os dados das estações em arquivos
+from server.apis.ana.services.ingest_pipeline import PipelineIngestao  # Pipeline em estágios (busca → processamento → gravação)
+from server.apis.ana.services.inventory_refresher import carregar_registro_estacoes  # Estações monitoradas (configuração)
+from server.apis.ana.services.ingest_sharding import CoordenadorShards, resumo_shard, CAMINHO_SHARDS  # Modo shard
+from server.apis.ana.services.data_freshness import META_ATRASO_S  # Meta de atraso das leituras até a publicação
+from server.apis.ana.services.ingest_observers import montar_observadores, OPCOES_PADRAO  # Feed, alertas, derivadas...
+from server.apis.ana.services.ingest_journal import DiarioIngestao, MaterializadorDiario, caminho_diario  # Diário
 
 logging.basicConfig(
     level=logging.DEBUG,  # <-- Altera para DEBUG
@@ -22,22 +29,72 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def normalizar_resposta(station_code, payload):
+    """
+    Decodifica a resposta bruta da API. No modo diário, é o estágio de CPU do pipeline (executado no pool
+    de processos, por isso é uma função de módulo) e o resultado é acrescentado ao diário de ingestão.
+
+    Returns:
+        dict | None: {"fonte", "estacao", "registros"} ou None se a resposta não contiver registros.
+    """
+    data = json.loads(payload)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not items:
+        logger.warning(f"Nenhum dado encontrado para {station_code}")
+        return None
+    return {"fonte": "hidroweb", "estacao": station_code, "registros": items}
+
+
+def preparar_entrada(entrada, data_root='public/data'):
+    """
+    Prepara (mescla, ordena e serializa) os arquivos diários de uma resposta normalizada, sem gravar.
+
+    Returns:
+        dict: {"fonte", "estacao", "arquivos"}.
+    """
+    arquivos = DataStorage(root_dir=data_root).preparar_arquivos(entrada["registros"], entrada["estacao"])
+    return {"fonte": "hidroweb", "estacao": entrada["estacao"], "arquivos": arquivos}
+
+
+def prepare_station_files(station_code, payload, data_root='public/data'):
+    """
+    Estágio de CPU do pipeline: decodifica a resposta bruta da API e prepara (mescla, ordena e serializa)
+    os arquivos diários da estação. Executado no pool de processos, por isso é uma função de módulo.
+
+    Returns:
+        dict | None: {"fonte", "estacao", "arquivos"} ou None se a resposta não contiver registros.
+    """
+    entrada = normalizar_resposta(station_code, payload)
+    if entrada is None:
+        return None
+    return preparar_entrada(entrada, data_root)
+
+
 class StationDataFetcher:
     """
     Classe responsável por buscar os dados de diversas estações de monitoramento.
     
     A classe gerencia:
-      - A lista de códigos das estações a serem atualizadas.
+      - A lista de códigos das estações a serem atualizadas (lida do registro de estações ao iniciar).
       - A data de busca (atualizada a cada execução).
       - O fuso horário para a data de busca (horário de Brasília, UTC-3).
       - O intervalo de busca (exemplo: 12 horas).
       - A execução paralela das requisições para buscar os dados de cada estação.
+
+    Os parâmetros opcionais permitem apontar o ciclo para outro servidor e outro diretório de dados
+    (ex.: o servidor mock usado nos testes de carga), sem alterar o comportamento padrão.
     """
-    def __init__(self):
-        # Lista de códigos das estações a serem atualizadas.
-        self.station_codes = [
-            "15043000", "15044000", "15044100", "15050001", "15120500", "15121000", "15122000", "15123000", "15123080", "15123100", "15710000", "15720000", "15730000", "15740000", "15748000", "15750500", "15750550", "15750600", "15753900", "15754000", "17090400", "17090500", "17090580", "17090600", "17091030", "17091040", "17091045", "17091047", "17091048", "17091050", "17091080", "17091090", "17091093", "17091095", "17091096", "17091097", "17091098", "17091099", "17091130", "17091150", "17091160", "17091170", "17091180", "17091200", "17091210", "17091300", "17091310", "17091400", "17091410", "17091450", "17091580", "17091600", "17092850", "17092960", "17093010", "17093400", "17093500", "17093600", "17093700", "17093750", "17094000", "17094010", "17094050", "17094400", "17094520", "17094550", "17099500", "17228000", "17229000", "17230000", "17240900", "17250500", "17250550", "17260000", "17270000", "17273100", "17275000", "17275100", "17277300", "17277500", "17280980", "17280990", "17305000", "17307000", "17343000", "17354000", "17354450", "17354700", "17354800", "17354930", "17354950", "17354970", "17355000", "17381100", "17384000", "17385000", "17387000", "17388000", "17389000", "17389500", "17390100", "17393000", "17393500", "17394000", "17395000", "17395900", "17410100", "18407500", "18408000", "18408500", "18409350", "18409600", "18409650", "18415000", "18420000", "18422000", "18422400", "18422480", "18422500", "18422600", "18425200", "18428000", "18435000", "24035000", "24051000", "24055000", "24179090", "24180050", "24180070", "24180080", "24500000", "24653000", "24850000", "26033600", "26033700", "26033750", "26033800", "26033900", "26053100", "26053110", "26054000", "26057000", "26100000", "26130000", "26350000", "66005100", "66005400", "66005600", "66005800", "66005900", "66005950", "66005960", "66010000", "66025000", "66025500", "66028000", "66028500", "66029000", "66029010", "66051000", "66052080", "66052081", "66052500", "66052600", "66052800", "66052900", "66053200", "66064000", "66070004", "66071353", "66071355", "66071360", "66071363", "66071375", "66071380", "66071382", "66071385", "66071390", "66071395", "66071397", "66071450", "66071470", "66125000", "66164600", "66165000", "66170100", "66170500", "66170600", "66171400", "66171500", "66174000", "66201100", "66201200", "66210000", "66240080", "66259650", "66260001", "66260050", "66260110", "66270000", "66280000", "66384000", "66385500", "66386000", "66388000", "66390090", "66400050", "66400060", "66400325", "66400355", "66400360", "66400380", "66400390", "66420000", "66420160", "66420180", "66420250", "66425000", "66425050", "66450010", "66452500", "66453000", "66454800", "66454900", "66489000", "66493000", "66521000", "66522000", "66522100", "66523000", "66525100", "66600000", "66650000", "66710000", "66830000"
-        ]  # Códigos das estações para buscar
+    def __init__(self, station_codes=None, base_url=None, data_root='public/data'):
+        # Lista de códigos das estações a serem atualizadas: registro gerado pela atualização do inventário
+        # (public/data/registro_estacoes.json) ou, na falta dele, server/apis/ana/config/estacoes.json
+        self.station_codes = list(station_codes) if station_codes else \
+            carregar_registro_estacoes(root_dir=data_root)["hidroweb"]
+
+        # URL base da API HidroWeb (None = variável de ambiente HIDROWEB_BASE_URL ou URL oficial)
+        self.base_url = base_url
+        # Diretório raiz onde os arquivos diários das estações são gravados
+        self.data_root = data_root
 
         # Nome do campo usado para filtrar os dados na API (exemplo: "DATA_LEITURA")
         self.filtro_data = "DATA_LEITURA"
@@ -48,6 +105,20 @@ class StationDataFetcher:
         # self.intervalo_busca = "HORA_12"  # Exemplo de intervalo de busca (pode indicar 12 horas)
         self.intervalo_busca = "HORA_24"  # Exemplo de intervalo de busca (pode indicar 24 horas)
         self.max_workers = 12             # Número máximo de threads paralelas para a busca de dados
+        self.max_cpu_workers = None       # Número de processos para decodificar/mesclar (None = número de CPUs)
+        self.usar_processos = True        # Se False, o estágio de CPU usa threads em vez de processos
+        self.observadores = []            # Callables notificados a cada lote gravado pelo pipeline
+        self.ultimo_resumo = None         # Métricas do último ciclo (por estágio)
+        self.publicar_feed = True         # Publica uma versão do feed (e os produtos de chuva) ao final de cada ciclo
+        self.shard = None                 # CoordenadorShards: se definido, busca só a parte das estações deste worker
+        self.avaliar_alertas = True       # Avalia as regras de alerta sobre as leituras novas (alertas.sqlite3)
+        self.calcular_derivadas = True    # Atualiza as variáveis derivadas (public/data/derivadas) a cada lote
+        self.atualizar_baselines = True   # Atualiza os percentis de cota e vazão por estação (baselines_estacoes.json)
+        self.manter_anel = True           # Grava as leituras novas no anel das últimas 48h (anel_recente.bin)
+        self.manter_quadros = True        # Atualiza os quadros horários de todas as estações (public/data/quadros)
+        self.medir_frescor = True         # Mede o atraso das leituras até a publicação (frescor_dados.json)
+        self.meta_frescor_s = META_ATRASO_S  # Meta de atraso de ponta a ponta das estações, em segundos
+        self.usar_diario = False          # Acrescenta as respostas ao diário de ingestão e materializa ao final do ciclo
 
     def update_data_busca(self):
         self.data_busca = datetime.now(self.brasilia_tz).strftime("%Y-%m-%d")
@@ -57,86 +128,120 @@ class StationDataFetcher:
         # print(f"[DEBUG] Data de busca atualizada para: {self.data_busca}")
         logger.debug(f"Data de busca atualizada para: {self.data_busca}")
 
-    def fetch_single_station(self, station_code, token):
-        try:
-            # Loga no início para saber que está iniciando a busca de determinada estação
-            print(f"[INFO] Buscando dados para estacao {station_code}...")
-            logger.info(f"Iniciando fetch da estacao {station_code}...")
-
-            station_data_api = HidroWebStationData(token=token)
-            data = station_data_api.fetch_station_data(
-                station_code=station_code,
-                filtro_data=self.filtro_data,
-                data_busca=self.data_busca,
-                intervalo_busca=self.intervalo_busca
-            )
-
-            # Exibe a resposta (cuidado com volume de dados)
-            logger.debug(f"Resposta da API para {station_code}: {json.dumps(data, indent=2)}")
-
-            if data and data.get('items') and data['items']:
-                DataStorage().save_station_data_to_file(
-                    data['items'],
-                    self.data_busca,
-                    self.intervalo_busca,
-                    station_code
-                )
-                # print(f"[SUCCESS] Dados salvos para {station_code}")
-                logger.info(f"Dados salvos para a estacao {station_code}")
-                return True
-            else:
-                print(f"[WARNING] Nenhum dado encontrado para {station_code}")
-                logger.warning(f"Nenhum dado encontrado para {station_code}")
-                return False
-
-        except Exception as e:
-            print(f"[ERROR] Erro ao buscar dados para {station_code}: {str(e)}")
-            logger.error(f"Erro ao buscar dados para a estacao {station_code}: {str(e)}")
-            return False
-
     def fetch_all_stations(self):
+        """
+        Executa um ciclo completo de atualização de todas as estações.
+
+        Returns:
+            int: Número de estações atualizadas com sucesso no ciclo.
+        """
         # Mensagem para sabermos que o método foi chamado
         print("[INFO] Iniciando atualização de dados de todas as estações...")
         logger.info("Iniciando atualização de dados...")
 
         self.update_data_busca()
         start_time = time.time()
+        success = 0
 
         try:
-            token = HidroWebAPI().authenticate()
+            token = HidroWebAPI(base_url=self.base_url).authenticate()
             logger.debug("Token de autenticação obtido com sucesso.")
 
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = {
-                    executor.submit(self.fetch_single_station, code, token): code 
-                    for code in self.station_codes
-                }
-                success = 0
-                for future in concurrent.futures.as_completed(futures):
-                    station_code = futures[future]
-                    if future.result():
-                        success += 1
-                    else:
-                        print(f"[WARNING] Falha na estacao {station_code}")
-                        logger.warning(f"Falha na estacao {station_code}")
+            station_data_api = HidroWebStationData(token=token, base_url=self.base_url)
+            storage = DataStorage(root_dir=self.data_root)
+
+            def buscar(station_code):
+                logger.info(f"Iniciando fetch da estacao {station_code}...")
+                return station_data_api.fetch_station_data_raw(
+                    station_code=station_code,
+                    filtro_data=self.filtro_data,
+                    data_busca=self.data_busca,
+                    intervalo_busca=self.intervalo_busca
+                )
+
+            def gravar(lote):
+                storage.gravar_lote([arquivo for resultado in lote for arquivo in resultado["arquivos"]])
+
+            ciclo = montar_observadores(self.data_root, "hidroweb",
+                                        {opcao: getattr(self, opcao) for opcao in OPCOES_PADRAO},
+                                        observadores=self.observadores)
+            observadores = ciclo.lista
+
+            # Busca (threads) → decodificação/mesclagem (processos) → gravação em lotes (thread única)
+            processar = functools.partial(prepare_station_files, data_root=self.data_root)
+            materializador = None
+            if self.usar_diario:
+                # Modo diário: a gravação só acrescenta as respostas normalizadas ao diário (escrita sequencial);
+                # os arquivos diários e os observadores são atualizados pelo materializador ao final do ciclo
+                diario = DiarioIngestao(caminho_diario(self.data_root, "hidroweb"))
+                materializador = MaterializadorDiario(diario.diretorio, root_dir=self.data_root,
+                                                      observadores=observadores, usar_processos=self.usar_processos,
+                                                      max_workers=self.max_cpu_workers)
+                processar, gravar, observadores = normalizar_resposta, diario.anexar, []
+            pipeline = PipelineIngestao(
+                buscar=buscar,
+                processar=processar,
+                gravar=gravar,
+                nome="hidroweb",
+                max_fetch_workers=self.max_workers,
+                max_cpu_workers=self.max_cpu_workers,
+                usar_processos=self.usar_processos,
+                observadores=observadores,
+            )
+            # Em modo shard, apenas as estações reivindicadas por este worker no ciclo atual
+            codigos = self.station_codes
+            if self.shard is not None:
+                codigos = self.shard.reivindicar("hidroweb", self.station_codes)
+            self.ultimo_resumo = pipeline.executar(codigos)
+            success = self.ultimo_resumo["sucesso"]
+            if materializador is not None:
+                materializacao = materializador.materializar()
+                if materializacao is None:
+                    # As entradas continuam no diário e são aplicadas pela próxima materialização
+                    logger.warning("Diário não materializado neste ciclo (trava ocupada); publicação sem as entradas.")
+                    materializacao = {"ignorada": True}
+                self.ultimo_resumo["materializacao"] = materializacao
+            if self.shard is not None:
+                self.shard.registrar_metricas("hidroweb", resumo_shard(self.ultimo_resumo))
+            # Em modo shard, as tarefas pós-publicação rodam só no último worker a concluir o ciclo
+            ciclo.concluir(self.shard)
 
             elapsed = time.time() - start_time
-            print(f"[INFO] Concluido! {success}/{len(self.station_codes)} estacoes atualizadas em {elapsed:.2f}s")
-            logger.info(f"Concluido! {success}/{len(self.station_codes)} estacoes atualizadas. Tempo: {elapsed:.2f}s")
+            print(f"[INFO] Concluido! {success}/{len(codigos)} estacoes atualizadas em {elapsed:.2f}s")
+            logger.info(f"Concluido! {success}/{len(codigos)} estacoes atualizadas. Tempo: {elapsed:.2f}s")
 
         except Exception as e:
             print(f"[ERROR] Falha crítica na atualização: {str(e)}")
             logger.error(f"Falha critica na atualização: {str(e)}")
 
+        return success
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scheduler de atualização das estações HidroWeb.")
+    parser.add_argument("--shard", action="store_true",
+                        help="Divide as estações com os outros workers registrados em --shards-db.")
+    parser.add_argument("--worker-id", default=None, help="Identificador do worker (padrão: host-pid).")
+    parser.add_argument("--shards-db", default=CAMINHO_SHARDS)
+    parser.add_argument("--diario", action="store_true",
+                        help="Grava as respostas no diário de ingestão e materializa os arquivos ao final do ciclo.")
+    args = parser.parse_args()
+
     # Instancia a classe de busca de dados para as estações
     fetcher = StationDataFetcher()
+    fetcher.usar_diario = args.diario
     
     # Configura o scheduler (BlockingScheduler) para rodar a cada 10 minutos, utilizando o fuso de Brasília
     scheduler = BlockingScheduler(timezone=fetcher.brasilia_tz)
-    # Adiciona uma tarefa agendada para chamar fetch_all_stations a cada 10 minutos
-    scheduler.add_job(fetcher.fetch_all_stations, 'interval', minutes=10, next_run_time=datetime.now(fetcher.brasilia_tz))
+    if args.shard:
+        fetcher.shard = CoordenadorShards(args.shards_db, worker_id=args.worker_id)
+        fetcher.shard.heartbeat()
+        # Os workers disparam juntos no início de cada janela de 10 minutos (mesmo ciclo para todos)
+        scheduler.add_job(fetcher.fetch_all_stations, 'cron', minute='*/10', max_instances=1, coalesce=True)
+        scheduler.add_job(fetcher.shard.heartbeat, 'interval', seconds=fetcher.shard.ttl_s // 3)
+    else:
+        # Adiciona uma tarefa agendada para chamar fetch_all_stations a cada 10 minutos
+        scheduler.add_job(fetcher.fetch_all_stations, 'interval', minutes=10, next_run_time=datetime.now(fetcher.brasilia_tz))
     
     try:
         logger.info("Agendador iniciado (execucao a cada 10 minutos)...")
@@ -144,7 +249,11 @@ if __name__ == "__main__":
     except (KeyboardInterrupt, SystemExit):
         # Trata interrupções (como Ctrl+C) e encerra o scheduler de forma limpa
         logger.info("Agendador interrompido.")
+        if fetcher.shard is not None:
+            fetcher.shard.encerrar()
         scheduler.shutdown()
 
 # Instrução para executar este script:
 # python -m server.apis.ana.services.station_data_scheduler
+# Em modo shard (um processo por worker, em um ou mais hosts):
+# python -m server.apis.ana.services.station_data_scheduler --shard --worker-id hidroweb-1
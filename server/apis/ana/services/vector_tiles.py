@@ -0,0 +1,531 @@
+"""
+@file server/apis/ana/services/vector_tiles.py
+@description Simplificação e divisão em tiles de arquivos vetoriais importados (GeoJSON, KML, KMZ, GPX).
+
+O gerenciador de arquivos do mapa (gerenciadorArquivos.renderFileOnMap) interpretava o arquivo inteiro no
+navegador e entregava a geometria completa ao Leaflet; arquivos de bacias ou redes de rios com dezenas de
+MB travavam a aba. Aqui o arquivo é processado uma única vez no servidor:
+
+  1) leitura do formato (GeoJSON, KML, KMZ ou GPX) para uma lista de feições (pontos, linhas e anéis de
+     polígonos) projetadas em Web Mercator normalizado ([0, 1] x [0, 1]);
+  2) simplificação Douglas–Peucker calculada uma única vez: cada vértice recebe a sua "importância"
+     (quadrado da distância em que ele deixaria de ser mantido), e em cada zoom ficam apenas os vértices
+     com importância maior que a tolerância daquele zoom (TOLERANCIA_PX pixels);
+  3) divisão recursiva em tiles (quadtree): as feições de um tile são recortadas para os quatro filhos
+     (com uma margem de BUFFER_PX), de modo que cada vértice é processado uma vez por nível. Um tile em que
+     nenhum vértice é descartado pela simplificação e que tem no máximo MAX_PONTOS_FOLHA pontos é uma
+     "folha": não é dividido, e suas coordenadas são gravadas com precisão suficiente para ZOOM_MAXIMO,
+     para que o mapa o amplie (overzoom) nos zooms seguintes.
+
+Os tiles são JSON compactos (public/data/camadas/<chave>/<z>/<x>/<y>.json) com coordenadas inteiras
+relativas ao tile (0..extent), no mesmo espírito dos vector tiles do Mapbox:
+    {"z", "x", "y", "extent", "folha", "feicoes": [{"id", "t" (1 ponto, 2 linha, 3 polígono), "g": [[x, y, ...]]}]}
+Tiles sem feições não são gravados. Os atributos de cada feição ficam em propriedades.json (pelo "id").
+
+A chave do cache é o SHA-256 do conteúdo do arquivo: reimportar o mesmo arquivo (com qualquer nome)
+apenas devolve o manifesto já existente. O manifesto (manifesto.json) é gravado por último, de modo que
+a sua presença indica uma pirâmide completa.
+
+Uso:
+    python -m server.apis.ana.services.vector_tiles bacias.kmz
+ou pelo serviço de leitura: POST /camadas?nome=bacias.kmz (corpo: o arquivo).
+"""
+
+import io
+import os
+import json
+import math
+import shutil
+import hashlib
+import zipfile
+import logging
+import argparse
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = os.path.join("public", "data")
+DIRETORIO_CAMADAS = "camadas"
+ARQUIVO_MANIFESTO = "manifesto.json"
+ARQUIVO_PROPRIEDADES = "propriedades.json"
+# Incrementar quando o formato ou os parâmetros dos tiles mudarem (invalida os caches existentes)
+VERSAO_FORMATO = 1
+
+FORMATOS = ("geojson", "json", "kml", "kmz", "gpx")
+EXTENT = 4096
+TOLERANCIA_PX = 3
+BUFFER_PX = 64
+ZOOM_MAXIMO = 14
+MAX_PONTOS_FOLHA = 5000
+
+PONTO, LINHA, POLIGONO = 1, 2, 3
+
+
+# ---------------------------------------------------------------------------
+# Leitura dos formatos
+# ---------------------------------------------------------------------------
+
+def _geometrias_geojson(geometria):
+    """Converte uma geometria GeoJSON em (tipo, [partes em lon/lat]) — um item por tipo."""
+    if not geometria:
+        return []
+    tipo = geometria.get("type")
+    coordenadas = geometria.get("coordinates") or []
+    if tipo == "Point":
+        return [(PONTO, [[coordenadas]])]
+    if tipo == "MultiPoint":
+        return [(PONTO, [coordenadas])]
+    if tipo == "LineString":
+        return [(LINHA, [coordenadas])]
+    if tipo == "MultiLineString":
+        return [(LINHA, coordenadas)]
+    if tipo == "Polygon":
+        return [(POLIGONO, coordenadas)]
+    if tipo == "MultiPolygon":
+        return [(POLIGONO, [anel for poligono in coordenadas for anel in poligono])]
+    if tipo == "GeometryCollection":
+        return [item for filha in geometria.get("geometries", []) for item in _geometrias_geojson(filha)]
+    raise ValueError(f"Tipo de geometria GeoJSON desconhecido: {tipo}")
+
+
+def ler_geojson(conteudo):
+    dados = json.loads(conteudo)
+    if dados.get("type") == "FeatureCollection":
+        feicoes = dados.get("features", [])
+    elif dados.get("type") == "Feature":
+        feicoes = [dados]
+    else:
+        feicoes = [{"type": "Feature", "geometry": dados, "properties": {}}]
+    return [(tipo, partes, feicao.get("properties") or {})
+            for feicao in feicoes for tipo, partes in _geometrias_geojson(feicao.get("geometry"))]
+
+
+def _sem_namespace(elemento):
+    for item in elemento.iter():
+        if isinstance(item.tag, str) and "}" in item.tag:
+            item.tag = item.tag.split("}", 1)[1]
+    return elemento
+
+
+def _coordenadas_kml(texto):
+    pontos = []
+    for tupla in (texto or "").split():
+        valores = tupla.split(",")
+        if len(valores) >= 2:
+            pontos.append([float(valores[0]), float(valores[1])])
+    return pontos
+
+
+def ler_kml(conteudo):
+    raiz = _sem_namespace(ET.fromstring(conteudo))
+    resultado = []
+    for placemark in raiz.iter("Placemark"):
+        propriedades = {}
+        nome = placemark.find("name")
+        if nome is not None and nome.text:
+            propriedades["name"] = nome.text.strip()
+        for dado in placemark.iter("Data"):
+            valor = dado.find("value")
+            propriedades[dado.get("name")] = valor.text if valor is not None else None
+        for dado in placemark.iter("SimpleData"):
+            propriedades[dado.get("name")] = dado.text
+
+        pontos, linhas, aneis = [], [], []
+        for ponto in placemark.iter("Point"):
+            pontos.extend(_coordenadas_kml(ponto.findtext("coordinates")))
+        for linha in placemark.iter("LineString"):
+            linhas.append(_coordenadas_kml(linha.findtext("coordinates")))
+        for poligono in placemark.iter("Polygon"):
+            for anel in poligono.iter("LinearRing"):
+                aneis.append(_coordenadas_kml(anel.findtext("coordinates")))
+        for tipo, partes in ((PONTO, [pontos] if pontos else []), (LINHA, linhas), (POLIGONO, aneis)):
+            if partes:
+                resultado.append((tipo, partes, propriedades))
+    return resultado
+
+
+def ler_kmz(conteudo):
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+        nomes = [nome for nome in arquivo.namelist() if nome.lower().endswith(".kml")]
+        if not nomes:
+            raise ValueError("O arquivo KMZ não contém um KML.")
+        # O KML principal costuma ser doc.kml, na raiz
+        nome = min(nomes, key=lambda n: (os.path.basename(n).lower() != "doc.kml", n.count("/"), n))
+        return ler_kml(arquivo.read(nome))
+
+
+def ler_gpx(conteudo):
+    raiz = _sem_namespace(ET.fromstring(conteudo))
+    resultado = []
+
+    def ponto(elemento):
+        return [float(elemento.get("lon")), float(elemento.get("lat"))]
+
+    for trilha in raiz.iter("trk"):
+        segmentos = [[ponto(p) for p in segmento.iter("trkpt")] for segmento in trilha.iter("trkseg")]
+        resultado.append((LINHA, [s for s in segmentos if s], {"name": trilha.findtext("name")}))
+    for rota in raiz.iter("rte"):
+        resultado.append((LINHA, [[ponto(p) for p in rota.iter("rtept")]], {"name": rota.findtext("name")}))
+    for waypoint in raiz.iter("wpt"):
+        resultado.append((PONTO, [[ponto(waypoint)]], {"name": waypoint.findtext("name")}))
+    return [item for item in resultado if any(item[1])]
+
+
+LEITORES = {"geojson": ler_geojson, "json": ler_geojson, "kml": ler_kml, "kmz": ler_kmz, "gpx": ler_gpx}
+
+
+# ---------------------------------------------------------------------------
+# Projeção e simplificação
+# ---------------------------------------------------------------------------
+
+def projetar(lonlat):
+    """lon/lat (graus) -> Web Mercator normalizado [0, 1] (y cresce para o sul)."""
+    lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+    x = lonlat[:, 0] / 360.0 + 0.5
+    seno = np.sin(np.radians(np.clip(lonlat[:, 1], -85.0511, 85.0511)))
+    y = 0.5 - 0.25 * np.log((1 + seno) / (1 - seno)) / math.pi
+    return np.clip(x, 0.0, 1.0), np.clip(y, 0.0, 1.0)
+
+
+def importancia_vertices(x, y, tolerancia_sq):
+    """
+    Douglas–Peucker: importância (distância ao quadrado) de cada vértice; as extremidades valem 1 (sempre
+    mantidas) e os vértices abaixo de tolerancia_sq ficam com 0 (descartados em todos os zooms).
+    """
+    importancia = np.zeros(len(x))
+    if len(x) == 0:
+        return importancia
+    importancia[0] = importancia[-1] = 1.0
+    pilha = [(0, len(x) - 1)]
+    while pilha:
+        a, b = pilha.pop()
+        if b - a < 2:
+            continue
+        px, py = x[a + 1:b], y[a + 1:b]
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        comprimento_sq = dx * dx + dy * dy
+        if comprimento_sq > 0:
+            t = np.clip(((px - x[a]) * dx + (py - y[a]) * dy) / comprimento_sq, 0.0, 1.0)
+            distancia_sq = (px - x[a] - t * dx) ** 2 + (py - y[a] - t * dy) ** 2
+        else:
+            distancia_sq = (px - x[a]) ** 2 + (py - y[a]) ** 2
+        maior = int(np.argmax(distancia_sq))
+        if distancia_sq[maior] > tolerancia_sq:
+            indice = a + 1 + maior
+            importancia[indice] = distancia_sq[maior]
+            pilha.append((a, indice))
+            pilha.append((indice, b))
+    return importancia
+
+
+def _tolerancia_sq(zoom):
+    return (TOLERANCIA_PX / ((1 << zoom) * EXTENT)) ** 2
+
+
+def preparar_feicoes(itens, zoom_maximo=ZOOM_MAXIMO):
+    """
+    Projeta as feições e calcula a importância dos vértices.
+
+    @param itens: Lista de (tipo, partes em lon/lat, propriedades) dos leitores.
+    @return: (feições internas, lista de propriedades por id)
+    """
+    tolerancia = _tolerancia_sq(zoom_maximo)
+    feicoes, propriedades = [], []
+    for tipo, partes, props in itens:
+        convertidas = []
+        for parte in partes:
+            if not parte:
+                continue
+            x, y = projetar([ponto[:2] for ponto in parte])
+            if tipo == PONTO:
+                importancia = np.ones(len(x))
+            else:
+                importancia = importancia_vertices(x, y, tolerancia)
+                if tipo == POLIGONO and (x[0] != x[-1] or y[0] != y[-1]):
+                    # Anel sem o ponto de fechamento
+                    x, y, importancia = np.append(x, x[0]), np.append(y, y[0]), np.append(importancia, 1.0)
+            # Vértices abaixo da tolerância do zoom máximo não aparecem em nenhum tile: saem antes do recorte
+            mantidos = importancia > 0
+            x, y, importancia = x[mantidos], y[mantidos], importancia[mantidos]
+            if (tipo == LINHA and len(x) < 2) or (tipo == POLIGONO and len(x) < 4):
+                continue
+            convertidas.append(np.column_stack((x, y, importancia)))
+        if convertidas:
+            feicoes.append(_feicao(len(propriedades), tipo, convertidas))
+            propriedades.append(props)
+    return feicoes, propriedades
+
+
+def _feicao(identificador, tipo, partes):
+    todas = np.concatenate(partes)
+    return {"id": identificador, "tipo": tipo, "partes": partes,
+            "bbox": (todas[:, 0].min(), todas[:, 1].min(), todas[:, 0].max(), todas[:, 1].max())}
+
+
+# ---------------------------------------------------------------------------
+# Recorte (em um eixo de cada vez, como no geojson-vt)
+# ---------------------------------------------------------------------------
+
+def _intersecao(a, b, k, eixo):
+    t = (k - a[eixo]) / (b[eixo] - a[eixo])
+    if eixo == 0:
+        return (k, a[1] + (b[1] - a[1]) * t, 1.0)
+    return (a[0] + (b[0] - a[0]) * t, k, 1.0)
+
+
+def _recortar_parte(parte, k1, k2, eixo, fechada):
+    """Recorta uma linha (ou anel, se fechada) à faixa [k1, k2] do eixo; retorna a lista de pedaços."""
+    valores = parte[:, eixo]
+    if valores.min() >= k1 and valores.max() <= k2:
+        return [parte]
+    if valores.max() < k1 or valores.min() > k2:
+        return []
+    pedacos, atual = [], []
+    pontos = parte.tolist()
+    for a, b in zip(pontos[:-1], pontos[1:]):
+        va, vb = a[eixo], b[eixo]
+        saiu = False
+        if va < k1:
+            if vb > k1:
+                atual.append(_intersecao(a, b, k1, eixo))
+        elif va > k2:
+            if vb < k2:
+                atual.append(_intersecao(a, b, k2, eixo))
+        else:
+            atual.append(a)
+        if vb < k1 <= va:
+            atual.append(_intersecao(a, b, k1, eixo))
+            saiu = True
+        if vb > k2 >= va:
+            atual.append(_intersecao(a, b, k2, eixo))
+            saiu = True
+        if not fechada and saiu:
+            pedacos.append(atual)
+            atual = []
+    ultimo = pontos[-1]
+    if k1 <= ultimo[eixo] <= k2:
+        atual.append(ultimo)
+    if fechada and len(atual) >= 3 and (atual[-1][0] != atual[0][0] or atual[-1][1] != atual[0][1]):
+        atual.append(atual[0])
+    if atual:
+        pedacos.append(atual)
+    minimo = 4 if fechada else 2
+    return [np.array(pedaco, dtype=np.float64) for pedaco in pedacos if len(pedaco) >= minimo]
+
+
+def recortar(feicoes, k1, k2, eixo):
+    """Feições recortadas à faixa [k1, k2] do eixo (0 = x, 1 = y)."""
+    resultado = []
+    for feicao in feicoes:
+        minimo, maximo = feicao["bbox"][eixo], feicao["bbox"][eixo + 2]
+        if minimo >= k1 and maximo <= k2:
+            resultado.append(feicao)
+            continue
+        if maximo < k1 or minimo > k2:
+            continue
+        partes = []
+        for parte in feicao["partes"]:
+            if feicao["tipo"] == PONTO:
+                dentro = (parte[:, eixo] >= k1) & (parte[:, eixo] <= k2)
+                if dentro.any():
+                    partes.append(parte[dentro])
+            else:
+                partes.extend(_recortar_parte(parte, k1, k2, eixo, feicao["tipo"] == POLIGONO))
+        if partes:
+            resultado.append(_feicao(feicao["id"], feicao["tipo"], partes))
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Pirâmide de tiles
+# ---------------------------------------------------------------------------
+
+def _codificar_tile(feicoes, z, x, y, zoom_maximo):
+    """Simplifica as feições para o zoom e as converte em coordenadas do tile. Retorna (tile, é_folha)."""
+    tolerancia = _tolerancia_sq(z)
+    completo = True
+    pontos = 0
+    for feicao in feicoes:
+        for parte in feicao["partes"]:
+            pontos += len(parte)
+            if completo and (parte[:, 2] <= tolerancia).any():
+                completo = False
+    folha = z >= zoom_maximo or (completo and pontos <= MAX_PONTOS_FOLHA)
+    # Folhas são ampliadas no cliente até o zoom máximo: coordenadas com a precisão daquele zoom
+    extent = EXTENT << (zoom_maximo - z) if folha else EXTENT
+    escala = float(1 << z)
+
+    saida = []
+    for feicao in feicoes:
+        geometria = []
+        for parte in feicao["partes"]:
+            if feicao["tipo"] != PONTO:
+                parte = parte[parte[:, 2] > tolerancia]
+            coordenadas = np.rint(np.column_stack(((parte[:, 0] * escala - x) * extent,
+                                                   (parte[:, 1] * escala - y) * extent))).astype(np.int64)
+            if feicao["tipo"] != PONTO and len(coordenadas) > 1:
+                # Remove vértices repetidos após o arredondamento
+                mantidos = np.concatenate(([True], (np.diff(coordenadas, axis=0) != 0).any(axis=1)))
+                coordenadas = coordenadas[mantidos]
+            if (feicao["tipo"] == LINHA and len(coordenadas) < 2) or \
+                    (feicao["tipo"] == POLIGONO and len(coordenadas) < 4):
+                continue
+            geometria.append(coordenadas.ravel().tolist())
+        if geometria:
+            saida.append({"id": feicao["id"], "t": feicao["tipo"], "g": geometria})
+    return {"z": z, "x": x, "y": y, "extent": extent, "folha": folha, "feicoes": saida}, folha
+
+
+def gerar_tiles(feicoes, destino, zoom_maximo=ZOOM_MAXIMO):
+    """
+    Gera a pirâmide de tiles a partir do zoom 0, dividindo cada tile nos quatro filhos até as folhas.
+
+    @return: Dicionário com o número de tiles por zoom e o número de folhas.
+    """
+    por_zoom = {}
+    folhas = 0
+    pilha = [(feicoes, 0, 0, 0)]
+    while pilha:
+        atuais, z, x, y = pilha.pop()
+        tile, folha = _codificar_tile(atuais, z, x, y, zoom_maximo)
+        if tile["feicoes"]:
+            caminho = os.path.join(destino, str(z), str(x), f"{y}.json")
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            with open(caminho, "w", encoding="utf-8") as f:
+                f.write(json.dumps(tile, separators=(",", ":")))
+            por_zoom[z] = por_zoom.get(z, 0) + 1
+            folhas += folha
+        if folha:
+            continue
+
+        # Recorte para os filhos: primeiro em x (esquerda/direita), depois em y (cima/baixo)
+        escala = 1 << z
+        margem = BUFFER_PX / EXTENT / (2 * escala)
+        meio_x, meio_y = (x + 0.5) / escala, (y + 0.5) / escala
+        for coluna, (k1, k2) in enumerate(((x / escala - margem, meio_x + margem),
+                                           (meio_x - margem, (x + 1) / escala + margem))):
+            lado = recortar(atuais, k1, k2, 0)
+            if not lado:
+                continue
+            for linha, (j1, j2) in enumerate(((y / escala - margem, meio_y + margem),
+                                              (meio_y - margem, (y + 1) / escala + margem))):
+                filhas = recortar(lado, j1, j2, 1)
+                if filhas:
+                    pilha.append((filhas, z + 1, 2 * x + coluna, 2 * y + linha))
+    return {"tiles_por_zoom": {str(z): n for z, n in sorted(por_zoom.items())}, "folhas": folhas}
+
+
+def chave_conteudo(conteudo):
+    """Chave do cache: SHA-256 do conteúdo do arquivo."""
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _ler_manifesto(caminho):
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def importar_arquivo(conteudo, nome, root_dir=DATA_ROOT, zoom_maximo=ZOOM_MAXIMO):
+    """
+    Gera (ou reaproveita) a pirâmide de tiles de um arquivo vetorial.
+
+    @param conteudo: Bytes do arquivo.
+    @param nome: Nome do arquivo (a extensão define o formato).
+    @return: Manifesto da camada ({"chave", "url_tiles", "zoom_maximo", "bbox", ...}).
+    @raise ValueError: Formato não suportado, arquivo inválido ou sem geometrias.
+    """
+    formato = os.path.splitext(nome)[1].lower().lstrip(".")
+    if formato not in LEITORES:
+        raise ValueError(f"Formato de arquivo não suportado: {formato or nome}")
+    chave = chave_conteudo(conteudo)
+    diretorio = os.path.join(root_dir, DIRETORIO_CAMADAS, chave)
+    manifesto = _ler_manifesto(os.path.join(diretorio, ARQUIVO_MANIFESTO))
+    if manifesto and manifesto.get("versao_formato") == VERSAO_FORMATO and manifesto.get("zoom_maximo") == zoom_maximo:
+        logger.info(f"Camada {nome} já processada ({chave[:12]}).")
+        return dict(manifesto, reaproveitado=True)
+
+    inicio = datetime.utcnow()
+    try:
+        itens = LEITORES[formato](conteudo)
+    except (ValueError, ET.ParseError, zipfile.BadZipFile, UnicodeDecodeError, AttributeError, TypeError) as e:
+        raise ValueError(f"Arquivo {nome} inválido: {e}")
+    feicoes, propriedades = preparar_feicoes(itens, zoom_maximo)
+    if not feicoes:
+        raise ValueError(f"O arquivo {nome} não contém geometrias.")
+
+    # Gera em um diretório temporário e o move para o destino (importações simultâneas do mesmo arquivo)
+    temporario = f"{diretorio}.tmp-{os.getpid()}-{id(feicoes)}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    try:
+        estatisticas = gerar_tiles(feicoes, temporario, zoom_maximo)
+        x1, y1, x2, y2 = (min(f["bbox"][i] for f in feicoes) if i < 2 else max(f["bbox"][i] for f in feicoes)
+                          for i in range(4))
+        manifesto = {
+            "versao_formato": VERSAO_FORMATO,
+            "chave": chave,
+            "nome": nome,
+            "formato": formato,
+            "feicoes": len(feicoes),
+            "vertices": int(sum(len(parte) for feicao in feicoes for parte in feicao["partes"])),
+            "bbox": [_longitude(x1), _latitude(y2), _longitude(x2), _latitude(y1)],
+            "zoom_minimo": 0,
+            "zoom_maximo": zoom_maximo,
+            "extent": EXTENT,
+            "url_tiles": f"/data/{DIRETORIO_CAMADAS}/{chave}/{{z}}/{{x}}/{{y}}.json",
+            "gerado_em": inicio.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duracao_s": round((datetime.utcnow() - inicio).total_seconds(), 2),
+            **estatisticas,
+        }
+        with open(os.path.join(temporario, ARQUIVO_PROPRIEDADES), "w", encoding="utf-8") as f:
+            json.dump(propriedades, f, ensure_ascii=False, separators=(",", ":"), default=str)
+        gravar_arquivo_atomico(os.path.join(temporario, ARQUIVO_MANIFESTO),
+                               json.dumps(manifesto, ensure_ascii=False, separators=(",", ":")))
+        if os.path.isdir(diretorio):
+            shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(temporario, diretorio)
+    except OSError:
+        # Outro processo terminou a mesma camada antes: vale a dele
+        shutil.rmtree(temporario, ignore_errors=True)
+        existente = _ler_manifesto(os.path.join(diretorio, ARQUIVO_MANIFESTO))
+        if existente is None:
+            raise
+        return dict(existente, reaproveitado=True)
+    print(f"Camada {nome}: {manifesto['feicoes']} feições, {sum(manifesto['tiles_por_zoom'].values())} tiles "
+          f"em {manifesto['duracao_s']}s ({chave[:12]}).")
+    return dict(manifesto, reaproveitado=False)
+
+
+def _longitude(x):
+    return round((x - 0.5) * 360.0, 6)
+
+
+def _latitude(y):
+    return round(math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y)))), 6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera a pirâmide de tiles vetoriais de um arquivo importado.")
+    parser.add_argument("arquivo", help="Arquivo GeoJSON, KML, KMZ ou GPX.")
+    parser.add_argument("--root-dir", default=DATA_ROOT)
+    parser.add_argument("--zoom-maximo", type=int, default=ZOOM_MAXIMO)
+    args = parser.parse_args()
+    with open(args.arquivo, "rb") as f:
+        conteudo = f.read()
+    manifesto = importar_arquivo(conteudo, os.path.basename(args.arquivo), args.root_dir, args.zoom_maximo)
+    print(json.dumps(manifesto, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.services.vector_tiles caminho/para/bacias.kmz
@@ -0,0 +1,23 @@
+# FILE: server\apis\ana\tests\auxiliares.py
+
+
+def registros(dia, horas, cota=100.0, chuva="0.00"):
+    """
+    Leituras horárias no formato da HidroWeb para um dia, usadas como dados de teste.
+
+    @param dia: Data no formato YYYY-MM-DD.
+    @param horas: Horas das leituras.
+    @param cota: Cota da hora 0 (a cota de cada leitura é cota + hora).
+    @param chuva: Valor de Chuva_Adotada, ou uma função hora -> valor (None: leitura sem chuva nem status).
+    @return: Lista de registros.
+    """
+    leituras = []
+    for h in horas:
+        valor = chuva(h) if callable(chuva) else chuva
+        leituras.append({
+            "Chuva_Adotada": valor, "Chuva_Adotada_Status": None if valor is None else "0",
+            "Cota_Adotada": f"{cota + h:.2f}", "Cota_Adotada_Status": "0",
+            "Data_Atualizacao": f"{dia} {h:02d}:30:00.0", "Data_Hora_Medicao": f"{dia} {h:02d}:00:00.0",
+            "Vazao_Adotada": None, "Vazao_Adotada_Status": None,
+        })
+    return leituras
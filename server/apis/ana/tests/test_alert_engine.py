@@ -0,0 +1,102 @@
+# FILE: server\apis\ana\tests\test_alert_engine.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from server.apis.ana.utils.leituras import Leitura, texto_para_segundos
+from server.apis.ana.services.alert_engine import MotorAlertas
+
+INICIO = texto_para_segundos("2025-03-01 00:00:00")
+
+
+def leituras(campo, valores, inicio_h=0):
+    """Leituras horárias consecutivas com os valores informados no campo."""
+    return [Leitura(INICIO + (inicio_h + i) * 3600, **{campo: valor}) for i, valor in enumerate(valores)]
+
+
+def lote(codigo, novas):
+    caminho = os.path.join("public", "data", "2025", "03", "2025-03-01", f"codigoestacao_{codigo}.json")
+    return [{"fonte": "hidroweb", "estacao": codigo,
+             "arquivos": [{"caminho": caminho, "data": "2025-03-01", "conteudo": {}, "novos": novas}]}]
+
+
+class TestMotorAlertas(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.motor = MotorAlertas(os.path.join(self.dir, "alertas.sqlite3"), fonte="hidroweb")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def eventos(self, regra=None):
+        return [(e["regra"], e["tipo"], e["medicao"][11:16]) for e in self.motor.eventos_desde()
+                if regra is None or e["regra"] == regra]
+
+    def test_limiar_com_histerese(self):
+        # Sobe acima de 450, oscila entre 441 e 455 (sem normalizar), e só normaliza abaixo de 440
+        self.motor.avaliar({"1": leituras("cota", [440, 451, 445, 455, 441, 439, 452])})
+        self.assertEqual(self.eventos("nivel_alto"), [
+            ("nivel_alto", "disparo", "01:00"),
+            ("nivel_alto", "normalizacao", "05:00"),
+            ("nivel_alto", "disparo", "06:00"),
+        ])
+
+    def test_estado_entre_lotes_e_sem_duplicados(self):
+        self.motor(lote("1", leituras("vazao", [30, 36])))
+        self.motor(lote("1", leituras("vazao", [37, 38], inicio_h=2)))
+        self.assertEqual(self.eventos("vazao_alta"), [("vazao_alta", "disparo", "01:00")])
+
+        # Leituras repetidas ou antigas não são reavaliadas
+        self.motor(lote("1", leituras("vazao", [30, 36, 37, 38])))
+        self.assertEqual(len(self.motor.eventos_desde()), 1)
+
+        # Um motor novo sobre o mesmo arquivo continua do estado gravado
+        outro = MotorAlertas(self.motor.caminho, fonte="hidroweb")
+        self.assertEqual(outro(lote("1", leituras("vazao", [30], inicio_h=4))), None)
+        self.assertEqual(self.eventos("vazao_alta")[-1], ("vazao_alta", "normalizacao", "04:00"))
+        self.assertEqual(self.motor.alertas_ativos(), [])
+
+    def test_subida_por_n_horas(self):
+        # Sobe por 3h (00h → 03h, com um patamar), desce, e volta a subir só por 2h
+        self.motor.avaliar({"1": leituras("cota", [300, 301, 301, 303, 302, 303, 304])})
+        self.assertEqual(self.eventos("nivel_subindo"), [
+            ("nivel_subindo", "disparo", "03:00"),
+            ("nivel_subindo", "normalizacao", "04:00"),
+        ])
+
+    def test_taxa_de_chuva(self):
+        self.motor.avaliar({"1": leituras("chuva", [0, 4, 12, 9, 7])})
+        self.assertEqual(self.eventos("chuva_intensa"), [
+            ("chuva_intensa", "disparo", "02:00"),
+            ("chuva_intensa", "normalizacao", "04:00"),
+        ])
+
+    def test_estacao_silenciosa(self):
+        self.motor.avaliar({"1": leituras("cota", [400]), "2": leituras("cota", [400], inicio_h=10)})
+        # 13h depois da primeira leitura (horário de Brasília = UTC-3): só a estação 1 passou de 12h
+        agora_utc = datetime(2025, 3, 1, 16, 0)
+        eventos = self.motor.verificar_silencio(agora_utc)
+        self.assertEqual([(e["codigoestacao"], e["medicao"]) for e in eventos], [("1", "2025-03-01 12:00:00")])
+        # Sem transições, a verificação não regrava o estado (um worker concorrente pode tê-lo atualizado)
+        alteracoes = self.motor._conexao().total_changes
+        self.assertEqual(self.motor.verificar_silencio(agora_utc), [])
+        self.assertEqual(self.motor._conexao().total_changes, alteracoes)
+
+        # Outra fonte não verifica as estações desta
+        cemaden = MotorAlertas(self.motor.caminho, fonte="cemaden")
+        self.assertEqual(cemaden.verificar_silencio(datetime(2025, 3, 5)), [])
+
+        # A próxima leitura encerra o alerta
+        self.motor.avaliar({"1": leituras("cota", [400], inicio_h=14)})
+        self.assertEqual(self.eventos("estacao_silenciosa")[-1][:2], ("estacao_silenciosa", "normalizacao"))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_alert_engine
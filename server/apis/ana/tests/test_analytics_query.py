@@ -0,0 +1,103 @@
+# FILE: server\apis\ana\tests\test_analytics_query.py
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+import importlib.util
+from datetime import datetime
+
+import pandas as pd
+
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.services.archive_compaction import compactar
+from server.apis.ana.services.analytics_query import ConsultaAnalitica
+from server.apis.ana.tests.auxiliares import registros
+
+
+class TestConsultaAnalitica(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        storage = DataStorage(root_dir=self.dir)
+        for codigo, cota in (("100", 100.0), ("200", 200.0)):
+            for dia in ("2025-01-30", "2025-01-31", "2025-02-01", "2025-03-10"):
+                leituras = registros(dia, range(0, 24, 6), cota, chuva=lambda h: "0.20" if h % 2 else None)
+                storage.save_station_data_to_file(leituras, None, None, codigo)
+        # Janeiro vai para o arquivo mensal: a consulta lê as duas camadas
+        compactar(self.dir, dias_minimos=30, agora_utc=datetime(2025, 3, 12))
+        self.consulta = ConsultaAnalitica(root_dir=self.dir, max_workers=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_dataframe_tipado_e_cache(self):
+        df = self.consulta.dataframe(["200", "100", "999"], "2025-01-31 06:00", "2025-02-01",
+                                     variaveis=("cota", "chuva"), incluir_status=True)
+        self.assertEqual(list(df.columns), ["codigoestacao", "medicao", "cota", "chuva", "cota_status", "chuva_status"])
+        self.assertEqual(str(df["codigoestacao"].dtype), "category")
+        self.assertEqual(list(df["codigoestacao"].cat.categories), ["200", "100", "999"])
+        self.assertEqual(str(df["medicao"].dtype), "datetime64[ns]")
+        self.assertEqual(str(df["cota_status"].dtype), "Int16")
+        self.assertEqual(len(df), 2 * 7)
+        primeira = df.iloc[0]
+        self.assertEqual((primeira["codigoestacao"], primeira["medicao"], primeira["cota"]),
+                         ("200", pd.Timestamp("2025-01-31 06:00"), 206.0))
+        self.assertTrue(pd.isna(primeira["chuva"]))
+        self.assertTrue(pd.isna(primeira["chuva_status"]))
+        self.assertEqual(df["cota_status"].sum(), 0)
+
+        lidas = self.consulta.estatisticas["particoes_lidas"]
+        self.consulta.dataframe(["100"], "2025-01-31", "2025-02-01")
+        self.assertEqual(self.consulta.estatisticas["particoes_lidas"], lidas)
+        self.assertEqual(self.consulta.estatisticas["acertos_cache"], 2)
+
+        with self.assertRaises(ValueError):
+            self.consulta.dataframe("100", "2025-02-01", "2025-01-01")
+        with self.assertRaises(ValueError):
+            self.consulta.dataframe("100", "2025-01-01", "2025-02-01", variaveis=("temperatura",))
+
+    def test_iterar_e_exportar_csv(self):
+        blocos = list(self.consulta.iterar(["100", "200"], "2025-01-01", "2025-03-31", variaveis=("cota",)))
+        self.assertEqual([(str(b["codigoestacao"].iloc[0]), len(b)) for b in blocos],
+                         [("100", 8), ("100", 4), ("100", 4), ("200", 8), ("200", 4), ("200", 4)])
+        completo = self.consulta.dataframe(["100", "200"], "2025-01-01", "2025-03-31", variaveis=("cota",))
+        pd.testing.assert_frame_equal(pd.concat(blocos, ignore_index=True), completo)
+
+        caminho = os.path.join(self.dir, "cota.csv.gz")
+        linhas = self.consulta.exportar(caminho, ["100", "200"], "2025-01-01", "2025-03-31", variaveis=("cota",),
+                                        incluir_atualizacao=True)
+        self.assertEqual(linhas, 32)
+        with gzip.open(caminho, "rt", encoding="utf-8") as f:
+            lido = pd.read_csv(f, dtype={"codigoestacao": str})
+        self.assertEqual(list(lido.columns), ["codigoestacao", "medicao", "cota", "atualizacao"])
+        self.assertEqual(lido.iloc[-1].tolist()[:3], ["200", "2025-03-10 18:00:00", 218.0])
+        with self.assertRaises(ValueError):
+            self.consulta.exportar(os.path.join(self.dir, "cota.xlsx"), "100", "2025-01-01", "2025-01-31")
+        # Parâmetros inválidos falham antes de criar o temporário; uma falha durante a gravação o remove
+        invertido = os.path.join(self.dir, "invertido.csv")
+        with self.assertRaises(ValueError):
+            self.consulta.iterar(["100"], "2025-02-01", "2025-01-01")
+        with self.assertRaises(ValueError):
+            self.consulta.exportar(invertido, ["100"], "2025-02-01", "2025-01-01")
+        self.assertFalse(os.path.exists(f"{invertido}.tmp"))
+        def falhar(*args):
+            raise OSError("disco cheio")
+        self.consulta._montar = falhar
+        with self.assertRaises(OSError):
+            self.consulta.exportar(invertido, ["100"], "2025-01-01", "2025-01-31")
+        self.assertEqual([nome for nome in os.listdir(self.dir) if nome.startswith("invertido")], [])
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow não instalado")
+    def test_exportar_parquet(self):
+        caminho = os.path.join(self.dir, "cota.parquet")
+        self.assertEqual(self.consulta.exportar(caminho, ["100", "200"], "2025-01-01", "2025-03-31"), 32)
+        self.assertEqual(len(pd.read_parquet(caminho)), 32)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_analytics_query
@@ -0,0 +1,83 @@
+# FILE: server\apis\ana\tests\test_archive_compaction.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.utils.arquivo_mensal import (
+    DIRETORIO_ARQUIVO, caminho_dia, ler_dia, listar_dias, localizar_dia
+)
+from server.apis.ana.services.archive_compaction import compactar, desarquivar_mes
+from server.apis.ana.services.series_query import ConsultaSeries
+from server.apis.ana.tests.auxiliares import registros
+
+
+class TestCompactacaoArquivos(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.storage = DataStorage(root_dir=self.dir)
+        for codigo in ("100", "200", "300"):
+            for dia in ("2025-01-10", "2025-01-11", "2025-02-27", "2025-03-20"):
+                self.storage.save_station_data_to_file(registros(dia, range(0, 24, 6)), None, None, codigo)
+        self.agora = datetime(2025, 3, 25, 12)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_dias_fechados_sao_arquivados_e_lidos_pela_mesma_api(self):
+        antes = ler_dia(self.dir, "200", "2025-01-10")
+        resumo = compactar(self.dir, dias_minimos=10, agora_utc=self.agora)
+        self.assertEqual((resumo["meses"], resumo["dias"], resumo["arquivos"]), (2, 3, 9))
+        self.assertLess(resumo["bytes_arquivo"], resumo["bytes_soltos"])
+
+        # Os dias fechados saíram da camada viva; o dia recente continua solto
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "2025", "01", "2025-01-10")))
+        self.assertTrue(os.path.exists(caminho_dia(self.dir, "200", "2025-03-20")))
+        dir_mes = os.path.join(self.dir, "2025", "01")
+        self.assertEqual([nome for nome in os.listdir(dir_mes) if os.path.isdir(os.path.join(dir_mes, nome))],
+                         [DIRETORIO_ARQUIVO])
+
+        self.assertEqual(ler_dia(self.dir, "200", "2025-01-10"), antes)
+        self.assertEqual(localizar_dia(self.dir, "200", "2025-01-10")[2][0], "arquivo")
+        self.assertIsNone(ler_dia(self.dir, "200", "2025-01-12"))
+        self.assertEqual(listar_dias(self.dir, {"300"}),
+                         {"300": ["2025-01-10", "2025-01-11", "2025-02-27", "2025-03-20"]})
+
+        consulta = ConsultaSeries(root_dir=self.dir)
+        _, resultado = consulta.consultar("100", "2025-01-10", "2025-03-20", variaveis=("cota",))
+        self.assertEqual(resultado["series"]["cota"]["total"], 16)
+
+    def test_gravacao_tardia_em_dia_arquivado(self):
+        compactar(self.dir, dias_minimos=10, agora_utc=self.agora)
+        # A nova leitura é mesclada com o dia arquivado e o arquivo solto volta a existir, completo
+        self.storage.save_station_data_to_file(registros("2025-01-10", [23], cota=500), None, None, "100")
+        self.assertEqual(localizar_dia(self.dir, "100", "2025-01-10")[2][0], "vivo")
+        self.assertEqual(len(ler_dia(self.dir, "100", "2025-01-10")["dados"]), 5)
+
+        # A próxima compactação substitui o membro do ZIP pela versão nova
+        resumo = compactar(self.dir, dias_minimos=10, agora_utc=self.agora)
+        self.assertEqual(resumo["arquivos"], 1)
+        self.assertEqual(localizar_dia(self.dir, "100", "2025-01-10")[2][0], "arquivo")
+        self.assertEqual(len(ler_dia(self.dir, "100", "2025-01-10")["dados"]), 5)
+        self.assertEqual(len(ler_dia(self.dir, "200", "2025-01-10")["dados"]), 4)
+
+    def test_desarquivar_e_limites(self):
+        compactar(self.dir, dias_minimos=10, agora_utc=self.agora)
+        self.assertEqual(desarquivar_mes(self.dir, "2025", "01"), 6)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "2025", "01", DIRETORIO_ARQUIVO)))
+        with open(caminho_dia(self.dir, "300", "2025-01-11"), "r", encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)["dados"]), 4)
+        with self.assertRaises(ValueError):
+            compactar(self.dir, dias_minimos=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_archive_compaction
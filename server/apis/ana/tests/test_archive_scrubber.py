@@ -0,0 +1,114 @@
+# FILE: server\apis\ana\tests\test_archive_scrubber.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.utils.arquivo_mensal import caminho_dia, ler_dia, localizar_dia
+from server.apis.ana.utils.manifesto_mensal import ler_manifesto, resumo_dia
+from server.apis.ana.services.archive_compaction import compactar
+from server.apis.ana.services.archive_scrubber import varrer, verificar_documento
+from server.apis.ana.tests.auxiliares import registros
+
+
+def tipos(problemas):
+    return sorted(problema["tipo"] for problema in problemas)
+
+
+class TestVarredura(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.storage = DataStorage(root_dir=self.dir)
+        for codigo in ("100", "200"):
+            for dia in ("2025-01-10", "2025-01-11", "2025-03-20"):
+                self.storage.save_station_data_to_file(registros(dia, [0, 6, 12]), None, None, codigo)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def gravar(self, codigo, data_str, documento):
+        conteudo = documento if isinstance(documento, str) else json.dumps(documento, ensure_ascii=False, indent=4)
+        with open(caminho_dia(self.dir, codigo, data_str), "w", encoding="utf-8") as f:
+            f.write(conteudo)
+
+    def test_verificar_documento(self):
+        problemas, _ = verificar_documento(b'{"codigoestacao": "1", "dados": [', "1", "2025-01-10")
+        self.assertEqual(tipos(problemas), ["truncado"])
+        cemaden = {"idestacao": "7", "codigoestacao": "510340701A", "data": "2025-01-10", "chuvaAcumulada": "1.00",
+                   "dados": [{"Chuva_Adotada": "0.40", "Data_Hora_Medicao": "2025-01-09 21:00:00.0"},
+                             {"Chuva_Adotada": "0.20", "Data_Hora_Medicao": "2025-01-10 03:00:00.0"},
+                             {"Chuva_Adotada": None, "Data_Hora_Medicao": "2025-01-10 03:00:00.0"},
+                             {"Chuva_Adotada": "x", "Data_Hora_Medicao": "2025-01-10 02:00:00.0", "Extra": 1}]}
+        problemas, _ = verificar_documento(json.dumps(cemaden).encode(), "510340701A", "2025-01-10")
+        # Cemaden sem Cota_Adotada e com leituras da noite anterior (UTC) segue o esquema da origem
+        self.assertEqual(tipos(problemas), ["campos_desconhecidos", "chuva_acumulada", "duplicados",
+                                            "fora_de_ordem", "valores_invalidos"])
+        hidroweb = {"codigoestacao": "100", "data": "2025-01-11",
+                    "dados": registros("2025-01-11", [1]) + [{"Cota_Adotada": "1.00"}]}
+        del hidroweb["dados"][0]["Vazao_Adotada"]
+        problemas, _ = verificar_documento(json.dumps(hidroweb).encode(), "100", "2025-01-10")
+        self.assertEqual(tipos(problemas), ["cabecalho", "campos_ausentes", "fora_do_dia", "registro_sem_medicao"])
+
+    def test_varredura_corrige_e_incremental(self):
+        documento = ler_dia(self.dir, "100", "2025-01-11")
+        documento["dados"] = documento["dados"][::-1] + documento["dados"][:1]
+        self.gravar("100", "2025-01-11", documento)
+        self.gravar("200", "2025-03-20", '{"codigoestacao": "200", "data": "2025-03-20", "dados": [{')
+        compactar(self.dir, dias_minimos=10, agora_utc=datetime(2025, 3, 25))  # Janeiro vai para o arquivo mensal
+
+        relatorio = varrer(self.dir, usar_processos=False)
+        self.assertEqual(relatorio["problemas_por_tipo"],
+                         {"duplicados": 1, "fora_de_ordem": 1, "manifesto": 2, "truncado": 1})
+        por_arquivo = {(item["arquivo"], item["membro"]): tipos(item["problemas"])
+                       for item in relatorio["arquivos_com_problemas"]}
+        grupo = localizar_dia(self.dir, "100", "2025-01-11")[0][len(self.dir) + 1:].replace(os.sep, "/")
+        self.assertEqual(por_arquivo[(grupo, "2025-01-11/codigoestacao_100.json")],
+                         ["duplicados", "fora_de_ordem", "manifesto"])
+        self.assertEqual(por_arquivo[("2025/03/2025-03-20/codigoestacao_200.json", None)], ["manifesto", "truncado"])
+
+        relatorio = varrer(self.dir, corrigir=True, usar_processos=False)
+        self.assertEqual(relatorio["corrigidos"], 1)
+        # O dia arquivado foi corrigido na camada viva, e o manifesto descreve o conteúdo corrigido
+        self.assertEqual(localizar_dia(self.dir, "100", "2025-01-11")[2][0], "vivo")
+        with open(caminho_dia(self.dir, "100", "2025-01-11"), "rb") as f:
+            conteudo = f.read()
+        self.assertEqual(ler_manifesto(self.dir, "2025", "01")["estacoes"]["100"]["2025-01-11"], resumo_dia(conteudo))
+        self.assertEqual([r["Data_Hora_Medicao"][11:13] for r in json.loads(conteudo)["dados"]], ["00", "06", "12"])
+
+        # Incremental: só o arquivo corrigido é relido; o problema sem correção continua no relatório
+        relatorio = varrer(self.dir, incremental=True, usar_processos=False)
+        self.assertEqual(relatorio["verificados"], 1)
+        self.assertEqual(relatorio["problemas_por_tipo"], {"manifesto": 1, "truncado": 1})
+        self.assertEqual(varrer(self.dir, incremental=True, usar_processos=False)["verificados"], 0)
+        with open(os.path.join(self.dir, "varredura_relatorio.json"), "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["modo"], "incremental")
+
+    def test_regravacao_preserva_dia_ilegivel(self):
+        truncado = '{"codigoestacao": "200", "data": "2025-03-20", "dados": [{'
+        self.gravar("200", "2025-03-20", truncado)
+        caminho = caminho_dia(self.dir, "200", "2025-03-20")
+        for tentativa in range(2):
+            self.storage.save_station_data_to_file(registros("2025-03-20", [18]), None, None, "200")
+            # O dia regravado só tem as leituras novas, e os bytes originais ficam em <arquivo>.corrompido
+            self.assertEqual([r["Data_Hora_Medicao"][11:13] for r in ler_dia(self.dir, "200", "2025-03-20")["dados"]],
+                             ["18"])
+            self.gravar("200", "2025-03-20", truncado)
+        with open(f"{caminho}.corrompido", "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), truncado)
+        # Uma segunda cópia não sobrescreve a primeira; a varredura ignora as cópias
+        self.assertTrue(os.path.exists(f"{caminho}.corrompido.1"))
+        relatorio = varrer(self.dir, usar_processos=False)
+        self.assertEqual([item["arquivo"] for item in relatorio["arquivos_com_problemas"]],
+                         ["2025/03/2025-03-20/codigoestacao_200.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_archive_scrubber
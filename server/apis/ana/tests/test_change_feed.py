@@ -0,0 +1,128 @@
+# FILE: server\apis\ana\tests\test_change_feed.py
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.utils.leituras import SerieLeituras
+from server.apis.ana.utils.classificacao import resumir_serie
+from server.apis.ana.services.change_feed import FeedAlteracoes, ColetorCiclo
+
+# 12:00 em Brasília
+AGORA_UTC = datetime(2025, 1, 29, 15, 0)
+
+
+def registro(data_hora, chuva="0.00", cota="420.00", vazao="31.00"):
+    return {
+        "Chuva_Adotada": chuva,
+        "Chuva_Adotada_Status": "0",
+        "Cota_Adotada": cota,
+        "Cota_Adotada_Status": "0",
+        "Data_Atualizacao": f"{data_hora}:15:00.0",
+        "Data_Hora_Medicao": f"{data_hora}:00:00.0",
+        "Vazao_Adotada": vazao,
+        "Vazao_Adotada_Status": "0",
+    }
+
+
+class TestResumo(unittest.TestCase):
+
+    def test_classificacao_como_no_frontend(self):
+        serie = SerieLeituras.de_json([
+            registro("2025-01-28 10", chuva="50.00"),  # fora da janela de 24h
+            registro("2025-01-28 12", chuva="3.00"),
+            registro("2025-01-29 11", chuva="4.50", cota="460.00", vazao="29.00"),
+        ])
+        resumo = resumir_serie("123", serie, datetime(2025, 1, 29, 12, 0))
+        self.assertEqual(resumo["chuvaAcumulada"], 7.5)
+        self.assertEqual(resumo["classificacaoChuva"], "Moderada")
+        self.assertEqual(resumo["classificacaoNivel"], "Alto")
+        self.assertEqual(resumo["classificacaoVazao"], "Baixa")
+        self.assertEqual(resumo["nivelMaisRecente"], "460.00")
+        self.assertEqual(resumo["statusAtualizacao"], "Atualizado")
+        self.assertEqual(resumir_serie("123", serie, datetime(2025, 1, 30, 12, 0))["statusAtualizacao"],
+                         "Desatualizado")
+
+
+class TestFeedAlteracoes(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = DataStorage(self.root)
+        self.feed = FeedAlteracoes(os.path.join(self.root, "feed.sqlite3"), root_dir=self.root,
+                                   intervalo_verificacao_s=0.05)
+        for codigo in ("111", "222"):
+            self.gravar(codigo, [registro("2025-01-29 10")])
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def gravar(self, codigo, registros):
+        return self.storage.gravar_lote(self.storage.preparar_arquivos(registros, codigo))
+
+    def test_versoes_e_deltas(self):
+        versao1, delta = self.feed.publicar(["111", "222", "sem-dados"], agora_utc=AGORA_UTC)
+        self.assertEqual(set(delta), {"111", "222"})
+
+        # Ciclo sem mudanças: nova versão, delta vazio
+        versao2, delta = self.feed.publicar(["111", "222"], agora_utc=AGORA_UTC)
+        self.assertEqual((versao2, delta), (versao1 + 1, {}))
+
+        self.gravar("222", [registro("2025-01-29 11", chuva="12.00")])
+        versao3, delta = self.feed.publicar(["222"], agora_utc=AGORA_UTC)
+        self.assertEqual(list(delta), ["222"])
+        self.assertEqual(delta["222"]["classificacaoChuva"], "Moderada")
+
+        alteracoes = self.feed.alteracoes_desde(versao1)
+        self.assertFalse(alteracoes["completo"])
+        self.assertEqual(alteracoes["versao"], versao3)
+        self.assertEqual([e["codigoestacao"] for e in alteracoes["estacoes"]], ["222"])
+        self.assertEqual(self.feed.alteracoes_desde(versao3)["estacoes"], [])
+
+        completo = self.feed.alteracoes_desde(0)
+        self.assertTrue(completo["completo"])
+        self.assertEqual(len(completo["estacoes"]), 2)
+
+    def test_status_muda_sem_novas_leituras(self):
+        self.feed.publicar(["111", "222"], agora_utc=AGORA_UTC)
+        _, delta = self.feed.publicar([], agora_utc=datetime(2025, 1, 30, 1, 30))  # 22:30 do mesmo dia em Brasília
+        self.assertEqual({e["statusAtualizacao"] for e in delta.values()}, {"Desatualizado"})
+
+    def test_long_poll_acorda_com_publicacao(self):
+        versao, _ = self.feed.publicar(["111", "222"], agora_utc=AGORA_UTC)
+        coletor = ColetorCiclo(self.feed)
+
+        def publicar_depois():
+            arquivos = self.storage.preparar_arquivos([registro("2025-01-29 11", cota="480.00")], "111")
+            self.storage.gravar_lote(arquivos)
+            coletor([{"arquivos": arquivos}])
+            self.feed.publicar(coletor.estacoes, agora_utc=AGORA_UTC)
+
+        temporizador = threading.Timer(0.2, publicar_depois)
+        temporizador.start()
+        resultado = self.feed.aguardar_alteracoes(versao, timeout_s=5)
+        temporizador.join()
+        self.assertEqual([e["codigoestacao"] for e in resultado["estacoes"]], ["111"])
+        self.assertEqual(resultado["estacoes"][0]["classificacaoNivel"], "Alto")
+
+        self.assertEqual(self.feed.aguardar_alteracoes(resultado["versao"], timeout_s=0.1)["estacoes"], [])
+
+    def test_long_poll_com_feed_vazio_espera(self):
+        # Sem nenhuma versão o estado completo é vazio: a requisição espera em vez de responder na hora
+        inicio = time.monotonic()
+        resultado = self.feed.aguardar_alteracoes(0, timeout_s=0.3)
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.3)
+        self.assertEqual((resultado["versao"], resultado["estacoes"]), (0, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_change_feed
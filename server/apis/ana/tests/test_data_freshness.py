@@ -0,0 +1,109 @@
+# FILE: server\apis\ana\tests\test_data_freshness.py
+
+import os
+import json
+import time
+import random
+import shutil
+import tempfile
+import unittest
+
+from server.apis.ana.utils.leituras import Leitura
+from server.apis.ana.utils.histograma import HistogramaLatencias
+from server.apis.ana.services.ingest_pipeline import PipelineIngestao
+from server.apis.ana.services.data_freshness import RastreadorFrescor, ARQUIVO_FRESCOR, DESLOCAMENTO_UTC_S
+
+
+def processar_payload(item, payload):
+    return {"estacao": item, "arquivos": []}
+
+
+def resultado(codigo, medicoes_utc, buscado, gravado, atraso_atualizacao_s=600):
+    """Resultado do pipeline com leituras medidas nos instantes (UTC) informados."""
+    novos = [Leitura(medicao=int(m) - DESLOCAMENTO_UTC_S,
+                     atualizacao_ms=int((m + atraso_atualizacao_s - DESLOCAMENTO_UTC_S) * 1000))
+             for m in medicoes_utc]
+    return {"fonte": "hidroweb", "estacao": codigo, "buscado_em": buscado, "gravado_em": gravado,
+            "arquivos": [{"caminho": f"2025-01-01/codigoestacao_{codigo}.json", "novos": novos}]}
+
+
+class TestFrescorDados(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_percentis_do_histograma(self):
+        random.seed(3)
+        valores = [random.expovariate(1 / 600) for _ in range(5000)]
+        histograma = HistogramaLatencias()
+        for valor in valores:
+            histograma.adicionar(valor)
+        histograma.adicionar(-5)
+        ordenados = sorted(valores)
+        for q in (0.5, 0.9, 0.99):
+            exato = ordenados[int(q * len(ordenados))]
+            self.assertAlmostEqual(histograma.quantil(q) / exato, 1, delta=0.2)
+        self.assertEqual(histograma.negativos, 1)
+
+        # Serialização esparsa e decaimento preservam os percentis
+        copia = HistogramaLatencias.de_dict(json.loads(json.dumps(histograma.para_dict())))
+        copia.decair(0.25)
+        self.assertAlmostEqual(copia.total, histograma.total / 4)
+        self.assertAlmostEqual(copia.quantil(0.9), histograma.quantil(0.9), delta=1e-6)
+
+    def test_pipeline_registra_busca_e_gravacao(self):
+        observados = []
+        pipeline = PipelineIngestao(buscar=lambda item: b"{}", processar=processar_payload, gravar=lambda lote: None,
+                                    usar_processos=False, observadores=[observados.extend])
+        antes = time.time()
+        pipeline.executar(["a", "b"])
+        self.assertEqual(len(observados), 2)
+        for item in observados:
+            self.assertLessEqual(antes, item["buscado_em"])
+            self.assertLessEqual(item["buscado_em"], item["gravado_em"])
+
+    def test_etapas_e_estacoes_acima_da_meta(self):
+        rastreador = RastreadorFrescor(os.path.join(self.dir, "frescor.sqlite3"), root_dir=self.dir,
+                                       fonte="hidroweb", meta_atraso_s=3600)
+        agora = time.time()
+        # Estação 1: leituras publicadas ~20 min após a medição; estação 2: ~2h depois
+        rastreador([resultado("1", [agora - 1200, agora - 1260], buscado=agora - 300, gravado=agora - 290),
+                    resultado("2", [agora - 7200], buscado=agora - 300, gravado=agora - 290),
+                    # Carga do histórico: não entra nos histogramas
+                    resultado("3", [agora - 30 * 86400], buscado=agora - 300, gravado=agora - 290)])
+        rastreador.publicar(publicado_em=agora)
+
+        with open(os.path.join(self.dir, ARQUIVO_FRESCOR), "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        self.assertEqual(dados["versao"], 1)
+        etapas = dados["fontes"]["hidroweb"]["etapas"]
+        self.assertEqual(etapas["ponta_a_ponta"]["n"], 3)
+        self.assertAlmostEqual(etapas["busca_gravacao"]["p50"], 10, delta=2)
+        self.assertAlmostEqual(etapas["gravacao_publicacao"]["p50"], 290, delta=60)
+        self.assertAlmostEqual(etapas["medicao_atualizacao"]["p50"], 600, delta=120)
+        self.assertAlmostEqual(dados["estacoes"]["1"]["p50"], 1230, delta=250)
+        self.assertNotIn("3", dados["estacoes"])
+
+        self.assertEqual([v["codigoestacao"] for v in dados["violadoras"]], ["2"])
+        self.assertEqual(dados["violadoras"][0]["motivos"], ["atraso", "idade"])
+        self.assertEqual(dados["fontes"]["hidroweb"]["violadoras"], 1)
+
+        # Outra fonte no mesmo banco: o relatório reúne as duas; a idade cresce sem leituras novas
+        cemaden = RastreadorFrescor(os.path.join(self.dir, "frescor.sqlite3"), root_dir=self.dir,
+                                    fonte="cemaden", meta_atraso_s=3600)
+        cemaden([resultado("9", [agora - 60], buscado=agora - 30, gravado=agora - 20)])
+        cemaden.publicar(publicado_em=agora)
+        relatorio = cemaden.relatorio(agora=agora + 4000)
+        self.assertEqual(sorted(relatorio["fontes"]), ["cemaden", "hidroweb"])
+        self.assertEqual(sorted(v["codigoestacao"] for v in relatorio["violadoras"]), ["1", "2", "9"])
+        self.assertEqual(relatorio["estacoes"]["9"]["fonte"], "cemaden")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_data_freshness
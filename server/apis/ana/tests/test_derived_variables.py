@@ -0,0 +1,122 @@
+# FILE: server\apis\ana\tests\test_derived_variables.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from server.apis.ana.utils.leituras import Leitura, texto_para_segundos
+from server.apis.ana.services.derived_variables import MotorDerivadas, calcular_derivadas, COLUNAS_DERIVADAS
+
+INICIO = texto_para_segundos("2025-03-30 00:00:00")
+
+
+def leituras(n, inicio_h=0, chuva=None, cota=None, vazao=None):
+    """Leituras horárias; cada variável é uma função do índice da hora."""
+    return [Leitura(INICIO + h * 3600,
+                    chuva=chuva(h) if chuva else None,
+                    cota=cota(h) if cota else None,
+                    vazao=vazao(h) if vazao else None)
+            for h in range(inicio_h, inicio_h + n)]
+
+
+def referencia_pandas(df):
+    """Mesmas variáveis calculadas com rolling do pandas, para comparação."""
+    s = df.set_index(pd.to_datetime(df["medicao"], unit="s"))
+    esperado = {f"chuva_{h}h": s["chuva"].rolling(f"{h}h").sum().where(s["chuva"].rolling(f"{h}h").count() > 0)
+                for h in (3, 6, 24)}
+    esperado["vazao_media"] = s["vazao"].rolling("720h").mean()
+    return {coluna: valores.to_numpy() for coluna, valores in esperado.items()}
+
+
+class TestCalcularDerivadas(unittest.TestCase):
+
+    def test_janelas_intensidade_e_dh_dt(self):
+        t = INICIO + np.array([0, 1, 2, 3, 4, 12, 12.5]) * 3600
+        chuva = np.array([1, 2, np.nan, 4, 0, 3, 1.5])
+        cota = np.array([100, 102, np.nan, 108, 107, 120, 121])
+        derivadas = calcular_derivadas(t.astype(np.int64), chuva, cota, np.full(7, np.nan))
+
+        np.testing.assert_allclose(derivadas["chuva_3h"], [1, 3, 3, 6, 4, 3, 4.5])
+        np.testing.assert_allclose(derivadas["intensidade_chuva"], [1, 2, np.nan, 4, 0, 3, 3])
+        # 3h → 1h: cota anterior válida a 2h; 12h: a anterior está a 8h (> 6h)
+        np.testing.assert_allclose(derivadas["dh_dt"], [np.nan, 2, np.nan, 3, -1, np.nan, 2])
+        self.assertTrue(np.isnan(derivadas["vazao_media"]).all())
+
+    def test_grupos_nao_se_misturam(self):
+        t = np.array([INICIO, INICIO + 3600, INICIO, INICIO + 3600])
+        derivadas = calcular_derivadas(t, [5, 5, 1, 1], [10, 11, 50, 40], [1, 3, 10, 20], grupo=[0, 0, 1, 1])
+        np.testing.assert_allclose(derivadas["chuva_24h"], [5, 10, 1, 2])
+        np.testing.assert_allclose(derivadas["dh_dt"], [np.nan, 1, np.nan, -10])
+        np.testing.assert_allclose(derivadas["anomalia_vazao"], [0, 1, 0, 5])
+
+
+class TestMotorDerivadas(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.motor = MotorDerivadas(self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_incremental_igual_ao_calculo_completo(self):
+        chuva = lambda h: float(h % 7)
+        vazao = lambda h: 30 + (h % 50) * 0.1
+        cota = lambda h: 400 + (h % 10)
+        completas = leituras(24 * 40, chuva=chuva, cota=cota, vazao=vazao)
+
+        # Em lotes de 6h (o último atravessa a virada do mês), com duas estações por lote
+        for inicio in range(0, len(completas), 6):
+            self.motor.atualizar({"A": completas[inicio:inicio + 6], "B": completas[inicio:inicio + 6]})
+        df = self.motor.ler("A", INICIO, INICIO + 40 * 86400)
+        self.assertEqual(len(df), len(completas))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.dir, "derivadas"))), ["2025-03", "2025-04", "2025-05"])
+
+        bruto = pd.DataFrame({"medicao": [l.medicao for l in completas], "chuva": [l.chuva for l in completas],
+                              "vazao": [l.vazao for l in completas]})
+        for coluna, esperado in referencia_pandas(bruto).items():
+            np.testing.assert_allclose(df[coluna].to_numpy(), esperado, err_msg=coluna)
+        np.testing.assert_allclose(df["anomalia_vazao"], df["vazao"] - df["vazao_media"])
+        pd.testing.assert_frame_equal(df, self.motor.ler("B", INICIO, INICIO + 40 * 86400))
+
+        # Um lote novo de 1h recalcula só a linha nova (o contexto não é regravado)
+        recalculadas = self.motor.atualizar({"A": leituras(1, inicio_h=24 * 40, chuva=chuva, cota=cota, vazao=vazao)})
+        self.assertEqual(recalculadas, 1)
+
+    def test_leitura_atrasada_recalcula_a_cauda(self):
+        self.motor.atualizar({"A": [l for l in leituras(10, chuva=lambda h: 1.0) if l.medicao != INICIO + 5 * 3600]})
+        self.assertEqual(self.motor.ler("A", INICIO, INICIO + 86400)["chuva_3h"].iloc[6], 2)
+        recalculadas = self.motor.atualizar({"A": leituras(1, inicio_h=5, chuva=lambda h: 10.0)})
+        df = self.motor.ler("A", INICIO, INICIO + 86400)
+        self.assertEqual(recalculadas, 5)
+        self.assertEqual(df["chuva_3h"].tolist()[4:8], [3, 12, 12, 12])
+        self.assertEqual(df["chuva_24h"].iloc[-1], 19)
+
+    def test_observador_e_reconstrucao(self):
+        caminho = os.path.join(self.dir, "2025", "03", "2025-03-30", "codigoestacao_15043000.json")
+        lote = [{"fonte": "hidroweb", "estacao": "15043000",
+                 "arquivos": [{"caminho": caminho, "data": "2025-03-30", "conteudo": "",
+                               "novos": leituras(3, cota=lambda h: 400 + h)}]}]
+        self.motor(lote)
+        df = self.motor.ler("15043000", INICIO, INICIO + 86400)
+        self.assertEqual(df["dh_dt"].tolist()[1:], [1, 1])
+        self.assertEqual(list(df.columns), ["chuva", "cota", "vazao", *COLUNAS_DERIVADAS])
+
+        # A reconstrução lê os arquivos diários
+        os.makedirs(os.path.dirname(caminho))
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write('{"codigoestacao": "15043000", "data": "2025-03-30", "dados": ['
+                    '{"Data_Hora_Medicao": "2025-03-30 03:00:00.0", "Cota_Adotada": "405"}]}')
+        self.assertEqual(self.motor.reconstruir(), 1)
+        self.assertEqual(self.motor.ler("15043000", INICIO, INICIO + 86400)["dh_dt"].tolist()[1:], [1, 1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_derived_variables
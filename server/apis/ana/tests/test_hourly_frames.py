@@ -0,0 +1,90 @@
+# FILE: server\apis\ana\tests\test_hourly_frames.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.utils.leituras import texto_para_segundos
+from server.apis.ana.services.hourly_frames import (
+    QuadrosHorarios, ler_quadro, ler_indice, ler_catalogo, reconstruir, caminho_quadro
+)
+
+
+def registro(medicao, chuva=None, cota=None):
+    return {"Data_Hora_Medicao": f"{medicao}.0", "Chuva_Adotada": chuva, "Cota_Adotada": cota}
+
+
+def hora(texto):
+    return texto_para_segundos(texto) // 3600
+
+
+class TestQuadrosHorarios(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        with open(os.path.join(self.dir, "inventario_estacoes.json"), "w", encoding="utf-8") as f:
+            json.dump([{"codigoestacao": "300"}, {"codigoestacao": "100"}], f)
+        self.storage = DataStorage(root_dir=self.dir)
+        self.quadros = QuadrosHorarios(self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def ingerir(self, codigo, registros):
+        arquivos = self.storage.preparar_arquivos(registros, codigo)
+        self.storage.gravar_lote(arquivos)
+        self.quadros([{"arquivos": arquivos}])
+
+    def test_ingestao_mantem_quadros_por_hora(self):
+        self.ingerir("100", [registro("2025-02-03 10:00:00", "1.0", "50"),
+                             registro("2025-02-03 10:15:00", "0.5", "51"),
+                             registro("2025-02-03 11:00:00", None, "52")])
+        self.ingerir("200", [registro("2025-02-03 10:30:00", "2.0")])
+        # Estações do inventário primeiro, as demais acrescentadas ao final
+        self.assertEqual(ler_indice(self.dir), ["300", "100", "200"])
+
+        quadro = ler_quadro(self.dir, hora("2025-02-03 10:00:00"))
+        self.assertEqual(quadro.shape, (3, 3))
+        self.assertTrue(np.isnan(quadro[:, 0]).all())
+        np.testing.assert_allclose(quadro[:2, 1], [1.5, 51.0])
+        self.assertEqual(quadro[0, 2], 2.0)
+        # O quadro das 11h foi gravado antes da estação 200 entrar no índice: é mais curto
+        self.assertEqual(ler_quadro(self.dir, hora("2025-02-03 11:00:00")).shape, (3, 2))
+        self.assertTrue(np.isnan(ler_quadro(self.dir, hora("2025-02-03 11:00:00"), n_estacoes=3)[:, 2]).all())
+        self.assertIsNone(ler_quadro(self.dir, hora("2025-02-03 12:00:00")))
+
+        # Regravar as mesmas leituras não soma a chuva de novo; uma leitura nova na hora recalcula o quadro
+        self.ingerir("100", [registro("2025-02-03 10:45:00", "0.25", "53")])
+        arquivos = self.storage.preparar_arquivos([registro("2025-02-03 10:50:00", "0.25")], "100")
+        self.storage.gravar_lote(arquivos)
+        self.quadros([{"arquivos": arquivos}])
+        self.quadros([{"arquivos": arquivos}])
+        np.testing.assert_allclose(ler_quadro(self.dir, hora("2025-02-03 10:00:00"))[:2, 1], [2.0, 53.0])
+
+        catalogo = ler_catalogo(self.dir)
+        self.assertEqual((catalogo["primeira_hora"], catalogo["ultima_hora"], catalogo["estacoes"]),
+                         ("2025-02-03 10:00:00", "2025-02-03 11:00:00", 3))
+
+    def test_reconstrucao_a_partir_dos_arquivos_diarios(self):
+        self.storage.save_station_data_to_file([registro("2025-01-05 00:10:00", "3.0"),
+                                                registro("2025-01-05 23:00:00", None, "10")], None, None, "100")
+        self.storage.save_station_data_to_file([registro("2025-01-06 05:00:00", "1.0")], None, None, "300")
+        self.assertEqual(reconstruir(self.dir, "2025-01-05", "2025-01-06"), 3)
+        quadro = ler_quadro(self.dir, hora("2025-01-05 00:00:00"), n_estacoes=2)
+        self.assertEqual(quadro[0, 1], 3.0)
+        self.assertTrue(os.path.exists(caminho_quadro(self.dir, hora("2025-01-06 05:00:00"))))
+        self.assertEqual(ler_quadro(self.dir, hora("2025-01-05 23:00:00"))[1, 1], 10.0)
+        with self.assertRaises(ValueError):
+            reconstruir(self.dir, "2025-01-06", "2025-01-05")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_hourly_frames
@@ -0,0 +1,182 @@
+# FILE: server\apis\ana\tests\test_ingest_journal.py
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+from server.apis.ana.utils.arquivo_mensal import ler_dia
+from server.apis.ana.utils.manifesto_mensal import ler_manifesto
+from server.apis.ana.services.ingest_journal import (
+    DiarioIngestao, MaterializadorDiario, ler_quadros, ler_checkpoint, segmentos, nome_segmento, reconstruir,
+    podar, status, caminho_diario, _travado
+)
+from server.apis.ana.tests.auxiliares import registros
+
+
+def entrada_hidroweb(codigo, dia, horas, cota=100):
+    return {"fonte": "hidroweb", "estacao": codigo, "buscado_em": 1736500000.0,
+            "registros": registros(dia, horas, cota, chuva="0.50")}
+
+
+def entrada_cemaden(codigo, dia, chuvas):
+    dados = [{"Chuva_Adotada": f"{chuva:.2f}", "Data_Hora_Medicao": f"{dia} {h:02d}:00:00.0"}
+             for h, chuva in enumerate(chuvas)]
+    return {"fonte": "cemaden", "estacao": codigo, "buscado_em": 1736500000.0,
+            "registros": [{"idestacao": "7", "codigoestacao": codigo, "data": dia, "chuvaAcumulada": None,
+                           "dados": dados}]}
+
+
+def horas_do_dia(root_dir, codigo, dia):
+    return [registro["Data_Hora_Medicao"][11:13] for registro in ler_dia(root_dir, codigo, dia)["dados"]]
+
+
+class TestDiarioIngestao(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.diretorio = caminho_diario(self.dir, "hidroweb")
+        self.diario = DiarioIngestao(self.diretorio, sincronizar=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def materializador(self, observados=None, root_dir=None):
+        observadores = [observados.append] if observados is not None else []
+        return MaterializadorDiario(self.diretorio, root_dir=root_dir or self.dir, observadores=observadores,
+                                    usar_processos=False, max_workers=2)
+
+    def test_segmentos_e_cauda_interrompida(self):
+        diario = DiarioIngestao(self.diretorio, tamanho_segmento=600, sincronizar=False)
+        for i in range(6):
+            diario.anexar([entrada_hidroweb(str(i), "2025-01-10", [0, 1, 2])])
+        self.assertGreater(len(segmentos(self.diretorio)), 1)
+        self.assertEqual([entradas[0]["estacao"] for _, _, _, entradas in ler_quadros(self.diretorio)],
+                         [str(i) for i in range(6)])
+
+        # Um escritor interrompido deixa meio quadro no final: leitores o ignoram e o próximo escritor o trunca
+        ultimo = os.path.join(self.diretorio, nome_segmento(segmentos(self.diretorio)[-1]))
+        tamanho = os.path.getsize(ultimo)
+        with open(ultimo, "ab") as f:
+            f.write(b"DIA1\x40\x00\x00\x00parcial")
+        self.assertEqual(len(list(ler_quadros(self.diretorio))), 6)
+        DiarioIngestao(self.diretorio, tamanho_segmento=10 ** 6, sincronizar=False).anexar(
+            [entrada_hidroweb("6", "2025-01-10", [0])])
+        self.assertGreater(os.path.getsize(ultimo), tamanho)
+        quadros = list(ler_quadros(self.diretorio))
+        self.assertEqual(quadros[-1][3][0]["estacao"], "6")
+        self.assertEqual(quadros[-1][1], tamanho)
+
+    def test_materializacao_idempotente_com_checkpoint(self):
+        self.diario.anexar([entrada_hidroweb("100", "2025-01-10", [0, 6]),
+                            entrada_cemaden("510340701A", "2025-01-10", [0.2, 0.4])])
+        # A mesma estação duas vezes no quadro: aplicadas em ordem, em sublotes separados
+        self.diario.anexar([entrada_hidroweb("100", "2025-01-10", [3]), entrada_hidroweb("100", "2025-01-10", [6, 9])])
+        observados = []
+        resumo = self.materializador(observados).materializar()
+        self.assertEqual((resumo["quadros"], resumo["entradas"], resumo["erros"]), (2, 4, 0))
+        self.assertEqual(horas_do_dia(self.dir, "100", "2025-01-10"), ["00", "03", "06", "09"])
+        self.assertEqual(ler_dia(self.dir, "510340701A", "2025-01-10")["chuvaAcumulada"], "0.60")
+        self.assertEqual(sorted(ler_manifesto(self.dir, "2025", "01")["estacoes"]), ["100", "510340701A"])
+        self.assertEqual(sum(len(arquivo["novos"]) for lote in observados for resultado in lote
+                             for arquivo in resultado["arquivos"]), 6)
+        self.assertTrue(all("gravado_em" in resultado and resultado["buscado_em"] == 1736500000.0
+                            for lote in observados for resultado in lote))
+        self.assertEqual(self.materializador().materializar()["quadros"], 0)
+
+        # Queda antes do checkpoint: o quadro é reaplicado sem duplicar leituras nem gerar leituras novas
+        checkpoint = os.path.join(self.diretorio, "checkpoint.json")
+        os.remove(checkpoint)
+        observados = []
+        resumo = self.materializador(observados).materializar()
+        self.assertEqual(resumo["quadros"], 2)
+        self.assertEqual(horas_do_dia(self.dir, "100", "2025-01-10"), ["00", "03", "06", "09"])
+        self.assertEqual(sum(len(arquivo["novos"]) for lote in observados for resultado in lote
+                             for arquivo in resultado["arquivos"]), 0)
+        self.assertEqual(status(self.diretorio)["pendente_bytes"], 0)
+
+        # Só o quadro novo é aplicado a partir do checkpoint
+        self.diario.anexar([entrada_hidroweb("200", "2025-01-11", [12])])
+        self.assertGreater(status(self.diretorio)["pendente_bytes"], 0)
+        self.assertEqual(self.materializador().materializar()["entradas"], 1)
+        self.assertEqual(ler_checkpoint(checkpoint)[1], os.path.getsize(
+            os.path.join(self.diretorio, nome_segmento(1))))
+
+    def test_dia_ilegivel_do_cemaden_e_preservado(self):
+        caminho = os.path.join(self.dir, "2025", "01", "2025-01-10", "codigoestacao_510340701A.json")
+        os.makedirs(os.path.dirname(caminho))
+        with open(caminho, "wb") as f:
+            f.write(b'{"dados": [')
+        self.diario.anexar([entrada_cemaden("510340701A", "2025-01-10", [0.2, 0.4])])
+        resumo = self.materializador().materializar()
+        self.assertEqual((resumo["quadros"], resumo["erros"]), (1, 0))
+        self.assertEqual(horas_do_dia(self.dir, "510340701A", "2025-01-10"), ["00", "01"])
+        with open(caminho + ".corrompido", "rb") as f:
+            self.assertEqual(f.read(), b'{"dados": [')
+
+    def test_reconstrucao_e_poda(self):
+        self.diario.anexar([entrada_hidroweb("100", "2025-01-10", [0, 1])])
+        self.diario.anexar([entrada_hidroweb("100", "2025-01-10", [2]), {"fonte": "outra", "estacao": "x"},
+                            {"fonte": "cemaden", "estacao": "y"}])
+        # Entradas que nunca poderão ser aplicadas são descartadas; o quadro é concluído
+        resumo = self.materializador().materializar()
+        self.assertEqual((resumo["quadros"], resumo["erros"]), (2, 2))
+
+        destino = os.path.join(self.dir, "reconstruido")
+        observados = []
+        resumo = reconstruir(self.diretorio, destino, observadores=[observados.append], usar_processos=False)
+        self.assertEqual(resumo["quadros"], 2)
+        with open(os.path.join(self.dir, "2025", "01", "2025-01-10", "codigoestacao_100.json"), "rb") as original, \
+                open(os.path.join(destino, "2025", "01", "2025-01-10", "codigoestacao_100.json"), "rb") as copia:
+            self.assertEqual(json.loads(original.read()), json.loads(copia.read()))
+        # Os observadores da reconstrução recebem as leituras como na ingestão original
+        self.assertEqual(sum(len(arquivo["novos"]) for lote in observados for resultado in lote
+                             for arquivo in resultado["arquivos"]), 3)
+        self.assertTrue(os.path.exists(os.path.join(destino, "diario_checkpoint_hidroweb.json")))
+        with self.assertRaises(ValueError):
+            reconstruir(self.diretorio, self.dir)
+
+        # Só segmentos anteriores ao do checkpoint podem ser removidos
+        self.assertEqual(podar(self.diretorio, 0), [])
+        with self.assertRaises(ValueError):
+            podar(self.diretorio, -1)
+
+    def test_diario_por_fonte_e_espera_da_trava(self):
+        self.assertEqual(caminho_diario(self.dir, "cemaden"), os.path.join(self.dir, "diario", "cemaden"))
+        with self.assertRaises(ValueError):
+            caminho_diario(self.dir, "outra")
+
+        self.diario.anexar([entrada_hidroweb("100", "2025-01-10", [0])])
+        trava = os.path.join(self.diretorio, "materializador.lock")
+        # Com a trava ocupada além da espera, nada é aplicado nem entregue aos observadores
+        observados = []
+        with _travado(trava) as travado:
+            self.assertTrue(travado)
+            self.assertIsNone(self.materializador(observados).materializar(espera_s=0))
+        self.assertEqual(observados, [])
+
+        # Liberada durante a espera, o segundo materializador aplica o diário
+        ocupada, liberar = threading.Event(), threading.Event()
+
+        def ocupar():
+            with _travado(trava):
+                ocupada.set()
+                liberar.wait(5)
+
+        ocupante = threading.Thread(target=ocupar)
+        ocupante.start()
+        ocupada.wait(5)
+        threading.Timer(0.3, liberar.set).start()
+        resumo = self.materializador(observados).materializar(espera_s=5)
+        ocupante.join()
+        self.assertEqual(resumo["quadros"], 1)
+        self.assertEqual(len(observados), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_ingest_journal
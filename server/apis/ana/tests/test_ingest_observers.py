@@ -0,0 +1,92 @@
+# FILE: server\apis\ana\tests\test_ingest_observers.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from server.apis.ana.services.ingest_observers import montar_observadores, OPCOES_PADRAO
+from server.apis.ana.services.alert_engine import MotorAlertas
+from server.apis.ana.services.data_freshness import RastreadorFrescor
+from server.apis.ana.services.change_feed import ColetorCiclo
+
+
+class TestMontarObservadores(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_opcoes_e_ordem(self):
+        lotes = []
+        extra = lotes.append
+        desligados = {opcao: False for opcao in OPCOES_PADRAO if opcao != "meta_frescor_s"}
+        ciclo = montar_observadores(self.dir, "cemaden", desligados, observadores=[extra])
+        self.assertEqual(ciclo.lista, [extra])
+        ciclo.concluir()
+        self.assertEqual(os.listdir(self.dir), [])
+
+        # Os adicionais vêm primeiro; o coletor do feed é o primeiro dos observadores criados
+        ciclo = montar_observadores(self.dir, "cemaden", {"meta_frescor_s": 60}, observadores=[extra])
+        self.assertEqual(len(ciclo.lista), 8)
+        self.assertIs(ciclo.lista[0], extra)
+        self.assertIsInstance(ciclo.lista[1], ColetorCiclo)
+        self.assertIsInstance(ciclo.motor_alertas, MotorAlertas)
+        self.assertIsInstance(ciclo.frescor, RastreadorFrescor)
+        self.assertIn(ciclo.baselines, ciclo.lista)
+
+        with self.assertRaises(ValueError):
+            montar_observadores(self.dir, "hidroweb", {"publicar": True})
+
+    def test_concluir_publica_frescor_e_baselines(self):
+        ciclo = montar_observadores(self.dir, "hidroweb", {"publicar_feed": False, "manter_anel": False})
+        self.assertIsNone(ciclo.coletor)
+        ciclo.concluir()
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "frescor_dados.json")))
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "baselines_estacoes.json")))
+
+    def test_concluir_em_shard_so_publica_no_eleito(self):
+        class Shard:
+            def __init__(self, eleito):
+                self.eleito = eleito
+                self.chamadas = []
+
+            def concluir_ciclo(self, fonte):
+                self.chamadas.append(fonte)
+                return self.eleito
+
+        opcoes = {"publicar_feed": False, "manter_anel": False, "medir_frescor": False}
+        verificacoes = []
+        for eleito in (False, True):
+            shard = Shard(eleito)
+            ciclo = montar_observadores(self.dir, "hidroweb", opcoes)
+            ciclo.motor_alertas.verificar_silencio = lambda: verificacoes.append(eleito)
+            ciclo.concluir(shard)
+            self.assertEqual(shard.chamadas, ["hidroweb"])
+            self.assertEqual(os.path.exists(os.path.join(self.dir, "baselines_estacoes.json")), eleito)
+        self.assertEqual(verificacoes, [True])
+
+    def test_frescor_sem_publicacao_do_feed(self):
+        ciclo = montar_observadores(self.dir, "hidroweb", {"manter_anel": False, "manter_quadros": False})
+        ciclo.coletor.apos_publicar = []
+        publicacoes = []
+        ciclo.frescor.publicar = publicacoes.append
+        ciclo.concluir()
+        self.assertIsNotNone(ciclo.coletor.ultima_publicacao)
+
+        def falhar(*args, **kwargs):
+            raise OSError("feed indisponível")
+
+        # A publicação do ciclo anterior não é atribuída a este ciclo
+        ciclo.coletor.feed.publicar = falhar
+        ciclo.concluir()
+        self.assertEqual(publicacoes, [ciclo.coletor.ultima_publicacao, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_ingest_observers
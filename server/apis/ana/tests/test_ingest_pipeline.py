@@ -0,0 +1,74 @@
+# FILE: server\apis\ana\tests\test_ingest_pipeline.py
+
+import json
+import unittest
+
+from server.apis.ana.services.ingest_pipeline import PipelineIngestao
+
+
+def processar_payload(item, payload):
+    """Função de módulo para poder ser enviada ao pool de processos"""
+    dados = json.loads(payload)
+    if not dados["items"]:
+        return None
+    if item == "erro":
+        raise ValueError("falha simulada")
+    return {"estacao": item, "total": sum(dados["items"])}
+
+
+class TestPipelineIngestao(unittest.TestCase):
+
+    def buscar(self, item):
+        if item == "sem-resposta":
+            return None
+        if item == "falha-rede":
+            raise Exception("timeout simulado")
+        if item == "vazio":
+            return json.dumps({"items": []}).encode("utf-8")
+        return json.dumps({"items": [1, 2, 3]}).encode("utf-8")
+
+    def executar(self, itens, **kwargs):
+        lotes = []
+        observados = []
+        pipeline = PipelineIngestao(
+            buscar=self.buscar,
+            processar=processar_payload,
+            gravar=lotes.append,
+            observadores=[observados.append],
+            **kwargs,
+        )
+        return pipeline.executar(itens), lotes, observados
+
+    def test_contadores_por_estagio(self):
+        itens = [f"e{i}" for i in range(20)] + ["sem-resposta", "falha-rede", "vazio", "erro"]
+        resumo, lotes, observados = self.executar(itens, usar_processos=False, max_cpu_workers=2, tamanho_lote=8)
+        self.assertEqual(resumo["total"], 24)
+        self.assertEqual(resumo["sucesso"], 20)
+        self.assertEqual(resumo["sem_dados"], 2)
+        self.assertEqual(resumo["estagios"]["busca"]["erros"], 1)
+        self.assertEqual(resumo["estagios"]["processamento"]["erros"], 1)
+        self.assertEqual(resumo["estagios"]["gravacao"]["saida"], 20)
+        self.assertTrue(all(len(lote) <= 8 for lote in lotes))
+        self.assertEqual(sum(len(lote) for lote in lotes), 20)
+        self.assertEqual(lotes, observados)
+
+    def test_backpressure_com_filas_pequenas(self):
+        """Com filas de 1 posição todos os itens ainda devem chegar à gravação"""
+        itens = [f"e{i}" for i in range(50)]
+        resumo, lotes, _ = self.executar(itens, usar_processos=False, tamanho_fila=1, tamanho_lote=4)
+        self.assertEqual(resumo["sucesso"], 50)
+        gravados = sorted(r["estacao"] for lote in lotes for r in lote)
+        self.assertEqual(gravados, sorted(itens))
+
+    def test_pool_de_processos(self):
+        resumo, lotes, _ = self.executar([f"e{i}" for i in range(10)], max_cpu_workers=2)
+        self.assertEqual(resumo["sucesso"], 10)
+        self.assertTrue(all(r["total"] == 6 for lote in lotes for r in lote))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_ingest_pipeline
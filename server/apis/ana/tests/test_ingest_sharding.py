@@ -0,0 +1,109 @@
+# FILE: server\apis\ana\tests\test_ingest_sharding.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from server.apis.ana.services.ingest_sharding import AnelConsistente, CoordenadorShards, resumo_shard
+
+CODIGOS = [str(15000000 + i) for i in range(2000)]
+AGORA = 1_740_000_000.0  # Início de uma janela de 10 minutos
+
+
+class TestAnelConsistente(unittest.TestCase):
+
+    def test_divisao_equilibrada(self):
+        particoes = AnelConsistente(["a", "b", "c", "d"]).particionar(CODIGOS)
+        self.assertEqual(sorted(c for parte in particoes.values() for c in parte), sorted(CODIGOS))
+        for parte in particoes.values():
+            self.assertGreater(len(parte), len(CODIGOS) / 4 * 0.75)
+            self.assertLess(len(parte), len(CODIGOS) / 4 * 1.25)
+
+    def test_saida_de_um_membro_so_move_as_estacoes_dele(self):
+        antes = AnelConsistente(["a", "b", "c", "d"])
+        depois = AnelConsistente(["a", "b", "c"])
+        for codigo in CODIGOS:
+            if antes.dono(codigo) != "d":
+                self.assertEqual(depois.dono(codigo), antes.dono(codigo))
+
+
+class TestCoordenadorShards(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.dir, "shards.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def coordenador(self, worker_id):
+        return CoordenadorShards(self.caminho, worker_id=worker_id, ttl_s=60)
+
+    def test_nenhuma_estacao_buscada_duas_vezes(self):
+        workers = [self.coordenador(f"w{i}") for i in range(3)]
+        for worker in workers:
+            worker.heartbeat(AGORA)
+        partes = [worker.reivindicar("hidroweb", CODIGOS, agora=AGORA + 1) for worker in workers]
+        todos = [codigo for parte in partes for codigo in parte]
+        self.assertEqual(len(todos), len(set(todos)))
+        self.assertEqual(sorted(todos), sorted(CODIGOS))
+
+        # Um worker que só entra depois, no mesmo ciclo, não pega estações já reivindicadas
+        self.assertEqual(self.coordenador("w3").reivindicar("hidroweb", CODIGOS, agora=AGORA + 2), [])
+        # Outra fonte tem reivindicações próprias
+        self.assertTrue(workers[0].reivindicar("cemaden", [7883, 7884, 7885], agora=AGORA + 1))
+
+    def test_worker_morto_e_redistribuido_no_ciclo_seguinte(self):
+        vivo, morto = self.coordenador("vivo"), self.coordenador("morto")
+        vivo.heartbeat(AGORA)
+        morto.heartbeat(AGORA)
+        primeiro = vivo.reivindicar("hidroweb", CODIGOS, agora=AGORA + 1)
+        self.assertLess(len(primeiro), len(CODIGOS))
+
+        # "morto" não renova o lease; no próximo ciclo "vivo" assume todas as estações
+        proximo = AGORA + vivo.intervalo_ciclo_s
+        self.assertEqual(vivo.membros_ativos(proximo), [])
+        self.assertEqual(vivo.reivindicar("hidroweb", CODIGOS, agora=proximo), CODIGOS)
+        self.assertEqual([w["ativo"] for w in vivo.status(proximo)], [False, True])
+
+    def test_tarefas_pos_publicacao_em_um_unico_worker(self):
+        workers = [self.coordenador(f"w{i}") for i in range(3)]
+        for worker in workers[:2]:
+            worker.heartbeat(AGORA)
+        for worker in workers[:2]:
+            worker.reivindicar("hidroweb", CODIGOS, agora=AGORA + 1)
+        # w2 entra depois e não reivindica nada; só w0 e w1 são esperados
+        self.assertEqual(workers[2].reivindicar("hidroweb", CODIGOS, agora=AGORA + 2), [])
+        self.assertFalse(workers[0].concluir_ciclo("hidroweb", agora=AGORA + 3))
+        self.assertFalse(workers[2].concluir_ciclo("hidroweb", agora=AGORA + 3))
+        self.assertTrue(workers[1].concluir_ciclo("hidroweb", agora=AGORA + 4))
+        self.assertFalse(workers[0].concluir_ciclo("hidroweb", agora=AGORA + 5))
+
+        # Um worker que morre no meio do ciclo deixa de ser esperado quando o lease expira
+        proximo = AGORA + workers[0].intervalo_ciclo_s
+        for worker in workers[:2]:
+            worker.heartbeat(proximo)
+        for worker in workers[:2]:
+            worker.reivindicar("hidroweb", CODIGOS, agora=proximo)
+        self.assertFalse(workers[0].concluir_ciclo("hidroweb", agora=proximo + 1))
+        self.assertTrue(workers[0].concluir_ciclo("hidroweb", agora=proximo + 61))
+
+    def test_metricas_por_shard(self):
+        worker = self.coordenador("w0")
+        worker.heartbeat(AGORA)
+        worker.registrar_metricas("hidroweb", resumo_shard({"total": 10, "sucesso": 9, "sem_dados": 1,
+                                                            "duracao_s": 2.0, "estagios": {}}), agora=AGORA)
+        metricas = worker.status(AGORA)[0]["metricas"]["hidroweb"]
+        self.assertEqual(metricas["sucesso"], 9)
+        self.assertEqual(metricas["estacoes_por_s"], 5.0)
+        self.assertEqual(metricas["ciclo"], worker.ciclo(AGORA))
+        worker.encerrar()
+        self.assertEqual(worker.status(AGORA), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_ingest_sharding
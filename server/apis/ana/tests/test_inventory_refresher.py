@@ -0,0 +1,130 @@
+# FILE: server\apis\ana\tests\test_inventory_refresher.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from server.apis.ana.services.mock_upstream_server import iniciar_servidor_mock
+from server.apis.ana.services.hidrowebAuth import HidroWebAPI
+from server.apis.ana.controllers.hidrowebInventory import HidroWebInventory
+from server.apis.ana.services.inventory_refresher import (
+    AtualizadorInventario, carregar_registro_estacoes, projetar_mapa, CAMPOS_MAPA,
+    ARQUIVO_INVENTARIO, ARQUIVO_INVENTARIO_MAPA, ARQUIVO_REGISTRO
+)
+from server.apis.ana.services.station_data_scheduler import StationDataFetcher
+
+CEMADEN = [{
+    "Latitude": "-15.61929", "Longitude": "-56.07717", "codigoestacao": "510340301H",
+    "Estacao_Nome": "Corrego do Barbado", "UF_Estacao": "MT", "Tipo_Estacao": "Hidrológica",
+    "Municipio_Nome": "CUIABÁ", "id_Estacao": 8753, "sigla": "CEMADEN",
+}]
+
+
+class TestAtualizadorInventario(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Replay: o inventário das estações vem de public/data/inventario_estacoes.json
+        cls.servidor = iniciar_servidor_mock(modo="replay", seed=7)
+        token = HidroWebAPI("usuario", "senha", base_url=cls.servidor.hidroweb_base_url).authenticate()
+        cls.cliente = HidroWebInventory(token=token, base_url=cls.servidor.hidroweb_base_url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.config = {
+            "hidroweb": {
+                "regioes": [{"uf": "MT", "codigo_bacia": "2"}],
+                "somente_telemetricas": True,
+                # 66170600 não existe no inventário: continua no registro, mas não no inventário
+                "estacoes": ["15043000", "66170600"],
+                "tamanho_lote": 2,
+                "max_workers": 2,
+            },
+            "cemaden": {"estacoes": CEMADEN},
+        }
+
+    def tearDown(self):
+        self.servidor.estado.config["endpoints"] = {}
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def ler(self, nome):
+        with open(os.path.join(self.dir, nome), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def atualizar(self):
+        return AtualizadorInventario(config=self.config, root_dir=self.dir, cliente=self.cliente).executar()
+
+    def test_inventario_projecao_e_registro(self):
+        resumo = self.atualizar()
+        inventario = self.ler(ARQUIVO_INVENTARIO)
+        codigos = [estacao["codigoestacao"] for estacao in inventario]
+
+        self.assertTrue(resumo["alterado"])
+        self.assertEqual(resumo["falhas"], [])
+        self.assertIn("15043000", codigos)
+        self.assertNotIn("66170600", codigos)
+        self.assertIn("510340301H", codigos)
+        regiao = [e for e in inventario if e.get("codigobacia") == "2"]
+        self.assertGreater(len(regiao), 0)
+        self.assertTrue(all(e["Tipo_Estacao_Telemetrica"] == "1" for e in regiao))
+
+        mapa = self.ler(ARQUIVO_INVENTARIO_MAPA)
+        self.assertEqual([e["codigoestacao"] for e in mapa], codigos)
+        self.assertTrue(all(set(e) <= set(CAMPOS_MAPA) for e in mapa))
+        self.assertEqual(mapa[0]["Latitude"], inventario[0]["Latitude"])
+
+        registro = self.ler(ARQUIVO_REGISTRO)
+        self.assertEqual(registro["hidroweb"][:2], ["15043000", "66170600"])
+        self.assertEqual(sorted(registro["hidroweb"][2:]), sorted(e["codigoestacao"] for e in regiao
+                                                                 if e["codigoestacao"] != "15043000"))
+        self.assertEqual(registro["cemaden"], [8753])
+        self.assertEqual(carregar_registro_estacoes(root_dir=self.dir)["hidroweb"], registro["hidroweb"])
+
+    def test_sem_alteracoes_nao_regrava(self):
+        self.atualizar()
+        mtimes = {nome: os.stat(os.path.join(self.dir, nome)).st_mtime_ns
+                  for nome in (ARQUIVO_INVENTARIO, ARQUIVO_INVENTARIO_MAPA, ARQUIVO_REGISTRO)}
+        resumo = self.atualizar()
+        self.assertFalse(resumo["alterado"])
+        self.assertEqual(resumo["adicionadas"] + resumo["removidas"] + resumo["alteradas"], [])
+        for nome, mtime in mtimes.items():
+            self.assertEqual(os.stat(os.path.join(self.dir, nome)).st_mtime_ns, mtime, nome)
+
+        # Uma estação nova na configuração é só uma mudança de configuração
+        self.config["hidroweb"]["estacoes"].append("15044000")
+        resumo = self.atualizar()
+        self.assertEqual(resumo["adicionadas"], ["15044000"])
+        self.assertIn("15044000", self.ler(ARQUIVO_REGISTRO)["hidroweb"])
+
+    def test_falhas_mantem_estacoes_conhecidas(self):
+        self.atualizar()
+        anterior = self.ler(ARQUIVO_INVENTARIO)
+        self.servidor.estado.config["endpoints"] = {"hidroweb_inventario": {"taxa_5xx": 1.0}}
+        resumo = self.atualizar()
+        self.assertEqual(len(resumo["falhas"]), 3)
+        self.assertFalse(resumo["alterado"])
+        self.assertEqual(self.ler(ARQUIVO_INVENTARIO), anterior)
+
+    def test_registro_ausente_usa_configuracao(self):
+        registro = carregar_registro_estacoes(root_dir=self.dir)
+        self.assertIn("15043000", registro["hidroweb"])
+        self.assertEqual(len(registro["cemaden"]), 25)
+        self.assertEqual(StationDataFetcher(data_root=self.dir).station_codes, registro["hidroweb"])
+
+    def test_projetar_mapa(self):
+        estacao = dict(CEMADEN[0], Tipo_Estacao_Telemetrica="1", Data_Ultima_Atualizacao="2025-01-01")
+        self.assertEqual(projetar_mapa([estacao]), CEMADEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_inventory_refresher
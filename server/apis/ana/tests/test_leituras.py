@@ -0,0 +1,102 @@
+# FILE: server\apis\ana\tests\test_leituras.py
+
+import json
+import pickle
+import unittest
+
+from server.apis.ana.utils.leituras import Leitura, SerieLeituras
+from server.apis.ana.services.cemaden_data_scheduler import merge_day_info
+
+REGISTRO_HIDROWEB = {
+    "Chuva_Adotada": "0.20",
+    "Chuva_Adotada_Status": "0",
+    "Cota_Adotada": "480.00",
+    "Cota_Adotada_Status": "0",
+    "Data_Atualizacao": "2025-01-29 01:15:02.37",
+    "Data_Hora_Medicao": "2025-01-29 01:00:00.0",
+    "Vazao_Adotada": "151.82",
+    "Vazao_Adotada_Status": "0",
+}
+
+
+def registro_cemaden(hora, chuva):
+    return {"Chuva_Adotada": chuva, "Data_Hora_Medicao": f"2025-01-29 {hora:02d}:00:00.0"}
+
+
+class TestLeituras(unittest.TestCase):
+
+    def test_conversao_sem_perdas(self):
+        leitura = Leitura.de_dict(REGISTRO_HIDROWEB)
+        self.assertEqual(leitura.cota, 480.0)
+        self.assertEqual(leitura.chuva_status, 0)
+        self.assertEqual(leitura.data, "2025-01-29")
+        self.assertEqual(json.dumps(leitura.para_dict()), json.dumps(REGISTRO_HIDROWEB))
+        self.assertEqual(pickle.loads(pickle.dumps(leitura)), leitura)
+
+    def test_campos_ausentes_e_textos_atipicos(self):
+        """Campos ausentes continuam ausentes e textos fora do padrão são preservados"""
+        cemaden = registro_cemaden(3, None)
+        self.assertEqual(Leitura.de_dict(cemaden).para_dict(), cemaden)
+        atipico = dict(REGISTRO_HIDROWEB, Cota_Adotada="480.5", Vazao_Adotada=None, Extra="x")
+        self.assertEqual(Leitura.de_dict(atipico).para_dict(), atipico)
+
+    def test_medicao_invalida(self):
+        with self.assertRaises(ValueError):
+            Leitura.de_dict({"Chuva_Adotada": "0.00"})
+
+    def test_serie_deduplica_e_ordena(self):
+        serie = SerieLeituras.de_json([registro_cemaden(2, None), registro_cemaden(1, "1.00"),
+                                       registro_cemaden(2, "0.40")], descartar_invalidos=True)
+        self.assertFalse(serie.estava_ordenada)
+        self.assertEqual(len(serie), 2)
+        self.assertEqual(serie.para_json(), [registro_cemaden(1, "1.00"), registro_cemaden(2, "0.40")])
+        self.assertAlmostEqual(serie.chuva_acumulada(), 1.4)
+
+    def test_registros_sem_medicao_preservados(self):
+        """Registros sem data de medição válida não são apagados numa regravação"""
+        invalidos = [{"Chuva_Adotada": "0.00"}, {"Data_Hora_Medicao": "29/01/2025"}, "texto"]
+        serie = SerieLeituras.de_json([registro_cemaden(2, None), invalidos[0], registro_cemaden(1, "1.00"),
+                                       invalidos[1], invalidos[2]])
+        self.assertEqual(len(serie), 2)
+        self.assertEqual(serie.opacos, invalidos)
+        serie.mesclar([Leitura.de_dict(registro_cemaden(3, "0.50"))])
+        self.assertEqual(serie.para_json(), [registro_cemaden(1, "1.00"), registro_cemaden(2, None),
+                                             registro_cemaden(3, "0.50")] + invalidos)
+        self.assertEqual(SerieLeituras.de_json(invalidos, descartar_invalidos=True).para_json(), [])
+
+    def test_duplicatas_do_arquivo_sao_mantidas(self):
+        """Registros com Data_Hora_Medicao repetida não são reunidos ao regravar o dia"""
+        duplicata = dict(registro_cemaden(1, "2.00"), idestacao="outra")
+        serie = SerieLeituras.de_json([registro_cemaden(1, None), duplicata, registro_cemaden(2, "0.50")])
+        self.assertEqual(len(serie), 2)
+        self.assertEqual(serie.opacos, [duplicata])
+        self.assertEqual(serie.para_json(), [registro_cemaden(1, None), registro_cemaden(2, "0.50"), duplicata])
+        # A correção da varredura reúne as duplicatas na primeira leitura, completando a chuva ausente
+        corrigida = SerieLeituras.de_json([registro_cemaden(1, None), duplicata], descartar_invalidos=True)
+        self.assertEqual((len(corrigida), corrigida.opacos), (1, []))
+        self.assertEqual(corrigida.ordenadas()[0].chuva, 2.0)
+
+    def test_mescla_mantem_existentes(self):
+        """Na HidroWeb, leituras já gravadas não são sobrescritas"""
+        serie = SerieLeituras.de_json([REGISTRO_HIDROWEB])
+        alterada = Leitura.de_dict(dict(REGISTRO_HIDROWEB, Cota_Adotada="999.00"))
+        nova = Leitura.de_dict(dict(REGISTRO_HIDROWEB, Data_Hora_Medicao="2025-01-29 00:00:00.0"))
+        self.assertEqual(serie.mesclar([alterada, nova]), [nova])
+        self.assertEqual([r["Cota_Adotada"] for r in serie.para_json()], ["480.00", "480.00"])
+
+    def test_merge_day_info_cemaden(self):
+        antigo = {"idestacao": "7890", "data": "2025-01-29",
+                  "dados": [registro_cemaden(1, "1.00"), registro_cemaden(2, None)]}
+        novo = {"dados": [registro_cemaden(2, "0.60"), registro_cemaden(0, None), registro_cemaden(1, None)]}
+        final = merge_day_info(antigo, novo)
+        self.assertEqual(final["dados"], [registro_cemaden(0, None), registro_cemaden(1, "1.00"),
+                                          registro_cemaden(2, "0.60")])
+        self.assertEqual(final["chuvaAcumulada"], "1.60")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_leituras
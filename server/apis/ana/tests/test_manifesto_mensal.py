@@ -0,0 +1,76 @@
+# FILE: server\apis\ana\tests\test_manifesto_mensal.py
+
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.utils.arquivo_mensal import caminho_dia
+from server.apis.ana.utils.manifesto_mensal import (
+    ler_manifesto, reconstruir_manifesto, dias_indexados, ARQUIVO_MANIFESTO
+)
+from server.apis.ana.services.archive_compaction import compactar
+from server.apis.ana.services.cemaden_data_scheduler import save_by_date
+from server.apis.ana.tests.auxiliares import registros
+
+
+class TestManifestoMensal(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.storage = DataStorage(root_dir=self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_gravacoes_atualizam_o_manifesto(self):
+        self.storage.save_station_data_to_file(registros("2025-02-03", [5, 1, 9]), None, None, "100")
+        self.storage.save_station_data_to_file(registros("2025-02-04", [0]) + registros("2025-03-01", [2]),
+                                               None, None, "100")
+        entrada = ler_manifesto(self.dir, "2025", "02")["estacoes"]["100"]["2025-02-03"]
+        with open(caminho_dia(self.dir, "100", "2025-02-03"), "rb") as f:
+            conteudo = f.read()
+        self.assertEqual(entrada, {"n": 3, "primeira": "2025-02-03 01:00:00.0", "ultima": "2025-02-03 09:00:00.0",
+                                   "bytes": len(conteudo), "sha256": hashlib.sha256(conteudo).hexdigest()})
+        self.assertEqual(sorted(ler_manifesto(self.dir, "2025", "02")["estacoes"]["100"]), ["2025-02-03", "2025-02-04"])
+        self.assertEqual(list(ler_manifesto(self.dir, "2025", "03")["estacoes"]["100"]), ["2025-03-01"])
+
+        # Uma nova leitura atualiza apenas a entrada do dia
+        self.storage.save_station_data_to_file(registros("2025-02-03", [23]), None, None, "100")
+        entrada = ler_manifesto(self.dir, "2025", "02")["estacoes"]["100"]["2025-02-03"]
+        self.assertEqual((entrada["n"], entrada["ultima"]), (4, "2025-02-03 23:00:00.0"))
+
+        # Cemaden (save_by_date) usa a mesma gravação
+        save_by_date([{"idestacao": "7", "codigoestacao": "510340701A", "data": "2025-02-05",
+                       "dados": [{"Data_Hora_Medicao": "2025-02-05 03:00:00.0", "Chuva_Adotada": "1.20"}]}],
+                     root_dir=self.dir)
+        self.assertEqual(ler_manifesto(self.dir, "2025", "02")["estacoes"]["510340701A"]["2025-02-05"]["n"], 1)
+        self.assertEqual(dias_indexados(self.dir, {"100"}), {"100": ["2025-02-03", "2025-02-04", "2025-03-01"]})
+
+    def test_criacao_inclui_dados_anteriores_e_sobrevive_a_compactacao(self):
+        self.storage.save_station_data_to_file(registros("2025-01-10", [1, 2]), None, None, "200")
+        self.storage.save_station_data_to_file(registros("2025-01-11", [1]), None, None, "300")
+        # Sem manifesto (dados anteriores ao índice), a primeira gravação do mês o reconstrói por inteiro
+        os.remove(os.path.join(self.dir, "2025", "01", ARQUIVO_MANIFESTO))
+        self.storage.save_station_data_to_file(registros("2025-01-12", [1]), None, None, "300")
+        estacoes = ler_manifesto(self.dir, "2025", "01")["estacoes"]
+        self.assertEqual({codigo: sorted(dias) for codigo, dias in estacoes.items()},
+                         {"200": ["2025-01-10"], "300": ["2025-01-11", "2025-01-12"]})
+
+        # A compactação mantém o conteúdo: o manifesto reconstruído a partir do ZIP é idêntico
+        compactar(self.dir, dias_minimos=10, agora_utc=datetime(2025, 3, 1))
+        self.assertFalse(os.path.exists(caminho_dia(self.dir, "200", "2025-01-10")))
+        self.assertEqual(reconstruir_manifesto(self.dir, "2025", "01"), estacoes)
+        with open(os.path.join(self.dir, "2025", "01", ARQUIVO_MANIFESTO), "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["mes"], "2025-01")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_manifesto_mensal
@@ -0,0 +1,105 @@
+# FILE: server\apis\ana\tests\test_marker_clusters.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from server.apis.ana.services.marker_clusters import (
+    agrupar, agrupar_por_classe, gerar_clusters, estacoes_por_camada, CAMADAS, DIRETORIO_CLUSTERS
+)
+
+INVENTARIO = [
+    {"codigoestacao": "1", "Latitude": "-15.600", "Longitude": "-56.100", "Rio_Nome": "RIO CUIABÁ"},
+    {"codigoestacao": "2", "Latitude": "-15.601", "Longitude": "-56.101", "Rio_Nome": "RIO CUIABÁ"},
+    {"codigoestacao": "3", "Latitude": "-15.602", "Longitude": "-56.099", "Rio_Nome": None},
+    {"codigoestacao": "4", "Latitude": "-10.000", "Longitude": "-52.000", "Rio_Nome": "RIO XINGU"},
+    {"codigoestacao": "5", "Latitude": None, "Longitude": "-52.000"},
+]
+
+RESUMOS = {
+    "1": {"classificacaoChuva": "Forte", "classificacaoNivel": "Alto", "statusAtualizacao": "Atualizado"},
+    "2": {"classificacaoChuva": "Fraca", "classificacaoNivel": "Alto", "statusAtualizacao": "Atualizado"},
+    "3": {"classificacaoChuva": "Fraca", "classificacaoNivel": "Normal", "statusAtualizacao": "Atualizado"},
+}
+
+
+class TestAgrupamentosMarcadores(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def ler_zoom(self, camada, z):
+        with open(os.path.join(self.dir, DIRETORIO_CLUSTERS, "manifest.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)["camadas"][camada]
+        with open(os.path.join(self.dir, DIRETORIO_CLUSTERS, camada, info["versao"], f"{z}.json")) as f:
+            return info, json.load(f)
+
+    def test_classes_por_camada(self):
+        estacoes, valores, classes = estacoes_por_camada(INVENTARIO, RESUMOS)
+        # A estação sem coordenadas fica de fora; sem resumo, as classes são as indefinidas
+        self.assertEqual([codigo for codigo, _, _ in estacoes], ["1", "2", "3", "4"])
+        self.assertEqual(valores["chuva"], ["Forte", "Fraca", "Fraca", "Indefinido"])
+        self.assertEqual(valores["status"][-1], "Desatualizado")
+        self.assertEqual(valores["rio"], ["RIO CUIABÁ", "RIO CUIABÁ", "Desconhecido", "RIO XINGU"])
+        self.assertEqual(classes["rio"], ["Desconhecido", "RIO CUIABÁ", "RIO XINGU"])
+        self.assertEqual(classes["nivel"], ["Indefinido", "Baixo", "Normal", "Alto"])
+
+    def test_hierarquia_contagens_e_limites(self):
+        estacoes, valores, classes = estacoes_por_camada(INVENTARIO, RESUMOS)
+        niveis = agrupar(estacoes, valores["chuva"], classes["chuva"], zoom_minimo=4, zoom_maximo=16)
+        self.assertEqual(sorted(niveis), list(range(4, 18)))
+        # Acima do zoom máximo, as estações isoladas; no zoom 4, as três próximas num único agrupamento
+        self.assertEqual(len(niveis[17]), 4)
+        grupo = next(item for item in niveis[4] if item["n"] > 1)
+        self.assertEqual(grupo["n"], 3)
+        self.assertEqual(grupo["k"][classes["chuva"].index("Fraca")], 2)
+        self.assertEqual(grupo["b"], [-56.101, -15.602, -56.099, -15.6])
+        self.assertEqual(len(niveis[4]), 2)
+        # O número de itens nunca diminui com o zoom
+        contagens = [len(niveis[z]) for z in sorted(niveis)]
+        self.assertEqual(contagens, sorted(contagens))
+
+    def test_agrupamentos_por_classe(self):
+        estacoes, valores, classes = estacoes_por_camada(INVENTARIO, RESUMOS)
+        niveis = agrupar_por_classe(estacoes, valores["chuva"], classes["chuva"], zoom_minimo=4, zoom_maximo=16)
+        # As duas estações "Fraca" se agrupam; a "Forte", vizinha delas, fica isolada
+        self.assertEqual(sorted((item["n"], item["k"].index(1) if item["n"] == 1 else None)
+                                for item in niveis[4]),
+                         [(1, classes["chuva"].index("Indefinido")), (1, classes["chuva"].index("Forte")), (2, None)])
+        self.assertTrue(all(sum(1 for n in item["k"] if n) == 1 for z in niveis for item in niveis[z]))
+        self.assertEqual(len(niveis[17]), 4)
+
+    def test_arquivos_por_zoom_e_versao_incremental(self):
+        self.assertEqual(gerar_clusters(RESUMOS, self.dir, INVENTARIO), list(CAMADAS))
+        info, dados = self.ler_zoom("nivel", 4)
+        grupo = next(item for item in dados["itens"] if item["n"] == 3)
+        self.assertEqual(info["classes"][grupo["c"]], "Alto")
+        self.assertEqual(set(grupo), {"x", "y", "n", "c", "k", "b"})
+        _, dados = self.ler_zoom("nivel", 17)
+        self.assertEqual(sorted(item["id"] for item in dados["itens"]), ["1", "2", "3", "4"])
+        with open(os.path.join(self.dir, DIRETORIO_CLUSTERS, "nivel", info["versao"], "classes", "4.json")) as f:
+            por_classe = json.load(f)["itens"]
+        self.assertEqual(sorted((info["classes"][item["c"]], item["n"]) for item in por_classe),
+                         [("Alto", 2), ("Indefinido", 1), ("Normal", 1)])
+        self.assertTrue(info["url_classes"].endswith(f"/nivel/{info['versao']}/classes/{{z}}.json"))
+
+        # Sem mudanças, nada é regravado; uma mudança de classe afeta só a camada correspondente
+        self.assertEqual(gerar_clusters(RESUMOS, self.dir, INVENTARIO), [])
+        resumos = dict(RESUMOS, **{"2": dict(RESUMOS["2"], classificacaoChuva="Extrema")})
+        self.assertEqual(gerar_clusters(resumos, self.dir, INVENTARIO), ["chuva"])
+        info, dados = self.ler_zoom("chuva", 4)
+        grupo = next(item for item in dados["itens"] if item["n"] == 3)
+        # Empate (Forte, Extrema e Fraca com uma estação cada): vale a classe mais severa
+        self.assertEqual(info["classes"][grupo["c"]], "Extrema")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_marker_clusters
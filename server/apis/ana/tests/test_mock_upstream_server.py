@@ -0,0 +1,85 @@
+# FILE: server\apis\ana\tests\test_mock_upstream_server.py
+
+import json
+import unittest
+import urllib.request
+
+from server.apis.ana.services.mock_upstream_server import iniciar_servidor_mock
+from server.apis.ana.services.hidrowebAuth import HidroWebAPI
+from server.apis.ana.services.hidrowebStationData import HidroWebStationData
+from server.apis.ana.services.cemaden_data_scheduler import fetch_station_data, process_cemaden_data
+
+
+class TestMockUpstreamServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = iniciar_servidor_mock(modo="misto", seed=42)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def tearDown(self):
+        # Remove qualquer falha injetada pelo teste
+        self.configurar({"taxa_401": 0.0, "taxa_5xx": 0.0})
+        self.servidor.estado.config["endpoints"] = {}
+
+    def configurar(self, config):
+        requisicao = urllib.request.Request(
+            f"{self.servidor.url_raiz}/__mock__/config",
+            data=json.dumps(config).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(requisicao, timeout=5) as resposta:
+            return json.loads(resposta.read())
+
+    def autenticar(self):
+        return HidroWebAPI("usuario", "senha", base_url=self.servidor.hidroweb_base_url).authenticate()
+
+    def test_serie_telemetrica_replay(self):
+        """A série de uma estação do acervo deve ter 24 leituras no formato da HidroWeb"""
+        api = HidroWebStationData(token=self.autenticar(), base_url=self.servidor.hidroweb_base_url)
+        data = api.fetch_station_data("15043000", "DATA_LEITURA", "2025-01-29", "HORA_24")
+        self.assertEqual(len(data["items"]), 24)
+        self.assertEqual(data["items"][-1]["Data_Hora_Medicao"], "2025-01-29 23:00:00.0")
+        self.assertEqual(data["items"][0]["codigoestacao"], "15043000")
+        self.assertIn("Cota_Adotada", data["items"][0])
+
+    def test_estacao_sintetica(self):
+        """Códigos desconhecidos também devem receber dados (testes com 10x estações)"""
+        api = HidroWebStationData(token=self.autenticar(), base_url=self.servidor.hidroweb_base_url)
+        data = api.fetch_station_data("915043000", "DATA_LEITURA", "2025-01-29", "HORA_12")
+        self.assertEqual(len(data["items"]), 12)
+
+    def test_token_invalido(self):
+        api = HidroWebStationData(token="token-invalido", base_url=self.servidor.hidroweb_base_url)
+        with self.assertRaisesRegex(Exception, "Erro de autenticação"):
+            api.fetch_station_data("15043000", "DATA_LEITURA", "2025-01-29", "HORA_24")
+
+    def test_injecao_de_falhas_por_endpoint(self):
+        """Falhas 5xx configuradas para um endpoint não devem afetar os demais"""
+        token = self.autenticar()
+        self.configurar({"endpoints": {"hidroweb_dados": {"taxa_5xx": 1.0}}})
+        api = HidroWebStationData(token=token, base_url=self.servidor.hidroweb_base_url)
+        with self.assertRaisesRegex(Exception, "Status 50"):
+            api.fetch_station_data("15043000", "DATA_LEITURA", "2025-01-29", "HORA_24")
+        self.assertIsNotNone(self.autenticar())
+
+    def test_cemaden_compativel_com_processamento(self):
+        """A resposta do Cemaden simulada deve ser processada pelo scheduler sem perdas de horas"""
+        raw = fetch_station_data(7890, base_url=self.servidor.cemaden_base_url)
+        self.assertEqual(raw["estacao"]["codEstacao"], "510330401A")
+        dias = process_cemaden_data(raw, 7890)
+        self.assertTrue(dias)
+        horarios = {r["Data_Hora_Medicao"] for dia in dias for r in dia["dados"]}
+        self.assertEqual(len(horarios), 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_mock_upstream_server
@@ -0,0 +1,121 @@
+# FILE: server\apis\ana\tests\test_rainfall_grid.py
+
+import os
+import json
+import zlib
+import shutil
+import struct
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from server.apis.ana.utils.kdtree import ArvoreKD
+from server.apis.ana.utils.png import codificar_png_rgba
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.services.rainfall_grid import Grade, VizinhancaGrade, gerar_superficies_chuva
+
+# 12:00 em Brasília
+AGORA_UTC = datetime(2025, 1, 29, 15, 0)
+
+
+def registro(hora, chuva):
+    return {
+        "Chuva_Adotada": chuva,
+        "Chuva_Adotada_Status": "0",
+        "Cota_Adotada": None,
+        "Cota_Adotada_Status": None,
+        "Data_Atualizacao": f"2025-01-29 {hora:02d}:15:00.0",
+        "Data_Hora_Medicao": f"2025-01-29 {hora:02d}:00:00.0",
+        "Vazao_Adotada": None,
+        "Vazao_Adotada_Status": None,
+    }
+
+
+class TestArvoreKD(unittest.TestCase):
+
+    def test_igual_a_busca_exaustiva(self):
+        rng = np.random.default_rng(1)
+        pontos, consultas = rng.uniform(0, 10, (200, 2)), rng.uniform(-1, 11, (500, 2))
+        distancias, indices = ArvoreKD(pontos, tamanho_folha=4).consultar(consultas, k=5)
+        d2 = ((consultas[:, None, :] - pontos[None, :, :]) ** 2).sum(axis=2)
+        esperados = np.sort(d2, axis=1)[:, :5]
+        np.testing.assert_allclose(distancias, np.sqrt(esperados))
+        np.testing.assert_allclose(np.take_along_axis(d2, indices, axis=1), esperados)
+
+
+class TestInterpolacao(unittest.TestCase):
+
+    def test_idw_respeita_estacoes_e_raio(self):
+        coordenadas = np.array([[-56.0, -15.0], [-55.0, -15.0]])
+        grade = Grade(-56.0, -15.0, -53.0, -14.0, resolucao=0.5)
+        superficie = VizinhancaGrade(grade, coordenadas, k=2, raio_maximo=0.75).interpolar(np.array([10.0, 20.0]))
+        self.assertEqual(superficie[0, 0], 10.0)
+        self.assertEqual(superficie[0, 2], 20.0)
+        self.assertAlmostEqual(superficie[0, 1], 15.0)
+        self.assertTrue(np.isnan(superficie[0, -1]))  # a mais de 0,75° da estação mais próxima
+
+    def test_png_valido(self):
+        imagem = np.zeros((4, 3, 4), dtype=np.uint8)
+        imagem[1, 2] = (255, 0, 0, 200)
+        dados = codificar_png_rgba(imagem)
+        self.assertTrue(dados.startswith(b"\x89PNG\r\n\x1a\n"))
+        largura, altura = struct.unpack(">II", dados[16:24])
+        self.assertEqual((largura, altura), (3, 4))
+        inicio_idat = dados.index(b"IDAT") + 4
+        tamanho_idat = struct.unpack(">I", dados[inicio_idat - 8:inicio_idat - 4])[0]
+        linhas = np.frombuffer(zlib.decompress(dados[inicio_idat:inicio_idat + tamanho_idat]), dtype=np.uint8)
+        np.testing.assert_array_equal(linhas.reshape(4, 13)[:, 1:].reshape(4, 3, 4), imagem)
+
+
+class TestSuperficies(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = DataStorage(self.root)
+        self.inventario = [
+            {"codigoestacao": "1", "Latitude": "-15.6", "Longitude": "-56.1"},
+            {"codigoestacao": "2", "Latitude": "-15.2", "Longitude": "-55.6"},
+            {"codigoestacao": "3", "Latitude": "-14.9", "Longitude": "-56.4"},
+        ]
+        self.gravar("1", [registro(10, "2.00"), registro(11, "8.00")])
+        self.gravar("2", [registro(2, "30.00"), registro(11, "0.00")])
+        self.gravar("3", [registro(11, "1.00")])
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def gravar(self, codigo, registros):
+        self.storage.gravar_lote(self.storage.preparar_arquivos(registros, codigo))
+
+    def gerar(self):
+        return gerar_superficies_chuva(self.root, AGORA_UTC, self.inventario, janelas_h=(1, 24), zooms=(5, 6))
+
+    def manifesto(self):
+        with open(os.path.join(self.root, "tiles", "chuva", "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_regera_somente_janelas_alteradas(self):
+        self.assertEqual(self.gerar(), ["1h", "24h"])
+        manifesto = self.manifesto()
+        self.assertEqual(manifesto["janelas"]["24h"]["maximo"], 30.0)
+        self.assertEqual(manifesto["janelas"]["1h"]["maximo"], 10.0)
+        pasta = os.path.join(self.root, "tiles", "chuva", "24h", manifesto["janelas"]["24h"]["versao"])
+        self.assertTrue(any(nome.endswith(".png") for _, _, nomes in os.walk(pasta) for nome in nomes))
+
+        self.assertEqual(self.gerar(), [])
+
+        # Chuva às 02h altera só a janela de 24h da estação 3 (a de 1h termina na última leitura, 11h)
+        self.gravar("3", [registro(2, "5.00")])
+        self.assertEqual(self.gerar(), ["24h"])
+        self.assertNotEqual(self.manifesto()["janelas"]["24h"]["versao"], manifesto["janelas"]["24h"]["versao"])
+        self.assertEqual(self.manifesto()["janelas"]["1h"]["versao"], manifesto["janelas"]["1h"]["versao"])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_rainfall_grid
@@ -0,0 +1,91 @@
+# FILE: server\apis\ana\tests\test_rainfall_stats.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from server.apis.ana.services.rainfall_stats import (
+    calcular_estatisticas, atualizar_estatisticas_chuva, ARQUIVO_ESTATISTICAS
+)
+
+INVENTARIO = [
+    {"codigoestacao": "1", "Estacao_Nome": "A", "Municipio_Nome": "Cuiabá ", "Bacia_Nome": "Paraguai",
+     "Sub_Bacia_Nome": "Cuiabá", "UF_Estacao": "MT"},
+    {"codigoestacao": "2", "Estacao_Nome": "B", "Municipio_Nome": "cuiabá", "Bacia_Nome": "Paraguai",
+     "Sub_Bacia_Nome": "Cuiabá", "UF_Estacao": "MT"},
+    {"codigoestacao": "3", "Estacao_Nome": "C", "Municipio_Nome": "Sinop", "Bacia_Nome": "Amazonas",
+     "Sub_Bacia_Nome": "Teles Pires", "UF_Estacao": "MT"},
+    {"codigoestacao": "4", "Estacao_Nome": "D", "Municipio_Nome": None, "Bacia_Nome": "Amazonas",
+     "Sub_Bacia_Nome": "Teles Pires", "UF_Estacao": "MT"},
+    {"codigoestacao": "5", "Estacao_Nome": "E", "Municipio_Nome": "Sinop", "Bacia_Nome": "Amazonas",
+     "Sub_Bacia_Nome": "Teles Pires", "UF_Estacao": "MT"},
+]
+
+RESUMOS = {
+    "1": {"chuvaAcumulada": 10.0},
+    "2": {"chuvaAcumulada": 2.0},
+    "3": {"chuvaAcumulada": 0.0},
+    "4": {"chuvaAcumulada": 6.5},
+    "5": {"chuvaAcumulada": None},  # sem chuva válida: ignorada
+}
+
+
+class TestEstatisticasChuva(unittest.TestCase):
+
+    def test_agrupamentos_como_chuva_por_cidade(self):
+        resultado = calcular_estatisticas(INVENTARIO, RESUMOS)
+        cidades = {grupo["nome"]: grupo for grupo in resultado["grupos"]["Municipio_Nome"]}
+        self.assertEqual(set(cidades), {"CUIABÁ", "SINOP", "DESCONHECIDO"})
+        self.assertEqual(cidades["CUIABÁ"]["estacoes"], ["1", "2"])
+        self.assertEqual(cidades["CUIABÁ"]["media"], 6.0)
+        self.assertEqual(cidades["CUIABÁ"]["mediana"], 6.0)
+        self.assertEqual(cidades["CUIABÁ"]["desvioPadrao"], 4.0)  # populacional, como no frontend
+        self.assertEqual(cidades["SINOP"]["numEstacoes"], 1)
+
+        bacias = {grupo["nome"]: grupo for grupo in resultado["grupos"]["Bacia_Nome"]}
+        self.assertEqual(bacias["AMAZONAS"]["maximo"], 6.5)
+        self.assertEqual(resultado["grupos"]["UF_Estacao"][0]["numEstacoes"], 4)
+
+        geral = resultado["geral"]
+        self.assertEqual((geral["numEstacoes"], geral["media"], geral["mediana"]), (4, 4.62, 4.25))
+        self.assertEqual(geral["estacaoMaximo"]["codigoestacao"], "1")
+        self.assertNotIn("5", resultado["estacoes"])
+
+    def test_sem_dados(self):
+        resultado = calcular_estatisticas(INVENTARIO, {})
+        self.assertEqual(resultado["geral"]["numEstacoes"], 0)
+        self.assertEqual(resultado["grupos"]["Municipio_Nome"], [])
+
+
+class TestArquivoEstatisticas(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_versao_muda_somente_com_conteudo(self):
+        agora = datetime(2025, 1, 29, 15, 0)
+        self.assertEqual(atualizar_estatisticas_chuva(RESUMOS, self.root, INVENTARIO, agora), 1)
+        self.assertEqual(atualizar_estatisticas_chuva(RESUMOS, self.root, INVENTARIO, agora), 1)
+        self.assertEqual(atualizar_estatisticas_chuva(dict(RESUMOS, **{"5": {"chuvaAcumulada": 1.0}}),
+                                                      self.root, INVENTARIO, agora), 2)
+
+        with open(os.path.join(self.root, ARQUIVO_ESTATISTICAS), "r", encoding="utf-8") as f:
+            conteudo = f.read()
+        self.assertNotIn(", ", conteudo)
+        documento = json.loads(conteudo)
+        self.assertEqual(documento["versao"], 2)
+        self.assertEqual(documento["geral"]["numEstacoes"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_rainfall_stats
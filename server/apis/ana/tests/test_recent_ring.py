@@ -0,0 +1,119 @@
+# FILE: server\apis\ana\tests\test_recent_ring.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import threading
+import multiprocessing
+
+import numpy as np
+
+from server.apis.ana.utils.leituras import Leitura, texto_para_segundos
+from server.apis.ana.utils.classificacao import carregar_serie_recente
+from server.apis.ana.services.recent_ring import AnelRecente, caminho_anel
+
+INICIO = texto_para_segundos("2025-03-01 00:00:00")
+
+
+def leituras(n, inicio_h=0, passo_s=3600, cota=lambda h: 400.0 + h):
+    return [Leitura(INICIO + inicio_h * 3600 + i * passo_s, chuva=1.0, cota=cota(i), vazao=cota(i))
+            for i in range(n)]
+
+
+def _ler_concorrente(caminho, parar, erros):
+    """Processo leitor: cota e vazão são sempre gravadas iguais; uma diferença seria uma leitura rasgada."""
+    anel = AnelRecente(caminho)
+    while not parar.is_set():
+        registros = anel.registros("A")
+        if registros is not None and not np.array_equal(registros["cota"], registros["vazao"], equal_nan=True):
+            erros.value += 1
+    anel.fechar()
+
+
+class TestAnelRecente(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.caminho = caminho_anel(self.dir)
+        self.anel = AnelRecente(self.caminho, escrita=True, root_dir=self.dir, capacidade=4)
+
+    def tearDown(self):
+        self.anel.fechar()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_janela_de_48h_e_outro_processo(self):
+        self.assertEqual(self.anel.gravar({"A": leituras(60), "B": leituras(3)}), 63)
+        leitor = AnelRecente(self.caminho)
+        registros = leitor.registros("A")
+        # Só as últimas 48 horas, em ordem cronológica
+        self.assertEqual(len(registros), 48)
+        self.assertEqual(registros["medicao"][0], INICIO + 12 * 3600)
+        self.assertEqual(registros["cota"][-1], 459)
+        self.assertEqual(len(leitor.registros("B", inicio_s=INICIO + 3600)), 2)
+        self.assertIsNone(leitor.registros("C"))
+
+        # Estações incluídas depois por outro escritor aparecem no leitor já aberto
+        self.anel.gravar({"C": leituras(1)})
+        self.assertTrue(leitor.contem("C"))
+        self.assertEqual(leitor.status()["estacoes"], 3)
+        leitor.fechar()
+
+        # Capacidade esgotada: a estação excedente é ignorada
+        self.anel.gravar({"D": leituras(1), "E": leituras(1)})
+        self.assertFalse(self.anel.contem("E"))
+
+    def test_leituras_da_mesma_hora_e_idempotencia(self):
+        quartos = leituras(8, passo_s=900, cota=lambda i: 400.0 + i)
+        self.anel.gravar({"A": quartos[:6]})
+        self.anel.gravar({"A": quartos})
+        serie = self.anel.serie("A").ordenadas()
+        self.assertEqual([l.chuva for l in serie], [4.0, 4.0])
+        self.assertEqual([l.cota for l in serie], [403.0, 407.0])
+        self.assertEqual(serie[-1].medicao, quartos[-1].medicao)
+
+    def test_carga_inicial_dos_arquivos_diarios(self):
+        caminho = os.path.join(self.dir, "2025", "03", "2025-03-01", "codigoestacao_15043000.json")
+        os.makedirs(os.path.dirname(caminho))
+        dados = [l.para_dict() for l in leituras(5)]
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump({"codigoestacao": "15043000", "data": "2025-03-01", "dados": dados}, f)
+
+        lote = [{"fonte": "hidroweb", "estacao": "15043000",
+                 "arquivos": [{"caminho": caminho, "data": "2025-03-01", "conteudo": "", "novos": leituras(1, 4)}]}]
+        self.anel(lote)
+        datas = ["2025-03-01", "2025-02-28"]
+        self.assertEqual(self.anel.serie_recente("15043000", datas).ordenadas(),
+                         carregar_serie_recente(self.dir, "15043000", datas).ordenadas())
+
+    def test_leitor_nunca_ve_escrita_pela_metade(self):
+        contexto = multiprocessing.get_context("spawn")
+        parar, erros = contexto.Event(), contexto.Value("i", 0)
+        self.anel.gravar({"A": leituras(48)})
+        processo = contexto.Process(target=_ler_concorrente, args=(self.caminho, parar, erros))
+        processo.start()
+        try:
+            for rodada in range(300):
+                self.anel.gravar({"A": leituras(48, inicio_h=48 * (rodada + 1), cota=lambda h: float(rodada))})
+        finally:
+            parar.set()
+            processo.join(30)
+        self.assertEqual(processo.exitcode, 0)
+        self.assertEqual(erros.value, 0)
+
+    def test_escritores_concorrentes(self):
+        threads = [threading.Thread(target=self.anel.gravar, args=({codigo: leituras(10)},)) for codigo in "ABCD"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.anel.status()["sequencia"] % 2, 0)
+        self.assertEqual(sorted(len(self.anel.registros(codigo)) for codigo in "ABCD"), [10] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_recent_ring
@@ -0,0 +1,131 @@
+# FILE: server\apis\ana\tests\test_series_query.py
+
+import json
+import shutil
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from server.apis.ana.utils.data_storage import DataStorage
+from server.apis.ana.utils.downsampling import lttb, min_max
+from server.apis.ana.services import series_query
+from server.apis.ana.services.series_query import ConsultaSeries
+from server.apis.ana.services.read_service import iniciar_servico_leitura
+
+
+def registros(dia, cota_base):
+    return [{
+        "Chuva_Adotada": "0.00",
+        "Chuva_Adotada_Status": "0",
+        "Cota_Adotada": f"{cota_base + hora:.2f}",
+        "Cota_Adotada_Status": "0",
+        "Data_Atualizacao": f"{dia} {hora:02d}:15:00.0",
+        "Data_Hora_Medicao": f"{dia} {hora:02d}:00:00.0",
+        "Vazao_Adotada": None,
+        "Vazao_Adotada_Status": None,
+    } for hora in range(24)]
+
+
+class TestDownsampling(unittest.TestCase):
+
+    def test_lttb_preserva_extremidades_e_pico(self):
+        x = np.arange(1000, dtype=np.float64)
+        y = np.sin(x / 50.0)
+        y[500] = 10.0
+        indices = lttb(x, y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertIn(500, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_min_max(self):
+        y = np.arange(100, dtype=np.float64)
+        y[37] = -5.0
+        indices = min_max(y, 20)
+        self.assertLessEqual(len(indices), 20)
+        self.assertIn(37, indices)
+        self.assertIn(99, indices)
+
+
+class TestConsultaSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = DataStorage(self.root)
+        for i, dia in enumerate(("2025-01-01", "2025-01-02", "2025-01-03")):
+            self.storage.save_station_data_to_file(registros(dia, 100 * i), dia, None, "123")
+        self.consulta = ConsultaSeries(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_intervalo_e_reducao(self):
+        _, resultado = self.consulta.consultar("123", "2025-01-01 12:00", "2025-01-03", variaveis=["cota", "vazao"],
+                                               pontos=10)
+        cota = resultado["series"]["cota"]
+        self.assertEqual(cota["total"], 60)
+        self.assertEqual(len(cota["valores"]), 10)
+        self.assertEqual(cota["horarios"][0], "2025-01-01 12:00:00")
+        self.assertEqual(cota["valores"][-1], 223.0)
+        self.assertEqual(resultado["series"]["vazao"]["total"], 0)
+
+    def test_etag_e_invalidacao_por_gravacao(self):
+        etag, _ = self.consulta.consultar("123", "2025-01-01", "2025-01-03")
+        # A ETag vem dos manifestos mensais: a revalidação não localiza cada dia do intervalo
+        localizados = []
+        localizar_dia = series_query.localizar_dia
+        series_query.localizar_dia = lambda *args: localizados.append(args) or localizar_dia(*args)
+        try:
+            self.assertIsNone(self.consulta.consultar("123", "2025-01-01", "2025-01-03", etag_cliente=etag)[1])
+        finally:
+            series_query.localizar_dia = localizar_dia
+        self.assertEqual(localizados, [])
+        # Outra estação gravada no mesmo mês não muda a ETag desta
+        self.storage.gravar_lote(self.storage.preparar_arquivos(registros("2025-01-02", 0), "456"))
+        self.assertIsNone(self.consulta.consultar("123", "2025-01-01", "2025-01-03", etag_cliente=etag)[1])
+
+        # Um novo dia gravado pela ingestão muda a assinatura do intervalo
+        arquivos = self.storage.preparar_arquivos(registros("2025-01-04", 0), "123")
+        self.storage.gravar_lote(arquivos)
+        self.consulta.observador_pipeline([{"arquivos": arquivos}])
+        novo_etag, resultado = self.consulta.consultar("123", "2025-01-01", "2025-01-04", etag_cliente=etag)
+        self.assertNotEqual(novo_etag, etag)
+        self.assertEqual(resultado["series"]["cota"]["total"], 96)
+
+    def test_parametros_invalidos(self):
+        with self.assertRaises(ValueError):
+            self.consulta.consultar("123", "2025-01-03", "2025-01-01")
+        with self.assertRaises(ValueError):
+            self.consulta.consultar("123", "2025-01-01", "2025-01-03", variaveis=["temperatura"])
+
+    def test_servico_http_responde_304(self):
+        servico = iniciar_servico_leitura(root_dir=self.root)
+        try:
+            url = f"{servico.url_raiz}/series/123?inicio=2025-01-01&fim=2025-01-03&pontos=20"
+            with urllib.request.urlopen(url, timeout=5) as resposta:
+                etag = resposta.headers["ETag"]
+                corpo = json.loads(resposta.read())
+            self.assertEqual(len(corpo["series"]["cota"]["valores"]), 20)
+
+            requisicao = urllib.request.Request(url, headers={"If-None-Match": etag})
+            with self.assertRaises(urllib.error.HTTPError) as contexto:
+                urllib.request.urlopen(requisicao, timeout=5)
+            self.assertEqual(contexto.exception.code, 304)
+
+            with self.assertRaises(urllib.error.HTTPError) as contexto:
+                urllib.request.urlopen(f"{servico.url_raiz}/series/123?inicio=2025-01-01", timeout=5)
+            self.assertEqual(contexto.exception.code, 400)
+        finally:
+            servico.shutdown()
+            servico.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_series_query
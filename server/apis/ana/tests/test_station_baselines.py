@@ -0,0 +1,118 @@
+# FILE: server\apis\ana\tests\test_station_baselines.py
+
+import os
+import json
+import bisect
+import random
+import shutil
+import tempfile
+import unittest
+
+from server.apis.ana.utils.leituras import Leitura, texto_para_segundos
+from server.apis.ana.utils.quantis import TDigest
+from server.apis.ana.services.station_baselines import BaselinesEstacoes, ARQUIVO_BASELINES
+
+INICIO = texto_para_segundos("2025-03-01 00:00:00")
+
+
+def leituras(cotas, vazoes=None, inicio_h=0):
+    vazoes = vazoes or [None] * len(cotas)
+    return [Leitura(INICIO + (inicio_h + i) * 3600, cota=cota, vazao=vazao)
+            for i, (cota, vazao) in enumerate(zip(cotas, vazoes))]
+
+
+class TestTDigest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(3)
+        self.valores = [random.lognormvariate(3, 0.8) for _ in range(50000)]
+        self.ordenados = sorted(self.valores)
+
+    def erro_de_posto(self, sketch, q):
+        return abs(bisect.bisect(self.ordenados, sketch.quantil(q)) / len(self.ordenados) - q)
+
+    def test_precisao_e_memoria_limitada(self):
+        sketch = TDigest()
+        sketch.adicionar_varios(self.valores)
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            self.assertLess(self.erro_de_posto(sketch, q), 0.005, q)
+        self.assertLessEqual(len(sketch.para_dict()["centroides"]), 2 * sketch.compressao)
+        self.assertEqual(sketch.quantil(0), min(self.valores))
+        self.assertEqual(sketch.quantil(1), max(self.valores))
+        self.assertIsNone(TDigest().quantil(0.5))
+
+    def test_mesclar_e_serializar(self):
+        partes = [TDigest() for _ in range(4)]
+        for i, valor in enumerate(self.valores):
+            partes[i % 4].adicionar(valor)
+        combinado = TDigest.de_dict(json.loads(json.dumps(partes[0].para_dict())))
+        for parte in partes[1:]:
+            combinado.mesclar(parte)
+        self.assertEqual(len(combinado), len(self.valores))
+        for q in (0.1, 0.5, 0.9):
+            self.assertLess(self.erro_de_posto(combinado, q), 0.005, q)
+
+
+class TestBaselinesEstacoes(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.dir, "baselines.sqlite3")
+        self.baselines = BaselinesEstacoes(self.caminho, root_dir=self.dir, min_amostras=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_faixas_por_estacao(self):
+        # Um córrego (cota entre 50 e 150) e um rio grande (entre 500 e 700)
+        self.baselines.atualizar({"corrego": leituras([50 + i % 101 for i in range(500)]),
+                                  "rio": leituras([500 + 2 * (i % 101) for i in range(500)])})
+        self.assertEqual(self.baselines.classificar("corrego", "nivel", 140), "Alto")
+        self.assertEqual(self.baselines.classificar("rio", "nivel", 510), "Baixo")
+        self.assertEqual(self.baselines.classificar("rio", "nivel", 600), "Normal")
+        # Sem leituras suficientes (ou sem estação), valem os limiares fixos
+        self.assertEqual(self.baselines.classificar("rio", "vazao", 36), "Alta")
+        self.assertEqual(self.baselines.classificar("outra", "nivel", 420), "Normal")
+        self.assertAlmostEqual(self.baselines.percentis("corrego", "cota")["p50"], 100, delta=2)
+
+    def test_persistencia_incremental_e_observador(self):
+        caminho = os.path.join(self.dir, "2025", "03", "2025-03-01", "codigoestacao_15043000.json")
+        lote = [{"fonte": "hidroweb", "estacao": "15043000",
+                 "arquivos": [{"caminho": caminho, "data": "2025-03-01", "conteudo": "",
+                               "novos": leituras(list(range(60)), vazoes=[1.0] * 60)}]}]
+        self.baselines(lote)
+        # Outro processo continua do sketch gravado
+        outro = BaselinesEstacoes(self.caminho, root_dir=self.dir, min_amostras=100)
+        outro.atualizar({"15043000": leituras(list(range(60, 120)), inicio_h=60)})
+        percentis = BaselinesEstacoes(self.caminho, root_dir=self.dir).percentis("15043000", "cota")
+        self.assertEqual(percentis["n"], 120)
+        self.assertEqual((percentis["minimo"], percentis["maximo"]), (0, 119))
+        self.assertEqual(outro.percentis("15043000", "vazao")["n"], 60)
+
+        self.assertEqual(outro.publicar(), 1)
+        self.assertEqual(outro.publicar(), 1)
+        with open(os.path.join(self.dir, ARQUIVO_BASELINES), "r", encoding="utf-8") as f:
+            documento = json.load(f)
+        cota = documento["estacoes"]["15043000"]["cota"]
+        self.assertTrue(cota["porPercentil"])
+        self.assertEqual((cota["limiarBaixo"], cota["limiarNormal"]), (cota["p10"], cota["p90"]))
+        self.assertFalse(documento["estacoes"]["15043000"]["vazao"]["porPercentil"])
+
+    def test_workers_alternados_nao_sobrescrevem(self):
+        # Em modo shard a estação passa de A para B e volta para A: A não pode gravar uma cópia antiga
+        worker_a = self.baselines
+        worker_b = BaselinesEstacoes(self.caminho, root_dir=self.dir, min_amostras=100)
+        worker_a.atualizar({"15043000": leituras(list(range(10)))})
+        self.assertEqual(worker_a.percentis("15043000", "cota")["n"], 10)
+        worker_b.atualizar({"15043000": leituras(list(range(10, 30)), inicio_h=10)})
+        worker_a.atualizar({"15043000": leituras(list(range(30, 35)), inicio_h=30)})
+        for worker in (worker_a, worker_b):
+            percentis = worker.percentis("15043000", "cota")
+            self.assertEqual((percentis["n"], percentis["maximo"]), (35, 34))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_station_baselines
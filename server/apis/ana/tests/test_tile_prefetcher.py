@@ -0,0 +1,106 @@
+# FILE: server\apis\ana\tests\test_tile_prefetcher.py
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from server.apis.hydro_estimator_rainfall.services.tile_prefetcher import (
+    CacheDiscoLRU, PrefetcherHydroEstimator, caminho_tile
+)
+
+PRODUTO = "NESDIS-GHE-HourlyRainfall"
+HORARIOS = ["20250129_090000", "20250129_133000", "20250129_140000", "20250129_143000"]
+AGORA_UTC = datetime(2025, 1, 29, 15, 0)
+
+
+class RealEarthFalsa(BaseHTTPRequestHandler):
+    """Responde api/times e api/image como a RealEarth, contando os tiles pedidos."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/api/times":
+            corpo = json.dumps({params["products"]: HORARIOS}).encode("utf-8")
+            tipo = "application/json"
+        elif url.path == "/api/image":
+            self.server.pedidos.append((params["time"], params["z"], params["x"], params["y"]))
+            corpo = ("tile-" + "-".join(params[c] for c in ("time", "z", "x", "y"))).encode("utf-8")
+            tipo = "image/png"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), RealEarthFalsa)
+        self.servidor.pedidos = []
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        host, porta = self.servidor.server_address[:2]
+        self.base_url = f"http://{host}:{porta}/api"
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        shutil.rmtree(self.dir)
+
+    def prefetcher(self, tamanho_maximo=10 * 1024 * 1024):
+        return PrefetcherHydroEstimator(PRODUTO, cache=CacheDiscoLRU(self.dir, tamanho_maximo),
+                                        base_url=self.base_url, chave_acesso="teste", zooms=(4, 5), max_workers=4)
+
+    def test_baixa_somente_horarios_recentes_e_tiles_ausentes(self):
+        prefetcher = self.prefetcher()
+        resumo = prefetcher.executar(AGORA_UTC)
+        self.assertEqual(resumo["horarios"], HORARIOS[1:])  # 09:00 está fora da janela de 2 horas
+        tiles_por_horario = len(list(prefetcher.tiles(HORARIOS[-1])))
+        self.assertEqual(resumo["baixados"], 3 * tiles_por_horario)
+        self.assertEqual(len(self.servidor.pedidos), 3 * tiles_por_horario)
+
+        z, x, y = next(prefetcher.tiles(HORARIOS[-1]))
+        with open(caminho_tile(self.dir, PRODUTO, HORARIOS[-1], z, x, y), "rb") as f:
+            self.assertEqual(f.read(), f"tile-{HORARIOS[-1]}-{z}-{x}-{y}".encode("utf-8"))
+        with open(os.path.join(self.dir, PRODUTO, "times.json"), "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)[PRODUTO], HORARIOS)
+
+        # Segunda passada: nada é baixado de novo
+        resumo = prefetcher.executar(AGORA_UTC)
+        self.assertEqual((resumo["baixados"], resumo["existentes"]), (0, 3 * tiles_por_horario))
+        self.assertEqual(len(self.servidor.pedidos), 3 * tiles_por_horario)
+
+    def test_lru_remove_os_menos_usados(self):
+        cache = CacheDiscoLRU(self.dir, tamanho_maximo=250)
+        caminhos = [os.path.join(self.dir, "p", f"{i}.png") for i in range(3)]
+        for i, caminho in enumerate(caminhos):
+            cache.gravar(caminho, b"x" * 100)
+            os.utime(caminho, (time.time() - 100 + i, os.stat(caminho).st_mtime))
+        cache.tocar(caminhos[0])  # lido pelo proxy: passa a ser o mais recente
+
+        self.assertEqual(cache.aplicar_limite(), (1, 100))
+        self.assertEqual([os.path.exists(c) for c in caminhos], [True, False, True])
+        self.assertEqual(cache.uso(), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_tile_prefetcher
@@ -0,0 +1,159 @@
+# FILE: server\apis\ana\tests\test_vector_tiles.py
+
+import io
+import os
+import json
+import math
+import shutil
+import zipfile
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from server.apis.ana.services.vector_tiles import (
+    importar_arquivo, importancia_vertices, ler_kml, ler_kmz, ler_gpx, projetar,
+    PONTO, LINHA, POLIGONO, DIRETORIO_CAMADAS, ARQUIVO_PROPRIEDADES
+)
+from server.apis.ana.services.read_service import iniciar_servico_leitura
+
+KML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document>
+  <Placemark><name>Estacao</name><Point><coordinates>-56.1,-15.6,0</coordinates></Point></Placemark>
+  <Placemark><name>Bacia</name>
+    <ExtendedData><Data name="area"><value>12</value></Data></ExtendedData>
+    <Polygon>
+      <outerBoundaryIs><LinearRing><coordinates>-57,-16 -55,-16 -55,-14 -57,-14 -57,-16</coordinates></LinearRing></outerBoundaryIs>
+      <innerBoundaryIs><LinearRing><coordinates>-56.5,-15.5 -55.5,-15.5 -55.5,-14.5 -56.5,-15.5</coordinates></LinearRing></innerBoundaryIs>
+    </Polygon>
+  </Placemark>
+</Document></kml>"""
+
+GPX = b"""<?xml version="1.0"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <wpt lat="-15.6" lon="-56.1"><name>Ponte</name></wpt>
+  <trk><name>Trilha</name><trkseg><trkpt lat="-15.0" lon="-56.0"/><trkpt lat="-15.1" lon="-56.1"/></trkseg></trk>
+</gpx>"""
+
+
+def rio_geojson(n=20000):
+    """Linha sinuosa com muitos vértices (um rio) e um ponto."""
+    coordenadas = [[-60 + 8 * i / n, -15 + 0.5 * math.sin(i / 200)] for i in range(n)]
+    return json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "LineString", "coordinates": coordenadas},
+         "properties": {"nome": "Rio"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-56.1, -15.6]},
+         "properties": {"nome": "Cuiabá"}},
+    ]}).encode("utf-8")
+
+
+class TestVectorTiles(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def ler_tile(self, manifesto, z, x, y):
+        caminho = os.path.join(self.dir, DIRETORIO_CAMADAS, manifesto["chave"], str(z), str(x), f"{y}.json")
+        if not os.path.exists(caminho):
+            return None
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_leitura_dos_formatos(self):
+        itens = ler_kml(KML)
+        self.assertEqual([(tipo, len(partes)) for tipo, partes, _ in itens], [(PONTO, 1), (POLIGONO, 2)])
+        self.assertEqual(itens[1][2], {"name": "Bacia", "area": "12"})
+
+        arquivo = io.BytesIO()
+        with zipfile.ZipFile(arquivo, "w") as kmz:
+            kmz.writestr("files/outro.kml", "<kml/>")
+            kmz.writestr("doc.kml", KML)
+        self.assertEqual(ler_kmz(arquivo.getvalue()), itens)
+
+        tipos = sorted((tipo, props["name"]) for tipo, _, props in ler_gpx(GPX))
+        self.assertEqual(tipos, [(PONTO, "Ponte"), (LINHA, "Trilha")])
+
+    def test_importancia_douglas_peucker(self):
+        # Pontos colineares são descartados; o pico é mantido com a maior importância
+        x = np.array([0.0, 0.1, 0.2, 0.3, 0.4])
+        y = np.array([0.0, 0.25, 0.5, 0.25, 0.0])
+        importancia = importancia_vertices(x, y, 1e-12)
+        self.assertEqual(importancia[0], 1.0)
+        self.assertEqual(importancia[-1], 1.0)
+        self.assertAlmostEqual(importancia[2], 0.25)
+        self.assertEqual(list(importancia[[1, 3]]), [0.0, 0.0])
+
+    def test_piramide_simplificada_e_cache_por_conteudo(self):
+        conteudo = rio_geojson()
+        manifesto = importar_arquivo(conteudo, "rio.geojson", self.dir, zoom_maximo=10)
+        self.assertFalse(manifesto["reaproveitado"])
+        self.assertEqual(manifesto["feicoes"], 2)
+
+        # O tile do zoom 0 tem poucos vértices; o nível de detalhe cresce com o zoom
+        raiz = self.ler_tile(manifesto, 0, 0, 0)
+        vertices_raiz = sum(len(parte) // 2 for f in raiz["feicoes"] if f["t"] == LINHA for parte in f["g"])
+        self.assertLess(vertices_raiz, 200)
+        self.assertEqual(manifesto["tiles_por_zoom"]["0"], 1)
+        self.assertGreater(manifesto["tiles_por_zoom"]["10"], manifesto["tiles_por_zoom"]["5"])
+
+        # O ponto está no tile do zoom máximo que o contém, na posição certa (extent do tile)
+        x, y = projetar([[-56.1, -15.6]])
+        tx, ty = int(x[0] * 1024), int(y[0] * 1024)
+        tile = self.ler_tile(manifesto, 10, tx, ty)
+        ponto = next(f for f in tile["feicoes"] if f["t"] == PONTO)
+        self.assertTrue(tile["folha"])
+        self.assertAlmostEqual(ponto["g"][0][0], (x[0] * 1024 - tx) * tile["extent"], delta=1)
+        with open(os.path.join(self.dir, DIRETORIO_CAMADAS, manifesto["chave"], ARQUIVO_PROPRIEDADES)) as f:
+            self.assertEqual(json.load(f)[ponto["id"]], {"nome": "Cuiabá"})
+
+        # Reimportar o mesmo conteúdo (com outro nome) não gera nada de novo
+        novamente = importar_arquivo(conteudo, "copia.json", self.dir, zoom_maximo=10)
+        self.assertTrue(novamente["reaproveitado"])
+        self.assertEqual(novamente["chave"], manifesto["chave"])
+
+    def test_folhas_sao_ampliadas(self):
+        # Um quadrado simples: tiles internos viram folhas cedo e não são divididos até o zoom máximo
+        quadrado = [[-57, -16], [-55, -16], [-55, -14], [-57, -14], [-57, -16]]
+        conteudo = json.dumps({"type": "Polygon", "coordinates": [quadrado]}).encode("utf-8")
+        manifesto = importar_arquivo(conteudo, "quadrado.geojson", self.dir)
+        self.assertLess(max(int(z) for z in manifesto["tiles_por_zoom"]), manifesto["zoom_maximo"])
+        self.assertGreater(manifesto["folhas"], 0)
+
+    def test_arquivos_invalidos(self):
+        with self.assertRaises(ValueError):
+            importar_arquivo(b"abc", "dados.shp", self.dir)
+        with self.assertRaises(ValueError):
+            importar_arquivo(b"<kml", "quebrado.kml", self.dir)
+        with self.assertRaises(ValueError):
+            importar_arquivo(b'{"type": "FeatureCollection", "features": []}', "vazio.geojson", self.dir)
+
+    def test_importacao_pelo_servico_de_leitura(self):
+        servico = iniciar_servico_leitura(root_dir=self.dir)
+        try:
+            url = f"{servico.url_raiz}/camadas?nome=trilha.gpx"
+            with urllib.request.urlopen(urllib.request.Request(url, data=GPX, method="POST"), timeout=30) as resposta:
+                self.assertEqual(resposta.status, 201)
+                manifesto = json.load(resposta)
+            self.assertEqual(manifesto["formato"], "gpx")
+            self.assertTrue(manifesto["url_tiles"].startswith(f"/data/camadas/{manifesto['chave']}/"))
+            with urllib.request.urlopen(urllib.request.Request(url, data=GPX, method="POST"), timeout=30) as resposta:
+                self.assertEqual(resposta.status, 200)
+            with self.assertRaises(urllib.error.HTTPError) as contexto:
+                urllib.request.urlopen(urllib.request.Request(f"{servico.url_raiz}/camadas?nome=a.txt", data=b"x",
+                                                              method="POST"), timeout=30)
+            self.assertEqual(contexto.exception.code, 400)
+        finally:
+            servico.shutdown()
+            servico.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# To run the test, use the following command:
+# python -m unittest server.apis.ana.tests.test_vector_tiles
@@ -0,0 +1,193 @@
+"""
+@file server/apis/ana/utils/arquivo_mensal.py
+@description Leitura dos arquivos diários das estações nas duas camadas de armazenamento.
+
+Os dias recentes ficam soltos em public/data/YYYY/MM/YYYY-MM-DD/codigoestacao_<codigo>.json (camada viva).
+Os dias já fechados são compactados (services/archive_compaction.py) em um ZIP por mês e grupo de
+estações, public/data/YYYY/MM/_arquivo/grupo_NN.zip, com um membro YYYY-MM-DD/codigoestacao_<codigo>.json
+por dia; o diretório central do ZIP serve de índice, então um dia é lido sem descompactar os demais.
+
+As funções deste módulo escondem a camada: ler_dia e localizar_dia procuram primeiro o arquivo vivo
+(que sempre prevalece, pois uma gravação tardia num dia arquivado recria o arquivo vivo com o dia
+completo) e depois o arquivo mensal. Os ZIPs abertos ficam em um cache pequeno, revalidado pelo mtime.
+"""
+
+import os
+import zlib
+import json
+import zipfile
+import threading
+from collections import OrderedDict
+
+DIRETORIO_ARQUIVO = "_arquivo"
+# Número de grupos de estações por mês (cada grupo é um ZIP)
+GRUPOS_ARQUIVO = 32
+MAX_ARQUIVOS_ABERTOS = 64
+
+_abertos = OrderedDict()  # {caminho: ((mtime_ns, tamanho), ZipFile)}
+_lock = threading.Lock()
+
+
+def grupo_da_estacao(codigo):
+    """Grupo (0..GRUPOS_ARQUIVO-1) em que os dias da estação são arquivados."""
+    return zlib.crc32(str(codigo).encode("utf-8")) % GRUPOS_ARQUIVO
+
+
+def caminho_dia(root_dir, codigo, data_str):
+    """Caminho do arquivo diário vivo da estação."""
+    return os.path.join(root_dir, data_str[:4], data_str[5:7], data_str, f"codigoestacao_{codigo}.json")
+
+
+def caminho_arquivo_mensal(root_dir, ano, mes, grupo):
+    """Caminho do ZIP do mês ("YYYY", "MM") e grupo de estações."""
+    return os.path.join(root_dir, ano, mes, DIRETORIO_ARQUIVO, f"grupo_{grupo:02d}.zip")
+
+
+def membro_dia(codigo, data_str):
+    """Nome do membro do dia dentro do arquivo mensal."""
+    return f"{data_str}/codigoestacao_{codigo}.json"
+
+
+def _zip(caminho):
+    """ZipFile aberto (do cache, enquanto o arquivo não mudar) ou None se não existir."""
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    assinatura = (info.st_mtime_ns, info.st_size)
+    with _lock:
+        em_cache = _abertos.get(caminho)
+        if em_cache is not None and em_cache[0] == assinatura:
+            _abertos.move_to_end(caminho)
+            return em_cache[1]
+    try:
+        arquivo = zipfile.ZipFile(caminho, "r")
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Erro ao abrir o arquivo mensal {caminho}: {e}")
+        return None
+    with _lock:
+        anterior = _abertos.pop(caminho, None)
+        _abertos[caminho] = (assinatura, arquivo)
+        while len(_abertos) > MAX_ARQUIVOS_ABERTOS:
+            _abertos.popitem(last=False)
+    # O ZipFile substituído pode estar em uso por outra thread; é fechado pelo coletor de lixo
+    del anterior
+    return arquivo
+
+
+def localizar_dia(root_dir, codigo, data_str):
+    """
+    Localiza o dia da estação em qualquer camada.
+
+    @return: (caminho, membro, assinatura) — membro é None para o arquivo vivo; a assinatura muda
+             sempre que o conteúdo muda. None se o dia não existir.
+    """
+    caminho = caminho_dia(root_dir, codigo, data_str)
+    try:
+        info = os.stat(caminho)
+        return caminho, None, ("vivo", info.st_mtime_ns, info.st_size)
+    except OSError:
+        pass
+    caminho = caminho_arquivo_mensal(root_dir, data_str[:4], data_str[5:7], grupo_da_estacao(codigo))
+    arquivo = _zip(caminho)
+    if arquivo is None:
+        return None
+    membro = membro_dia(codigo, data_str)
+    try:
+        info = arquivo.getinfo(membro)
+    except KeyError:
+        return None
+    return caminho, membro, ("arquivo", info.CRC, info.file_size)
+
+
+def ler_localizado(caminho, membro=None):
+    """Conteúdo (bytes) de um dia localizado por localizar_dia."""
+    if membro is None:
+        with open(caminho, "rb") as f:
+            return f.read()
+    arquivo = _zip(caminho)
+    if arquivo is None:
+        raise FileNotFoundError(caminho)
+    return arquivo.read(membro)
+
+
+def ler_conteudo_dia(root_dir, codigo, data_str):
+    """Conteúdo (bytes) do dia da estação em qualquer camada, ou None se não existir."""
+    local = localizar_dia(root_dir, codigo, data_str)
+    if local is None:
+        return None
+    try:
+        return ler_localizado(local[0], local[1])
+    except (OSError, KeyError):
+        return None
+
+
+def ler_dia(root_dir, codigo, data_str):
+    """
+    Documento JSON do dia da estação ({"codigoestacao", "data", "dados", ...}) em qualquer camada.
+
+    @return: Dicionário, ou None se o dia não existir.
+    @raise ValueError: Se o conteúdo não for JSON válido.
+    """
+    conteudo = ler_conteudo_dia(root_dir, codigo, data_str)
+    if conteudo is None:
+        return None
+    return json.loads(conteudo)
+
+
+def listar_dias_mes(root_dir, ano, mes):
+    """
+    Dias existentes de um mês nas duas camadas (varredura dos diretórios e dos índices dos ZIPs).
+
+    @return: Dicionário {codigo: {data_str, ...}}.
+    """
+    dias = {}
+    dir_mes = os.path.join(root_dir, ano, mes)
+    if not os.path.isdir(dir_mes):
+        return dias
+    for nome in os.listdir(dir_mes):
+        if nome == DIRETORIO_ARQUIVO:
+            dir_arquivo = os.path.join(dir_mes, nome)
+            for nome_zip in os.listdir(dir_arquivo):
+                arquivo = _zip(os.path.join(dir_arquivo, nome_zip)) if nome_zip.endswith(".zip") else None
+                for membro in arquivo.namelist() if arquivo is not None else []:
+                    data_str, _, nome_dia = membro.partition("/")
+                    dias.setdefault(nome_dia[len("codigoestacao_"):-len(".json")], set()).add(data_str)
+            continue
+        dir_dia = os.path.join(dir_mes, nome)
+        if not os.path.isdir(dir_dia):
+            continue
+        for nome_dia in os.listdir(dir_dia):
+            if nome_dia.startswith("codigoestacao_") and nome_dia.endswith(".json"):
+                dias.setdefault(nome_dia[len("codigoestacao_"):-len(".json")], set()).add(nome)
+    return dias
+
+
+def meses(root_dir):
+    """Meses ("YYYY", "MM") com diretório em root_dir, em ordem."""
+    encontrados = []
+    if not os.path.isdir(root_dir):
+        return encontrados
+    for ano in sorted(os.listdir(root_dir)):
+        dir_ano = os.path.join(root_dir, ano)
+        if not ano.isdigit() or not os.path.isdir(dir_ano):
+            continue
+        for mes in sorted(os.listdir(dir_ano)):
+            if os.path.isdir(os.path.join(dir_ano, mes)):
+                encontrados.append((ano, mes))
+    return encontrados
+
+
+def listar_dias(root_dir, codigos=None):
+    """
+    Lista os dias existentes nas duas camadas.
+
+    @param codigos: Conjunto de códigos de estação (None = todas).
+    @return: Dicionário {codigo: [data_str, ...]} com as datas em ordem crescente.
+    """
+    dias = {}
+    for ano, mes in meses(root_dir):
+        for codigo, datas in listar_dias_mes(root_dir, ano, mes).items():
+            if codigos is None or codigo in codigos:
+                dias.setdefault(codigo, set()).update(datas)
+    return {codigo: sorted(datas) for codigo, datas in dias.items()}
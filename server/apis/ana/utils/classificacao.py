@@ -0,0 +1,146 @@
+"""
+@file server/apis/ana/utils/classificacao.py
+@description Classificação das estações (chuva, nível, vazão e status de atualização) no lado Python.
+
+Reproduz as regras de src/utils/ana/classification/categorizacaoEstacoes.js com os mesmos limiares de
+STATION_CLASSIFICATION_CONFIG (src/utils/config.js); ao alterar os limiares lá, altere-os aqui também.
+"""
+
+from datetime import datetime, timedelta
+
+from server.apis.ana.utils.leituras import SerieLeituras, texto_para_segundos
+from server.apis.ana.utils.arquivo_mensal import ler_dia
+
+# Espelho de STATION_CLASSIFICATION_CONFIG (src/utils/config.js)
+CONFIG_CLASSIFICACAO = {
+    "chuva": {
+        "indefinido": "Indefinido",
+        "sem_chuva": "Sem Chuva",
+        # Limiares em milímetros, em ordem crescente
+        "limiares": [(5, "Fraca"), (29, "Moderada"), (59, "Forte"), (99, "Muito Forte")],
+        "acima": "Extrema",
+    },
+    "nivel": {"indefinido": "Indefinido", "baixo": ("Baixo", 400), "normal": ("Normal", 450), "acima": "Alto"},
+    "vazao": {"indefinido": "Indefinido", "baixo": ("Baixa", 30), "normal": ("Normal", 35), "acima": "Alta"},
+    # Período para acumulação de chuva (em horas)
+    "periodo_acumulacao_chuva_h": 24,
+    # Limiar para considerar que os dados estão atualizados (em horas)
+    "limiar_atualizacao_h": 12,
+}
+
+
+def classificar_chuva(total):
+    config = CONFIG_CLASSIFICACAO["chuva"]
+    if total is None:
+        return config["indefinido"]
+    if total == 0:
+        return config["sem_chuva"]
+    for limiar, classe in config["limiares"]:
+        if total <= limiar:
+            return classe
+    return config["acima"]
+
+
+def _classificar_faixa(valor, config):
+    if valor is None:
+        return config["indefinido"]
+    classe_baixo, limiar_baixo = config["baixo"]
+    classe_normal, limiar_normal = config["normal"]
+    if valor < limiar_baixo:
+        return classe_baixo
+    if valor <= limiar_normal:
+        return classe_normal
+    return config["acima"]
+
+
+def classificar_nivel(cota):
+    return _classificar_faixa(cota, CONFIG_CLASSIFICACAO["nivel"])
+
+
+def classificar_vazao(vazao):
+    return _classificar_faixa(vazao, CONFIG_CLASSIFICACAO["vazao"])
+
+
+def status_atualizacao(data_hora_medicao, agora=None):
+    """
+    "Atualizado" se a última medição tiver no máximo limiar_atualizacao_h horas; caso contrário "Desatualizado".
+
+    @param data_hora_medicao: Texto "YYYY-MM-DD HH:MM:SS[.f]" (horário local) ou None.
+    @param agora: datetime local de referência (padrão: datetime.now()).
+    """
+    if not data_hora_medicao:
+        return "Desatualizado"
+    agora = agora or datetime.now()
+    idade_s = texto_para_segundos(agora.strftime("%Y-%m-%d %H:%M:%S")) - texto_para_segundos(data_hora_medicao)
+    return "Atualizado" if idade_s <= CONFIG_CLASSIFICACAO["limiar_atualizacao_h"] * 3600 else "Desatualizado"
+
+
+def resumir_serie(codigoestacao, serie, agora=None):
+    """
+    Calcula o resumo de uma estação a partir da sua série recente (equivalente a categorizeStation).
+
+    @param codigoestacao: Código da estação.
+    @param serie: SerieLeituras com as leituras recentes (ex.: hoje e ontem).
+    @param agora: datetime local de referência para o status de atualização.
+    @return: Dicionário com a última leitura, a chuva acumulada e as classificações. Sem leituras, os valores
+             são None e as classificações "Indefinido", como no categorizeStation.
+    """
+    leituras = serie.ordenadas()
+    if not leituras:
+        return {
+            "codigoestacao": str(codigoestacao),
+            "Data_Hora_Medicao": None,
+            "Data_Atualizacao": None,
+            "chuvaAcumulada": None,
+            "nivelMaisRecente": None,
+            "vazaoMaisRecente": None,
+            "statusAtualizacao": status_atualizacao(None),
+            "classificacaoChuva": classificar_chuva(None),
+            "classificacaoNivel": classificar_nivel(None),
+            "classificacaoVazao": classificar_vazao(None),
+        }
+    ultima = leituras[-1]
+    inicio = ultima.medicao - CONFIG_CLASSIFICACAO["periodo_acumulacao_chuva_h"] * 3600
+    chuvas = [l.chuva for l in leituras if inicio <= l.medicao <= ultima.medicao and l.chuva is not None]
+    chuva_acumulada = round(sum(chuvas), 2) if chuvas else None
+    registro = ultima.para_dict()
+
+    return {
+        "codigoestacao": str(codigoestacao),
+        "Data_Hora_Medicao": registro["Data_Hora_Medicao"],
+        "Data_Atualizacao": registro.get("Data_Atualizacao"),
+        "chuvaAcumulada": chuva_acumulada,
+        "nivelMaisRecente": registro.get("Cota_Adotada"),
+        "vazaoMaisRecente": registro.get("Vazao_Adotada"),
+        "statusAtualizacao": status_atualizacao(registro["Data_Hora_Medicao"], agora),
+        "classificacaoChuva": classificar_chuva(chuva_acumulada),
+        "classificacaoNivel": classificar_nivel(ultima.cota),
+        "classificacaoVazao": classificar_vazao(ultima.vazao),
+    }
+
+
+def datas_referencia(agora_utc=None):
+    """Retorna (hoje, ontem) em "YYYY-MM-DD" no horário de Brasília (UTC-3), como em mesclarDadosEstacoes.js."""
+    agora = (agora_utc or datetime.utcnow()) - timedelta(hours=3)
+    return agora.strftime("%Y-%m-%d"), (agora - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def carregar_serie_recente(root_dir, codigoestacao, datas):
+    """Lê os arquivos diários da estação nas datas informadas e retorna uma única SerieLeituras."""
+    serie = SerieLeituras()
+    for data_str in datas:
+        try:
+            documento = ler_dia(root_dir, codigoestacao, data_str)
+            if documento is not None:
+                serie.mesclar(SerieLeituras.de_json(documento.get("dados", [])))
+        except (OSError, ValueError, AttributeError):
+            continue
+    return serie
+
+
+def resumir_estacao(root_dir, codigoestacao, agora_utc=None):
+    """Resumo da estação com os dados de hoje e de ontem (mesma janela usada pelo endpoint /estacoes/todas)."""
+    agora_utc = agora_utc or datetime.utcnow()
+    serie = carregar_serie_recente(root_dir, codigoestacao, datas_referencia(agora_utc))
+    return resumir_serie(codigoestacao, serie, agora_utc - timedelta(hours=3))
+
@@ -1,113 +1,249 @@
 """
 @file server/apis/ana/utils/data_storage.py
-@description Módulo para armazenamento dos dados das estações em arquivos JSON, 
-agrupando os registros por data e estação. Os dados são salvos e atualizados conforme 
+@description Módulo para armazenamento dos dados das estações em arquivos JSON,
+agrupando os registros por data e estação. Os dados são salvos e atualizados conforme
 a data de leitura dos registros, evitando duplicação.
+
+Os registros são convertidos uma única vez para leituras tipadas (ver leituras.py), sobre as quais
+são feitas a deduplicação, a ordenação e a mescla; o formato JSON só é reconstruído na serialização.
+
+A gravação é dividida em duas etapas:
+  - preparar_arquivos: etapa de CPU (agrupamento, mesclagem, ordenação e serialização), sem escrita,
+    que pode ser executada em outro processo;
+  - gravar_lote: etapa de I/O, que apenas escreve o conteúdo já serializado de forma atômica.
+
+O conteúdo existente de um dia é lido em qualquer camada (arquivo solto ou arquivo mensal, ver
+arquivo_mensal.py): uma gravação tardia num dia já arquivado recria o arquivo solto com o dia completo.
+Um dia ilegível é regravado só com as leituras novas, mas antes o conteúdo original é copiado para
+<arquivo>.corrompido (preservar_corrompido), para recuperação manual.
+Após cada lote, gravar_lote atualiza o manifesto de cada mês afetado (manifesto_mensal.py) com o número
+de leituras, a primeira e a última medição, o tamanho e o checksum de cada dia gravado.
 """
 
 import os
 import json
-from datetime import datetime
+
+from server.apis.ana.utils.leituras import Leitura, SerieLeituras
+from server.apis.ana.utils.arquivo_mensal import ler_conteudo_dia
+from server.apis.ana.utils.manifesto_mensal import resumo_dia, atualizar_manifesto
+
+# Sufixo da cópia de um arquivo diário ilegível, feita antes de o dia ser regravado
+SUFIXO_CORROMPIDO = ".corrompido"
+
+
+def gravar_arquivo_atomico(caminho, conteudo):
+    """
+    Grava o conteúdo em um arquivo temporário e o move para o destino, de modo que leitores
+    nunca vejam um arquivo pela metade. Se a substituição falhar (ex.: arquivo aberto por outro
+    processo no Windows), grava diretamente no destino.
+
+    @param caminho: Caminho final do arquivo.
+    @param conteudo: Texto a ser gravado (UTF-8).
+    """
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(conteudo)
+    try:
+        os.replace(temporario, caminho)
+    except PermissionError:
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+        os.remove(temporario)
+
+
+def preservar_corrompido(caminho, conteudo):
+    """
+    Guarda o conteúdo ilegível de um arquivo diário em <caminho>.corrompido (ou .corrompido.1, .2, ...
+    se já existir), para que a regravação do dia não apague os bytes originais.
+
+    @param caminho: Caminho do arquivo diário.
+    @param conteudo: Conteúdo original (bytes).
+    @return: Caminho do arquivo preservado.
+    """
+    destino = f"{caminho}{SUFIXO_CORROMPIDO}"
+    sequencia = 0
+    while os.path.exists(destino):
+        sequencia += 1
+        destino = f"{caminho}{SUFIXO_CORROMPIDO}.{sequencia}"
+    temporario = f"{destino}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(conteudo)
+    os.replace(temporario, destino)
+    print(f"Conteúdo ilegível de {caminho} preservado em {destino}.")
+    return destino
+
 
 class DataStorage:
     def __init__(self, root_dir='public/data'):
         """
         Inicializa a classe DataStorage com o diretório raiz onde os dados serão armazenados.
-        
+
         @param root_dir: Diretório base para armazenamento dos dados. Default: 'public/data'
         """
         self.root_dir = root_dir
 
+    def caminho_arquivo(self, station_code, record_date):
+        """
+        Retorna o caminho do arquivo diário de uma estação.
+
+        @param station_code: Código da estação.
+        @param record_date: Data no formato "YYYY-MM-DD".
+        """
+        year, month, _ = record_date.split("-")
+        return os.path.join(self.root_dir, year, month, record_date, f'codigoestacao_{station_code}.json')
+
     def save_station_data_to_file(self, all_data, data_busca, intervalo, station_code):
         """
         Salva os dados das estações em arquivos JSON, agrupando-os por data (extraída do campo
         "Data_Hora_Medicao") e estação. Para cada data, o arquivo correspondente é atualizado com
         os registros novos, evitando duplicação.
-        
+
         @param all_data: Lista de registros retornados pela API.
         @param data_busca: Data da busca (geralmente a data corrente), mas aqui não é usado para filtrar,
                            pois cada registro é salvo de acordo com sua própria data.
         @param intervalo: Intervalo usado na busca (apenas para log ou controle, se necessário).
         @param station_code: Código da estação.
         """
-        # Agrupa os registros por data, extraindo os 10 primeiros caracteres do campo "Data_Hora_Medicao"
-        registros_por_data = {}
+        self.gravar_lote(self.preparar_arquivos(all_data, station_code))
+
+    def preparar_arquivos(self, all_data, station_code):
+        """
+        Agrupa os registros por data, mescla-os com os arquivos existentes e serializa o resultado,
+        sem gravar nada em disco.
+
+        @param all_data: Lista de registros retornados pela API.
+        @param station_code: Código da estação.
+        @return: Lista de dicionários {"caminho", "data", "conteudo", "novos", "manifesto"} apenas para os arquivos
+                 que precisam ser (re)gravados. "novos" contém as leituras (Leitura) que ainda não existiam no arquivo.
+        """
+        # Agrupa as leituras pela data de medição
+        leituras_por_data = {}
         for entry in all_data:
             if "Data_Hora_Medicao" not in entry:
                 continue  # Ignora registros sem a data de medição
-            # Extrai a data (assumindo formato "YYYY-MM-DD ...")
-            record_date = entry["Data_Hora_Medicao"][:10]
-            if record_date not in registros_por_data:
-                registros_por_data[record_date] = []
             # Remove o campo "codigoestacao" (pois já estará no cabeçalho)
             entry.pop("codigoestacao", None)
-            registros_por_data[record_date].append(entry)
-        
-        # Para cada data encontrada, ordena os registros em ordem crescente (mais antigo primeiro)
-        # e salva (ou atualiza) o arquivo correspondente.
-        for record_date, registros in registros_por_data.items():
             try:
-                registros.sort(key=lambda r: datetime.strptime(r["Data_Hora_Medicao"], "%Y-%m-%d %H:%M:%S.%f"))
+                leitura = Leitura.de_dict(entry)
+            except ValueError as e:
+                print(f"Registro ignorado para a estação {station_code}: {e}")
+                continue
+            leituras_por_data.setdefault(leitura.data, []).append(leitura)
+
+        arquivos = []
+        for record_date, leituras in leituras_por_data.items():
+            file_path = self.caminho_arquivo(station_code, record_date)
+            try:
+                preparado = self._mesclar_dia(file_path, station_code, record_date, leituras)
+            except Exception as e:
+                print(f"Erro ao preparar os dados do arquivo {file_path}: {e}")
+                continue
+            if preparado is not None:
+                arquivos.append(preparado)
+        return arquivos
+
+    def _mesclar_dia(self, file_path, station_code, record_date, leituras):
+        """
+        Mescla as leituras de um dia com o arquivo existente (se houver).
+        Retorna None quando o arquivo já está atualizado e corretamente ordenado.
+        """
+        documento = None
+        corrompido = None
+        conteudo = ler_conteudo_dia(self.root_dir, station_code, record_date)
+        if conteudo is not None:
+            try:
+                documento = json.loads(conteudo)
+            except ValueError as e:
+                # O dia é regravado só com as leituras novas; o conteúdo ilegível é preservado por gravar_lote
+                # em <arquivo>.corrompido antes da regravação
+                print(f"Arquivo {file_path} ilegível ({e}); o dia será regravado a partir das leituras novas "
+                      f"e o conteúdo original preservado em {file_path}{SUFIXO_CORROMPIDO}.")
+                documento = {"codigoestacao": station_code, "data": record_date, "dados": []}
+                corrompido = conteudo
+
+        if documento is None:
+            # Se o arquivo não existir, cria-o com todas as leituras do grupo (ordenadas)
+            serie = SerieLeituras()
+            novos = serie.mesclar(leituras)
+            documento = {"codigoestacao": station_code, "data": record_date}
+            print(f"Arquivo criado para a estação {station_code} no dia {record_date} com {len(novos)} registros.")
+            return self._preparado(file_path, record_date, documento, serie, novos)
+
+        # Leituras já existentes são mantidas; apenas timestamps inéditos são adicionados
+        serie = SerieLeituras.de_json(documento.get("dados", []))
+        novos = serie.mesclar(leituras)
+
+        if corrompido is not None:
+            preparado = self._preparado(file_path, record_date, documento, serie, novos)
+            preparado["corrompido"] = corrompido
+            return preparado
+        if novos:
+            print(f"Arquivo atualizado para a estação {station_code} no dia {record_date} com {len(novos)} novos registros.")
+            return self._preparado(file_path, record_date, documento, serie, novos)
+        if not serie.estava_ordenada:
+            # Mesmo sem novos registros, corrige a ordem do arquivo
+            print(f"Arquivo reordenado para a estação {station_code} no dia {record_date}.")
+            return self._preparado(file_path, record_date, documento, serie, [])
+        print(f"Nenhum dado novo para a estação {station_code} no dia {record_date}.")
+        return None
+
+    @staticmethod
+    def _preparado(file_path, record_date, documento, serie, novos):
+        documento["dados"] = serie.para_json()
+        conteudo = json.dumps(documento, ensure_ascii=False, indent=4)
+        return {
+            "caminho": file_path,
+            "data": record_date,
+            "conteudo": conteudo,
+            "novos": novos,
+            "manifesto": resumo_dia(conteudo, documento),
+        }
+
+    def gravar_lote(self, arquivos):
+        """
+        Grava em disco os arquivos preparados por preparar_arquivos (ou equivalente) e atualiza o
+        manifesto dos meses afetados.
+
+        @param arquivos: Lista de dicionários com "caminho", "conteudo" e, opcionalmente, "manifesto"
+                         (resumo_dia do conteúdo; calculado aqui se ausente) e "corrompido" (conteúdo ilegível
+                         do dia, preservado em <caminho>.corrompido antes da gravação; se não puder ser
+                         preservado, o arquivo não é gravado).
+        @return: Número de arquivos gravados com sucesso.
+        """
+        gravados = 0
+        diretorios_criados = set()
+        entradas_por_mes = {}
+        for arquivo in arquivos:
+            file_path = arquivo["caminho"]
+            directory = os.path.dirname(file_path)
+            try:
+                if directory not in diretorios_criados:
+                    os.makedirs(directory, exist_ok=True)
+                    diretorios_criados.add(directory)
+                if arquivo.get("corrompido") is not None:
+                    preservar_corrompido(file_path, arquivo["corrompido"])
+                gravar_arquivo_atomico(file_path, arquivo["conteudo"])
+                gravados += 1
+            except Exception as e:
+                print(f"Erro ao salvar os dados no arquivo {file_path}: {e}")
+                continue
+            # Só arquivos no leiaute YYYY/MM/YYYY-MM-DD/codigoestacao_<codigo>.json entram no manifesto
+            record_date, nome = os.path.basename(directory), os.path.basename(file_path)
+            if not nome.startswith("codigoestacao_") or os.path.basename(os.path.dirname(directory)) != record_date[5:7]:
+                continue
+            codigo = nome[len("codigoestacao_"):-len(".json")]
+            try:
+                resumo = arquivo.get("manifesto") or resumo_dia(arquivo["conteudo"])
+            except ValueError as e:
+                print(f"Arquivo {file_path} fora do manifesto: {e}")
+                continue
+            entradas_por_mes.setdefault(os.path.dirname(directory), {})[(codigo, record_date)] = resumo
+
+        for dir_mes, entradas in entradas_por_mes.items():
+            root_dir, mes = os.path.split(dir_mes)
+            root_dir, ano = os.path.split(root_dir)
+            try:
+                atualizar_manifesto(root_dir, ano, mes, entradas)
             except Exception as e:
-                print(f"Erro na ordenação dos registros para {record_date}: {e}")
-
-            year, month, day = record_date.split("-")
-            # Define o diretório baseado na data do registro
-            directory = os.path.join(self.root_dir, year, month, f'{record_date}')
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-            # Define o caminho do arquivo para essa estação e data
-            file_path = os.path.join(directory, f'codigoestacao_{station_code}.json')
-            
-            # Se o arquivo já existir, carrega os dados existentes e adiciona os registros novos
-            if os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r+', encoding='utf-8') as f:
-                        try:
-                            dados_existentes = json.load(f)
-                        except json.JSONDecodeError:
-                            dados_existentes = {"codigoestacao": station_code, "data": record_date, "dados": []}
-                        
-                        # Pega os timestamps já existentes para evitar duplicação
-                        timestamps_existentes = {item.get("Data_Hora_Medicao") for item in dados_existentes.get("dados", [])}
-                        novos_registros = [r for r in registros if r.get("Data_Hora_Medicao") not in timestamps_existentes]
-                        
-                        if novos_registros:
-                            dados_existentes["dados"].extend(novos_registros)
-                            # Ordena os registros existentes em ordem crescente (mais antigo primeiro)
-                            try:
-                                dados_existentes["dados"].sort(key=lambda r: datetime.strptime(r["Data_Hora_Medicao"], "%Y-%m-%d %H:%M:%S.%f"))
-                            except Exception as e:
-                                print(f"Erro na ordenação dos dados existentes para {record_date}: {e}")
-                            
-                            # Verifica se a ordem atual é diferente da ordenada
-                            registros_ordenados = sorted(dados_existentes["dados"], key=lambda r: datetime.strptime(r["Data_Hora_Medicao"], "%Y-%m-%d %H:%M:%S.%f"))
-                            if registros_ordenados != dados_existentes["dados"]:
-                                dados_existentes["dados"] = registros_ordenados
-                            
-                            f.seek(0)
-                            json.dump(dados_existentes, f, ensure_ascii=False, indent=4)
-                            f.truncate()
-                            print(f"Arquivo atualizado para a estação {station_code} no dia {record_date} com {len(novos_registros)} novos registros.")
-                        else:
-                            # Mesmo sem novos registros, verifica se a ordem está correta
-                            registros_ordenados = sorted(dados_existentes["dados"], key=lambda r: datetime.strptime(r["Data_Hora_Medicao"], "%Y-%m-%d %H:%M:%S.%f"))
-                            if registros_ordenados != dados_existentes["dados"]:
-                                dados_existentes["dados"] = registros_ordenados
-                                f.seek(0)
-                                json.dump(dados_existentes, f, ensure_ascii=False, indent=4)
-                                f.truncate()
-                                print(f"Arquivo reordenado para a estação {station_code} no dia {record_date}.")
-                            else:
-                                print(f"Nenhum dado novo para a estação {station_code} no dia {record_date}.")
-                except Exception as e:
-                    print(f"Erro ao salvar os dados no arquivo {file_path}: {e}")
-            else:
-                # Se o arquivo não existir, cria-o com todos os registros do grupo (já ordenados)
-                try:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        novo_registro = {"codigoestacao": station_code, "data": record_date, "dados": registros}
-                        json.dump(novo_registro, f, ensure_ascii=False, indent=4)
-                    print(f"Arquivo criado para a estação {station_code} no dia {record_date} com {len(registros)} registros.")
-                except Exception as e:
-                    print(f"Erro ao criar o arquivo {file_path}: {e}")
+                print(f"Erro ao atualizar o manifesto de {dir_mes}: {e}")
+        return gravados
@@ -0,0 +1,91 @@
+"""
+@file server/apis/ana/utils/downsampling.py
+@description Redução de séries temporais para um número fixo de pontos, usada nos gráficos.
+
+  - lttb: Largest-Triangle-Three-Buckets, preserva a forma visual da curva (picos e vales);
+  - min_max: em cada intervalo mantém o menor e o maior valor, preservando os extremos.
+
+As funções recebem arrays NumPy (x crescente, y sem NaN) e retornam os índices dos pontos
+selecionados, em ordem cronológica.
+"""
+
+import numpy as np
+
+METODOS = ("lttb", "minmax")
+
+
+def lttb(x, y, pontos):
+    """
+    Seleciona até 'pontos' índices pelo algoritmo Largest-Triangle-Three-Buckets.
+
+    @param x: Array com os instantes (crescente).
+    @param y: Array com os valores.
+    @param pontos: Número de pontos desejado (mínimo 3).
+    @return: Array de índices selecionados.
+    """
+    total = len(x)
+    if pontos >= total or pontos < 3:
+        return np.arange(total)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    indices = np.empty(pontos, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = total - 1
+
+    # Limites dos intervalos: o primeiro e o último ponto ficam fora dos intervalos
+    limites = (np.arange(pontos - 1) * (total - 2) / (pontos - 2)).astype(np.int64) + 1
+    limites[-1] = total - 1
+    anterior = 0
+    for i in range(pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do próximo intervalo (ou o último ponto, no último intervalo)
+        if i + 2 < len(limites):
+            proximo = slice(limites[i + 1], limites[i + 2])
+            media_x, media_y = x[proximo].mean(), y[proximo].mean()
+        else:
+            media_x, media_y = x[-1], y[-1]
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs((ax - media_x) * (y[inicio:fim] - ay) - (ax - x[inicio:fim]) * (media_y - ay))
+        anterior = inicio + int(areas.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+def min_max(y, pontos):
+    """
+    Divide a série em pontos/2 intervalos e seleciona o mínimo e o máximo de cada um.
+
+    @param y: Array com os valores.
+    @param pontos: Número máximo de pontos desejado.
+    @return: Array de índices selecionados (sem repetições).
+    """
+    total = len(y)
+    intervalos = pontos // 2
+    if pontos >= total or intervalos < 1:
+        return np.arange(total)
+
+    y = np.asarray(y, dtype=np.float64)
+    limites = (np.arange(intervalos + 1) * total / intervalos).astype(np.int64)
+    selecionados = []
+    for inicio, fim in zip(limites[:-1], limites[1:]):
+        if fim <= inicio:
+            continue
+        trecho = y[inicio:fim]
+        par = sorted({inicio + int(trecho.argmin()), inicio + int(trecho.argmax())})
+        selecionados.extend(par)
+    return np.asarray(selecionados, dtype=np.int64)
+
+
+def reduzir(x, y, pontos, metodo="lttb"):
+    """
+    Reduz a série (x, y) para no máximo 'pontos' pontos.
+
+    @param metodo: "lttb" ou "minmax".
+    @raise ValueError: Se o método não for suportado.
+    """
+    if metodo == "lttb":
+        return lttb(x, y, pontos)
+    if metodo == "minmax":
+        return min_max(y, pontos)
+    raise ValueError(f"Método de redução inválido: {metodo}. Use um de {', '.join(METODOS)}.")
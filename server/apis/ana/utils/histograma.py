@@ -0,0 +1,129 @@
+"""
+@file server/apis/ana/utils/histograma.py
+@description Histograma de latências em fluxo, com baldes em escala logarítmica e memória fixa.
+
+Cada dobra de valor (1s, 2s, 4s, ...) é dividida em BALDES_POR_DOBRA baldes, o que mantém o erro
+relativo dos percentis abaixo de ~19% (2^(1/4)) de 1 segundo a ~48 dias, com no máximo NUM_BALDES
+contadores. O balde 0 recebe as latências menores que 1 segundo (inclusive as negativas, contadas à
+parte em 'negativos', que indicam relógios fora de sincronia) e o último, as acima do limite.
+
+As contagens são reais para permitir o decaimento exponencial (decair): multiplicar as contagens por
+um fator < 1 faz com que os percentis reflitam principalmente as latências recentes. O histograma é
+serializável em JSON de forma esparsa (para_dict) e dois histogramas são mesclados somando os baldes.
+"""
+
+import math
+
+BALDES_POR_DOBRA = 4
+# 2^22 s ≈ 48 dias
+DOBRAS = 22
+NUM_BALDES = BALDES_POR_DOBRA * DOBRAS + 2
+
+
+def indice_balde(valor):
+    """Índice do balde da latência (em segundos)."""
+    if valor < 1:
+        return 0
+    return min(int(math.log2(valor) * BALDES_POR_DOBRA) + 1, NUM_BALDES - 1)
+
+
+def limites_balde(indice):
+    """Intervalo [inferior, superior) de valores do balde."""
+    if indice == 0:
+        return 0.0, 1.0
+    return 2 ** ((indice - 1) / BALDES_POR_DOBRA), 2 ** (indice / BALDES_POR_DOBRA)
+
+
+class HistogramaLatencias:
+    """Distribuição aproximada de latências (em segundos)."""
+
+    __slots__ = ("contagens", "total", "soma", "maximo", "negativos")
+
+    def __init__(self):
+        self.contagens = [0.0] * NUM_BALDES
+        self.total = 0.0
+        self.soma = 0.0
+        self.maximo = None
+        self.negativos = 0
+
+    def adicionar(self, valor, peso=1.0):
+        """Adiciona uma latência (None e NaN são ignorados)."""
+        if valor is None or valor != valor:
+            return
+        if valor < 0:
+            self.negativos += 1
+            valor = 0.0
+        self.contagens[indice_balde(valor)] += peso
+        self.total += peso
+        self.soma += valor * peso
+        if self.maximo is None or valor > self.maximo:
+            self.maximo = valor
+
+    def decair(self, fator):
+        """Multiplica todas as contagens pelo fator (0 < fator <= 1)."""
+        if fator >= 1:
+            return
+        self.contagens = [contagem * fator for contagem in self.contagens]
+        self.total *= fator
+        self.soma *= fator
+
+    def mesclar(self, outro):
+        """Soma as contagens de outro histograma a este."""
+        for indice, contagem in enumerate(outro.contagens):
+            self.contagens[indice] += contagem
+        self.total += outro.total
+        self.soma += outro.soma
+        self.negativos += outro.negativos
+        if outro.maximo is not None and (self.maximo is None or outro.maximo > self.maximo):
+            self.maximo = outro.maximo
+
+    def media(self):
+        return self.soma / self.total if self.total else None
+
+    def quantil(self, q):
+        """
+        Valor aproximado do quantil q (0..1), interpolado geometricamente dentro do balde.
+        Retorna None se o histograma estiver vazio.
+        """
+        if self.total <= 0:
+            return None
+        alvo = q * self.total
+        acumulado = 0.0
+        for indice, contagem in enumerate(self.contagens):
+            if contagem <= 0:
+                continue
+            if acumulado + contagem >= alvo:
+                inferior, superior = limites_balde(indice)
+                fracao = (alvo - acumulado) / contagem
+                if indice == 0:
+                    valor = superior * fracao
+                else:
+                    valor = inferior * (superior / inferior) ** fracao
+                return min(valor, self.maximo) if self.maximo is not None else valor
+            acumulado += contagem
+        return self.maximo
+
+    def quantis(self, qs):
+        return {q: self.quantil(q) for q in qs}
+
+    def para_dict(self):
+        """Representação JSON esparsa ({indice: contagem} só com os baldes não vazios)."""
+        return {
+            "baldes": {str(indice): round(contagem, 6) for indice, contagem in enumerate(self.contagens)
+                       if contagem > 1e-9},
+            "total": round(self.total, 6),
+            "soma": round(self.soma, 3),
+            "maximo": self.maximo,
+            "negativos": self.negativos,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        histograma = cls()
+        for indice, contagem in dados.get("baldes", {}).items():
+            histograma.contagens[int(indice)] = contagem
+        histograma.total = dados.get("total", 0.0)
+        histograma.soma = dados.get("soma", 0.0)
+        histograma.maximo = dados.get("maximo")
+        histograma.negativos = dados.get("negativos", 0)
+        return histograma
@@ -0,0 +1,104 @@
+"""
+@file server/apis/ana/utils/kdtree.py
+@description Árvore k-d em NumPy para busca dos k vizinhos mais próximos de muitos pontos de uma vez.
+
+A árvore é construída sobre poucos pontos (as estações) e consultada por muitos (as células de uma grade).
+As consultas são feitas em lote: cada nó recebe o conjunto de pontos de consulta que ainda podem ter
+vizinhos nele, e as folhas calculam as distâncias com operações vetorizadas. Os pontos cujo melhor
+k-ésimo vizinho já está mais perto que a caixa do nó são descartados (poda), como na busca clássica.
+"""
+
+import numpy as np
+
+
+class ArvoreKD:
+    """Árvore k-d estática sobre um conjunto de pontos (n x d)."""
+
+    def __init__(self, pontos, tamanho_folha=16):
+        """
+        @param pontos: Array (n, d) com as coordenadas dos pontos.
+        @param tamanho_folha: Número máximo de pontos por folha.
+        """
+        self.pontos = np.asarray(pontos, dtype=np.float64)
+        if self.pontos.ndim != 2 or len(self.pontos) == 0:
+            raise ValueError("A árvore k-d precisa de um array (n, d) com ao menos um ponto.")
+        self.tamanho_folha = max(int(tamanho_folha), 1)
+        # Cada nó: (minimos, maximos, eixo, corte, esquerda, direita, indices)
+        self._nos = []
+        self._raiz = self._construir(np.arange(len(self.pontos)))
+
+    def __len__(self):
+        return len(self.pontos)
+
+    def _construir(self, indices):
+        pontos = self.pontos[indices]
+        minimos, maximos = pontos.min(axis=0), pontos.max(axis=0)
+        no = len(self._nos)
+        if len(indices) <= self.tamanho_folha or np.all(maximos == minimos):
+            self._nos.append((minimos, maximos, -1, 0.0, -1, -1, indices))
+            return no
+
+        eixo = int(np.argmax(maximos - minimos))
+        meio = len(indices) // 2
+        ordem = np.argpartition(pontos[:, eixo], meio)
+        self._nos.append(None)
+        esquerda = self._construir(indices[ordem[:meio]])
+        direita = self._construir(indices[ordem[meio:]])
+        corte = float(pontos[ordem[meio], eixo])
+        self._nos[no] = (minimos, maximos, eixo, corte, esquerda, direita, None)
+        return no
+
+    def consultar(self, consultas, k=1):
+        """
+        Busca os k vizinhos mais próximos de cada ponto de consulta.
+
+        @param consultas: Array (m, d) com os pontos de consulta.
+        @param k: Número de vizinhos (limitado ao número de pontos da árvore).
+        @return: (distancias, indices), arrays (m, k) ordenados do vizinho mais próximo ao mais distante.
+        """
+        consultas = np.asarray(consultas, dtype=np.float64)
+        k = min(int(k), len(self.pontos))
+        self._consultas = consultas
+        self._melhores_d2 = np.full((len(consultas), k), np.inf)
+        self._melhores_idx = np.full((len(consultas), k), -1, dtype=np.int64)
+        try:
+            self._visitar(self._raiz, np.arange(len(consultas)))
+            ordem = np.argsort(self._melhores_d2, axis=1)
+            distancias = np.sqrt(np.take_along_axis(self._melhores_d2, ordem, axis=1))
+            indices = np.take_along_axis(self._melhores_idx, ordem, axis=1)
+        finally:
+            del self._consultas, self._melhores_d2, self._melhores_idx
+        return distancias, indices
+
+    def _visitar(self, no, candidatos):
+        minimos, maximos, eixo, corte, esquerda, direita, indices = self._nos[no]
+        q = self._consultas[candidatos]
+
+        # Poda: descarta as consultas cuja caixa do nó está mais longe que o k-ésimo melhor vizinho atual
+        excesso = np.maximum(minimos - q, 0.0) + np.maximum(q - maximos, 0.0)
+        d2_caixa = np.einsum("ij,ij->i", excesso, excesso)
+        manter = d2_caixa < self._melhores_d2[candidatos].max(axis=1)
+        if not manter.all():
+            candidatos, q = candidatos[manter], q[manter]
+        if len(candidatos) == 0:
+            return
+
+        if indices is not None:
+            diferenca = q[:, None, :] - self.pontos[indices][None, :, :]
+            d2 = np.einsum("ijk,ijk->ij", diferenca, diferenca)
+            todos_d2 = np.concatenate([self._melhores_d2[candidatos], d2], axis=1)
+            todos_idx = np.concatenate([self._melhores_idx[candidatos],
+                                        np.broadcast_to(indices, d2.shape)], axis=1)
+            k = self._melhores_d2.shape[1]
+            escolhidos = np.argpartition(todos_d2, k - 1, axis=1)[:, :k]
+            self._melhores_d2[candidatos] = np.take_along_axis(todos_d2, escolhidos, axis=1)
+            self._melhores_idx[candidatos] = np.take_along_axis(todos_idx, escolhidos, axis=1)
+            return
+
+        # Cada grupo de consultas visita primeiro o lado em que está, o que torna a poda mais eficaz
+        lado_esquerdo = q[:, eixo] < corte
+        for grupo, primeiro, segundo in ((candidatos[lado_esquerdo], esquerda, direita),
+                                         (candidatos[~lado_esquerdo], direita, esquerda)):
+            if len(grupo):
+                self._visitar(primeiro, grupo)
+                self._visitar(segundo, grupo)
@@ -0,0 +1,355 @@
+"""
+@file server/apis/ana/utils/leituras.py
+@description Representação compacta e tipada das leituras telemétricas das estações.
+
+Na API e nos arquivos diários, cada leitura é um dicionário com 8 a 9 campos em texto
+("Cota_Adotada": "480.00", status como "0", datas como "2025-01-29 00:00:00.0"). Este módulo converte
+cada leitura uma única vez, na ingestão, para um objeto com __slots__:
+  - valores numéricos como float (ou None);
+  - status como int (ou None);
+  - data de medição como segundos inteiros (horário local, sem fuso) e data de atualização em milissegundos.
+
+A conversão de volta para o formato JSON atual é sem perdas: os campos ausentes continuam ausentes
+(ex.: estações do Cemaden sem "Cota_Adotada"), e qualquer valor cujo texto não possa ser reproduzido
+exatamente a partir do valor tipado é preservado no texto original. Registros de um arquivo sem
+Data_Hora_Medicao válida não viram leituras: são mantidos como vieram (registros opacos) e regravados
+ao final da lista "dados", de modo que uma regravação não apaga nada do arquivo.
+"""
+
+import logging
+import functools
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Campos conhecidos, na ordem em que aparecem nos arquivos (ordem alfabética devolvida pela API)
+CAMPOS = (
+    "Chuva_Adotada",
+    "Chuva_Adotada_Status",
+    "Cota_Adotada",
+    "Cota_Adotada_Status",
+    "Data_Atualizacao",
+    "Data_Hora_Medicao",
+    "Vazao_Adotada",
+    "Vazao_Adotada_Status",
+)
+_BIT = {campo: 1 << i for i, campo in enumerate(CAMPOS)}
+
+# Campos numéricos (float com duas casas) e de status (inteiros) -> atributo da leitura
+_NUMERICOS = {"Chuva_Adotada": "chuva", "Cota_Adotada": "cota", "Vazao_Adotada": "vazao"}
+_STATUS = {"Chuva_Adotada_Status": "chuva_status", "Cota_Adotada_Status": "cota_status",
+           "Vazao_Adotada_Status": "vazao_status"}
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@functools.lru_cache(maxsize=8192)
+def _segundos_do_dia(data_str):
+    """Segundos desde 1970-01-01 até o início do dia "YYYY-MM-DD" (com cache, pois os dias se repetem muito)."""
+    return (date(int(data_str[0:4]), int(data_str[5:7]), int(data_str[8:10])).toordinal() - _EPOCH_ORDINAL) * 86400
+
+
+def texto_para_segundos(texto):
+    """
+    Converte "YYYY-MM-DD HH:MM:SS[.f]" em segundos desde 1970-01-01 (horário local, sem fuso).
+    A fração de segundo é ignorada.
+
+    @raise ValueError: Se o texto não estiver no formato esperado.
+    """
+    if len(texto) < 19 or texto[4] != "-" or texto[10] != " " or texto[13] != ":":
+        raise ValueError(f"Data/hora inválida: {texto!r}")
+    return _segundos_do_dia(texto[:10]) + int(texto[11:13]) * 3600 + int(texto[14:16]) * 60 + int(texto[17:19])
+
+
+def segundos_para_texto(segundos):
+    """Converte segundos desde 1970-01-01 em "YYYY-MM-DD HH:MM:SS"."""
+    dias, resto = divmod(segundos, 86400)
+    horas, resto = divmod(resto, 3600)
+    minutos, segs = divmod(resto, 60)
+    return f"{date.fromordinal(dias + _EPOCH_ORDINAL).isoformat()} {horas:02d}:{minutos:02d}:{segs:02d}"
+
+
+class Leitura:
+    """
+    Uma leitura telemétrica tipada.
+
+    Atributos:
+        medicao (int): Data/hora da medição em segundos desde 1970-01-01 (horário local).
+        chuva, cota, vazao (float | None): Valores adotados.
+        chuva_status, cota_status, vazao_status (int | None): Status dos valores adotados.
+        atualizacao_ms (int | None): Data/hora de atualização em milissegundos desde 1970-01-01.
+    """
+
+    __slots__ = ("medicao", "chuva", "cota", "vazao", "chuva_status", "cota_status", "vazao_status",
+                 "atualizacao_ms", "_digitos_atualizacao", "_campos", "_brutos")
+
+    def __init__(self, medicao, chuva=None, cota=None, vazao=None, chuva_status=None, cota_status=None,
+                 vazao_status=None, atualizacao_ms=None):
+        self.medicao = medicao
+        self.chuva = chuva
+        self.cota = cota
+        self.vazao = vazao
+        self.chuva_status = chuva_status
+        self.cota_status = cota_status
+        self.vazao_status = vazao_status
+        self.atualizacao_ms = atualizacao_ms
+        self._digitos_atualizacao = 3
+        # Por padrão, uma leitura criada diretamente possui todos os campos conhecidos
+        self._campos = (1 << len(CAMPOS)) - 1
+        self._brutos = None
+
+    @classmethod
+    def de_dict(cls, registro):
+        """
+        Converte um registro no formato JSON (API ou arquivo diário) em Leitura.
+
+        @param registro: Dicionário com ao menos "Data_Hora_Medicao".
+        @raise ValueError: Se "Data_Hora_Medicao" estiver ausente ou em formato inválido.
+        """
+        texto_medicao = registro.get("Data_Hora_Medicao")
+        if not isinstance(texto_medicao, str):
+            raise ValueError("Registro sem Data_Hora_Medicao")
+        leitura = cls.__new__(cls)
+        brutos = None
+        campos = 0
+
+        leitura.medicao = texto_para_segundos(texto_medicao.strip())
+        if f"{segundos_para_texto(leitura.medicao)}.0" != texto_medicao:
+            brutos = {"Data_Hora_Medicao": texto_medicao}
+
+        for campo, atributo in _NUMERICOS.items():
+            valor = None
+            if campo in registro:
+                campos |= _BIT[campo]
+                texto = registro[campo]
+                if texto is not None:
+                    try:
+                        valor = float(texto)
+                        if f"{valor:.2f}" != texto:
+                            raise ValueError
+                    except (TypeError, ValueError):
+                        brutos = brutos or {}
+                        brutos[campo] = texto
+            setattr(leitura, atributo, valor)
+
+        for campo, atributo in _STATUS.items():
+            valor = None
+            if campo in registro:
+                campos |= _BIT[campo]
+                texto = registro[campo]
+                if texto is not None:
+                    try:
+                        valor = int(texto)
+                        if str(valor) != texto:
+                            raise ValueError
+                    except (TypeError, ValueError):
+                        brutos = brutos or {}
+                        brutos[campo] = texto
+            setattr(leitura, atributo, valor)
+
+        leitura.atualizacao_ms = None
+        leitura._digitos_atualizacao = 3
+        if "Data_Atualizacao" in registro:
+            campos |= _BIT["Data_Atualizacao"]
+            texto = registro["Data_Atualizacao"]
+            if texto is not None:
+                try:
+                    fracao = texto[20:] if len(texto) > 19 and texto[19] == "." else ""
+                    if not (1 <= len(fracao) <= 3 and fracao.isdigit()):
+                        raise ValueError
+                    leitura.atualizacao_ms = texto_para_segundos(texto) * 1000 + int(fracao.ljust(3, "0"))
+                    leitura._digitos_atualizacao = len(fracao)
+                    if leitura._texto_atualizacao() != texto:
+                        raise ValueError
+                except (TypeError, ValueError):
+                    leitura.atualizacao_ms = None
+                    brutos = brutos or {}
+                    brutos["Data_Atualizacao"] = texto
+
+        campos |= _BIT["Data_Hora_Medicao"]
+        # Campos desconhecidos são preservados como vieram
+        for campo, valor in registro.items():
+            if campo not in _BIT:
+                brutos = brutos or {}
+                brutos[campo] = valor
+
+        leitura._campos = campos
+        leitura._brutos = brutos
+        return leitura
+
+    def _texto_atualizacao(self):
+        segundos, ms = divmod(self.atualizacao_ms, 1000)
+        return f"{segundos_para_texto(segundos)}.{ms:03d}"[:20 + self._digitos_atualizacao]
+
+    @property
+    def data(self):
+        """Data da medição no formato "YYYY-MM-DD"."""
+        return segundos_para_texto(self.medicao)[:10]
+
+    @property
+    def medicao_texto(self):
+        """Data/hora da medição no formato dos arquivos ("YYYY-MM-DD HH:MM:SS.0")."""
+        if self._brutos and "Data_Hora_Medicao" in self._brutos:
+            return self._brutos["Data_Hora_Medicao"]
+        return f"{segundos_para_texto(self.medicao)}.0"
+
+    def tem_campo(self, campo):
+        """Indica se o campo estava presente no registro original."""
+        return bool(self._campos & _BIT.get(campo, 0)) or bool(self._brutos and campo in self._brutos)
+
+    def para_dict(self):
+        """Converte a leitura de volta para o formato JSON original (mesmos campos, mesmos textos)."""
+        brutos = self._brutos or {}
+        registro = {}
+        for campo in CAMPOS:
+            if not self._campos & _BIT[campo]:
+                continue
+            if campo in brutos:
+                registro[campo] = brutos[campo]
+            elif campo == "Data_Hora_Medicao":
+                registro[campo] = f"{segundos_para_texto(self.medicao)}.0"
+            elif campo == "Data_Atualizacao":
+                registro[campo] = None if self.atualizacao_ms is None else self._texto_atualizacao()
+            elif campo in _NUMERICOS:
+                valor = getattr(self, _NUMERICOS[campo])
+                registro[campo] = None if valor is None else f"{valor:.2f}"
+            else:
+                valor = getattr(self, _STATUS[campo])
+                registro[campo] = None if valor is None else str(valor)
+        for campo, valor in brutos.items():
+            if campo not in _BIT:
+                registro[campo] = valor
+        return registro
+
+    def __getstate__(self):
+        return tuple(getattr(self, atributo) for atributo in self.__slots__)
+
+    def __setstate__(self, estado):
+        for atributo, valor in zip(self.__slots__, estado):
+            setattr(self, atributo, valor)
+
+    def __eq__(self, outra):
+        if not isinstance(outra, Leitura):
+            return NotImplemented
+        return self.__getstate__() == outra.__getstate__()
+
+    def __repr__(self):
+        return (f"Leitura({self.medicao_texto!r}, chuva={self.chuva}, cota={self.cota}, vazao={self.vazao})")
+
+
+class SerieLeituras:
+    """
+    Série de leituras de uma estação, sem timestamps duplicados e ordenável pela data de medição.
+    Substitui as listas de dicionários no caminho de ingestão (mescla, deduplicação e somatórios).
+    """
+
+    __slots__ = ("_por_medicao", "_ordenada", "estava_ordenada", "_opacos")
+
+    def __init__(self, leituras=()):
+        self._por_medicao = {}
+        self._ordenada = None
+        self._opacos = []
+        self.estava_ordenada = True
+        anterior = None
+        for leitura in leituras:
+            if anterior is not None and leitura.medicao < anterior:
+                self.estava_ordenada = False
+            anterior = leitura.medicao
+            self._adicionar_inicial(leitura)
+
+    @classmethod
+    def de_json(cls, dados, descartar_invalidos=False):
+        """
+        Cria a série a partir da lista "dados" de um arquivo diário. O atributo estava_ordenada indica se
+        a lista original estava em ordem.
+
+        @param descartar_invalidos: Registros sem data de medição válida e registros com Data_Hora_Medicao
+                                    repetida são mantidos como registros opacos (devolvidos por para_json);
+                                    se True, os primeiros são descartados e as duplicatas reunidas na primeira
+                                    leitura (correção da varredura).
+        """
+        leituras = []
+        opacos = []
+        medicoes = set()
+        for registro in dados or []:
+            try:
+                leitura = Leitura.de_dict(registro)
+            except (ValueError, AttributeError):
+                opacos.append(registro)
+                continue
+            if leitura.medicao in medicoes and not descartar_invalidos:
+                # Duplicata no arquivo: mantida como veio; a deduplicação fica para archive_scrubber --corrigir
+                opacos.append(registro)
+                continue
+            medicoes.add(leitura.medicao)
+            leituras.append(leitura)
+        serie = cls(leituras)
+        if opacos and descartar_invalidos:
+            logger.warning(f"{len(opacos)} registros sem Data_Hora_Medicao válida descartados.")
+        elif opacos:
+            serie._opacos = opacos
+        return serie
+
+    def _adicionar_inicial(self, leitura):
+        existente = self._por_medicao.get(leitura.medicao)
+        if existente is None:
+            self._por_medicao[leitura.medicao] = leitura
+        elif existente.chuva is None and leitura.chuva is not None:
+            # Duplicata dentro da mesma lista: mantém a primeira, completando a chuva ausente
+            existente.chuva = leitura.chuva
+            existente._campos |= _BIT["Chuva_Adotada"]
+
+    def mesclar(self, leituras, atualizar_chuva=False):
+        """
+        Mescla novas leituras na série.
+
+        @param leituras: Leituras a mesclar.
+        @param atualizar_chuva: Se True (regra do Cemaden), uma chuva não nula em uma leitura já existente
+                                substitui o valor anterior; caso contrário, leituras existentes são mantidas.
+        @return: Lista das leituras inéditas ou alteradas pela mescla.
+        """
+        alteradas = []
+        for leitura in leituras:
+            existente = self._por_medicao.get(leitura.medicao)
+            if existente is None:
+                self._por_medicao[leitura.medicao] = leitura
+                self._ordenada = None
+                alteradas.append(leitura)
+            elif atualizar_chuva and leitura.chuva is not None and existente.chuva != leitura.chuva:
+                existente.chuva = leitura.chuva
+                existente._campos |= _BIT["Chuva_Adotada"]
+                if existente._brutos:
+                    existente._brutos.pop("Chuva_Adotada", None)
+                alteradas.append(existente)
+        return alteradas
+
+    def ordenadas(self):
+        """Retorna as leituras em ordem cronológica (mais antiga primeiro)."""
+        if self._ordenada is None:
+            self._ordenada = sorted(self._por_medicao.values(), key=lambda leitura: leitura.medicao)
+        return self._ordenada
+
+    def chuva_acumulada(self):
+        """Soma das chuvas não nulas da série."""
+        return sum(leitura.chuva for leitura in self._por_medicao.values() if leitura.chuva is not None)
+
+    @property
+    def opacos(self):
+        """
+        Registros sem data de medição válida ou com Data_Hora_Medicao repetida, mantidos como vieram (não fazem
+        parte das leituras).
+        """
+        return list(self._opacos)
+
+    def para_json(self):
+        """Converte a série para a lista "dados" no formato dos arquivos diários (registros opacos ao final)."""
+        return [leitura.para_dict() for leitura in self.ordenadas()] + list(self._opacos)
+
+    def __len__(self):
+        return len(self._por_medicao)
+
+    def __iter__(self):
+        return iter(self.ordenadas())
+
+    def __contains__(self, medicao):
+        return medicao in self._por_medicao
@@ -0,0 +1,193 @@
+"""
+@file server/apis/ana/utils/manifesto_mensal.py
+@description Manifesto (índice) de cada mês de dados: o que existe por estação e dia, sem abrir os arquivos.
+
+Cada mês tem um public/data/YYYY/MM/manifesto.json mantido pelos gravadores (DataStorage.gravar_lote,
+usado também por save_by_date do Cemaden). Para cada (estação, dia), o manifesto registra:
+
+  n         número de leituras do dia
+  primeira  Data_Hora_Medicao da primeira leitura
+  ultima    Data_Hora_Medicao da última leitura
+  bytes     tamanho do documento JSON do dia
+  sha256    checksum do conteúdo do documento
+
+O manifesto descreve o dia independentemente da camada (arquivo solto ou arquivo mensal, ver
+arquivo_mensal.py): a compactação guarda o mesmo conteúdo, então tamanho e checksum continuam valendo.
+Leitores, a busca por lacunas e os geradores de cache planejam a leitura a partir deste único arquivo
+em vez de listar diretórios e abrir milhares de arquivos.
+
+Atualização: sob uma trava entre processos (.manifesto.lock no diretório do mês), o manifesto é lido,
+alterado e regravado num temporário substituído com os.replace, de modo que leitores nunca veem um
+manifesto pela metade. Quando o manifesto de um mês ainda não existe, ele é reconstruído a partir dos
+dados do mês antes da primeira alteração, para que nunca descreva o mês só parcialmente.
+"""
+
+import os
+import json
+import hashlib
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+
+from server.apis.ana.utils.arquivo_mensal import listar_dias_mes, ler_conteudo_dia, meses
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ARQUIVO_MANIFESTO = "manifesto.json"
+ARQUIVO_TRAVA = ".manifesto.lock"
+VERSAO_FORMATO = 1
+
+
+def resumo_dia(conteudo, documento=None):
+    """
+    Entrada do manifesto para o documento de um dia.
+
+    @param conteudo: Documento serializado (str ou bytes), exatamente como gravado.
+    @param documento: Documento já decodificado (evita decodificar o conteúdo de novo).
+    @return: Dicionário {"n", "primeira", "ultima", "bytes", "sha256"}.
+    """
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode("utf-8")
+    if documento is None:
+        documento = json.loads(conteudo)
+    horarios = [registro["Data_Hora_Medicao"] for registro in documento.get("dados", [])
+                if registro.get("Data_Hora_Medicao")]
+    return {
+        "n": len(horarios),
+        "primeira": min(horarios) if horarios else None,
+        "ultima": max(horarios) if horarios else None,
+        "bytes": len(conteudo),
+        "sha256": hashlib.sha256(conteudo).hexdigest(),
+    }
+
+
+def caminho_manifesto(root_dir, ano, mes):
+    return os.path.join(root_dir, ano, mes, ARQUIVO_MANIFESTO)
+
+
+def ler_manifesto(root_dir, ano, mes):
+    """Manifesto do mês ("YYYY", "MM"), ou None se ainda não existir."""
+    try:
+        with open(caminho_manifesto(root_dir, ano, mes), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _travado(dir_mes):
+    """Trava exclusiva entre processos para alterar o manifesto do mês."""
+    os.makedirs(dir_mes, exist_ok=True)
+    with open(os.path.join(dir_mes, ARQUIVO_TRAVA), "a+b") as trava:
+        if fcntl is not None:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_EX)
+        else:
+            trava.seek(0)
+            msvcrt.locking(trava.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(trava.fileno(), fcntl.LOCK_UN)
+            else:
+                trava.seek(0)
+                msvcrt.locking(trava.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _varrer_mes(root_dir, ano, mes):
+    """Entradas de todos os dias do mês, lendo cada documento (usado só na criação do manifesto)."""
+    estacoes = {}
+    for codigo, datas in listar_dias_mes(root_dir, ano, mes).items():
+        for data_str in sorted(datas):
+            conteudo = ler_conteudo_dia(root_dir, codigo, data_str)
+            try:
+                estacoes.setdefault(codigo, {})[data_str] = resumo_dia(conteudo)
+            except (TypeError, ValueError, AttributeError) as e:
+                print(f"Dia {data_str} da estação {codigo} fora do manifesto: {e}")
+    return estacoes
+
+
+def _gravar(root_dir, ano, mes, estacoes):
+    caminho = caminho_manifesto(root_dir, ano, mes)
+    documento = {
+        "versao_formato": VERSAO_FORMATO,
+        "mes": f"{ano}-{mes}",
+        "atualizado_em": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "estacoes": {codigo: dict(sorted(dias.items())) for codigo, dias in sorted(estacoes.items())},
+    }
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(json.dumps(documento, ensure_ascii=False, separators=(",", ":")))
+    os.replace(temporario, caminho)
+
+
+def atualizar_manifesto(root_dir, ano, mes, entradas):
+    """
+    Registra no manifesto do mês as entradas dos dias gravados.
+
+    @param entradas: Dicionário {(codigo, data_str): resumo_dia(...)}.
+    """
+    dir_mes = os.path.join(root_dir, ano, mes)
+    with _travado(dir_mes):
+        manifesto = ler_manifesto(root_dir, ano, mes)
+        estacoes = manifesto["estacoes"] if manifesto else _varrer_mes(root_dir, ano, mes)
+        for (codigo, data_str), resumo in entradas.items():
+            estacoes.setdefault(str(codigo), {})[data_str] = resumo
+        _gravar(root_dir, ano, mes, estacoes)
+
+
+def reconstruir_manifesto(root_dir, ano, mes):
+    """Regrava o manifesto do mês a partir dos dados (ex.: após uma restauração de backup)."""
+    with _travado(os.path.join(root_dir, ano, mes)):
+        estacoes = _varrer_mes(root_dir, ano, mes)
+        _gravar(root_dir, ano, mes, estacoes)
+    return estacoes
+
+
+def dias_indexados(root_dir, codigos=None):
+    """
+    Dias existentes por estação, pelos manifestos (ou pela varredura, nos meses ainda sem manifesto).
+
+    @param codigos: Conjunto de códigos de estação (None = todas).
+    @return: Dicionário {codigo: [data_str, ...]} com as datas em ordem crescente.
+    """
+    dias = {}
+    for ano, mes in meses(root_dir):
+        manifesto = ler_manifesto(root_dir, ano, mes)
+        if manifesto is not None:
+            do_mes = manifesto["estacoes"]
+        else:
+            do_mes = listar_dias_mes(root_dir, ano, mes)
+        for codigo, datas in do_mes.items():
+            if codigos is None or codigo in codigos:
+                dias.setdefault(codigo, set()).update(datas)
+    return {codigo: sorted(datas) for codigo, datas in dias.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói ou exibe os manifestos mensais dos dados.")
+    parser.add_argument("--root-dir", default=os.path.join("public", "data"))
+    parser.add_argument("--mes", metavar="YYYY-MM", help="Mês a reconstruir (padrão: todos).")
+    parser.add_argument("--estacao", help="Exibe as entradas de uma estação.")
+    args = parser.parse_args()
+    if args.estacao:
+        for ano, mes in meses(args.root_dir):
+            dias = (ler_manifesto(args.root_dir, ano, mes) or {}).get("estacoes", {}).get(args.estacao, {})
+            for data_str, resumo in sorted(dias.items()):
+                print(data_str, json.dumps(resumo))
+        return
+    alvos = [tuple(args.mes.split("-"))] if args.mes else meses(args.root_dir)
+    for ano, mes in alvos:
+        estacoes = reconstruir_manifesto(args.root_dir, ano, mes)
+        print(f"Manifesto {ano}-{mes}: {len(estacoes)} estações, {sum(len(d) for d in estacoes.values())} dias.")
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.ana.utils.manifesto_mensal --mes 2025-02
@@ -0,0 +1,38 @@
+"""
+@file server/apis/ana/utils/png.py
+@description Codificação mínima de imagens PNG RGBA (8 bits por canal) com zlib, sem dependências externas.
+"""
+
+import zlib
+import struct
+
+import numpy as np
+
+_ASSINATURA_PNG = b"\x89PNG\r\n\x1a\n"
+
+
+def _bloco(tipo, dados):
+    return (struct.pack(">I", len(dados)) + tipo + dados
+            + struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF))
+
+
+def codificar_png_rgba(imagem, nivel_compressao=6):
+    """
+    Codifica uma imagem em PNG.
+
+    @param imagem: Array uint8 (altura, largura, 4) com os canais RGBA.
+    @param nivel_compressao: Nível do zlib (0 a 9).
+    @return: Bytes do arquivo PNG.
+    """
+    imagem = np.ascontiguousarray(imagem, dtype=np.uint8)
+    if imagem.ndim != 3 or imagem.shape[2] != 4:
+        raise ValueError("A imagem deve ter o formato (altura, largura, 4).")
+    altura, largura = imagem.shape[:2]
+    # Cada linha é precedida pelo tipo de filtro (0 = nenhum)
+    linhas = np.zeros((altura, largura * 4 + 1), dtype=np.uint8)
+    linhas[:, 1:] = imagem.reshape(altura, largura * 4)
+    cabecalho = struct.pack(">IIBBBBB", largura, altura, 8, 6, 0, 0, 0)
+    return (_ASSINATURA_PNG
+            + _bloco(b"IHDR", cabecalho)
+            + _bloco(b"IDAT", zlib.compress(linhas.tobytes(), nivel_compressao))
+            + _bloco(b"IEND", b""))
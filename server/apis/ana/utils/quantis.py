@@ -0,0 +1,148 @@
+"""
+@file server/apis/ana/utils/quantis.py
+@description Sketch de quantis em fluxo (t-digest com fusão), com memória limitada e mesclável.
+
+O t-digest resume uma distribuição em centróides (média, peso). Os valores novos ficam em um buffer e,
+quando ele enche, são fundidos aos centróides em uma única passada ordenada. A função de escala k1
+(arco-seno) limita o peso de cada centróide de acordo com o quantil: centróides pequenos nas caudas
+e maiores no meio, de modo que percentis extremos (p5, p95) continuam precisos. O número de
+centróides fica em torno de 'compressao' (nunca mais que ~2x), independentemente do número de valores.
+
+Dois sketches são mesclados somando os centróides de um ao buffer do outro (ex.: juntar os sketches
+de vários workers ou de várias estações de uma bacia). O sketch é serializável em JSON (para_dict).
+"""
+
+import math
+import bisect
+
+COMPRESSAO_PADRAO = 100
+
+
+class TDigest:
+    """Sketch de quantis de uma variável."""
+
+    __slots__ = ("compressao", "centroides", "buffer", "total", "minimo", "maximo")
+
+    def __init__(self, compressao=COMPRESSAO_PADRAO):
+        """@param compressao: Controla a precisão e o tamanho (número aproximado de centróides)."""
+        self.compressao = compressao
+        self.centroides = []  # Lista de [media, peso], ordenada pela média
+        self.buffer = []      # Valores (ou centróides) ainda não fundidos: [media, peso]
+        self.total = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+
+    def __len__(self):
+        return int(self.total)
+
+    def adicionar(self, valor, peso=1.0):
+        """Adiciona um valor (NaN e None são ignorados)."""
+        if valor is None or valor != valor:
+            return
+        self.buffer.append([float(valor), float(peso)])
+        self.total += peso
+        self.minimo = min(self.minimo, valor)
+        self.maximo = max(self.maximo, valor)
+        if len(self.buffer) >= self.compressao * 5:
+            self._comprimir()
+
+    def adicionar_varios(self, valores):
+        for valor in valores:
+            self.adicionar(valor)
+
+    def mesclar(self, outro):
+        """Incorpora outro sketch a este (o outro não é alterado)."""
+        if not outro.total:
+            return
+        self.buffer.extend([media, peso] for media, peso in outro.centroides + outro.buffer)
+        self.total += outro.total
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        self._comprimir()
+
+    def _k(self, q):
+        return self.compressao / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _q(self, k):
+        return (math.sin(min(max(k * 2 * math.pi / self.compressao, -math.pi / 2), math.pi / 2)) + 1) / 2
+
+    def _comprimir(self):
+        """Funde o buffer aos centróides respeitando o limite de peso da função de escala."""
+        if not self.buffer:
+            return
+        itens = sorted(self.centroides + self.buffer, key=lambda item: item[0])
+        self.buffer = []
+        total = sum(peso for _, peso in itens)
+        fundidos = []
+        atual = list(itens[0])
+        acumulado = 0.0
+        limite = self._q(self._k(0.0) + 1)
+        for media, peso in itens[1:]:
+            if (acumulado + atual[1] + peso) / total <= limite:
+                # Média ponderada incremental
+                atual[1] += peso
+                atual[0] += (media - atual[0]) * peso / atual[1]
+            else:
+                fundidos.append(atual)
+                acumulado += atual[1]
+                limite = self._q(self._k(acumulado / total) + 1)
+                atual = [media, peso]
+        fundidos.append(atual)
+        self.centroides = fundidos
+
+    def quantil(self, q):
+        """
+        Valor estimado no quantil q (0 a 1), por interpolação entre os centros dos centróides.
+
+        @return: float, ou None se o sketch estiver vazio.
+        """
+        if not self.total:
+            return None
+        self._comprimir()
+        if q <= 0:
+            return self.minimo
+        if q >= 1:
+            return self.maximo
+        alvo = q * self.total
+        # Posição (em peso acumulado) do centro de cada centróide
+        centros, acumulado = [], 0.0
+        for _, peso in self.centroides:
+            centros.append(acumulado + peso / 2)
+            acumulado += peso
+        if alvo <= centros[0]:
+            return self._interpolar(alvo, 0.0, self.minimo, centros[0], self.centroides[0][0])
+        if alvo >= centros[-1]:
+            return self._interpolar(alvo, centros[-1], self.centroides[-1][0], self.total, self.maximo)
+        i = bisect.bisect_right(centros, alvo) - 1
+        return self._interpolar(alvo, centros[i], self.centroides[i][0], centros[i + 1], self.centroides[i + 1][0])
+
+    @staticmethod
+    def _interpolar(x, x0, y0, x1, y1):
+        if x1 <= x0:
+            return y0
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def quantis(self, qs):
+        """Dicionário {q: valor} para vários quantis."""
+        return {q: self.quantil(q) for q in qs}
+
+    def para_dict(self, casas=4):
+        """Representação JSON (centróides arredondados; o buffer é fundido antes)."""
+        self._comprimir()
+        return {
+            "compressao": self.compressao,
+            "total": self.total,
+            "minimo": self.minimo if self.total else None,
+            "maximo": self.maximo if self.total else None,
+            "centroides": [[round(media, casas), peso] for media, peso in self.centroides],
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        sketch = cls(dados.get("compressao", COMPRESSAO_PADRAO))
+        sketch.centroides = [[float(media), float(peso)] for media, peso in dados.get("centroides", [])]
+        sketch.total = float(dados.get("total", 0))
+        if sketch.total:
+            sketch.minimo = float(dados["minimo"])
+            sketch.maximo = float(dados["maximo"])
+        return sketch
@@ -0,0 +1,22 @@
+"""
+@file server/apis/ana/utils/tiles_xyz.py
+@description Cálculos do esquema de tiles XYZ (Web Mercator) usados pelos geradores e pelo pré-carregamento
+de tiles, sem dependências externas.
+"""
+
+import math
+
+
+def tiles_cobrindo(limites, zoom):
+    """Intervalos (x_min, x_max, y_min, y_max) dos tiles XYZ que cobrem os limites (oeste, sul, leste, norte)."""
+    oeste, sul, leste, norte = limites
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return min(max(int((lon + 180.0) / 360.0 * n), 0), n - 1)
+
+    def tile_y(lat):
+        lat_rad = math.radians(lat)
+        return min(max(int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n), 0), n - 1)
+
+    return tile_x(oeste), tile_x(leste), tile_y(norte), tile_y(sul)
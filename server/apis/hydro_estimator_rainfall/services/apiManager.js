@@ -50,8 +50,8 @@ export async function fetchTimestamps(productID, useCache = true) {
             return filterTimestamps(apiCache.data);
         }
 
-        // Realiza a requisição usando a URL centralizada no DEFAULT_CONFIG
-        const response = await fetch(`${DEFAULT_CONFIG.REAL_EARTH_API_URL}?products=${productID}`);
+        // Realiza a requisição pelo servidor, que responde com os horários do cache do prefetcher
+        const response = await fetch(`${DEFAULT_CONFIG.REAL_EARTH_TIMES_URL}?products=${productID}`);
         if (!response.ok) throw new Error(`Erro na requisição: ${response.statusText}`);
         const data = await response.json();
 
@@ -82,7 +82,7 @@ export async function fetchTimestamps(productID, useCache = true) {
 export async function refreshTimestamps(productID) {
     try {
         // Realiza a requisição à API para buscar os timestamps
-        const response = await fetch(`${DEFAULT_CONFIG.REAL_EARTH_API_URL}?products=${productID}`);
+        const response = await fetch(`${DEFAULT_CONFIG.REAL_EARTH_TIMES_URL}?products=${productID}`);
         if (!response.ok) throw new Error(`Erro na requisição: ${response.statusText}`);
         const data = await response.json();
 
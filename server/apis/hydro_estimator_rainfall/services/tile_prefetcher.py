@@ -0,0 +1,283 @@
+"""
+@file server/apis/hydro_estimator_rainfall/services/tile_prefetcher.py
+@description Pré-carregamento dos tiles do Hydro-Estimator (RealEarth) em um cache em disco limitado por tamanho.
+
+A cada execução o job:
+  1) consulta os horários disponíveis do produto (api/times) e grava a resposta em <cache>/<produto>/times.json,
+     que o servidor Node entrega em /proxy/times sem consultar a RealEarth a cada atualização dos clientes;
+  2) baixa, para os horários das últimas JANELA_HORAS (o mesmo filtro de apiManager.js), os tiles que cobrem
+     os limites monitorados nos níveis de zoom ZOOMS, pulando os que já estão no cache;
+  3) aplica o limite de tamanho do cache, removendo os tiles usados há mais tempo (LRU).
+
+Os tiles ficam em <cache>/<produto>/<horario>/<z>/<x>/<y>.png. O proxy /proxy/image (server/server.js) serve
+direto desse diretório quando o tile existe e marca o acesso (data de acesso do arquivo), que é o critério
+de remoção do LRU; tiles ausentes continuam sendo buscados na RealEarth.
+
+Para executar (a cada 5 minutos):
+    python -m server.apis.hydro_estimator_rainfall.services.tile_prefetcher
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from server.apis.ana.utils.data_storage import gravar_arquivo_atomico
+from server.apis.ana.utils.tiles_xyz import tiles_cobrindo
+
+# O servidor Node lê a chave de server/.env; o prefetcher aceita os dois locais
+load_dotenv()
+load_dotenv(os.path.join("server", ".env"))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REAL_EARTH_BASE_URL = "https://realearth.ssec.wisc.edu/api"
+PRODUTO_PADRAO = "NESDIS-GHE-HourlyRainfall"
+CACHE_DIR = os.path.join("cache", "realearth")
+
+# Limites de Mato Grosso usados na animação (HourlyRainfall.js): [[sul, oeste], [norte, leste]]
+LIMITES_MT = ((-18.1835, -63.0000), (-7.9869, -50.2244))
+# A animação usa maxNativeZoom 7; acima disso o Leaflet amplia os tiles do zoom 7
+ZOOMS = (4, 5, 6, 7)
+# Mesma janela de filterTimestamps (apiManager.js)
+JANELA_HORAS = 2
+TAMANHO_MAXIMO_BYTES = 512 * 1024 * 1024
+FORMATO_HORARIO = "%Y%m%d_%H%M%S"
+
+
+def caminho_tile(cache_dir, produto, horario, z, x, y):
+    return os.path.join(cache_dir, produto, horario, str(z), str(x), f"{y}.png")
+
+
+class CacheDiscoLRU:
+    """
+    Diretório de arquivos com tamanho máximo. A recência de cada arquivo é a sua data de acesso (atime),
+    atualizada explicitamente na gravação e a cada leitura pelo proxy, independentemente das opções de
+    montagem do sistema de arquivos.
+    """
+
+    def __init__(self, diretorio=CACHE_DIR, tamanho_maximo=TAMANHO_MAXIMO_BYTES):
+        self.diretorio = diretorio
+        self.tamanho_maximo = int(tamanho_maximo)
+        os.makedirs(diretorio, exist_ok=True)
+
+    def gravar(self, caminho, dados):
+        """Grava o arquivo de forma atômica e o marca como recém-usado."""
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, caminho)
+        self.tocar(caminho)
+
+    @staticmethod
+    def tocar(caminho):
+        agora = time.time()
+        try:
+            os.utime(caminho, (agora, os.stat(caminho).st_mtime))
+        except OSError:
+            pass
+
+    def _arquivos(self):
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                if nome.endswith(".tmp"):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                yield caminho, info.st_size, info.st_atime
+
+    def uso(self):
+        return sum(tamanho for _, tamanho, _ in self._arquivos())
+
+    def aplicar_limite(self, preservar=()):
+        """
+        Remove os arquivos usados há mais tempo até o total caber no limite.
+
+        @param preservar: Caminhos que não devem ser removidos nesta passada (ex.: o manifesto de horários).
+        @return: (arquivos removidos, bytes liberados).
+        """
+        arquivos = sorted(self._arquivos(), key=lambda item: item[2])
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        preservar = {os.path.abspath(caminho) for caminho in preservar}
+        removidos, liberados = 0, 0
+        for caminho, tamanho, _ in arquivos:
+            if total <= self.tamanho_maximo:
+                break
+            if os.path.abspath(caminho) in preservar:
+                continue
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+            removidos += 1
+            liberados += tamanho
+        if removidos:
+            self._remover_diretorios_vazios()
+        return removidos, liberados
+
+    def _remover_diretorios_vazios(self):
+        for raiz, diretorios, nomes in os.walk(self.diretorio, topdown=False):
+            if raiz != self.diretorio and not diretorios and not nomes:
+                try:
+                    os.rmdir(raiz)
+                except OSError:
+                    pass
+
+
+class PrefetcherHydroEstimator:
+    """Segue os horários mais recentes de um produto da RealEarth e mantém os tiles deles no cache."""
+
+    def __init__(self, produto=PRODUTO_PADRAO, cache=None, base_url=None, chave_acesso=None, limites=LIMITES_MT,
+                 zooms=ZOOMS, janela_horas=JANELA_HORAS, max_workers=8, timeout=30, sessao=None):
+        self.produto = produto
+        self.cache = cache or CacheDiscoLRU()
+        self.base_url = (base_url or os.getenv("REAL_EARTH_BASE_URL") or REAL_EARTH_BASE_URL).rstrip("/")
+        self.chave_acesso = chave_acesso or os.getenv("REAL_EARTH_API_KEY")
+        (sul, oeste), (norte, leste) = limites
+        self.limites = (oeste, sul, leste, norte)
+        self.zooms = tuple(zooms)
+        self.janela_horas = janela_horas
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.sessao = sessao or requests.Session()
+        self.ultimo_resumo = None
+
+    @property
+    def caminho_horarios(self):
+        return os.path.join(self.cache.diretorio, self.produto, "times.json")
+
+    def _cabecalhos(self):
+        cabecalhos = {"Referer": "https://realearth.ssec.wisc.edu/"}
+        if self.chave_acesso:
+            cabecalhos["RE-Access-Key"] = self.chave_acesso
+        return cabecalhos
+
+    def buscar_horarios(self):
+        """Consulta api/times e grava a resposta no cache. Retorna a lista completa de horários."""
+        resposta = self.sessao.get(f"{self.base_url}/times", params={"products": self.produto},
+                                   headers=self._cabecalhos(), timeout=self.timeout)
+        resposta.raise_for_status()
+        dados = resposta.json()
+        horarios = dados.get(self.produto) if isinstance(dados, dict) else None
+        if not horarios:
+            raise Exception("Nenhum horário disponível na resposta da RealEarth.")
+        documento = {self.produto: horarios, "atualizado_em": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")}
+        os.makedirs(os.path.dirname(self.caminho_horarios), exist_ok=True)
+        gravar_arquivo_atomico(self.caminho_horarios, json.dumps(documento, separators=(",", ":")))
+        return horarios
+
+    def horarios_recentes(self, horarios, agora_utc=None):
+        """Horários dentro das últimas janela_horas (mesmo critério do frontend)."""
+        agora_utc = agora_utc or datetime.utcnow()
+        inicio = agora_utc - timedelta(hours=self.janela_horas)
+        recentes = []
+        for horario in horarios:
+            try:
+                instante = datetime.strptime(horario, FORMATO_HORARIO)
+            except (TypeError, ValueError):
+                continue
+            if inicio <= instante <= agora_utc:
+                recentes.append(horario)
+        return recentes
+
+    def tiles(self, horario):
+        """(z, x, y) de todos os tiles que cobrem os limites monitorados."""
+        for z in self.zooms:
+            x_min, x_max, y_min, y_max = tiles_cobrindo(self.limites, z)
+            for x in range(x_min, x_max + 1):
+                for y in range(y_min, y_max + 1):
+                    yield z, x, y
+
+    def _baixar_tile(self, horario, z, x, y):
+        caminho = caminho_tile(self.cache.diretorio, self.produto, horario, z, x, y)
+        if os.path.exists(caminho):
+            return "existente", 0
+        try:
+            resposta = self.sessao.get(
+                f"{self.base_url}/image",
+                params={"products": self.produto, "time": horario, "x": x, "y": y, "z": z},
+                headers=self._cabecalhos(), timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"[realearth] Falha ao baixar {horario} z{z}/{x}/{y}: {e}")
+            return "falha", 0
+        if resposta.status_code != 200 or not resposta.content:
+            logger.warning(f"[realearth] HTTP {resposta.status_code} em {horario} z{z}/{x}/{y}")
+            return "falha", 0
+        self.cache.gravar(caminho, resposta.content)
+        return "baixado", len(resposta.content)
+
+    def executar(self, agora_utc=None):
+        """
+        Executa uma passada completa (horários, tiles e limite do cache).
+
+        @return: Resumo {"horarios", "baixados", "existentes", "falhas", "bytes", "removidos", "duracao_s"}.
+        """
+        inicio = time.time()
+        resumo = {"horarios": [], "baixados": 0, "existentes": 0, "falhas": 0, "bytes": 0, "removidos": 0}
+        try:
+            horarios = self.buscar_horarios()
+        except Exception as e:
+            logger.error(f"[realearth] Falha ao consultar os horários de {self.produto}: {e}")
+            horarios = []
+        recentes = self.horarios_recentes(horarios, agora_utc)
+        resumo["horarios"] = recentes
+
+        # Do mais recente para o mais antigo: o quadro mais novo é o primeiro que os clientes pedem
+        tarefas = [(horario, z, x, y) for horario in reversed(recentes) for z, x, y in self.tiles(horario)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for estado, tamanho in executor.map(lambda tarefa: self._baixar_tile(*tarefa), tarefas):
+                resumo[{"baixado": "baixados", "existente": "existentes", "falha": "falhas"}[estado]] += 1
+                resumo["bytes"] += tamanho
+
+        resumo["removidos"], _ = self.cache.aplicar_limite(preservar=[self.caminho_horarios])
+        resumo["duracao_s"] = round(time.time() - inicio, 2)
+        self.ultimo_resumo = resumo
+        logger.info(f"[realearth] {len(recentes)} horários: {resumo['baixados']} tiles baixados, "
+                    f"{resumo['existentes']} já no cache, {resumo['falhas']} falhas, "
+                    f"{resumo['removidos']} removidos pelo limite ({resumo['duracao_s']}s).")
+        return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-carrega os tiles do Hydro-Estimator em cache local.")
+    parser.add_argument("--produto", default=PRODUTO_PADRAO)
+    parser.add_argument("--cache-dir", default=os.getenv("REAL_EARTH_CACHE_DIR") or CACHE_DIR)
+    parser.add_argument("--tamanho-maximo-mb", type=int, default=TAMANHO_MAXIMO_BYTES // (1024 * 1024))
+    parser.add_argument("--intervalo-min", type=int, default=5)
+    parser.add_argument("--uma-vez", action="store_true", help="Executa uma única passada e encerra.")
+    args = parser.parse_args()
+
+    prefetcher = PrefetcherHydroEstimator(
+        produto=args.produto, cache=CacheDiscoLRU(args.cache_dir, args.tamanho_maximo_mb * 1024 * 1024))
+    if args.uma_vez:
+        prefetcher.executar()
+        return
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(prefetcher.executar, 'interval', minutes=args.intervalo_min, next_run_time=datetime.now(),
+                      max_instances=1, coalesce=True)
+    logger.info(f"Prefetcher da RealEarth iniciado (execução a cada {args.intervalo_min} minutos)...")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Prefetcher interrompido.")
+
+
+if __name__ == "__main__":
+    main()
+
+# Instrução para executar este script:
+# python -m server.apis.hydro_estimator_rainfall.services.tile_prefetcher
@@ -18,6 +18,7 @@ import geocodeRouter from '#components/geocoding/geocode.js';  // Router para o
 import stationDataRouter from '#apis/ana/routes/rotasDadosEstacoes.js'; // Router para o serviço de dados das estações
 import { pipeline } from 'stream';             // Utilitário para encadear streams (usado no proxy)
 import fetch from 'node-fetch';                // Biblioteca para fazer requisições HTTP (substituindo o fetch nativo)
+import fs from 'fs/promises';                  // Leitura do cache de tiles da RealEarth
 
 // Configura __dirname para módulos ES usando fileURLToPath e path.dirname
 const __filename = fileURLToPath(import.meta.url);
@@ -81,10 +82,65 @@ app.use('/api/geocode', geocodeRouter);
 // Adiciona o serviço de dados das estações na rota /api/stationData
 app.use('/api/stationData', stationDataRouter);
 
+// Serviço de leitura em Python (server/apis/ana/services/read_service.py)
+const READ_SERVICE_URL = process.env.READ_SERVICE_URL || 'http://127.0.0.1:5001';
+// Pirâmides de tiles dos arquivos vetoriais importados; o diretório de cada uma é o hash do conteúdo
+const CAMADAS_DIR = path.join('public', 'data', 'camadas');
+
+// Importação de arquivos vetoriais grandes: o serviço de leitura simplifica e divide o arquivo em tiles
+app.post('/api/camadas', express.raw({ type: '*/*', limit: '512mb' }), async (req, res) => {
+    try {
+        const response = await fetch(`${READ_SERVICE_URL}/camadas?nome=${encodeURIComponent(req.query.nome || '')}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/octet-stream' },
+            body: req.body,
+        });
+        res.status(response.status).json(await response.json());
+    } catch (error) {
+        console.error('Erro ao importar a camada vetorial:', error.message);
+        res.status(502).json({ error: 'Serviço de leitura indisponível.' });
+    }
+});
+
+// Tiles gerados nunca mudam (o caminho inclui o hash do conteúdo)
+app.use('/data/camadas', express.static(CAMADAS_DIR, { immutable: true, maxAge: '30d' }));
+
+// Cache em disco dos tiles e horários da RealEarth, mantido pelo prefetcher
+// (server/apis/hydro_estimator_rainfall/services/tile_prefetcher.py)
+const REAL_EARTH_CACHE_DIR = process.env.REAL_EARTH_CACHE_DIR || path.join('cache', 'realearth');
+// Horários em cache mais antigos que isso são ignorados (o prefetcher roda a cada 5 minutos)
+const REAL_EARTH_TIMES_MAX_AGE_MS = 10 * 60 * 1000;
+
+/**
+ * Retorna o caminho do tile no cache ou null se os parâmetros não forem válidos
+ * (evita que a query string seja usada para ler arquivos fora do cache).
+ */
+function caminhoTileCache({ products, time, x, y, z }) {
+    const valido = /^[\w-]+$/.test(products || '') && /^\d{8}_\d{6}$/.test(time || '')
+        && [x, y, z].every(valor => /^\d+$/.test(valor || ''));
+    return valido ? path.join(REAL_EARTH_CACHE_DIR, products, time, z, x, `${y}.png`) : null;
+}
+
 // Configura um proxy para a RealEarth API na rota /proxy/image
 app.use('/proxy/image', async (req, res) => {
     // Extrai os parâmetros da query string
     const { products, time, x, y, z } = req.query;
+
+    // Tiles já baixados pelo prefetcher são servidos do disco; um tile de um horário nunca muda
+    const cachePath = caminhoTileCache(req.query);
+    if (cachePath) {
+        try {
+            const stats = await fs.stat(cachePath);
+            // Marca o acesso (critério de remoção do LRU do cache)
+            fs.utimes(cachePath, new Date(), stats.mtime).catch(() => {});
+            res.setHeader('X-Cache', 'HIT');
+            res.setHeader('Cache-Control', 'public, max-age=86400, immutable');
+            return res.sendFile(path.resolve(cachePath));
+        } catch (error) {
+            // Tile fora do cache: segue para a RealEarth
+        }
+    }
+
     // Constrói a URL da RealEarth API com os parâmetros recebidos
     const url = `https://realearth.ssec.wisc.edu/api/image?products=${products}&time=${time}&x=${x}&y=${y}&z=${z}`;
     // Obtém a chave de acesso a partir das variáveis de ambiente
@@ -106,6 +162,7 @@ app.use('/proxy/image', async (req, res) => {
 
         // Define o header Content-Type com base na resposta ou usa 'image/png'
         res.setHeader('Content-Type', response.headers.get('content-type') || 'image/png');
+        res.setHeader('X-Cache', 'MISS');
         // Encadeia o stream de resposta da API para a resposta HTTP usando pipeline
         pipeline(response.body, res, (err) => {
             if (err) {
@@ -120,6 +177,38 @@ app.use('/proxy/image', async (req, res) => {
     }
 });
 
+// Horários disponíveis de um produto da RealEarth (mesmo formato de api/times), servidos do cache do prefetcher
+app.get('/proxy/times', async (req, res) => {
+    const { products } = req.query;
+    if (!/^[\w-]+$/.test(products || '')) {
+        return res.status(400).json({ error: 'Produto inválido' });
+    }
+
+    try {
+        const cachePath = path.join(REAL_EARTH_CACHE_DIR, products, 'times.json');
+        const stats = await fs.stat(cachePath);
+        if (Date.now() - stats.mtimeMs < REAL_EARTH_TIMES_MAX_AGE_MS) {
+            const data = JSON.parse(await fs.readFile(cachePath, 'utf-8'));
+            res.setHeader('X-Cache', 'HIT');
+            return res.json({ [products]: data[products] });
+        }
+    } catch (error) {
+        // Sem cache recente: consulta a RealEarth
+    }
+
+    try {
+        const response = await fetch(`https://realearth.ssec.wisc.edu/api/times?products=${products}`);
+        if (!response.ok) {
+            return res.status(response.status).json({ error: 'Erro ao acessar a API' });
+        }
+        res.setHeader('X-Cache', 'MISS');
+        res.json(await response.json());
+    } catch (error) {
+        console.error('Erro ao consultar os horários da RealEarth:', error.message);
+        res.status(500).json({ error: 'Erro interno no servidor' });
+    }
+});
+
 // Inicia o servidor, escutando na porta definida em process.env.PORT ou 3000 por padrão
 app.listen(process.env.PORT || 3000, '0.0.0.0', () => {
     console.log(`Servidor rodando em http://<SEU_IP_LOCAL>:${process.env.PORT || 3000} 🚀`);
@@ -0,0 +1,302 @@
+/**
+ * @file src/components/ana/camadaAgrupamentos.js
+ * @description Camadas de agrupamentos (clusters) de estações pré-calculados no servidor por zoom.
+ * Os agrupamentos de cada camada de classificação são gerados após cada ciclo de ingestão
+ * (server/apis/ana/services/marker_clusters.py); o navegador só baixa o arquivo do zoom atual e desenha
+ * os agrupamentos visíveis, sem reagrupar as estações a cada zoom ou movimento do mapa.
+ *
+ * As camadas de classificação (ex.: "Chuva - Forte", camadasClassificacao.js) usam os agrupamentos por classe
+ * do mesmo manifesto (criarCamadaClasseAgrupada): os agrupamentos vêm do servidor e as estações isoladas são
+ * os próprios marcadores de classificação, com popup e rótulo.
+ */
+
+import { DEFAULT_CONFIG, APP_CONFIG, MARKER_STYLE_CONFIG } from '#utils/config.js';
+
+const NOMES_CAMADAS = { chuva: 'Chuva', nivel: 'Nível', vazao: 'Vazão', status: 'Status', rio: 'Rio' };
+
+const camadas = {};
+const camadasClasses = [];
+const arquivos = new Map(); // URL do zoom -> Promise com os itens
+let manifestoAtual = null;
+let intervaloAtualizacao = null;
+
+/**
+ * Nome da camada de agrupamentos no controle de camadas (ex.: "Agrupamentos - Chuva").
+ * @param {string} camada - Chave da camada no manifesto (chuva, nivel, vazao, status, rio).
+ * @returns {string}
+ */
+export function nomeCamadaAgrupamentos(camada) {
+  return `Agrupamentos - ${NOMES_CAMADAS[camada] || camada}`;
+}
+
+function estiloClasse(camada, classe) {
+  const estilos = MARKER_STYLE_CONFIG[camada];
+  const estilo = (estilos && (estilos[classe] || estilos.default)) || MARKER_STYLE_CONFIG.general;
+  return { cor: estilo.color, texto: estilo.textColor };
+}
+
+async function obterManifesto() {
+  const response = await fetch(DEFAULT_CONFIG.AGRUPAMENTOS_MANIFEST, { cache: 'no-cache' });
+  if (!response.ok) throw new Error(`Erro HTTP! status: ${response.status}`);
+  manifestoAtual = await response.json();
+  return manifestoAtual;
+}
+
+/**
+ * Carrega (uma vez) o manifesto dos agrupamentos.
+ * @returns {Promise<boolean>} true se os agrupamentos pré-calculados estão disponíveis.
+ */
+export async function carregarManifestoAgrupamentos() {
+  if (manifestoAtual) return true;
+  try {
+    await obterManifesto();
+    return true;
+  } catch (error) {
+    console.warn('Agrupamentos pré-calculados indisponíveis:', error.message);
+    return false;
+  }
+}
+
+function carregarZoom(url, z) {
+  const caminho = L.Util.template(url, { z });
+  if (!arquivos.has(caminho)) {
+    arquivos.set(caminho, fetch(caminho)
+      .then(response => (response.ok ? response.json() : { itens: [] }))
+      .catch(() => ({ itens: [] })));
+  }
+  return arquivos.get(caminho);
+}
+
+function zoomDoArquivo(map) {
+  const [zoomMinimo, zoomMaximo] = manifestoAtual.zooms;
+  return Math.max(zoomMinimo, Math.min(zoomMaximo, Math.floor(map.getZoom())));
+}
+
+/**
+ * Marcador de um agrupamento (ou de uma estação isolada) do arquivo de um zoom.
+ */
+function criarMarcadorAgrupamento(item, camada, classes, map) {
+  const { cor, texto } = estiloClasse(camada, classes[item.c]);
+  const tamanho = item.n > 1 ? Math.min(25 + 4 * Math.log2(item.n), 44) : 14;
+  const icon = L.divIcon({
+    html: `
+    <div style="
+        background-color: ${cor};
+        border-radius: 50%;
+        width: ${tamanho}px;
+        height: ${tamanho}px;
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        color: ${texto};
+        border: 2px solid #fff;
+      ">
+      <span>${item.n > 1 ? item.n : ''}</span>
+    </div>`,
+    className: '',
+    iconSize: L.point(tamanho + 4, tamanho + 4)
+  });
+  const marker = L.marker([item.y, item.x], { icon });
+
+  if (item.n > 1) {
+    const contagens = item.k
+      .map((n, i) => (n ? `${classes[i]}: ${n}` : null))
+      .filter(Boolean)
+      .join('<br>');
+    marker.bindTooltip(contagens);
+    // Ao clicar, aproxima até os limites das estações do agrupamento
+    const [oeste, sul, leste, norte] = item.b;
+    marker.on('click', () => map.fitBounds([[sul, oeste], [norte, leste]], { padding: [30, 30] }));
+  } else {
+    marker.bindTooltip(`${item.id} - ${classes[item.c]}`);
+  }
+  return marker;
+}
+
+const CamadaAgrupamentos = L.LayerGroup.extend({
+  initialize(camada, info) {
+    L.LayerGroup.prototype.initialize.call(this);
+    this._camada = camada;
+    this._info = info;
+    this._requisicao = 0;
+  },
+
+  onAdd(map) {
+    L.LayerGroup.prototype.onAdd.call(this, map);
+    map.on('moveend', this._atualizar, this);
+    this._atualizar();
+  },
+
+  onRemove(map) {
+    map.off('moveend', this._atualizar, this);
+    L.LayerGroup.prototype.onRemove.call(this, map);
+  },
+
+  /** Troca a versão dos agrupamentos (novo ciclo) e redesenha. */
+  definirInfo(info) {
+    if (info.versao === this._info.versao) return;
+    this._info = info;
+    this._atualizar();
+  },
+
+  async _atualizar() {
+    if (!this._map) return;
+    const requisicao = ++this._requisicao;
+    const dados = await carregarZoom(this._info.url, zoomDoArquivo(this._map));
+    // Descarta respostas de um zoom/movimento já superado
+    if (!this._map || requisicao !== this._requisicao) return;
+
+    const limites = this._map.getBounds().pad(0.2);
+    this.clearLayers();
+    dados.itens.forEach(item => {
+      if (limites.contains([item.y, item.x])) {
+        this.addLayer(criarMarcadorAgrupamento(item, this._camada, this._info.classes, this._map));
+      }
+    });
+  }
+});
+
+/**
+ * Versão agrupada de uma camada de classificação (uma classe de uma camada do manifesto). Guarda os marcadores
+ * de classificação por código de estação e, a cada zoom ou movimento, desenha os agrupamentos da classe
+ * calculados no servidor; as estações isoladas são desenhadas com o próprio marcador de classificação.
+ * Tem a mesma interface usada pela HybridLayer (addLayer, removeLayer, clearLayers).
+ */
+const CamadaClasseAgrupada = L.Layer.extend({
+  initialize(camada, classe) {
+    this._camada = camada;
+    this._classe = classe;
+    this._marcadores = new Map();
+    this._grupo = L.layerGroup();
+    this._visiveis = new Set();
+    this._requisicao = 0;
+    this._agendada = false;
+  },
+
+  onAdd(map) {
+    this._grupo.addTo(map);
+    map.on('moveend', this._atualizar, this);
+    this._atualizar();
+  },
+
+  onRemove(map) {
+    map.off('moveend', this._atualizar, this);
+    map.removeLayer(this._grupo);
+    this._grupo.clearLayers();
+    this._visiveis.clear();
+  },
+
+  addLayer(marker) {
+    this._marcadores.set(String(marker.stationData.codigoestacao), marker);
+    this._agendar();
+    return this;
+  },
+
+  removeLayer(marker) {
+    this._marcadores.delete(String(marker.stationData.codigoestacao));
+    this._agendar();
+    return this;
+  },
+
+  clearLayers() {
+    this._marcadores.clear();
+    this._agendar();
+    return this;
+  },
+
+  // Várias inclusões seguidas (atualizarCamadasPorTipo) resultam em um único redesenho
+  _agendar() {
+    if (!this._map || this._agendada) return;
+    this._agendada = true;
+    setTimeout(() => {
+      this._agendada = false;
+      this._atualizar();
+    }, 0);
+  },
+
+  async _atualizar() {
+    const info = manifestoAtual && manifestoAtual.camadas[this._camada];
+    if (!this._map || !info) return;
+    const requisicao = ++this._requisicao;
+    const dados = await carregarZoom(info.url_classes, zoomDoArquivo(this._map));
+    if (!this._map || requisicao !== this._requisicao) return;
+
+    const indice = info.classes.indexOf(this._classe);
+    const limites = this._map.getBounds().pad(0.2);
+    const visiveis = new Set();
+    dados.itens.forEach(item => {
+      if (item.c !== indice || !limites.contains([item.y, item.x])) return;
+      const layer = item.n > 1
+        ? criarMarcadorAgrupamento(item, this._camada, info.classes, this._map)
+        : this._marcadores.get(item.id);
+      if (layer) visiveis.add(layer);
+    });
+
+    // Marcadores de estação que continuam visíveis não são removidos (mantém popups abertos)
+    this._visiveis.forEach(layer => {
+      if (!visiveis.has(layer)) this._grupo.removeLayer(layer);
+    });
+    visiveis.forEach(layer => {
+      if (!this._visiveis.has(layer)) this._grupo.addLayer(layer);
+    });
+    this._visiveis = visiveis;
+  }
+});
+
+/**
+ * Cria a versão agrupada (pelo servidor) de uma camada de classificação.
+ * Requer o manifesto carregado (carregarManifestoAgrupamentos).
+ *
+ * @param {string} camada - Chave da camada no manifesto (chuva, nivel, vazao, rio).
+ * @param {string} classe - Classe da camada (ex.: "Forte").
+ * @returns {L.Layer|null} null se a camada não tiver agrupamentos por classe no manifesto.
+ */
+export function criarCamadaClasseAgrupada(camada, classe) {
+  const info = manifestoAtual && manifestoAtual.camadas[camada];
+  if (!info || !info.url_classes) return null;
+  const layer = new CamadaClasseAgrupada(camada, classe);
+  camadasClasses.push(layer);
+  return layer;
+}
+
+/**
+ * Atualiza a versão das camadas cujos agrupamentos mudaram no manifesto.
+ */
+async function atualizarCamadas() {
+  try {
+    const anterior = manifestoAtual;
+    const manifesto = await obterManifesto();
+    Object.entries(manifesto.camadas).forEach(([camada, info]) => {
+      const versaoAnterior = anterior && anterior.camadas[camada] && anterior.camadas[camada].versao;
+      if (versaoAnterior === info.versao) return;
+      // Descarta os arquivos da versão anterior e redesenha as camadas que usam a camada do manifesto
+      if (versaoAnterior) {
+        [...arquivos.keys()].filter(url => url.includes(`/${camada}/${versaoAnterior}/`)).forEach(url => arquivos.delete(url));
+      }
+      if (camadas[camada]) camadas[camada].definirInfo(info);
+      camadasClasses.filter(layer => layer._camada === camada).forEach(layer => layer._atualizar());
+    });
+  } catch (error) {
+    console.error('Erro ao atualizar os agrupamentos de estações:', error);
+  }
+}
+
+/**
+ * Cria uma camada de agrupamentos para cada camada do manifesto e passa a acompanhar novas versões.
+ *
+ * @returns {Promise<Object>} Objeto { nomeDaCamada: L.LayerGroup }; vazio se o manifesto ainda não existir.
+ */
+export async function criarCamadasAgrupamentos() {
+  if (!(await carregarManifestoAgrupamentos())) return {};
+
+  const overlays = {};
+  Object.entries(manifestoAtual.camadas).forEach(([camada, info]) => {
+    camadas[camada] = new CamadaAgrupamentos(camada, info);
+    overlays[nomeCamadaAgrupamentos(camada)] = camadas[camada];
+  });
+
+  if (!intervaloAtualizacao) {
+    intervaloAtualizacao = setInterval(atualizarCamadas, APP_CONFIG.REFRESH_INTERVAL_MS);
+  }
+  return overlays;
+}
@@ -0,0 +1,97 @@
+/**
+ * @file src/components/ana/camadaAnimacaoChuva.js
+ * @description Camada que anima a chuva horária das estações nas últimas horas disponíveis.
+ * Cada passo lê um único quadro horário (src/utils/ana/quadrosHorarios.js, gerado por
+ * server/apis/ana/services/hourly_frames.py) com a chuva de todas as estações naquela hora, em vez de
+ * baixar a série de cada estação; o leitor busca os quadros seguintes enquanto o atual é exibido.
+ */
+
+import { StationMarkers } from '#components/ana/gerenciadorDeMarcadores.js';
+import { LeitorQuadros, textoDaHora } from '#utils/ana/quadrosHorarios.js';
+
+export const NOME_CAMADA_ANIMACAO = 'Chuva Horária - Animação';
+
+const HORAS_ANIMADAS = 24;
+const INTERVALO_PASSO_MS = 1000;
+
+const ControleHora = L.Control.extend({
+  options: { position: 'bottomleft' },
+
+  onAdd() {
+    this._div = L.DomUtil.create('div', 'leaflet-bar');
+    this._div.style.background = '#fff';
+    this._div.style.padding = '2px 6px';
+    return this._div;
+  },
+
+  definirTexto(texto) {
+    if (this._div) this._div.textContent = texto;
+  }
+});
+
+const CamadaAnimacaoChuva = L.LayerGroup.extend({
+  initialize() {
+    L.LayerGroup.prototype.initialize.call(this);
+    this._leitor = null;
+    this._controle = new ControleHora();
+    this._intervalo = null;
+    this._hora = null;
+  },
+
+  async onAdd(map) {
+    L.LayerGroup.prototype.onAdd.call(this, map);
+    this._controle.addTo(map);
+    try {
+      if (!this._leitor) this._leitor = await new LeitorQuadros().iniciar();
+    } catch (error) {
+      console.warn('Quadros horários indisponíveis:', error.message);
+      this._controle.definirTexto('Quadros horários indisponíveis');
+      return;
+    }
+    if (!this._map) return;
+    this._hora = Math.max(this._leitor.primeiraHora, this._leitor.ultimaHora - HORAS_ANIMADAS + 1);
+    this._passo();
+    clearInterval(this._intervalo);
+    this._intervalo = setInterval(() => this._passo(), INTERVALO_PASSO_MS);
+  },
+
+  onRemove(map) {
+    clearInterval(this._intervalo);
+    this._intervalo = null;
+    map.removeControl(this._controle);
+    L.LayerGroup.prototype.onRemove.call(this, map);
+  },
+
+  async _passo() {
+    const hora = this._hora;
+    // Recomeça do início ao chegar na última hora disponível
+    this._hora = hora >= this._leitor.ultimaHora
+      ? Math.max(this._leitor.primeiraHora, this._leitor.ultimaHora - HORAS_ANIMADAS + 1)
+      : hora + 1;
+
+    const valores = await this._leitor.valores(hora, 'chuva');
+    if (!this._map) return;
+    this.clearLayers();
+    valores.forEach((chuva, codigo) => {
+      const marker = chuva > 0 ? StationMarkers.getMarkerByCode(codigo) : null;
+      if (!marker) return;
+      this.addLayer(L.circleMarker(marker.getLatLng(), {
+        radius: Math.min(4 + 2 * Math.sqrt(chuva), 20),
+        color: '#1f4e9c',
+        weight: 1,
+        fillColor: '#3b8beb',
+        fillOpacity: 0.7
+      }).bindTooltip(`${codigo}: ${chuva.toFixed(1)} mm`));
+    });
+    this._controle.definirTexto(`Chuva em ${textoDaHora(hora)}`);
+  }
+});
+
+/**
+ * Cria a camada de animação da chuva horária.
+ *
+ * @returns {Object} Objeto { nomeDaCamada: L.LayerGroup }.
+ */
+export function criarCamadaAnimacaoChuva() {
+  return { [NOME_CAMADA_ANIMACAO]: new CamadaAnimacaoChuva() };
+}
@@ -0,0 +1,83 @@
+/**
+ * @file src/components/ana/camadaSuperficieChuva.js
+ * @description Camadas de tiles com a superfície de chuva interpolada (uma por janela de acumulação).
+ * Os tiles são pré-renderizados no servidor após cada ciclo de ingestão
+ * (server/apis/ana/services/rainfall_grid.py); o manifesto indica a versão atual de cada janela.
+ */
+
+import { DEFAULT_CONFIG, APP_CONFIG } from '#utils/config.js';
+
+// Tile transparente usado no lugar dos tiles não gravados (áreas sem chuva)
+const TILE_TRANSPARENTE = 'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7';
+
+const camadas = {};
+let intervaloAtualizacao = null;
+
+/**
+ * Nome da camada no controle de camadas para uma janela (ex.: "24h").
+ * @param {string} janela
+ * @returns {string}
+ */
+export function nomeCamadaSuperficie(janela) {
+  return `Superfície de Chuva - ${janela}`;
+}
+
+async function obterManifesto() {
+  const response = await fetch(DEFAULT_CONFIG.SUPERFICIE_CHUVA_MANIFEST, { cache: 'no-cache' });
+  if (!response.ok) throw new Error(`Erro HTTP! status: ${response.status}`);
+  return response.json();
+}
+
+/**
+ * Atualiza a URL das camadas cujas versões mudaram no manifesto.
+ */
+async function atualizarCamadas() {
+  try {
+    const manifesto = await obterManifesto();
+    Object.entries(manifesto.janelas).forEach(([janela, info]) => {
+      const camada = camadas[janela];
+      if (camada && camada._versao !== info.versao) {
+        camada._versao = info.versao;
+        camada.setUrl(info.url);
+      }
+    });
+  } catch (error) {
+    console.error('Erro ao atualizar a superfície de chuva:', error);
+  }
+}
+
+/**
+ * Cria uma camada de tiles para cada janela do manifesto e passa a acompanhar novas versões.
+ *
+ * @returns {Promise<Object>} Objeto { nomeDaCamada: L.TileLayer }; vazio se o manifesto ainda não existir.
+ */
+export async function criarCamadasSuperficieChuva() {
+  let manifesto;
+  try {
+    manifesto = await obterManifesto();
+  } catch (error) {
+    console.warn('Superfície de chuva indisponível:', error.message);
+    return {};
+  }
+
+  const [minZoom, maxZoom] = manifesto.zooms;
+  const overlays = {};
+  Object.entries(manifesto.janelas).forEach(([janela, info]) => {
+    const camada = L.tileLayer(info.url, {
+      bounds: manifesto.limites,
+      minNativeZoom: minZoom,
+      maxNativeZoom: maxZoom,
+      opacity: 0.75,
+      errorTileUrl: TILE_TRANSPARENTE,
+      attribution: 'Chuva interpolada (IDW) das estações ANA/Cemaden'
+    });
+    camada._versao = info.versao;
+    camadas[janela] = camada;
+    overlays[nomeCamadaSuperficie(janela)] = camada;
+  });
+
+  if (!intervaloAtualizacao) {
+    intervaloAtualizacao = setInterval(atualizarCamadas, APP_CONFIG.REFRESH_INTERVAL_MS);
+  }
+  return overlays;
+}
@@ -10,6 +10,7 @@ import { attachFloatingPopupEvents } from '#utils/ana/marker/floatingPopup.js';
 import { DEFAULT_CONFIG, CLASSIFICATION_CONFIG } from '#utils/config.js';
 import { FLOATING_POPUP_CONFIG } from '#utils/config.js';
 import { HybridLayer } from '#components/ana/HybridLayer.js';
+import { carregarManifestoAgrupamentos, criarCamadaClasseAgrupada } from '#components/ana/camadaAgrupamentos.js';
 import { fetchTelemetricData } from '#utils/ana/marker/secaoTelemetria.js';
 
 // Mapeia o "type" para o "layerType" que queremos usar no createClusterIcon
@@ -109,13 +110,15 @@ function createClassificationMarker(marker, type) {
 /**
  * Cria ou recupera uma HybridLayer para uma determinada camada de classificação.
  * Removido o uso de 'status' para forçar 'chuva'.
+ * A versão COM cluster usa os agrupamentos da classe pré-calculados no servidor (camadaAgrupamentos.js);
+ * sem o manifesto dos agrupamentos, volta ao agrupamento no navegador (markerClusterGroup).
  */
-function getOrCreateHybridLayer(layerName, type) {
+function getOrCreateHybridLayer(layerName, type, classificationValue) {
   if (!layers[layerName]) {
     const layerType = resolveLayerType(type);
 
     // Cria a versão COM cluster
-    const clusterLayer = L.markerClusterGroup({
+    const clusterLayer = criarCamadaClasseAgrupada(layerType, classificationValue) || L.markerClusterGroup({
       maxClusterRadius: 40,
       // Chama a função createClusterIcon do StationMarkers com layerType
       iconCreateFunction: (cluster) => StationMarkers.createClusterIcon(cluster, layerType),
@@ -185,7 +188,7 @@ async function atualizarCamadasPorTipo(type) {
     const layerName = `${CLASSIFICATION_CONFIG.PREFIXES[type]} - ${classificationValue}`;
 
     // Agora passamos "type" para getOrCreateHybridLayer
-    const hybridLayer = getOrCreateHybridLayer(layerName, type);
+    const hybridLayer = getOrCreateHybridLayer(layerName, type, classificationValue);
 
     const classificationMarker = createClassificationMarker(marker, type);
     if (classificationMarker) {
@@ -206,6 +209,7 @@ export async function atualizarCamadas() {
 
 export const ClassificationLayers = {
   initialize: async function () {
+    await carregarManifestoAgrupamentos();
     await atualizarCamadas();
   
     // Garante que todas as camadas definidas na ordem geral existam (mesmo vazias)
@@ -231,8 +235,10 @@ export const ClassificationLayers = {
   
     for (const name of allNames) {
       if (!layers[name]) {
-        const type = name.split(" - ")[0].toLowerCase(); // chuva, nível, etc.
-        layers[name] = getOrCreateHybridLayer(name, type);
+        const [prefix, classificationValue] = name.split(" - ");
+        // Chave do tipo (chuva, nivel, vazao) a partir do prefixo ("Nível" -> "nivel")
+        const type = Object.keys(CLASSIFICATION_CONFIG.PREFIXES).find(key => CLASSIFICATION_CONFIG.PREFIXES[key] === prefix);
+        layers[name] = getOrCreateHybridLayer(name, type, classificationValue);
       }
     }
   
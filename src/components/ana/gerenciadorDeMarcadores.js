@@ -165,13 +165,10 @@ export const StationMarkers = (() => {
       });
     },
 
-    load: async () => {
+    // As estações vêm da carga inicial do feed de alterações (carregarEstacoesIniciais em atualizarMarcadores.js),
+    // que também mantém os marcadores atualizados depois, via update()
+    load: async (stations) => {
       try {
-        const response = await fetch(DEFAULT_CONFIG.DATA_SOURCE);
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        const stations = await response.json();
         stations.forEach(station => {
           const code = String(station.codigoestacao);
           if (!markerMap.has(code)) {
@@ -223,7 +223,7 @@ function addClusterToggleControl(map) {
         }
 
         // 2) Para cada camada de classificação
-        const clusterLayers = ClassificationLayers.getClusterLayers();   // { "Chuva - Forte": markerClusterGroup, ... }
+        const clusterLayers = ClassificationLayers.getClusterLayers();   // { "Chuva - Forte": camada agrupada, ... }
         const noClusterLayers = ClassificationLayers.getNoClusterLayers(); // { "Chuva - Forte": layerGroup, ... }
 
         Object.keys(clusterLayers).forEach(layerName => {
@@ -2,6 +2,7 @@
 
 import JSZip from 'jszip';
 import { refreshOverlays, applyOverlayStyles } from '#components/layers/controleCamadas.js';
+import { deveGerarTilesNoServidor, importarCamadaVetorial, criarCamadaVetorialTiles } from '#components/layers/camadaVetorialTiles.js';
 
 /**
  * Módulo de importação e visualização de arquivos no mapa (Refatorado).
@@ -162,6 +163,19 @@ export function removeUploadedFile(fileItemElement, file, uploadedFiles, confirm
  */
 export async function renderFileOnMap(file, map, layerControl) {
     const fileExtension = extractFileExtension(file.name);
+    const fileKey = file.name.substring(0, file.name.lastIndexOf('.'));
+
+    // Arquivos grandes: simplificados e divididos em tiles no servidor (o mapa baixa só os tiles visíveis)
+    if (deveGerarTilesNoServidor(file, fileExtension)) {
+        try {
+            const manifesto = await importarCamadaVetorial(file);
+            refreshOverlays(map, { [fileKey]: criarCamadaVetorialTiles(manifesto) });
+            return;
+        } catch (error) {
+            console.warn(`Tiles do arquivo ${file.name} indisponíveis no servidor; processando no navegador:`, error.message);
+        }
+    }
+
     const reader = new FileReader();
 
     reader.onload = async event => {
@@ -205,7 +219,6 @@ export async function renderFileOnMap(file, map, layerControl) {
             }
 
             // Cria a entrada no controle de camadas
-            const fileKey = file.name.substring(0, file.name.lastIndexOf('.'));
             const newOverlay = { [fileKey]: combinedGroup };
             refreshOverlays(map, newOverlay);
 
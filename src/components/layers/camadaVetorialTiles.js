@@ -0,0 +1,174 @@
+/**
+ * @file src/components/layers/camadaVetorialTiles.js
+ * @description Camada de tiles vetoriais para arquivos importados grandes (GeoJSON, KML, KMZ, GPX).
+ * O arquivo é simplificado e dividido em tiles uma única vez no servidor
+ * (server/apis/ana/services/vector_tiles.py); o mapa baixa apenas os tiles visíveis, já com o nível de
+ * detalhe do zoom, e os desenha em canvas. Tiles "folha" são ampliados nos zooms seguintes.
+ */
+
+import { DEFAULT_CONFIG, FILE_HANDLER_CONFIG } from '#utils/config.js';
+
+// Deve acompanhar VERSAO_FORMATO em vector_tiles.py
+const VERSAO_FORMATO = 1;
+const PONTO = 1, LINHA = 2, POLIGONO = 3;
+
+const ESTILO_PADRAO = {
+    cor: '#3388ff',
+    espessura: 2,
+    preenchimento: 'rgba(51, 136, 255, 0.2)',
+    raioPonto: 4
+};
+
+/**
+ * Indica se o arquivo deve ser processado no servidor em vez de no navegador.
+ * @param {File} file
+ * @param {string} fileExtension
+ * @returns {boolean}
+ */
+export function deveGerarTilesNoServidor(file, fileExtension) {
+    return file.size >= FILE_HANDLER_CONFIG.SERVER_TILING_MIN_BYTES
+        && FILE_HANDLER_CONFIG.SERVER_TILING_EXTENSIONS.includes(fileExtension);
+}
+
+async function sha256Hex(buffer) {
+    const hash = await crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(hash), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+/**
+ * Obtém o manifesto da pirâmide de tiles do arquivo: reaproveita a já gerada para o mesmo conteúdo
+ * (chave SHA-256) ou envia o arquivo ao servidor.
+ *
+ * @param {File} file
+ * @returns {Promise<Object>} Manifesto ({ url_tiles, zoom_maximo, bbox, ... }).
+ */
+export async function importarCamadaVetorial(file) {
+    const buffer = await file.arrayBuffer();
+
+    if (globalThis.crypto?.subtle) {
+        try {
+            const chave = await sha256Hex(buffer);
+            const response = await fetch(`${DEFAULT_CONFIG.CAMADAS_VETORIAIS_DIR}/${chave}/manifesto.json`);
+            if (response.ok) {
+                const manifesto = await response.json();
+                if (manifesto.versao_formato === VERSAO_FORMATO) return manifesto;
+            }
+        } catch (error) {
+            // Sem manifesto em cache: segue para a importação
+        }
+    }
+
+    const url = `${DEFAULT_CONFIG.CAMADAS_VETORIAIS_IMPORTACAO}?nome=${encodeURIComponent(file.name)}`;
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: buffer
+    });
+    const manifesto = await response.json();
+    if (!response.ok) {
+        throw new Error(manifesto.error || `Erro HTTP! status: ${response.status}`);
+    }
+    return manifesto;
+}
+
+const CamadaVetorialTiles = L.GridLayer.extend({
+    initialize(manifesto, options) {
+        L.GridLayer.prototype.initialize.call(this, options);
+        this._manifesto = manifesto;
+        this._estilo = { ...ESTILO_PADRAO, ...(options && options.estilo) };
+        this._tilesBaixados = new Map();
+    },
+
+    /** Tile gravado (ou null, se não existir), baixado uma única vez. */
+    _buscarTile(z, x, y) {
+        const chave = `${z}/${x}/${y}`;
+        if (!this._tilesBaixados.has(chave)) {
+            const url = L.Util.template(this._manifesto.url_tiles, { z, x, y });
+            this._tilesBaixados.set(chave, fetch(url)
+                .then(response => (response.ok ? response.json() : null))
+                .catch(() => null));
+        }
+        return this._tilesBaixados.get(chave);
+    },
+
+    /**
+     * Tile com os dados de (z, x, y): o próprio, ou a folha de um zoom menor que o cobre.
+     * Um tile ausente cujo ancestral mais próximo não é folha está vazio.
+     */
+    async _tileOuFolha(z, x, y) {
+        while (z > this._manifesto.zoom_maximo) {
+            z -= 1; x >>= 1; y >>= 1;
+        }
+        const tile = await this._buscarTile(z, x, y);
+        if (tile) return tile;
+        while (z > 0) {
+            z -= 1; x >>= 1; y >>= 1;
+            const ancestral = await this._buscarTile(z, x, y);
+            if (ancestral) return ancestral.folha ? ancestral : null;
+        }
+        return null;
+    },
+
+    createTile(coords, done) {
+        const canvas = L.DomUtil.create('canvas', 'leaflet-tile');
+        const tamanho = this.getTileSize();
+        canvas.width = tamanho.x;
+        canvas.height = tamanho.y;
+        this._tileOuFolha(coords.z, coords.x, coords.y)
+            .then(dados => {
+                if (dados) this._desenhar(canvas, dados, coords);
+                done(null, canvas);
+            })
+            .catch(error => done(error, canvas));
+        return canvas;
+    },
+
+    _desenhar(canvas, dados, coords) {
+        const escala = 2 ** (coords.z - dados.z);
+        const fator = (canvas.width * escala) / dados.extent;
+        const deslocamentoX = (coords.x - dados.x * escala) * canvas.width;
+        const deslocamentoY = (coords.y - dados.y * escala) * canvas.height;
+        const ctx = canvas.getContext('2d');
+        const estilo = this._estilo;
+        ctx.strokeStyle = estilo.cor;
+        ctx.fillStyle = estilo.preenchimento;
+        ctx.lineWidth = estilo.espessura;
+        ctx.lineJoin = 'round';
+
+        dados.feicoes.forEach(feicao => {
+            ctx.beginPath();
+            feicao.g.forEach(parte => {
+                for (let i = 0; i < parte.length; i += 2) {
+                    const px = parte[i] * fator - deslocamentoX;
+                    const py = parte[i + 1] * fator - deslocamentoY;
+                    if (feicao.t === PONTO) {
+                        ctx.moveTo(px + estilo.raioPonto, py);
+                        ctx.arc(px, py, estilo.raioPonto, 0, 2 * Math.PI);
+                    } else if (i === 0) {
+                        ctx.moveTo(px, py);
+                    } else {
+                        ctx.lineTo(px, py);
+                    }
+                }
+            });
+            // Anéis internos e multipolígonos no mesmo caminho: a regra evenodd recorta os buracos
+            if (feicao.t !== LINHA) ctx.fill(feicao.t === POLIGONO ? 'evenodd' : 'nonzero');
+            ctx.stroke();
+        });
+    }
+});
+
+/**
+ * Cria a camada Leaflet da pirâmide de tiles descrita no manifesto.
+ *
+ * @param {Object} manifesto - Resposta de importarCamadaVetorial.
+ * @param {Object} [options] - Opções de L.GridLayer e { estilo: { cor, espessura, preenchimento, raioPonto } }.
+ * @returns {L.GridLayer}
+ */
+export function criarCamadaVetorialTiles(manifesto, options = {}) {
+    const [oeste, sul, leste, norte] = manifesto.bbox;
+    return new CamadaVetorialTiles(manifesto, {
+        bounds: L.latLngBounds([sul, oeste], [norte, leste]),
+        ...options
+    });
+}
@@ -5,6 +5,9 @@
 import { createBaseLayers, createSatelliteLayer, DEFAULT_LAYER_NAME } from '#components/layers/camadasBase.js';
 import { StationMarkers } from '#components/ana/gerenciadorDeMarcadores.js';
 import { ClassificationLayers } from '#components/ana/camadasClassificacao.js';
+import { criarCamadasSuperficieChuva, nomeCamadaSuperficie } from '#components/ana/camadaSuperficieChuva.js';
+import { criarCamadasAgrupamentos, nomeCamadaAgrupamentos } from '#components/ana/camadaAgrupamentos.js';
+import { criarCamadaAnimacaoChuva, NOME_CAMADA_ANIMACAO } from '#components/ana/camadaAnimacaoChuva.js';
 import { getMarkerColorFromLayerName } from '#utils/ana/marker/estiloMarcador.js';
 import { FILE_HANDLER_CONFIG } from '#utils/config.js';
 
@@ -50,6 +53,8 @@ const ORDEM_GERAL = [
   "Chuva - Fraca",
   "Chuva - Sem Chuva",
   "Chuva - Indefinido",
+  ...["1h", "3h", "6h", "12h", "24h"].map(nomeCamadaSuperficie),
+  NOME_CAMADA_ANIMACAO,
   "Nível - Alto",
   "Nível - Normal",
   "Nível - Baixo",
@@ -57,7 +62,8 @@ const ORDEM_GERAL = [
   "Vazão - Alta",
   "Vazão - Normal",
   "Vazão - Baixa",
-  "Vazão - Indefinido"
+  "Vazão - Indefinido",
+  ...["chuva", "nivel", "vazao", "status", "rio"].map(nomeCamadaAgrupamentos)
 ];
 
 /**
@@ -197,14 +203,20 @@ export async function initializeLayerControl(map) {
   const camadasNivel = ClassificationLayers.getCamadasNivel();
   const camadasVazao = ClassificationLayers.getCamadasVazao();
   const camadasRio = ClassificationLayers.getCamadasRio();
+  const camadasSuperficie = await criarCamadasSuperficieChuva();
+  const camadasAgrupamentos = await criarCamadasAgrupamentos();
+  const camadaAnimacao = criarCamadaAnimacaoChuva();
 
   // 5) Mescla e ordena (reabilitada "Todas Estações"; camadas de status permanecem excluídas)
   const allOverlays = {
     "Todas Estações": stationLayer,
     ...camadasChuva,
+    ...camadasSuperficie,
+    ...camadaAnimacao,
     ...camadasNivel,
     ...camadasVazao,
-    ...camadasRio
+    ...camadasRio,
+    ...camadasAgrupamentos
   };
   const overlaysOrdenados = ordenarCamadas(allOverlays, ORDEM_GERAL);
 
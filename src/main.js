@@ -26,7 +26,7 @@ import { setupMapControls, addClusterToggleControl } from '#components/controleM
 import { setupImportControl } from '#components/controleImportacao.js';
 import { initializeLayerControl } from '#components/layers/controleCamadas.js';
 import { MAP_CONFIG, APP_CONFIG } from '#utils/config.js';
-import { atualizarMarcadoresIncremental } from '#utils/ana/atualizarMarcadores.js';
+import { startAutoUpdate, carregarEstacoesIniciais } from '#utils/ana/atualizarMarcadores.js';
 import { StationMarkers } from '#components/ana/gerenciadorDeMarcadores.js';
 import { showError } from '#utils/notificacoes.js';
 // import { setupHourlyRainfall } from '#components/Hydro_Estimator_Rainfall/HourlyRainfall.js';
@@ -60,7 +60,7 @@ if (!mapElement) {
             console.timeEnd('Map Initialization');
 
             StationMarkers.initialize(map);
-            await StationMarkers.load();
+            await StationMarkers.load(await carregarEstacoesIniciais());
 
             const { layerControl } = await initializeLayerControl(map);
 
@@ -90,9 +90,11 @@ if (!mapElement) {
             atualizarEstatisticasNaUI();
             setTimeout(configurarEventosEstatisticas, APP_CONFIG.CONFIG_EVENT_DELAY_MS);
 
-            // Atualiza os marcadores, gráficos e estatísticas conforme o intervalo definido em APP_CONFIG
+            // Os marcadores são atualizados pelo feed de alterações (long-poll), com fallback periódico
+            startAutoUpdate();
+
+            // Atualiza os gráficos e estatísticas conforme o intervalo definido em APP_CONFIG
             setInterval(() => {
-                atualizarMarcadoresIncremental();
                 atualizarGraficoDeChuva();
                 atualizarEstatisticasNaUI();
                 setTimeout(configurarEventosEstatisticas, APP_CONFIG.CONFIG_EVENT_DELAY_MS);
@@ -10,6 +10,11 @@ const CACHE_TIME_MS = CACHE_CONFIG.STATIONS.TTL;
 const UPDATE_INTERVAL = APP_CONFIG.MARKER_UPDATE_INTERVAL_MS;
 let updateIntervalId = null;
 
+// Estado do feed de alterações (long-poll): versão conhecida e controle da requisição em andamento
+let feedVersion = null;
+let feedActive = false;
+let feedAbortController = null;
+
 async function fetchStations() {
   const now = Date.now();
   if (stationCache && now - lastUpdateTime < CACHE_TIME_MS) {
@@ -29,37 +34,133 @@ async function fetchStations() {
   }
 }
 
+async function aplicarEstacoes(newStations) {
+  await StationMarkers.update(newStations);
+
+  if (modalState.isOpen && modalState.stationCode && modalState.activeType && modalState.stationName) {
+    updateModalContent(
+      modalState.activeType,            // activeType
+      modalState.stationCode,           // stationCode
+      modalState.stationName,           // stationName
+      modalState.stationMunicipio_Nome, // stationMunicipio_Nome (nome da cidade)
+      true                              // skipSpinner (ou false, conforme a necessidade)
+      // Se necessário, o intervalo pode ser passado como 6º parâmetro
+    );
+  }
+}
+
 export async function atualizarMarcadoresIncremental() {
   try {
     const newStations = await fetchStations();
-    await StationMarkers.update(newStations);
-
-    if (modalState.isOpen && modalState.stationCode && modalState.activeType && modalState.stationName) {
-      updateModalContent(
-        modalState.activeType,            // activeType
-        modalState.stationCode,           // stationCode
-        modalState.stationName,           // stationName
-        modalState.stationMunicipio_Nome, // stationMunicipio_Nome (nome da cidade)
-        true                              // skipSpinner (ou false, conforme a necessidade)
-        // Se necessário, o intervalo pode ser passado como 6º parâmetro
-      );
-    }
+    await aplicarEstacoes(newStations);
   } catch (error) {
     console.error("❌ Erro ao atualizar marcadores:", error);
   }
 }
 
-export function startAutoUpdate() {
+/**
+ * Mescla os resumos recebidos do feed (última leitura e classificações) nas estações em cache.
+ * Estações ausentes do cache são ignoradas; elas chegam na próxima carga completa.
+ */
+function mesclarAlteracoes(stations, alteracoes) {
+  const porCodigo = new Map(alteracoes.map(resumo => [String(resumo.codigoestacao), resumo]));
+  return stations.map(station => {
+    const resumo = porCodigo.get(String(station.codigoestacao));
+    return resumo ? { ...station, ...resumo } : station;
+  });
+}
+
+async function fetchFeedVersion() {
+  const response = await fetch(`${DEFAULT_CONFIG.DATA_SOURCE_ALTERACOES}/versao`);
+  if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+  return (await response.json()).versao;
+}
+
+/**
+ * Laço de long-poll: cada requisição fica aberta até o servidor publicar estações alteradas
+ * (ou até o timeout), e só as estações alteradas são transferidas e aplicadas aos marcadores.
+ */
+async function acompanharFeed() {
+  let falhas = 0;
+  while (feedActive) {
+    try {
+      feedAbortController = new AbortController();
+      const url = `${DEFAULT_CONFIG.DATA_SOURCE_ALTERACOES}?desde=${feedVersion}&timeout=${APP_CONFIG.FEED_LONG_POLL_TIMEOUT_S}`;
+      const response = await fetch(url, { signal: feedAbortController.signal });
+      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+      const delta = await response.json();
+      falhas = 0;
+      if (delta.estacoes.length && stationCache) {
+        stationCache = mesclarAlteracoes(stationCache, delta.estacoes);
+        lastUpdateTime = Date.now();
+        await aplicarEstacoes(stationCache);
+      }
+      const semVersaoNova = !delta.estacoes.length && delta.versao === feedVersion;
+      feedVersion = delta.versao;
+      // Sem versão nova (timeout ou servidor que respondeu sem esperar), aguarda antes da próxima requisição
+      if (semVersaoNova) await new Promise(resolve => setTimeout(resolve, APP_CONFIG.FEED_RETRY_DELAY_MS));
+    } catch (error) {
+      if (!feedActive) return;
+      falhas += 1;
+      console.error("❌ Erro no feed de alterações:", error);
+      if (falhas >= APP_CONFIG.FEED_MAX_FAILURES) {
+        console.warn("⚠️ Feed de alterações indisponível; voltando à atualização periódica.");
+        feedActive = false;
+        iniciarAtualizacaoPeriodica();
+        return;
+      }
+      await new Promise(resolve => setTimeout(resolve, APP_CONFIG.FEED_RETRY_DELAY_MS));
+    }
+  }
+}
+
+function iniciarAtualizacaoPeriodica() {
   if (!updateIntervalId) {
+    updateIntervalId = setInterval(atualizarMarcadoresIncremental, UPDATE_INTERVAL);
+    console.log("🔄 Atualização automática iniciada (30 segundos)");
+  }
+}
+
+/**
+ * Carga completa inicial das estações (única requisição a DATA_SOURCE na abertura do mapa).
+ * A versão do feed é obtida antes: alterações publicadas entre as duas chegam depois pelo feed.
+ */
+export async function carregarEstacoesIniciais() {
+  try {
+    feedVersion = await fetchFeedVersion();
+  } catch (error) {
+    feedVersion = null;
+    console.warn("⚠️ Versão do feed de alterações indisponível na carga inicial.", error);
+  }
+  return fetchStations();
+}
+
+export async function startAutoUpdate() {
+  if (updateIntervalId || feedActive) return;
+  try {
+    if (feedVersion === null) {
+      // Sem carga inicial pelo feed: obtém a versão e aplica uma carga completa antes de acompanhar o feed
+      feedVersion = await fetchFeedVersion();
+      await atualizarMarcadoresIncremental();
+    }
+    feedActive = true;
+    acompanharFeed();
+    console.log(`🔄 Atualização por feed de alterações iniciada (versão ${feedVersion})`);
+  } catch (error) {
+    console.warn("⚠️ Feed de alterações indisponível; usando atualização periódica.", error);
     // Primeira execução imediata
     atualizarMarcadoresIncremental();
     // Configura intervalo periódico
-    updateIntervalId = setInterval(atualizarMarcadoresIncremental, UPDATE_INTERVAL);
-    console.log("🔄 Atualização automática iniciada (30 segundos)");
+    iniciarAtualizacaoPeriodica();
   }
 }
 
 export function stopAutoUpdate() {
+  if (feedActive) {
+    feedActive = false;
+    feedAbortController?.abort();
+    console.log("⏹ Atualização por feed de alterações parada");
+  }
   if (updateIntervalId) {
     clearInterval(updateIntervalId);
     updateIntervalId = null;
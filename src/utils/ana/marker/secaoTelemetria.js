@@ -10,6 +10,7 @@ import {
     TELEMETRIC_CHART_CONFIG
 } from '#utils/config.js';
 import {
+    buscarRegistrosSerie,
     renderChuvaChart,
     renderCotaChart,
     renderVazaoChart
@@ -129,12 +130,19 @@ export async function updateModalContent(
     try {
         updateProgressStatus("Buscando dados...");
         // STEP 1: Buscar os dados da API
-        const response = await fetch(apiUrl);
-        if (!response.ok) {
-            telemetricModalText.innerHTML = 'Erro ao buscar dados históricos.';
-            return;
+        if (interval.endsWith('d')) {
+            // Intervalos em dias vêm de /estacoes/serie (reduzida no servidor e revalidada por ETag)
+            const inicio = new Date(`${dateStr}T00:00:00Z`);
+            inicio.setUTCDate(inicio.getUTCDate() - (parseInt(interval, 10) - 1));
+            stationData = { registros: await buscarRegistrosSerie(stationCode, inicio.toISOString().slice(0, 10), dateStr) };
+        } else {
+            const response = await fetch(apiUrl);
+            if (!response.ok) {
+                telemetricModalText.innerHTML = 'Erro ao buscar dados históricos.';
+                return;
+            }
+            stationData = await response.json();
         }
-        stationData = await response.json();
         if (!stationData || !stationData.registros || stationData.registros.length === 0) {
             telemetricModalText.innerHTML = `
                 <h4>Histórico - ${activeType}</h4>
@@ -228,12 +236,12 @@ export async function updateModalContent(
     // Preenche o select de intervalos
     const intervalSelect = document.getElementById('intervalSelect');
     intervalSelect.innerHTML = '';
-    const intervals = [2, 6, 12, 24, 48];
-    intervals.forEach((h) => {
+    const intervals = ['2h', '6h', '12h', '24h', '48h', '7d', '30d'];
+    intervals.forEach((valor) => {
         const opt = document.createElement('option');
-        opt.value = `${h}h`;
-        opt.textContent = `${h}h`;
-        if (`${h}h` === modalState.selectedInterval) {
+        opt.value = valor;
+        opt.textContent = valor;
+        if (valor === modalState.selectedInterval) {
             opt.selected = true;
         }
         intervalSelect.appendChild(opt);
@@ -0,0 +1,139 @@
+/**
+ * @file src/utils/ana/quadrosHorarios.js
+ * @description Leitura dos quadros horários das estações para animações no mapa.
+ * Cada quadro (/data/quadros/YYYY/MM/DD/HH.bin, gerado por server/apis/ana/services/hourly_frames.py)
+ * traz chuva, cota e vazão de todas as estações numa hora; a posição de cada estação está em estacoes.json.
+ * O leitor mantém os quadros já baixados e busca os próximos em sequência enquanto o atual é exibido.
+ */
+
+import { DEFAULT_CONFIG } from '#utils/config.js';
+
+const ASSINATURA = 'QH01';
+const TAMANHO_CABECALHO = 16;
+const VARIAVEIS = ['chuva', 'cota', 'vazao'];
+const MS_HORA = 3600 * 1000;
+
+/**
+ * Converte "YYYY-MM-DD HH:MM:SS" (horário de Brasília) no número da hora usado nos quadros.
+ * As horas são contadas como se o horário local fosse UTC, igual ao servidor (medicao // 3600).
+ * @param {string} texto
+ * @returns {number}
+ */
+export function horaDoTexto(texto) {
+  return Math.floor(Date.parse(`${texto.slice(0, 10)}T${texto.slice(11, 19)}Z`) / MS_HORA);
+}
+
+/**
+ * Converte o número da hora em "YYYY-MM-DD HH:00".
+ * @param {number} hora
+ * @returns {string}
+ */
+export function textoDaHora(hora) {
+  return new Date(hora * MS_HORA).toISOString().slice(0, 16).replace('T', ' ');
+}
+
+function urlQuadro(hora) {
+  const iso = new Date(hora * MS_HORA).toISOString();
+  return `${DEFAULT_CONFIG.QUADROS_HORARIOS_DIR}/${iso.slice(0, 4)}/${iso.slice(5, 7)}/${iso.slice(8, 10)}/${iso.slice(11, 13)}.bin`;
+}
+
+/**
+ * Decodifica um quadro.
+ * @param {ArrayBuffer} buffer
+ * @returns {{hora: number, chuva: Float32Array, cota: Float32Array, vazao: Float32Array}}
+ */
+export function decodificarQuadro(buffer) {
+  const visao = new DataView(buffer);
+  const assinatura = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  const n = visao.getUint32(4, true);
+  if (assinatura !== ASSINATURA || buffer.byteLength !== TAMANHO_CABECALHO + 3 * n * 4) {
+    throw new Error('Quadro horário inválido.');
+  }
+  const quadro = { hora: Number(visao.getBigInt64(8, true)) };
+  VARIAVEIS.forEach((variavel, i) => {
+    quadro[variavel] = new Float32Array(buffer, TAMANHO_CABECALHO + i * n * 4, n);
+  });
+  return quadro;
+}
+
+export class LeitorQuadros {
+  /**
+   * @param {Object} [opcoes]
+   * @param {number} [opcoes.prefetch=6] - Quantos quadros à frente buscar após cada leitura.
+   * @param {number} [opcoes.maxQuadros=96] - Quadros mantidos em memória.
+   */
+  constructor({ prefetch = 6, maxQuadros = 96 } = {}) {
+    this.prefetch = prefetch;
+    this.maxQuadros = maxQuadros;
+    this.estacoes = [];
+    this.catalogo = null;
+    this._quadros = new Map(); // hora -> Promise<quadro|null>
+  }
+
+  /** Carrega o índice das estações e o catálogo (primeira e última hora disponíveis). */
+  async iniciar() {
+    const [estacoes, catalogo] = await Promise.all([
+      fetch(`${DEFAULT_CONFIG.QUADROS_HORARIOS_DIR}/estacoes.json`, { cache: 'no-cache' }).then(r => r.json()),
+      fetch(`${DEFAULT_CONFIG.QUADROS_HORARIOS_DIR}/catalogo.json`, { cache: 'no-cache' }).then(r => r.json()),
+    ]);
+    this.estacoes = estacoes.estacoes;
+    this.catalogo = catalogo;
+    this.primeiraHora = horaDoTexto(catalogo.primeira_hora);
+    this.ultimaHora = horaDoTexto(catalogo.ultima_hora);
+    return this;
+  }
+
+  _buscar(hora) {
+    if (this._quadros.has(hora)) {
+      // Mantém a ordem de uso (o Map é a fila do LRU)
+      const promessa = this._quadros.get(hora);
+      this._quadros.delete(hora);
+      this._quadros.set(hora, promessa);
+      return promessa;
+    }
+    const promessa = fetch(urlQuadro(hora))
+      .then(r => (r.ok ? r.arrayBuffer() : null))
+      .then(buffer => (buffer ? decodificarQuadro(buffer) : null))
+      .catch(error => {
+        console.error(`Erro ao obter o quadro de ${textoDaHora(hora)}:`, error);
+        return null;
+      });
+    this._quadros.set(hora, promessa);
+    while (this._quadros.size > this.maxQuadros) {
+      this._quadros.delete(this._quadros.keys().next().value);
+    }
+    return promessa;
+  }
+
+  /**
+   * Quadro da hora (null se não houver leituras nela) e busca antecipada dos seguintes.
+   * @param {number} hora - Número da hora (ver horaDoTexto).
+   * @param {number} [passo=1] - Sentido da animação (1 = para frente, -1 = para trás).
+   * @returns {Promise<Object|null>}
+   */
+  quadro(hora, passo = 1) {
+    const promessa = this._buscar(hora);
+    for (let i = 1; i <= this.prefetch; i++) {
+      const proxima = hora + i * passo;
+      if (proxima < this.primeiraHora || proxima > this.ultimaHora) break;
+      this._buscar(proxima);
+    }
+    return promessa;
+  }
+
+  /**
+   * Valores da hora por estação.
+   * @param {number} hora
+   * @param {string} variavel - chuva, cota ou vazao.
+   * @returns {Promise<Map<string, number>>} Código da estação -> valor (apenas estações com leitura).
+   */
+  async valores(hora, variavel) {
+    const quadro = await this.quadro(hora);
+    const valores = new Map();
+    if (!quadro) return valores;
+    quadro[variavel].forEach((valor, posicao) => {
+      if (!Number.isNaN(valor) && posicao < this.estacoes.length) valores.set(this.estacoes[posicao], valor);
+    });
+    return valores;
+  }
+}
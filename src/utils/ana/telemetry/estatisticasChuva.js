@@ -32,13 +32,21 @@ export async function obterDadosEstatisticos() {
     }
 
     try {
-        const [cidadesData, estacoesData, estacoesCategorizadas] = await Promise.all([
-            fetchData(DEFAULT_CONFIG.DATA_SOURCE_CHUVA_POR_CIDADE),
-            fetchData(DEFAULT_CONFIG.DATA_SOURCE),
+        // Estatísticas pré-calculadas a cada ciclo de ingestão; sem elas, calcula a partir das estações
+        const [estatisticasChuva, estacoesCategorizadas] = await Promise.all([
+            fetchData(DEFAULT_CONFIG.DATA_SOURCE_ESTATISTICAS_CHUVA),
             fetchData(DEFAULT_CONFIG.DATA_SOURCE_CATEGORIZADAS)
         ]);
 
-        cacheEstatisticas = calcularEstatisticas(cidadesData, estacoesData, estacoesCategorizadas);
+        if (estatisticasChuva.geral) {
+            cacheEstatisticas = converterEstatisticasPreCalculadas(estatisticasChuva, estacoesCategorizadas);
+        } else {
+            const [cidadesData, estacoesData] = await Promise.all([
+                fetchData(DEFAULT_CONFIG.DATA_SOURCE_CHUVA_POR_CIDADE),
+                fetchData(DEFAULT_CONFIG.DATA_SOURCE)
+            ]);
+            cacheEstatisticas = calcularEstatisticas(cidadesData, estacoesData, estacoesCategorizadas);
+        }
         ultimaAtualizacao = agora;
 
         return cacheEstatisticas;
@@ -156,6 +164,48 @@ function calcularEstatisticas(cidadesData, estacoesData, estacoesCategorizadas)
     };
 }
 
+/**
+ * Converte o arquivo de estatísticas pré-calculadas (GET /estacoes/estatisticasChuva) para o mesmo
+ * formato retornado por calcularEstatisticas, sem recalcular média, mediana e desvio padrão.
+ *
+ * @param {Object} estatisticasChuva - Conteúdo de estatisticas_chuva.json ("geral", "grupos", "estacoes").
+ * @param {Object} estacoesCategorizadas - Dados das estações categorizadas (para contagem de desatualizadas).
+ * @returns {Object} Estatísticas no formato de calcularEstatisticas.
+ */
+function converterEstatisticasPreCalculadas(estatisticasChuva, estacoesCategorizadas) {
+    const { geral, grupos, estacoes } = estatisticasChuva;
+    const cidades = grupos.Municipio_Nome || [];
+    const mediaGeral = geral.media || 0;
+
+    const cidadesSemChuva = cidades.filter(cidade => cidade.media === 0);
+    const cidadesComChuvaElevada = cidades.filter(cidade => (cidade.mediana || 0) > mediaGeral);
+    const maiorRegistroChuva = geral.maximo > 0
+        ? `${geral.estacaoMaximo.Municipio_Nome} (${geral.maximo.toFixed(2)} mm)`
+        : 'N/A (0.00 mm)';
+
+    return {
+        totalCidadesMonitoradas: cidades.length,
+        listaCidades: cidades.map(cidade => cidade.nome),
+        cidadesSemChuva: cidadesSemChuva.length,
+        listaCidadesSemChuva: cidadesSemChuva.map(cidade => cidade.nome),
+        cidadesComChuvaElevada: cidadesComChuvaElevada.length,
+        listaCidadesComChuvaElevada: cidadesComChuvaElevada.map(cidade => cidade.nome),
+        maiorRegistroChuva,
+        mediaGeralChuva: `${mediaGeral.toFixed(2)} mm`,
+        medianaChuva: `${(geral.mediana || 0).toFixed(2)} mm`,
+        desvioPadraoChuva: `${(geral.desvioPadrao || 0).toFixed(2)} mm`,
+        totalEstacoesMonitoradas: geral.numEstacoes,
+        totalEstacoesNA: estacoesCategorizadas.desatualizadas ? estacoesCategorizadas.desatualizadas.length : 0,
+        listaValoresChuva: cidades
+            .filter(cidade => cidade.mediana > 0)
+            .map(cidade => parseFloat(cidade.mediana.toFixed(2)))
+            .sort((a, b) => a - b),
+        listaValoresChuvaGlobal: Object.values(estacoes)
+            .map(estacao => estacao.chuvaAcumulada)
+            .sort((a, b) => a - b)
+    };
+}
+
 /**
  * Atualiza os valores das estatísticas na UI.
  */
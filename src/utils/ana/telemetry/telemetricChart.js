@@ -14,7 +14,7 @@ import {
   PointElement
 } from 'chart.js';
 
-import { CHART_STYLES } from '#utils/config.js';
+import { CHART_STYLES, DEFAULT_CONFIG } from '#utils/config.js';
 
 Chart.register(
   CategoryScale,
@@ -29,6 +29,44 @@ Chart.register(
   PointElement
 );
 
+// Campo dos registros preenchido por cada variável de /estacoes/serie
+const CAMPOS_SERIE = { cota: 'Cota_Adotada', vazao: 'Vazao_Adotada', chuva: 'Chuva_Adotada' };
+// Pontos por variável pedidos ao servidor (o máximo aceito por series_query.py): 30 dias de leituras
+// horárias ou de 10 em 10 minutos chegam sem redução, o que mantém correto o acumulado de chuva
+const PONTOS_SERIE = 5000;
+
+/**
+ * Busca a série da estação em /estacoes/serie (reduzida no servidor, com ETag) e a converte em registros
+ * no formato usado pelos gráficos ({ Data_Hora_Medicao, Cota_Adotada, Vazao_Adotada, Chuva_Adotada }).
+ *
+ * @param {string} stationCode - Código da estação.
+ * @param {string} inicio - Primeiro dia do intervalo ("YYYY-MM-DD").
+ * @param {string} fim - Último dia do intervalo ("YYYY-MM-DD").
+ * @returns {Promise<Array<Object>>} Registros em ordem cronológica.
+ */
+export async function buscarRegistrosSerie(stationCode, inicio, fim) {
+  const params = new URLSearchParams({
+    inicio,
+    fim,
+    variaveis: Object.keys(CAMPOS_SERIE).join(','),
+    pontos: PONTOS_SERIE,
+    metodo: 'minmax'
+  });
+  const response = await fetch(`${DEFAULT_CONFIG.DATA_SOURCE_SERIE}/${encodeURIComponent(stationCode)}?${params}`);
+  if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+  const { series } = await response.json();
+
+  const porHorario = new Map();
+  Object.entries(CAMPOS_SERIE).forEach(([variavel, campo]) => {
+    const { horarios = [], valores = [] } = series[variavel] || {};
+    horarios.forEach((horario, i) => {
+      if (!porHorario.has(horario)) porHorario.set(horario, { Data_Hora_Medicao: horario });
+      porHorario.get(horario)[campo] = valores[i];
+    });
+  });
+  return [...porHorario.values()].sort((a, b) => a.Data_Hora_Medicao.localeCompare(b.Data_Hora_Medicao));
+}
+
 /**
  * Ordena os registros pela data/hora de medição e prepara rótulos (labels) e valores (dataValues)
  * com base em uma propriedade específica (fieldName). Retorna também o valor máximo encontrado.
@@ -13,11 +13,20 @@ export const DEFAULT_CONFIG = {
   DATA_SOURCE: `${API_BASE}/api/stationData/estacoes/todas`,
   DATA_SOURCE_HISTORICO: `${API_BASE}/api/stationData/estacoes/historico`,
   DATA_SOURCE_CHUVA_POR_CIDADE: `${API_BASE}/api/stationData/estacoes/chuvaPorCidade`,
+  DATA_SOURCE_ESTATISTICAS_CHUVA: `${API_BASE}/api/stationData/estacoes/estatisticasChuva`,
   DATA_SOURCE_CATEGORIZADAS: `${API_BASE}/api/stationData/estacoes/categorizadas`,
+  DATA_SOURCE_ALTERACOES: `${API_BASE}/api/stationData/estacoes/alteracoes`,
+  DATA_SOURCE_SERIE: `${API_BASE}/api/stationData/estacoes/serie`, // Séries por intervalo, reduzidas no servidor (series_query.py)
+  SUPERFICIE_CHUVA_MANIFEST: '/data/tiles/chuva/manifest.json',
+  AGRUPAMENTOS_MANIFEST: '/data/clusters/manifest.json', // Agrupamentos de estações por zoom (marker_clusters.py)
+  CAMADAS_VETORIAIS_DIR: '/data/camadas', // Tiles dos arquivos importados (server/apis/ana/services/vector_tiles.py)
+  CAMADAS_VETORIAIS_IMPORTACAO: `${API_BASE}/api/camadas`,
+  QUADROS_HORARIOS_DIR: '/data/quadros', // Quadros horários de todas as estações (server/apis/ana/services/hourly_frames.py)
   TELEMETRIC_DATE: new Date().toLocaleDateString('en-CA', { timeZone: 'America/Sao_Paulo' }),
   TILE_PROXY_URL: `${API_BASE}/proxy/image`,
   GEOCODE_ENDPOINT: `${API_BASE}/api/geocode`,
   REAL_EARTH_API_URL: 'https://realearth.ssec.wisc.edu/api/times',
+  REAL_EARTH_TIMES_URL: `${API_BASE}/proxy/times`, // Horários servidos do cache do prefetcher
 };
 
 
@@ -33,6 +42,9 @@ export const CACHE_CONFIG = {
   },
   STATIONS: {
     TTL: 1 * 60 * 1000 // 10 segundos em milissegundos
+  },
+  TIMESTAMPS: {
+    TTL: 5 * 60 * 1000 // Horários do Hydro-Estimator (o prefetcher os atualiza a cada 5 minutos)
   }
 };
 
@@ -41,7 +53,10 @@ export const APP_CONFIG = {
   MAP_ELEMENT_ID: 'map',              // ID do elemento HTML do mapa
   REFRESH_INTERVAL_MS: 1 * 40 * 1000,          // Intervalo de atualização dos dados (10000 ms = 10 segundo)
   CONFIG_EVENT_DELAY_MS: 1 * 60 * 1000,        // Delay para disparar a configuração dos eventos após atualização (10000 ms = 10 segundos)
-  MARKER_UPDATE_INTERVAL_MS: 1 * 20 * 1000     // Intervalo de atualização dos marcadores (10000 ms = 10 segundos)
+  MARKER_UPDATE_INTERVAL_MS: 1 * 20 * 1000,    // Intervalo de atualização dos marcadores (10000 ms = 10 segundos)
+  FEED_LONG_POLL_TIMEOUT_S: 25,                // Tempo máximo de espera de cada long-poll do feed de alterações
+  FEED_RETRY_DELAY_MS: 5 * 1000,               // Espera após uma falha no feed ou uma resposta sem versão nova
+  FEED_MAX_FAILURES: 3                         // Falhas seguidas antes de voltar à atualização periódica
 };
 
 // Configurações para classificação, com prefixos, tamanho de lote para processamento e valor padrão.
@@ -265,7 +280,10 @@ export const FILE_HANDLER_CONFIG = {
     kml: 'kml.png',         // Ícone para arquivos KML
     gpx: 'gpx.png',         // Ícone para arquivos GPX
     default: 'file.png'     // Ícone padrão para formatos não reconhecidos
-  }
+  },
+  // Arquivos a partir deste tamanho são simplificados e divididos em tiles no servidor
+  SERVER_TILING_MIN_BYTES: 2 * 1024 * 1024,
+  SERVER_TILING_EXTENSIONS: ['geojson', 'json', 'kml', 'kmz', 'gpx']
 };
 
 // Configurações do mapa, definindo centro, zoom e limites de navegação.